@@ -1,10 +1,26 @@
-from django.contrib import admin
+import io
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from django.utils.html import format_html
-from django.urls import reverse
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils.html import format_html, format_html_join
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
-from .models import UserProfile, Operation, Record, RecordMedia, AuditLog, DeletionLog
+from django.utils import timezone
+from datetime import timedelta
+from .forms import RecordImportForm
+from .ingest import IngestError, import_records
+from .models import (
+    UserProfile, Operation, Record, RecordMedia, AuditLog, DeletionLog, GeocodeCache, OperationArchive,
+    Customer, Meter, AnomalySuggestion, ProfileRun,
+)
+from .profiling import QUERY_PARAM, make_token
+from .signals import get_client_ip
 
 
 # =============================================
@@ -196,6 +212,7 @@ class RecordAdmin(admin.ModelAdmin):
     readonly_fields = ['record_number', 'created_at', 'updated_at']
     inlines = [RecordMediaInline]
     date_hierarchy = 'created_at'
+    change_list_template = 'admin/DataForm/record/change_list.html'
     
     fieldsets = (
         ('Record Information', {
@@ -220,6 +237,49 @@ class RecordAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='DataForm_record_import'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_view(self, request):
+        """Upload a CSV/XLSX sheet; rejected rows are saved to an error report"""
+        if not self.has_add_permission(request):
+            return redirect('admin:DataForm_record_changelist')
+        
+        form = RecordImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            report = io.StringIO()
+            try:
+                summary = import_records(
+                    upload, upload.name, form.cleaned_data['operation'], request.user,
+                    error_report=report, ip_address=get_client_ip(request)
+                )
+            except IngestError as e:
+                form.add_error('file', str(e))
+            else:
+                self.message_user(request, f"Imported {summary['created']} of {summary['rows']} rows.")
+                if summary['rejected']:
+                    stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+                    name = default_storage.save(
+                        f'imports/record_errors_{stamp}.csv', ContentFile(report.getvalue().encode('utf-8'))
+                    )
+                    self.message_user(request, format_html(
+                        '{} rows were rejected. <a href="{}">Download the error report</a>.',
+                        summary['rejected'], default_storage.url(name)
+                    ), level=messages.WARNING)
+                return redirect('admin:DataForm_record_changelist')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import records',
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/DataForm/record/import.html', context)
+    
     def status_badge(self, obj):
         colors = {
             'draft': 'gray',
@@ -303,10 +363,57 @@ class RecordMediaAdmin(admin.ModelAdmin):
 # AUDIT LOG ADMIN
 # =============================================
 
+class AuditPeriodFilter(admin.SimpleListFilter):
+    """
+    Show recent audit entries unless another period is picked, so the
+    changelist only scans the latest monthly partitions.
+    """
+    title = 'period'
+    parameter_name = 'period'
+    default_period = '3m'
+    periods = {'1m': 30, '3m': 92, '12m': 366}
+    
+    def __init__(self, request, params, model, model_admin):
+        # Drilling down the date hierarchy picks its own period
+        self.has_date_filter = any(key.startswith('timestamp__') for key in params)
+        super().__init__(request, params, model, model_admin)
+    
+    def lookups(self, request, model_admin):
+        return [
+            ('1m', 'Last 30 days'),
+            ('3m', 'Last 3 months'),
+            ('12m', 'Last 12 months'),
+            ('all', 'All time'),
+        ]
+    
+    def value(self):
+        value = super().value()
+        if value is None:
+            return 'all' if self.has_date_filter else self.default_period
+        return value
+    
+    def choices(self, changelist):
+        for lookup, title in self.lookup_choices:
+            yield {
+                'selected': self.value() == lookup,
+                'query_string': changelist.get_query_string({self.parameter_name: lookup}),
+                'display': title,
+            }
+    
+    def queryset(self, request, queryset):
+        days = self.periods.get(self.value())
+        if days is None:
+            return queryset
+        return queryset.filter(timestamp__gte=timezone.now() - timedelta(days=days))
+
+
 @admin.register(AuditLog)
 class AuditLogAdmin(admin.ModelAdmin):
     list_display = ['timestamp', 'user', 'action_type_badge', 'target_type', 'target_id', 'ip_address']
-    list_filter = ['action_type', 'target_type', 'timestamp']
+    list_filter = [AuditPeriodFilter, 'action_type', 'target_type', 'timestamp']
+    list_select_related = ['user']
+    # Counting every partition on each page load is the slowest part of the changelist
+    show_full_result_count = False
     search_fields = ['user__username', 'ip_address', 'details']
     readonly_fields = ['user', 'action_type', 'target_type', 'target_id', 'details', 
                        'timestamp', 'ip_address', 'details_display']
@@ -428,3 +535,165 @@ class DeletionLogAdmin(admin.ModelAdmin):
         except:
             return str(obj.metadata)
     metadata_display.short_description = 'Metadata (JSON)'
+
+
+# =============================================
+# GEOCODE CACHE ADMIN
+# =============================================
+
+@admin.register(GeocodeCache)
+class GeocodeCacheAdmin(admin.ModelAdmin):
+    list_display = ['latitude', 'longitude', 'address', 'created_at']
+    search_fields = ['address']
+    readonly_fields = ['created_at']
+
+
+# =============================================
+# OPERATION ARCHIVE ADMIN
+# =============================================
+
+@admin.register(OperationArchive)
+class OperationArchiveAdmin(admin.ModelAdmin):
+    list_display = ['operation', 'format', 'record_count', 'media_count', 'audit_count', 'archived_at', 'purged_at']
+    list_filter = ['format', 'archived_at']
+    search_fields = ['operation__name', 'location']
+    readonly_fields = ['operation', 'location', 'format', 'record_count', 'media_count', 'audit_count',
+                       'checksums', 'archived_by', 'archived_at', 'purged_at']
+    
+    def has_add_permission(self, request):
+        # Archives are created by the archive_operations command
+        return False
+
+
+# =============================================
+# CUSTOMER / METER REGISTRY ADMIN
+# =============================================
+
+class MeterInline(admin.TabularInline):
+    model = Meter
+    extra = 0
+    fields = ['meter_number', 'address']
+
+
+@admin.register(Customer)
+class CustomerAdmin(admin.ModelAdmin):
+    list_display = ['account_number', 'name', 'contact', 'updated_at']
+    search_fields = ['account_number', 'name', 'contact']
+    inlines = [MeterInline]
+
+
+@admin.register(Meter)
+class MeterAdmin(admin.ModelAdmin):
+    list_display = ['meter_number', 'customer', 'address', 'updated_at']
+    search_fields = ['meter_number', 'customer__account_number', 'customer__name']
+    list_select_related = ['customer']
+    raw_id_fields = ['customer']
+
+
+# =============================================
+# ANOMALY SUGGESTION ADMIN
+# =============================================
+
+@admin.register(AnomalySuggestion)
+class AnomalySuggestionAdmin(admin.ModelAdmin):
+    list_display = ['record', 'reason', 'suggested_type', 'consumption', 'status', 'created_at', 'reviewed_by']
+    list_filter = ['status', 'reason', 'created_at']
+    search_fields = ['record__record_number', 'record__meter_number', 'record__customer_name']
+    list_select_related = ['record', 'reviewed_by']
+    readonly_fields = ['record', 'reason', 'details', 'created_at', 'reviewed_by', 'reviewed_at']
+    
+    def consumption(self, obj):
+        return obj.details.get('consumption', '-')
+    consumption.short_description = 'Consumption'
+    
+    def has_add_permission(self, request):
+        # Suggestions are queued by the validate_readings command
+        return False
+    
+    actions = ['accept_suggestions', 'dismiss_suggestions']
+    
+    def accept_suggestions(self, request, queryset):
+        accepted = 0
+        for suggestion in queryset.filter(status='pending').select_related('record'):
+            record = suggestion.record
+            if record.type_of_anomaly == 'none':
+                record.type_of_anomaly = suggestion.suggested_type
+                record.save()
+            suggestion.status = 'accepted'
+            suggestion.reviewed_by = request.user
+            suggestion.reviewed_at = timezone.now()
+            suggestion.save()
+            accepted += 1
+        self.message_user(request, f"{accepted} suggestion(s) accepted; the records now carry the anomaly.")
+    accept_suggestions.short_description = "Accept: set the anomaly type on the records"
+    
+    def dismiss_suggestions(self, request, queryset):
+        dismissed = queryset.filter(status='pending').update(
+            status='dismissed', reviewed_by=request.user, reviewed_at=timezone.now()
+        )
+        self.message_user(request, f"{dismissed} suggestion(s) dismissed.")
+    dismiss_suggestions.short_description = "Dismiss selected suggestions"
+
+
+# =============================================
+# PROFILE RUN ADMIN
+# =============================================
+
+@admin.register(ProfileRun)
+class ProfileRunAdmin(admin.ModelAdmin):
+    list_display = ['path', 'view_name', 'status_code', 'duration_ms', 'query_count', 'db_ms', 'user', 'created_at']
+    list_filter = ['view_name', 'created_at']
+    search_fields = ['path', 'view_name']
+    list_select_related = ['user']
+    date_hierarchy = 'created_at'
+    change_list_template = 'admin/DataForm/profilerun/change_list.html'
+    fields = ['user', 'view_name', 'method', 'path', 'status_code', 'duration_ms', 'query_count', 'db_ms',
+              'created_at', 'stats_download', 'summary_display', 'queries_display']
+    readonly_fields = fields
+    
+    def get_urls(self):
+        urls = [
+            path('token/', self.admin_site.admin_view(self.token_view), name='DataForm_profilerun_token'),
+            path('<int:pk>/stats/', self.admin_site.admin_view(self.stats_view), name='DataForm_profilerun_stats'),
+        ]
+        return urls + super().get_urls()
+    
+    def token_view(self, request):
+        """Issue a profiling token to the current admin"""
+        self.message_user(request, format_html(
+            'Add <code>?{}={}</code> (or the X-Profile-Token header) to a request to profile it.',
+            QUERY_PARAM, make_token(request.user)
+        ))
+        return redirect('admin:DataForm_profilerun_changelist')
+    
+    def stats_view(self, request, pk):
+        """Raw cProfile stats as a .prof file"""
+        run = self.get_object(request, pk)
+        if run is None or not self.has_view_permission(request, run):
+            return redirect('admin:DataForm_profilerun_changelist')
+        response = HttpResponse(bytes(run.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile_{run.pk}.prof"'
+        return response
+    
+    def stats_download(self, obj):
+        return format_html('<a href="{}">Download .prof</a>', reverse('admin:DataForm_profilerun_stats', args=[obj.pk]))
+    stats_download.short_description = 'cProfile Stats'
+    
+    def summary_display(self, obj):
+        return format_html('<pre style="font-size: 11px; overflow-x: auto;">{}</pre>', obj.summary)
+    summary_display.short_description = 'Top Functions'
+    
+    def queries_display(self, obj):
+        rows = format_html_join('', '<tr><td>{}</td><td><code>{}</code></td><td>{}</td></tr>', (
+            (query['ms'], query['sql'], format_html_join(mark_safe('<br>'), '{}', ((frame,) for frame in query['origin'])))
+            for query in sorted(obj.queries, key=lambda query: -query['ms'])
+        ))
+        return format_html('<table><tr><th>ms</th><th>SQL</th><th>Origin</th></tr>{}</table>', rows)
+    queries_display.short_description = 'Queries (slowest first)'
+    
+    def has_add_permission(self, request):
+        # Runs are recorded by DataForm.middleware.ProfilingMiddleware
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
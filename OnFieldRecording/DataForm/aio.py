@@ -0,0 +1,132 @@
+"""
+Async view helpers for DataForm app
+Read-heavy endpoints (active operation, record list, search, sync
+long-polling, metrics) are async views when served over ASGI
+(OnFieldRecording.asgi): they query through Django's async ORM, hand
+other ORM-bound code to run_sync() and blocking work that does not touch
+the database (template rendering, archive parsing) to run_blocking(), so
+a waiting request holds no worker thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import close_old_connections
+from django.db.models import QuerySet
+from django.http import HttpResponse
+from django.template import loader
+
+from .archive import ArchivedRecordSet, attach_archived_relations, get_archive, read_archived_records
+from .models import Record
+
+
+# =============================================
+# BLOCKING WORK
+# =============================================
+
+_pool = None
+
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=settings.ASYNC_SYNC_WORKERS, thread_name_prefix='aio')
+    return _pool
+
+
+def _pooled(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Pool work should not query; if it did, don't leave the thread holding a connection
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run ORM-bound sync code from an async view.
+
+    Calls are thread-sensitive: they run in the request's sync thread and
+    share its database connection (and any transaction) with the async ORM
+    queries. They are not run in parallel with each other, so keep them
+    short and move work that does not query to run_blocking().
+    """
+    return await sync_to_async(func, thread_sensitive=True)(*args, **kwargs)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run blocking work that does not touch the database from an async view.
+
+    Runs in a pool of ASYNC_SYNC_WORKERS threads shared by all requests;
+    calls over that limit queue until a thread is free.
+    """
+    return await sync_to_async(_pooled, thread_sensitive=False, executor=_executor())(func, *args, **kwargs)
+
+
+# =============================================
+# RENDERING
+# =============================================
+
+def _processed_context(request, template, context):
+    """The context with the engine's context processors applied (they may query)"""
+    # Resolve the user here rather than lazily during the render
+    request.user.is_authenticated
+    processed = dict(context)
+    for processor in template.backend.engine.template_context_processors:
+        processed.update(processor(request))
+    return processed
+
+
+async def render(request, template_name, context):
+    """
+    django.shortcuts.render() for async views.
+
+    Context processors run in run_sync(); the template itself renders in
+    run_blocking(), so its context must already be fetched: evaluated
+    pages, select_related() relations, no lazy querysets.
+    """
+    template = await run_blocking(loader.get_template, template_name)
+    context = await run_sync(_processed_context, request, template, context)
+    return HttpResponse(await run_blocking(template.render, context))
+
+
+# =============================================
+# RECORDS
+# =============================================
+
+async def operation_records(operation):
+    """archive.operation_records() for async views (archive files are parsed in run_blocking())"""
+    archive = await run_sync(get_archive, operation)
+    if archive is None:
+        return Record.objects.filter(operation=operation, is_deleted=False)
+    records = await run_blocking(read_archived_records, archive)
+    await run_sync(attach_archived_relations, archive, records)
+    return await run_blocking(lambda: ArchivedRecordSet(records).filter(is_deleted=False))
+
+
+async def paginate(records, page_number, per_page=50):
+    """
+    Paginator page whose rows are already fetched.
+
+    QuerySets are counted and sliced through the async ORM; archived
+    record sets (in memory) are paginated in run_blocking().
+
+    Returns:
+        Page: With a list as object_list and paginator.count set
+    """
+    if not isinstance(records, QuerySet):
+        return await run_blocking(lambda: _fetched(Paginator(records, per_page).get_page(page_number)))
+
+    paginator = Paginator(records, per_page)
+    paginator.count = await records.acount()
+    page = paginator.get_page(page_number)
+    page.object_list = [record async for record in page.object_list]
+    return page
+
+
+def _fetched(page):
+    page.object_list = list(page.object_list)
+    return page
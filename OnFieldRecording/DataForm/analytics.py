@@ -0,0 +1,267 @@
+"""
+Operation analytics for DataForm app
+Distributions and rates over an operation's records (balance and reading
+percentiles, anomaly rates by agent, hour and area, per-agent productivity
+curves), computed with NumPy over columns loaded in chunks and cached per
+operation data version
+"""
+
+import logging
+from datetime import date, timedelta
+from itertools import islice
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Max, QuerySet
+from django.utils import timezone
+
+from .archive import get_archive, operation_records
+from .models import Record
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+# Rows fetched and converted to arrays at a time
+ANALYTICS_CHUNK_SIZE = 20000
+
+# Results are keyed on the data version, so the timeout only frees memory
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+
+PERCENTILES = [5, 25, 50, 75, 95, 99]
+
+# Area = GPS grid cell of this size (about 1 km at the equator)
+AREA_CELL_DEGREES = 0.01
+TOP_AREAS = 20
+
+COLUMNS = [
+    'created_by_id', 'created_at', 'todays_balance', 'meter_reading',
+    'type_of_anomaly', 'gps_latitude', 'gps_longitude',
+]
+
+
+# =============================================
+# DATA VERSION
+# =============================================
+
+def data_version(operation):
+    """
+    Version of an operation's records, read from the database.
+
+    Any insert, edit (updated_at) or delete changes it, whichever process
+    or command made the write. Archived operations use the archive checksum.
+    """
+    stats = Record.objects.filter(operation=operation).aggregate(count=Count('pk'), updated=Max('updated_at'))
+    # Purged operations have no live rows
+    archive = get_archive(operation) if not stats['count'] else None
+    if archive is not None:
+        return f"archive-{archive.checksums.get('records', '')[:16]}"
+    updated = stats['updated'].timestamp() if stats['updated'] else 0
+    return f"{stats['count']}-{updated:.6f}"
+
+
+# =============================================
+# COLUMN LOADING
+# =============================================
+
+def load_columns(operation, chunk_size=ANALYTICS_CHUNK_SIZE):
+    """
+    An operation's live records as NumPy columns.
+
+    Rows are read with values_list() (or from the archive) chunk by chunk,
+    so only one chunk of Python tuples exists at a time.
+
+    Returns:
+        dict: agent (int64), time (epoch seconds), balance, reading, lat,
+        lon (float64, NaN when missing) and anomaly (bool)
+    """
+    records = operation_records(operation)
+    if isinstance(records, QuerySet):
+        rows = records.values_list(*COLUMNS).iterator(chunk_size=chunk_size)
+    else:
+        rows = (tuple(getattr(record, name) for name in COLUMNS) for record in records)
+
+    parts = {name: [] for name in ('agent', 'time', 'balance', 'reading', 'anomaly', 'lat', 'lon')}
+    while chunk := list(islice(rows, chunk_size)):
+        agents, created, balances, readings, anomalies, lats, lons = zip(*chunk)
+        parts['agent'].append(np.array(agents, dtype=np.int64))
+        parts['time'].append(np.array([ts.timestamp() for ts in created]))
+        parts['balance'].append(np.array(balances, dtype=np.float64))
+        parts['reading'].append(np.array(readings, dtype=np.float64))
+        parts['anomaly'].append(np.array(anomalies) != 'none')
+        parts['lat'].append(np.array(lats, dtype=np.float64))
+        parts['lon'].append(np.array(lons, dtype=np.float64))
+
+    dtypes = {'agent': np.int64, 'anomaly': bool}
+    return {
+        name: np.concatenate(arrays) if arrays else np.array([], dtype=dtypes.get(name, np.float64))
+        for name, arrays in parts.items()
+    }
+
+
+# =============================================
+# STATISTICS
+# =============================================
+
+def _rate(anomalies, records):
+    return round(anomalies / records, 4) if records else 0.0
+
+
+def _distribution(values):
+    """Percentiles and moments of a column (NaNs ignored)"""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        'count': int(len(values)),
+        'mean': round(float(values.mean()), 2),
+        'std': round(float(values.std()), 2),
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+    }
+
+
+def _group_rates(codes, anomaly, size):
+    """Record and anomaly counts per group code"""
+    records = np.bincount(codes, minlength=size)
+    anomalies = np.bincount(codes, weights=anomaly, minlength=size).astype(np.int64)
+    return records, anomalies
+
+
+def compute_analytics(columns, usernames=None, utc_offset=0):
+    """
+    Statistics over load_columns() output.
+
+    Args:
+        columns: Column arrays
+        usernames: {user id: username} for the agent breakdowns
+        utc_offset: Seconds added to timestamps for hours and days
+
+    Returns:
+        dict: JSON-ready summary, distributions, by_agent, by_hour,
+        by_area and productivity
+    """
+    usernames = usernames or {}
+    anomaly = columns['anomaly']
+    total = len(anomaly)
+    local = columns['time'] + utc_offset
+
+    result = {
+        'summary': {
+            'records': total,
+            'anomalies': int(anomaly.sum()),
+            'anomaly_rate': _rate(int(anomaly.sum()), total),
+            'without_gps': 0,
+        },
+        'distributions': {
+            'todays_balance': _distribution(columns['balance']),
+            'meter_reading': _distribution(columns['reading']),
+        },
+        'by_agent': [],
+        'by_hour': [],
+        'by_area': [],
+        'productivity': {'dates': [], 'agents': []},
+    }
+    if not total:
+        return result
+
+    # Anomaly rate by agent
+    agent_ids, agent_codes = np.unique(columns['agent'], return_inverse=True)
+    records, anomalies = _group_rates(agent_codes, anomaly, len(agent_ids))
+    result['by_agent'] = sorted(
+        (
+            {
+                'agent_id': int(agent_id),
+                'agent': usernames.get(int(agent_id), str(agent_id)),
+                'records': int(count),
+                'anomalies': int(flagged),
+                'anomaly_rate': _rate(int(flagged), int(count)),
+            }
+            for agent_id, count, flagged in zip(agent_ids, records, anomalies)
+        ),
+        key=lambda row: -row['records'],
+    )
+
+    # Anomaly rate by hour of day
+    hours = (local // 3600 % 24).astype(np.int64)
+    records, anomalies = _group_rates(hours, anomaly, 24)
+    result['by_hour'] = [
+        {'hour': hour, 'records': int(records[hour]), 'anomalies': int(anomalies[hour]),
+         'anomaly_rate': _rate(int(anomalies[hour]), int(records[hour]))}
+        for hour in range(24)
+    ]
+
+    # Anomaly rate by area (GPS grid cell), busiest cells first
+    located = ~(np.isnan(columns['lat']) | np.isnan(columns['lon']))
+    result['summary']['without_gps'] = int(total - located.sum())
+    if located.any():
+        cell_rows = np.floor((columns['lat'][located] + 90) / AREA_CELL_DEGREES).astype(np.int64)
+        cell_cols = np.floor((columns['lon'][located] + 180) / AREA_CELL_DEGREES).astype(np.int64)
+        width = int(360 / AREA_CELL_DEGREES) + 1
+        cell_ids, cell_codes = np.unique(cell_rows * width + cell_cols, return_inverse=True)
+        records, anomalies = _group_rates(cell_codes, anomaly[located], len(cell_ids))
+        for index in np.argsort(-records, kind='stable')[:TOP_AREAS]:
+            south = cell_ids[index] // width * AREA_CELL_DEGREES - 90
+            west = cell_ids[index] % width * AREA_CELL_DEGREES - 180
+            result['by_area'].append({
+                'latitude': round(float(south + AREA_CELL_DEGREES / 2), 4),
+                'longitude': round(float(west + AREA_CELL_DEGREES / 2), 4),
+                'records': int(records[index]),
+                'anomalies': int(anomalies[index]),
+                'anomaly_rate': _rate(int(anomalies[index]), int(records[index])),
+            })
+
+    # Records per agent per day, and the cumulative curve
+    days = (local // 86400).astype(np.int64)
+    first_day = days.min()
+    days -= first_day
+    day_count = int(days.max()) + 1
+    daily = np.bincount(agent_codes * day_count + days, minlength=len(agent_ids) * day_count)
+    daily = daily.reshape(len(agent_ids), day_count)
+    cumulative = daily.cumsum(axis=1)
+    active_days = (daily > 0).sum(axis=1)
+    start = date(1970, 1, 1) + timedelta(days=int(first_day))
+    result['productivity'] = {
+        'dates': [(start + timedelta(days=day)).isoformat() for day in range(day_count)],
+        'agents': [
+            {
+                'agent_id': int(agent_id),
+                'agent': usernames.get(int(agent_id), str(agent_id)),
+                'daily': daily[index].tolist(),
+                'cumulative': cumulative[index].tolist(),
+                'active_days': int(active_days[index]),
+                'per_active_day': round(float(cumulative[index, -1] / active_days[index]), 2),
+            }
+            for index, agent_id in enumerate(agent_ids)
+        ],
+    }
+    return result
+
+
+# =============================================
+# CACHED ENTRY POINT
+# =============================================
+
+def get_operation_analytics(operation):
+    """
+    Analytics of an operation, recomputed only when its records changed.
+
+    Hours and days use the current UTC offset of TIME_ZONE.
+    """
+    version = data_version(operation)
+    key = f"analytics:{operation.pk}:{version}"
+    result = cache.get(key)
+    if result is None:
+        columns = load_columns(operation)
+        usernames = dict(User.objects.filter(pk__in=np.unique(columns['agent']).tolist()).values_list('pk', 'username'))
+        result = compute_analytics(columns, usernames, timezone.localtime().utcoffset().total_seconds())
+        result.update(operation=operation.pk, version=version, computed_at=timezone.now().isoformat())
+        cache.set(key, result, ANALYTICS_CACHE_TIMEOUT)
+        logger.info(f"Analytics computed for operation {operation.pk}: {len(columns['agent'])} records")
+    return result
@@ -0,0 +1,299 @@
+"""
+REST API for DataForm app (mounted at /api/v1/)
+
+Read-only endpoints for records, operations and media, built for bulk
+readers (mobile client, billing integration):
+- list endpoints serialize .values() rows with only the selected columns
+- keyset (cursor) pagination, so deep pages cost the same as the first
+- ?fields=a,b,c to trim the payload
+- /sync/ returns the changes since a device's cursor (see sync.py);
+  /sync/poll/ waits for them (async, for ASGI)
+- /records/batch/ creates records captured offline (see ingest.py)
+"""
+
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework import filters, viewsets
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+from rest_framework.views import APIView
+
+from . import aio
+from .auth import Principal, aget_principal, get_principal
+from .ingest import IngestError, ingest_batch
+from .models import Operation, Record, RecordMedia
+from .renderers import ORJSONRenderer
+from .serializers import (
+    ValuesSerializer, RecordValuesSerializer, RecordDetailSerializer,
+    OperationValuesSerializer, MediaValuesSerializer,
+)
+from .signals import get_client_ip
+from .sync import InvalidCursor, SYNC_PAGE_SIZE, SYNC_MAX_PAGE_SIZE, changes_since
+
+
+# =============================================
+# PERMISSIONS AND PAGINATION
+# =============================================
+
+class IsStaffMember(BasePermission):
+    """Staff and admin profiles (same rule as the staff_required decorator)"""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and get_principal(request).can_access_staff_views
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination; the ordering comes from the view (see OrderingFilter)"""
+
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 5000
+
+
+def int_param(request, name):
+    """Optional integer query parameter"""
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: 'Must be an integer.'})
+
+
+# =============================================
+# VIEWSETS
+# =============================================
+
+class ValuesViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only viewset that serializes .values() rows when its serializer
+    is a ValuesSerializer, selecting only the columns the requested fields
+    and the cursor ordering need.
+    """
+
+    permission_classes = [IsStaffMember]
+    pagination_class = KeysetPagination
+    filter_backends = [filters.OrderingFilter]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if issubclass(self.get_serializer_class(), ValuesSerializer):
+            columns = self.get_serializer().value_columns()
+            if self.action == 'list':
+                columns += [name.lstrip('-') for name in self.paginator.get_ordering(self.request, queryset, self)]
+            queryset = queryset.values(*dict.fromkeys(columns))
+        return queryset
+
+
+class RecordViewSet(ValuesViewSet):
+    """
+    Records (soft-deleted excluded).
+
+    Filters: ?operation=<id>&status=<status>&anomaly=<type>&created_by=<id>
+    Ordering: ?ordering=-created_at (default), created_at, updated_at, id
+    """
+
+    ordering = ['-created_at']
+    ordering_fields = ['created_at', 'updated_at', 'id']
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return RecordDetailSerializer
+        return RecordValuesSerializer
+
+    def get_queryset(self):
+        queryset = Record.objects.filter(is_deleted=False)
+
+        if self.action == 'retrieve':
+            return queryset.select_related('operation', 'created_by').prefetch_related('media_files')
+
+        operation = int_param(self.request, 'operation')
+        if operation is not None:
+            queryset = queryset.filter(operation_id=operation)
+        created_by = int_param(self.request, 'created_by')
+        if created_by is not None:
+            queryset = queryset.filter(created_by_id=created_by)
+        status = self.request.query_params.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+        anomaly = self.request.query_params.get('anomaly')
+        if anomaly:
+            queryset = queryset.filter(type_of_anomaly=anomaly)
+        return queryset
+
+
+class OperationViewSet(ValuesViewSet):
+    """Operations with their live record counts"""
+
+    serializer_class = OperationValuesSerializer
+    ordering = ['-created_at']
+    ordering_fields = ['created_at', 'id']
+
+    def get_queryset(self):
+        return Operation.objects.filter(is_deleted=False).annotate(
+            record_count=Count('records', filter=Q(records__is_deleted=False))
+        )
+
+
+class MediaViewSet(ValuesViewSet):
+    """
+    Record media.
+
+    Filters: ?record=<id>&operation=<id>
+    """
+
+    serializer_class = MediaValuesSerializer
+    ordering = ['-uploaded_at']
+    ordering_fields = ['uploaded_at', 'id']
+
+    def get_queryset(self):
+        queryset = RecordMedia.objects.filter(record__is_deleted=False)
+        record = int_param(self.request, 'record')
+        if record is not None:
+            queryset = queryset.filter(record_id=record)
+        operation = int_param(self.request, 'operation')
+        if operation is not None:
+            queryset = queryset.filter(record__operation_id=operation)
+        return queryset
+
+
+# =============================================
+# DELTA SYNC
+# =============================================
+
+@method_decorator(gzip_page, name='dispatch')
+class SyncView(APIView):
+    """
+    Changes since a device's last sync.
+
+    GET /api/v1/sync/?cursor=<token>&limit=1000&operation=<id>
+    Omit the cursor for a full sync; keep calling with the returned cursor
+    while has_more is true.
+    """
+
+    permission_classes = [IsStaffMember]
+
+    def get(self, request):
+        limit = int_param(request, 'limit')
+        if limit is None:
+            limit = SYNC_PAGE_SIZE
+        elif not 0 < limit <= SYNC_MAX_PAGE_SIZE:
+            raise ValidationError({'limit': f'Must be between 1 and {SYNC_MAX_PAGE_SIZE}.'})
+        try:
+            changes = changes_since(
+                request.query_params.get('cursor'),
+                limit=limit,
+                operation_id=int_param(request, 'operation'),
+            )
+        except InvalidCursor as e:
+            raise ValidationError({'cursor': str(e)})
+        return Response(changes)
+
+
+async def _poll_principal(request):
+    """Principal from a "Token <key>" header or the session, or None"""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        token = await Token.objects.select_related('user__profile').filter(key=header[6:].strip()).afirst()
+        if token is None or not token.user.is_active:
+            return None
+        return Principal(token.user)
+    principal = await aget_principal(request)
+    return principal if principal.is_authenticated else None
+
+
+def _has_changes(changes):
+    return any(changes[stream]['rows'] for stream in ('records', 'media', 'operations', 'tombstones'))
+
+
+@gzip_page
+async def sync_poll(request):
+    """
+    Long-polling variant of /sync/ for devices waiting on changes.
+
+    GET /api/v1/sync/poll/?cursor=<token>&wait=25&limit=1000&operation=<id>
+    Answers as soon as there are changes after the cursor, or with empty
+    streams and the same cursor once `wait` seconds (at most
+    SYNC_POLL_MAX_WAIT) have passed. Under ASGI a waiting device holds no
+    worker thread; checks run every SYNC_POLL_INTERVAL seconds.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    principal = await _poll_principal(request)
+    if principal is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not principal.can_access_staff_views:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+    try:
+        limit = int(request.GET.get('limit') or SYNC_PAGE_SIZE)
+        wait = float(request.GET.get('wait') or settings.SYNC_POLL_MAX_WAIT)
+        operation_id = int(request.GET['operation']) if request.GET.get('operation') else None
+    except ValueError:
+        return JsonResponse({'detail': 'limit, wait and operation must be numbers.'}, status=400)
+    if not 0 < limit <= SYNC_MAX_PAGE_SIZE:
+        return JsonResponse({'limit': [f'Must be between 1 and {SYNC_MAX_PAGE_SIZE}.']}, status=400)
+
+    deadline = time.monotonic() + min(max(wait, 0), settings.SYNC_POLL_MAX_WAIT)
+    while True:
+        try:
+            changes = await aio.run_sync(
+                changes_since, request.GET.get('cursor'), limit=limit, operation_id=operation_id,
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'cursor': [str(e)]}, status=400)
+        remaining = deadline - time.monotonic()
+        if _has_changes(changes) or remaining <= 0:
+            break
+        await asyncio.sleep(min(settings.SYNC_POLL_INTERVAL, remaining))
+
+    return HttpResponse(ORJSONRenderer().render(changes), content_type=ORJSONRenderer.media_type)
+
+
+# =============================================
+# BATCH INGEST
+# =============================================
+
+class RecordBatchView(APIView):
+    """
+    Create records captured offline in one round-trip.
+
+    POST /api/v1/records/batch/ with {"records": [{client_key, ...}, ...]}
+    as JSON, or as multipart with the list JSON-encoded in a "records" part
+    and the photos as file parts named in each record's "media" list.
+    Replaying a batch is safe: known client keys return the original record.
+    """
+
+    permission_classes = [IsStaffMember]
+
+    def post(self, request):
+        items = request.data.get('records')
+        if isinstance(items, str):
+            try:
+                items = json.loads(items)
+            except ValueError:
+                raise ValidationError({'records': 'Must be a JSON list.'})
+        try:
+            results = ingest_batch(items, request.user, files=request.FILES, ip_address=get_client_ip(request))
+        except IngestError as e:
+            raise ValidationError({'records': str(e)})
+        return Response({'results': results})
+
+
+router = DefaultRouter()
+router.register('records', RecordViewSet, basename='api-record')
+router.register('operations', OperationViewSet, basename='api-operation')
+router.register('media', MediaViewSet, basename='api-media')
@@ -0,0 +1,569 @@
+"""
+Cold archival of closed operations for DataForm app
+Moves an operation's records, media rows and record audit entries out of the
+live tables into compressed files (Parquet when pyarrow is installed,
+gzip JSON Lines otherwise) and reads them back on demand for reports and search
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import Q
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from . import maps
+from .db import retry_on_locked
+from .models import Operation, Record, RecordMedia, AuditLog, OperationArchive, AnomalySuggestion
+from .utils import overwrite_stored_file
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet is optional
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+ARCHIVE_ROOT = 'archives'
+
+DELETE_BATCH_SIZE = 1000
+
+# Archived operations kept parsed in memory
+LOADED_ARCHIVES_MAX = 4
+
+# Fields searched by operation_search (mirrors the view's Q filter)
+SEARCH_FIELDS = [
+    'customer_name', 'customer_contact', 'account_number', 'meter_number',
+    'gps_address', 'record_number', 'remarks',
+]
+
+
+class ArchiveError(Exception):
+    """Raised when an operation cannot be archived or an archive fails verification"""
+
+
+def parquet_available():
+    return pq is not None
+
+
+def archive_location(operation):
+    return f'{ARCHIVE_ROOT}/operation_{operation.pk}'
+
+
+def table_path(location, table, fmt):
+    return f'{location}/{table}.{fmt}'
+
+
+# =============================================
+# ROW SERIALIZATION
+# =============================================
+
+def _fields(model):
+    return [field for field in model._meta.concrete_fields]
+
+
+def serialize_row(model, row):
+    """Convert a values() row to plain JSON types (str, int, float, bool, None)"""
+    serialized = {}
+    for field in _fields(model):
+        value = row[field.attname]
+        if value is None:
+            pass
+        elif isinstance(field, models.JSONField):
+            value = json.dumps(value, sort_keys=True)
+        elif isinstance(value, Decimal):
+            value = str(value)
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif hasattr(value, 'name') and isinstance(field, models.FileField):
+            value = value.name
+        serialized[field.attname] = value
+    return serialized
+
+
+def deserialize_row(model, row):
+    """Inverse of serialize_row(): Python values ready for Model.from_db()"""
+    values = {}
+    for field in _fields(model):
+        value = row.get(field.attname)
+        if value is not None:
+            if isinstance(field, models.JSONField):
+                value = json.loads(value)
+            elif isinstance(field, models.FileField):
+                pass
+            else:
+                value = field.to_python(value)
+        values[field.attname] = value
+    return values
+
+
+def _canonical(row):
+    return json.dumps(row, sort_keys=True, separators=(',', ':')).encode() + b'\n'
+
+
+def _arrow_type(field):
+    if isinstance(field, (models.AutoField, models.IntegerField, models.ForeignKey)):
+        return pa.int64()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    if isinstance(field, models.FloatField):
+        return pa.float64()
+    return pa.string()
+
+
+# =============================================
+# FILE WRITERS AND READERS
+# =============================================
+
+def _write_table(queryset, path, fmt, batch_size=5000):
+    """
+    Stream a queryset to an archive file in storage.
+
+    Returns:
+        tuple: (row count, sha256 of the canonical rows)
+    """
+    return _write_rows(queryset.model, _serialized(queryset, batch_size), path, fmt, batch_size)
+
+
+def _serialized(queryset, batch_size=5000):
+    """Serialized rows of a queryset, in pk order"""
+    model = queryset.model
+    attnames = [field.attname for field in _fields(model)]
+    for row in queryset.order_by('pk').values(*attnames).iterator(chunk_size=batch_size):
+        yield serialize_row(model, row)
+
+
+def _write_rows(model, rows, path, fmt, batch_size=5000):
+    """_write_table() for serialized rows (an iterable, read once)"""
+    digest = hashlib.sha256()
+    count = 0
+
+    with tempfile.TemporaryFile() as handle:
+        if fmt == 'parquet':
+            schema = pa.schema([(field.attname, _arrow_type(field)) for field in _fields(model)])
+            writer = pq.ParquetWriter(handle, schema, compression='zstd')
+            batch = []
+
+            def flush():
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                batch.clear()
+        else:
+            writer = gzip.GzipFile(fileobj=handle, mode='wb')
+
+        for row in rows:
+            line = _canonical(row)
+            digest.update(line)
+            count += 1
+            if fmt == 'parquet':
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    flush()
+            else:
+                writer.write(line)
+
+        if fmt == 'parquet' and batch:
+            flush()
+        writer.close()
+
+        handle.seek(0)
+        overwrite_stored_file(path, File(handle, name=path))
+
+    return count, digest.hexdigest()
+
+
+def read_table(path, fmt):
+    """Yield the serialized rows of an archive file"""
+    with default_storage.open(path, 'rb') as handle:
+        if fmt == 'parquet':
+            parquet_file = pq.ParquetFile(handle)
+            for batch in parquet_file.iter_batches():
+                yield from batch.to_pylist()
+        else:
+            with gzip.GzipFile(fileobj=handle, mode='rb') as lines:
+                for line in lines:
+                    yield json.loads(line)
+
+
+def verify_table(path, fmt, expected_count, expected_checksum):
+    """Re-read an archive file and compare its row count and checksum"""
+    digest = hashlib.sha256()
+    count = 0
+    for row in read_table(path, fmt):
+        digest.update(_canonical(row))
+        count += 1
+    if count != expected_count or digest.hexdigest() != expected_checksum:
+        raise ArchiveError(
+            f"Verification failed for {path}: {count} rows (expected {expected_count}), "
+            f"checksum {digest.hexdigest()[:12]} (expected {expected_checksum[:12]})"
+        )
+
+
+# =============================================
+# ARCHIVING
+# =============================================
+
+def archived_querysets(operation):
+    """Live rows belonging to an operation, per archive table"""
+    records = Record.objects.filter(operation=operation)
+    media = RecordMedia.objects.filter(record__operation=operation)
+    audit = AuditLog.objects.filter(
+        Q(target_type='record', target_id__in=records.values('pk'))
+        | Q(target_type='media', target_id__in=media.values('pk'))
+    )
+    return OrderedDict([('records', records), ('media', media), ('audit', audit)])
+
+
+def archive_operation(operation, user=None, fmt=None, batch_size=DELETE_BATCH_SIZE):
+    """
+    Archive a closed operation and purge its rows from the live tables.
+
+    Each table is written, then re-read and checked against the row count
+    and checksum taken while writing. Only then is the OperationArchive stub
+    saved and are the rows deleted, in batches. Re-running on an archive
+    whose purge was interrupted or kept changed records re-exports the rows
+    still live and resumes the purge.
+
+    Args:
+        operation: Closed Operation instance
+        user: User performing the archival
+        fmt: 'parquet' or 'jsonl.gz' (default: Parquet when available)
+        batch_size: Rows deleted per transaction
+
+    Returns:
+        OperationArchive: The archive stub
+
+    Raises:
+        ArchiveError: If the operation is not closed or verification fails
+    """
+    existing = OperationArchive.objects.filter(operation=operation).first()
+    if existing is not None:
+        if existing.is_purged:
+            raise ArchiveError(f'Operation "{operation.name}" is already archived.')
+        # Rows still live may have changed since the export
+        refresh_archive(existing)
+        purge_archived_rows(existing, batch_size)
+        return existing
+
+    if operation.is_active or not operation.closed_at:
+        raise ArchiveError(f'Operation "{operation.name}" must be closed before archiving.')
+
+    fmt = fmt or ('parquet' if parquet_available() else 'jsonl.gz')
+    if fmt == 'parquet' and not parquet_available():
+        raise ArchiveError('Parquet archives need pyarrow installed.')
+
+    location = archive_location(operation)
+    counts, checksums = {}, {}
+    for table, queryset in archived_querysets(operation).items():
+        path = table_path(location, table, fmt)
+        counts[table], checksums[table] = _write_table(queryset, path, fmt)
+        verify_table(path, fmt, counts[table], checksums[table])
+        logger.info(f"Archived {counts[table]} {table} rows of operation {operation.pk} to {path}")
+
+    archive = OperationArchive.objects.create(
+        operation=operation,
+        location=location,
+        format=fmt,
+        record_count=counts['records'],
+        media_count=counts['media'],
+        audit_count=counts['audit'],
+        checksums=checksums,
+        archived_by=user,
+    )
+    purge_archived_rows(archive, batch_size)
+    return archive
+
+
+def _merged_rows(archived, live):
+    """Archived rows, replaced by or merged with the live rows (both in pk order)"""
+    live = iter(live)
+    current = next(live, None)
+    for row in archived:
+        while current is not None and current['id'] < row['id']:
+            yield current
+            current = next(live, None)
+        if current is not None and current['id'] == row['id']:
+            yield current
+            current = next(live, None)
+        else:
+            yield row
+    while current is not None:
+        yield current
+        current = next(live, None)
+
+
+def refresh_archive(archive):
+    """
+    Write the live rows of a partly purged archive into its files again.
+
+    Rows already purged are kept from the files; rows still live (changed
+    or added since the export) replace or join them. Each table is verified
+    as in archive_operation().
+    """
+    counts, checksums = {}, {}
+    for table, queryset in archived_querysets(archive.operation).items():
+        path = table_path(archive.location, table, archive.format)
+        rows = _merged_rows(read_table(path, archive.format), _serialized(queryset))
+        counts[table], checksums[table] = _write_rows(queryset.model, rows, path, archive.format)
+        verify_table(path, archive.format, counts[table], checksums[table])
+
+    archive.record_count = counts['records']
+    archive.media_count = counts['media']
+    archive.audit_count = counts['audit']
+    archive.checksums = checksums
+    archive.save(update_fields=['record_count', 'media_count', 'audit_count', 'checksums'])
+    logger.info(f"Refreshed archive of operation {archive.operation_id}")
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+
+def _last_id(archive, table):
+    """Highest archived id of a table (ids only grow, so later rows are newer)"""
+    rows = read_table(table_path(archive.location, table, archive.format), archive.format)
+    return max((row['id'] for row in rows), default=0)
+
+
+@retry_on_locked
+def _purge_batch(rows, last_media_id, last_audit_id):
+    """
+    Delete one batch of archived records with their media rows and audit entries.
+
+    Records changed since the export (updated_at differs) or given media
+    after it are kept live.
+
+    Returns:
+        tuple: (locations of the deleted records, number of records kept)
+    """
+    updated_field = Record._meta.get_field('updated_at')
+    exported = {row['id']: updated_field.to_python(row['updated_at']) for row in rows}
+
+    with transaction.atomic():
+        live = list(Record.objects.select_for_update().filter(pk__in=list(exported)).values_list(
+            'pk', 'updated_at', 'gps_latitude', 'gps_longitude'
+        ))
+        unchanged = {pk: (lat, lon) for pk, updated_at, lat, lon in live if updated_at == exported[pk]}
+        newer_media = RecordMedia.objects.filter(record_id__in=list(unchanged), pk__gt=last_media_id)
+        for record_id in newer_media.values_list('record_id', flat=True):
+            unchanged.pop(record_id, None)
+        ids = list(unchanged)
+
+        media_ids = list(RecordMedia.objects.filter(record_id__in=ids).values_list('pk', flat=True))
+        # Raw deletes: no per-row signals, so no audit entry per archived record
+        AuditLog.objects.filter(
+            Q(target_type='record', target_id__in=ids) | Q(target_type='media', target_id__in=media_ids),
+            pk__lte=last_audit_id,
+        )._raw_delete(DEFAULT_DB_ALIAS)
+        RecordMedia.objects.filter(pk__in=media_ids)._raw_delete(DEFAULT_DB_ALIAS)
+        # Pending review suggestions are not archived
+        AnomalySuggestion.objects.filter(record_id__in=ids)._raw_delete(DEFAULT_DB_ALIAS)
+        Record.objects.filter(pk__in=ids)._raw_delete(DEFAULT_DB_ALIAS)
+
+    # Records missing from the table were purged by an earlier run
+    return list(unchanged.values()), len(live) - len(unchanged)
+
+
+def purge_archived_rows(archive, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete the rows listed in an archive from the live tables.
+
+    Streams the archived records in batches; each batch is deleted in one
+    transaction that locks the rows first. Only records whose updated_at
+    still matches the export are deleted, together with their media rows
+    and archived audit entries, so rows added or edited after archiving are
+    never lost. Media files in storage are kept; the archived media rows
+    still point to them.
+
+    Raises:
+        ArchiveError: If records were kept; the archive stays unpurged until
+            archive_operation() is run again
+    """
+    last_media_id = _last_id(archive, 'media')
+    last_audit_id = _last_id(archive, 'audit')
+
+    kept = 0
+    records = read_table(table_path(archive.location, 'records', archive.format), archive.format)
+    for rows in _batches(records, batch_size):
+        locations, batch_kept = _purge_batch(rows, last_media_id, last_audit_id)
+        kept += batch_kept
+        maps.invalidate_locations(archive.operation_id, locations)
+
+    if kept:
+        raise ArchiveError(
+            f"{kept} records of operation {archive.operation_id} changed since they were archived and were "
+            f"kept; archive the operation again to export them."
+        )
+
+    archive.purged_at = timezone.now()
+    archive.save(update_fields=['purged_at'])
+    # Devices drop the operation's records on the next sync (see sync.py)
+    Operation.objects.filter(pk=archive.operation_id).update(updated_at=archive.purged_at)
+    logger.info(f"Purged archived rows of operation {archive.operation_id}")
+
+
+# =============================================
+# TRANSPARENT READS
+# =============================================
+
+_loaded_archives = OrderedDict()
+# Async views parse archives in a thread pool (see aio.operation_records)
+_loaded_archives_lock = threading.Lock()
+
+
+def load_archived_records(archive):
+    """
+    Read an archive's records back as Record instances (cached in-process).
+
+    The instances carry their operation and creator but are not backed by
+    live rows: media_files and other reverse relations are empty.
+    """
+    records = read_archived_records(archive)
+    attach_archived_relations(archive, records)
+    return records
+
+
+def read_archived_records(archive):
+    """
+    Parse an archive's records table into Record instances (cached in-process).
+
+    Only reads the archive file; the operation and creator are set by
+    attach_archived_relations().
+    """
+    key = (archive.pk, archive.checksums.get('records'))
+    with _loaded_archives_lock:
+        if key in _loaded_archives:
+            _loaded_archives.move_to_end(key)
+            return _loaded_archives[key]
+
+    attnames = [field.attname for field in _fields(Record)]
+    records = []
+    for row in read_table(table_path(archive.location, 'records', archive.format), archive.format):
+        values = deserialize_row(Record, row)
+        records.append(Record.from_db(DEFAULT_DB_ALIAS, attnames, [values[name] for name in attnames]))
+
+    with _loaded_archives_lock:
+        _loaded_archives[key] = records
+        while len(_loaded_archives) > LOADED_ARCHIVES_MAX:
+            _loaded_archives.popitem(last=False)
+    return records
+
+
+def attach_archived_relations(archive, records):
+    """Set operation and created_by on records from read_archived_records() (once per cached list)"""
+    if not records or Record.operation.is_cached(records[-1]):
+        return
+    users = User.objects.in_bulk({record.created_by_id for record in records})
+    for record in records:
+        record.operation = archive.operation
+        if record.created_by_id in users:
+            record.created_by = users[record.created_by_id]
+
+
+class ArchivedRecordSet:
+    """
+    In-memory stand-in for a Record queryset over an archived operation.
+
+    Supports the subset the report and search views use: exact-match
+    filter()/exclude(), order_by(), count(), slicing and iteration.
+    """
+
+    def __init__(self, records):
+        self.records = list(records)
+
+    def _matches(self, record, lookups):
+        return all(getattr(record, name) == value for name, value in lookups.items())
+
+    def filter(self, **lookups):
+        return ArchivedRecordSet(r for r in self.records if self._matches(r, lookups))
+
+    def exclude(self, **lookups):
+        return ArchivedRecordSet(r for r in self.records if not self._matches(r, lookups))
+
+    def search(self, query, fields=SEARCH_FIELDS):
+        """Case-insensitive substring match on any of the fields"""
+        query = query.lower()
+        return ArchivedRecordSet(
+            r for r in self.records
+            if any(query in (getattr(r, name) or '').lower() for name in fields)
+        )
+
+    def order_by(self, *fields):
+        records = list(self.records)
+        for name in reversed(fields):
+            reverse = name.startswith('-')
+            name = name.lstrip('-')
+            records.sort(key=lambda r: (getattr(r, name) is not None, getattr(r, name)), reverse=reverse)
+        return ArchivedRecordSet(records)
+
+    def select_related(self, *fields):
+        return self
+
+    def count(self):
+        return len(self.records)
+
+    def exists(self):
+        return bool(self.records)
+
+    def anomaly_stats(self):
+        """Anomaly distribution as [{'type_of_anomaly', 'count'}], most common first"""
+        counts = Counter(r.type_of_anomaly for r in self.records if r.type_of_anomaly != 'none')
+        return [{'type_of_anomaly': anomaly, 'count': count} for anomaly, count in counts.most_common()]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+
+def get_archive(operation):
+    """The purged archive of an operation, or None if its records are live"""
+    archive = getattr(operation, '_archive_cache', False)
+    if archive is False:
+        archive = OperationArchive.objects.filter(operation=operation, purged_at__isnull=False).first()
+        operation._archive_cache = archive
+    return archive
+
+
+def operation_records(operation):
+    """
+    Non-deleted records of an operation, from the live table or its archive.
+
+    Returns:
+        QuerySet or ArchivedRecordSet
+    """
+    archive = get_archive(operation)
+    if archive is not None:
+        return ArchivedRecordSet(load_archived_records(archive)).filter(is_deleted=False)
+    return Record.objects.filter(operation=operation, is_deleted=False)
+
+
+def anomaly_distribution(records):
+    """Anomaly counts (excluding 'none') of operation_records(), most common first"""
+    if isinstance(records, ArchivedRecordSet):
+        return records.anomaly_stats()
+    return records.exclude(type_of_anomaly='none').values('type_of_anomaly').annotate(
+        count=models.Count('id')
+    ).order_by('-count')
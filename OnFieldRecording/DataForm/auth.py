@@ -0,0 +1,85 @@
+"""
+Authentication backend and request-scoped principal for DataForm app
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's UserProfile in the same query.
+
+    AuthenticationMiddleware resolves request.user through get_user(),
+    so role checks in decorators, views and templates
+    (user.profile.role) no longer trigger a separate profile query.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        """get_user() for request.auser() in async views"""
+        UserModel = get_user_model()
+        try:
+            user = await UserModel._default_manager.select_related('profile').aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class Principal:
+    """Role information of the requesting user, resolved once per request"""
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = user.is_authenticated
+        self.profile = getattr(user, 'profile', None) if self.is_authenticated else None
+        self.role = self.profile.role if self.profile else None
+
+    @property
+    def has_profile(self):
+        return self.profile is not None
+
+    @property
+    def is_admin(self):
+        return self.role == 'admin'
+
+    @property
+    def can_access_staff_views(self):
+        """Staff views are open to staff and admins"""
+        return self.role in ('staff', 'admin')
+
+    def can_edit_record(self, record):
+        """Admins edit any record; staff only their own records in active operations"""
+        if self.is_admin:
+            return True
+        return record.created_by_id == self.user.pk and record.operation.is_active
+
+    def can_delete_record(self, record):
+        """Admins delete any record; staff only their own"""
+        return self.is_admin or record.created_by_id == self.user.pk
+
+
+def get_principal(request):
+    """Get the memoized Principal for a request"""
+    principal = getattr(request, '_principal', None)
+    if principal is None or principal.user is not request.user:
+        principal = request._principal = Principal(request.user)
+    return principal
+
+
+async def aget_principal(request):
+    """get_principal() for async views (resolves the user with request.auser())"""
+    user = await request.auser()
+    # Sync code later in the request (templates, context processors) reuses it
+    request.user = user
+    principal = getattr(request, '_principal', None)
+    if principal is None or principal.user is not user:
+        principal = request._principal = Principal(user)
+    return principal
@@ -87,6 +87,17 @@ class SupabaseMediaStorage(Storage):
         else:
             return self.fallback_storage.exists(name)
     
+    def listdir(self, path):
+        """List the directories and files in a folder"""
+        if self.use_supabase:
+            directories, files = [], []
+            for item in self.supabase_storage.list_files(path):
+                # Folders are listed without an id
+                (files if item.get('id') else directories).append(item['name'])
+            return directories, files
+        else:
+            return self.fallback_storage.listdir(path)
+    
     def url(self, name):
         """
         Get public URL for file
@@ -0,0 +1,415 @@
+"""
+Benchmarks for DataForm app
+Timed scenarios over the hot paths (record creation and numbering, list
+and search views at several table sizes, exports, dashboard, cascade
+deletes) and comparison of a run against a stored baseline.
+See the bench management command.
+"""
+
+import io
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AuditLog, Operation, Record
+from .utils import allocate_record_numbers, generate_record_number
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_ITERATIONS = 5
+
+# A run is a regression when its median is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.20
+
+# Slowdowns smaller than this are timer noise, whatever the ratio
+MIN_REGRESSION_MS = 2.0
+
+SEED_BATCH_SIZE = 5000
+EXPORT_RECORDS = 2000
+DELETE_RECORDS = 500
+AUDIT_ENTRIES_PER_RECORD = 3
+NUMBERING_THREADS = 8
+NUMBERING_RECORDS = 25
+PHOTOS_PER_RECORD = 2
+
+SCENARIOS = [
+    'record_create', 'record_create_photos', 'record_numbering_concurrent',
+    'export_pdf', 'export_xlsx', 'cascade_delete',
+    'record_list', 'system_search', 'dashboard',
+]
+
+# Scenarios run once per table size (named e.g. record_list[100000])
+SIZED_SCENARIOS = ['record_list', 'system_search', 'dashboard']
+
+
+# =============================================
+# MEASUREMENT
+# =============================================
+
+class QueryCounter:
+    """connection.execute_wrapper() hook counting queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, iterations, setup=None, warmup=True):
+    """
+    Time func() over several iterations.
+
+    Args:
+        func: Called with setup()'s return value (or nothing)
+        iterations: Timed calls
+        setup: Untimed preparation run before every call
+        warmup: Make one untimed call first (caches, lazy imports)
+
+    Returns:
+        dict: iterations, min/median/p95/mean/max in ms and the query
+        count of the last call
+    """
+    def call():
+        args = (setup(),) if setup else ()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            func(*args)
+            elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, counter.count
+
+    if warmup:
+        call()
+    timings = []
+    for _ in range(iterations):
+        elapsed, queries = call()
+        timings.append(elapsed)
+    return summarize(timings, queries=queries)
+
+
+def summarize(timings, **extra):
+    ordered = sorted(timings)
+    return {
+        'iterations': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'median_ms': round(statistics.median(ordered), 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'max_ms': round(ordered[-1], 3),
+        **extra,
+    }
+
+
+def environment():
+    """Metadata stored with every run"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'created_at': timezone.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+# =============================================
+# DATA
+# =============================================
+
+def record_values(index):
+    """Field values of the index-th synthetic record"""
+    return {
+        'customer_name': f'Bench Customer {index}',
+        'customer_contact': f'+2547{index % 100_000_000:08d}',
+        'account_number': f'ACC-{index:08d}',
+        'meter_number': f'MTR-{index:08d}',
+        'todays_balance': Decimal(index % 50_000) / 10,
+        'meter_reading': Decimal(index % 99_999),
+        'gps_latitude': Decimal('-1.2') + Decimal(index % 1000) / 10_000,
+        'gps_longitude': Decimal('36.8') + Decimal(index % 997) / 10_000,
+        'gps_address': f'Bench Street {index % 500}',
+        'type_of_anomaly': 'meter_tampered' if index % 10 == 0 else 'none',
+        'status': ('draft', 'submitted', 'verified')[index % 3],
+    }
+
+
+def seed_records(operation, user, count, start=0):
+    """
+    Bulk insert synthetic records (no per-record signals or audit entries).
+
+    Returns:
+        int: Index after the last record inserted
+    """
+    for offset in range(start, start + count, SEED_BATCH_SIZE):
+        size = min(SEED_BATCH_SIZE, start + count - offset)
+        with transaction.atomic():
+            numbers = allocate_record_numbers(operation, size)
+            Record.objects.bulk_create(
+                Record(operation=operation, record_number=number, created_by=user, **record_values(offset + i))
+                for i, number in enumerate(numbers)
+            )
+    return start + count
+
+
+def _jpeg(size=(1280, 960)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (120, 160, 90)).save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+# =============================================
+# SCENARIOS
+# =============================================
+
+class BenchRun:
+    """
+    One benchmark run over a scratch database.
+
+    Creates its own users and operations; sized scenarios grow one closed
+    operation to each size in turn, smallest first.
+    """
+
+    def __init__(self, sizes=None, iterations=DEFAULT_ITERATIONS, only=None, log=None):
+        self.sizes = sorted(sizes or DEFAULT_SIZES)
+        self.iterations = iterations
+        self.only = set(only or SCENARIOS)
+        self.log = log or logger.info
+        self.results = {}
+
+    def wants(self, name):
+        return name in self.only
+
+    def run(self):
+        self.setup()
+        for name in SCENARIOS:
+            if name not in SIZED_SCENARIOS and self.wants(name):
+                self.log(f'{name}...')
+                self.results[name] = getattr(self, f'bench_{name}')()
+
+        seeded = 0
+        if any(self.wants(name) for name in SIZED_SCENARIOS):
+            for size in self.sizes:
+                self.log(f'Seeding {size} records...')
+                seeded = seed_records(self.big_operation, self.staff, size - seeded, start=seeded)
+                for name in SIZED_SCENARIOS:
+                    if self.wants(name):
+                        self.log(f'{name}[{size}]...')
+                        self.results[f'{name}[{size}]'] = getattr(self, f'bench_{name}')()
+        return self.results
+
+    def setup(self):
+        self.admin = User.objects.create_user(username='bench_admin')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.staff = User.objects.create_user(username='bench_staff')
+        self.staff.profile.role = 'staff'
+        self.staff.profile.save()
+
+        self.active_operation = Operation.objects.create(name='Bench Active', created_by=self.admin, is_active=True)
+        self.big_operation = Operation.objects.create(name='Bench Records', created_by=self.admin)
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        self.counter = 0
+        self._export_operation = None
+
+    def get(self, client, url, data=None):
+        response = client.get(url, data)
+        assert response.status_code == 200, f'GET {url}: {response.status_code}'
+        return response
+
+    def record_form(self):
+        self.counter += 1
+        values = record_values(10_000_000 + self.counter)
+        values['status'] = 'submitted'
+        return {key: str(value) for key, value in values.items()}
+
+    def bench_record_create(self):
+        def create():
+            response = self.staff_client.post(reverse('record_create'), self.record_form())
+            assert response.status_code == 302, f'record_create: {response.status_code}'
+        return measure(create, self.iterations)
+
+    def bench_record_create_photos(self):
+        image = _jpeg()
+
+        def create():
+            data = self.record_form()
+            data['photos'] = [
+                SimpleUploadedFile(f'photo{i}.jpg', image, content_type='image/jpeg') for i in range(PHOTOS_PER_RECORD)
+            ]
+            response = self.staff_client.post(reverse('record_create'), data)
+            assert response.status_code == 302, f'record_create: {response.status_code}'
+        return measure(create, self.iterations)
+
+    def bench_record_numbering_concurrent(self):
+        """Wall time of NUMBERING_THREADS agents each saving NUMBERING_RECORDS records"""
+        timings = []
+        for iteration in range(self.iterations):
+            operation = Operation.objects.create(name=f'Bench Numbering {iteration}', created_by=self.admin)
+            barrier = threading.Barrier(NUMBERING_THREADS + 1)
+            errors = []
+
+            def agent(index):
+                try:
+                    barrier.wait()
+                    for i in range(NUMBERING_RECORDS):
+                        record = Record(
+                            operation=operation, created_by=self.staff,
+                            **record_values(20_000_000 + iteration * 100_000 + index * 1000 + i),
+                        )
+                        record.record_number = generate_record_number(operation)
+                        record.save()
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    connections.close_all()
+
+            threads = [threading.Thread(target=agent, args=(index,)) for index in range(NUMBERING_THREADS)]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            timings.append((time.perf_counter() - started) * 1000)
+            if errors:
+                raise errors[0]
+
+        records = NUMBERING_THREADS * NUMBERING_RECORDS
+        return summarize(timings, records=records, records_per_s=round(records / (statistics.median(timings) / 1000), 1))
+
+    @property
+    def export_operation(self):
+        if self._export_operation is None:
+            self._export_operation = Operation.objects.create(name='Bench Export', created_by=self.admin)
+            seed_records(self._export_operation, self.staff, EXPORT_RECORDS, start=30_000_000)
+        return self._export_operation
+
+    def bench_export_pdf(self):
+        url = reverse('operation_export_pdf', args=[self.export_operation.pk])
+        return measure(lambda: self.get(self.admin_client, url), self.iterations)
+
+    def bench_export_xlsx(self):
+        url = reverse('operation_export_xlsx', args=[self.export_operation.pk])
+        return measure(lambda: self.get(self.admin_client, url), self.iterations)
+
+    def bench_cascade_delete(self):
+        """Operation delete cascading to records that each carry audit history"""
+        def setup():
+            self.counter += 1
+            number = self.counter
+            operation = Operation.objects.create(name=f'Bench Delete {number}', created_by=self.admin)
+            seed_records(operation, self.staff, DELETE_RECORDS, start=40_000_000 + number * DELETE_RECORDS)
+            AuditLog.objects.bulk_create(
+                (
+                    AuditLog(user=self.staff, action_type='update', target_type='record', target_id=pk,
+                             details={'changes': {'status': ['draft', 'submitted']}})
+                    for pk in operation.records.values_list('pk', flat=True)
+                    for _ in range(AUDIT_ENTRIES_PER_RECORD)
+                ),
+                batch_size=SEED_BATCH_SIZE,
+            )
+            return operation
+
+        def delete(operation):
+            response = self.admin_client.post(reverse('operation_delete', args=[operation.pk]), {'deletion_reason': 'bench'})
+            assert response.status_code == 302, f'operation_delete: {response.status_code}'
+        return measure(delete, self.iterations, setup=setup, warmup=False)
+
+    def bench_record_list(self):
+        return measure(lambda: self.get(self.admin_client, reverse('record_list')), self.iterations)
+
+    def bench_system_search(self):
+        # Matches about one record in a thousand
+        return measure(lambda: self.get(self.admin_client, reverse('system_search'), {'q': 'Street 42'}), self.iterations)
+
+    def bench_dashboard(self):
+        return measure(lambda: self.get(self.admin_client, reverse('dashboard')), self.iterations)
+
+
+# =============================================
+# BASELINE COMPARISON
+# =============================================
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the scenarios present in both runs.
+
+    A scenario regressed when its median got more than threshold slower
+    (and at least MIN_REGRESSION_MS), or when it issues more queries.
+
+    Returns:
+        list: Rows as dicts with name, baseline_ms, current_ms, change,
+        baseline_queries, current_queries and regressed
+    """
+    rows = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        before, after = previous['median_ms'], result['median_ms']
+        change = (after - before) / before if before else 0.0
+        slower = change > threshold and after - before >= MIN_REGRESSION_MS
+        more_queries = result.get('queries', 0) > previous.get('queries', 0)
+        rows.append({
+            'name': name,
+            'baseline_ms': before,
+            'current_ms': after,
+            'change': round(change, 4),
+            'baseline_queries': previous.get('queries'),
+            'current_queries': result.get('queries'),
+            'regressed': slower or more_queries,
+        })
+    return rows
+
+
+@contextmanager
+def scratch_database(keepdb=False):
+    """
+    Run inside a freshly migrated copy of the default database.
+
+    SQLite gets a file rather than the in-memory test database, so the
+    concurrent numbering scenario sees real locking.
+    """
+    settings_dict = connection.settings_dict
+    old_name = settings_dict['NAME']
+    if connection.vendor == 'sqlite' and not settings_dict['TEST'].get('NAME'):
+        settings_dict['TEST']['NAME'] = str(Path(tempfile.gettempdir()) / 'onfield_bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
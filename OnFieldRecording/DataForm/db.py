@@ -0,0 +1,77 @@
+"""
+Database helpers for DataForm app
+Retrying short write transactions that lose the SQLite write lock
+"""
+
+import logging
+import random
+import time
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+LOCK_RETRY_ATTEMPTS = 8
+LOCK_RETRY_BASE_DELAY = 0.05  # seconds
+LOCK_RETRY_MAX_DELAY = 2.0
+
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+# =============================================
+# LOCK RETRY
+# =============================================
+
+def is_database_locked(error):
+    """True if an OperationalError is SQLite's busy/locked error"""
+    return isinstance(error, OperationalError) and any(
+        message in str(error) for message in LOCKED_MESSAGES
+    )
+
+
+def lock_retry_delay(attempt, base_delay=LOCK_RETRY_BASE_DELAY, max_delay=LOCK_RETRY_MAX_DELAY):
+    """Full-jitter exponential backoff: random delay up to base * 2^attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_on_locked(func=None, *, attempts=LOCK_RETRY_ATTEMPTS, using=DEFAULT_DB_ALIAS):
+    """
+    Retry a function when SQLite reports 'database is locked'.
+
+    The function should wrap its own transaction.atomic() block. Calls made
+    inside an outer atomic block are not retried, since the failed statement
+    belongs to the caller's transaction; the error propagates to the
+    outermost retry_on_locked (if any).
+
+    Usage:
+        @retry_on_locked
+        def allocate():
+            with transaction.atomic():
+                ...
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if connections[using].in_atomic_block:
+                return fn(*args, **kwargs)
+
+            for attempt in range(attempts):
+                try:
+                    return fn(*args, **kwargs)
+                except OperationalError as e:
+                    if not is_database_locked(e) or attempt == attempts - 1:
+                        raise
+                    delay = lock_retry_delay(attempt)
+                    logger.warning(f"{fn.__name__}: database is locked, retrying in {delay:.3f}s")
+                    time.sleep(delay)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
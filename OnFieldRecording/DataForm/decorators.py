@@ -3,54 +3,71 @@ Custom decorators for permission and access control
 """
 
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
-from .models import Operation
+from django.http import HttpResponseForbidden, Http404
+from .models import Operation, Record
+from .auth import aget_principal, get_principal
 
 
-def staff_required(view_func):
-    """
-    Decorator to ensure user is logged in and has staff or admin role.
-    Checks UserProfile.role field.
-    """
+def _role_denied(request, principal, admin_only):
+    """Response refusing the principal, or None when its role is allowed"""
+    if not principal.has_profile:
+        messages.error(request, "User profile not found. Please contact administrator.")
+        return redirect('login')
+    
+    if admin_only and not principal.is_admin:
+        messages.error(request, "You don't have permission to access this page. Admin access required.")
+        return HttpResponseForbidden("Access Denied: Admin access required")
+    
+    # Both staff and admin roles are allowed
+    if not principal.can_access_staff_views:
+        messages.error(request, "You don't have permission to access this page.")
+        return HttpResponseForbidden("Access Denied: Staff access required")
+    return None
+
+
+def _role_required(view_func, admin_only):
+    # Async views resolve the user without blocking (see aio.py)
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        @login_required
+        async def async_wrapper(request, *args, **kwargs):
+            denied = _role_denied(request, await aget_principal(request), admin_only)
+            if denied is not None:
+                return denied
+            return await view_func(request, *args, **kwargs)
+        
+        return async_wrapper
+    
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
-        if not hasattr(request.user, 'profile'):
-            messages.error(request, "User profile not found. Please contact administrator.")
-            return redirect('login')
-        
-        # Both staff and admin roles are allowed
-        if request.user.profile.role in ['staff', 'admin']:
-            return view_func(request, *args, **kwargs)
-        
-        messages.error(request, "You don't have permission to access this page.")
-        return HttpResponseForbidden("Access Denied: Staff access required")
+        denied = _role_denied(request, get_principal(request), admin_only)
+        if denied is not None:
+            return denied
+        return view_func(request, *args, **kwargs)
     
     return wrapper
 
 
+def staff_required(view_func):
+    """
+    Decorator to ensure user is logged in and has staff or admin role.
+    Checks UserProfile.role field. Works on sync and async views.
+    """
+    return _role_required(view_func, admin_only=False)
+
+
 def admin_required(view_func):
     """
     Decorator to ensure user is logged in and has admin role.
     Only users with UserProfile.role = 'admin' can access.
+    Works on sync and async views.
     """
-    @wraps(view_func)
-    @login_required
-    def wrapper(request, *args, **kwargs):
-        if not hasattr(request.user, 'profile'):
-            messages.error(request, "User profile not found. Please contact administrator.")
-            return redirect('login')
-        
-        if request.user.profile.role == 'admin':
-            return view_func(request, *args, **kwargs)
-        
-        messages.error(request, "You don't have permission to access this page. Admin access required.")
-        return HttpResponseForbidden("Access Denied: Admin access required")
-    
-    return wrapper
+    return _role_required(view_func, admin_only=True)
 
 
 def active_operation_required(view_func):
@@ -69,7 +86,7 @@ def active_operation_required(view_func):
                 "No active operation found. Please contact an administrator to activate an operation."
             )
             # Redirect admins to operation list, staff to dashboard
-            if hasattr(request.user, 'profile') and request.user.profile.role == 'admin':
+            if get_principal(request).is_admin:
                 return redirect('operation_list')
             else:
                 return redirect('dashboard')
@@ -81,6 +98,44 @@ def active_operation_required(view_func):
     return wrapper
 
 
+def resolve_record(request, pk):
+    """
+    Load a record once per request with everything the record views need.
+    
+    The record is fetched with its operation, creator and creator profile
+    joined and its media files prefetched, then memoized on the request so
+    permission decorators and the view share the same instance.
+    
+    Args:
+        request: Django HttpRequest object
+        pk: Record primary key
+    
+    Returns:
+        Record: The record (deleted records included)
+    
+    Raises:
+        Record.DoesNotExist: If no record has this primary key
+    """
+    record = getattr(request, 'resolved_record', None)
+    if record is None or record.pk != int(pk):
+        record = Record.objects.select_related(
+            'operation', 'created_by__profile'
+        ).prefetch_related('media_files').get(pk=pk)
+        request.resolved_record = record
+    return record
+
+
+def get_record_or_404(request, pk):
+    """resolve_record() for views: raises Http404 for missing or soft-deleted records"""
+    try:
+        record = resolve_record(request, pk)
+    except Record.DoesNotExist:
+        raise Http404("No Record matches the given query.")
+    if record.is_deleted:
+        raise Http404("No Record matches the given query.")
+    return record
+
+
 def staff_can_edit_record(view_func):
     """
     Decorator to check if staff can edit a specific record.
@@ -90,8 +145,6 @@ def staff_can_edit_record(view_func):
     @wraps(view_func)
     @login_required
     def wrapper(request, *args, **kwargs):
-        from .models import Record
-        
         # Get record_id from kwargs or args
         record_id = kwargs.get('pk') or kwargs.get('record_id')
         
@@ -100,17 +153,17 @@ def staff_can_edit_record(view_func):
             return redirect('record_list')
         
         try:
-            record = Record.objects.get(pk=record_id)
+            record = resolve_record(request, record_id)
         except Record.DoesNotExist:
             messages.error(request, "Record not found.")
             return redirect('record_list')
         
         # Admins can edit any record
-        if hasattr(request.user, 'profile') and request.user.profile.role == 'admin':
+        if get_principal(request).is_admin:
             return view_func(request, *args, **kwargs)
         
         # Staff can only edit their own records
-        if record.created_by != request.user:
+        if record.created_by_id != request.user.pk:
             messages.error(request, "You can only edit records you created.")
             return HttpResponseForbidden("Access Denied: You can only edit your own records")
         
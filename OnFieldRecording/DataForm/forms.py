@@ -6,6 +6,7 @@ from django import forms
 from django.contrib.auth.forms import AuthenticationForm, PasswordChangeForm
 from django.contrib.auth.models import User
 from .models import Operation, Record, RecordMedia
+from .readings import lower_reading_error
 
 
 class CustomLoginForm(AuthenticationForm):
@@ -150,6 +151,25 @@ class RecordForm(forms.ModelForm):
             'gps_longitude': 'GPS Longitude',
             'gps_address': 'GPS Address',
         }
+    
+    def __init__(self, *args, previous_readings=None, **kwargs):
+        # Optional {meter key: MeterLatestReading} preloaded for a batch
+        self.previous_readings = previous_readings
+        super().__init__(*args, **kwargs)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        # New visits only: a reading below the last one needs an explanation
+        if self.instance.pk is None:
+            message = lower_reading_error(
+                cleaned_data.get('meter_number'),
+                cleaned_data.get('meter_reading'),
+                cleaned_data.get('type_of_anomaly'),
+                self.previous_readings,
+            )
+            if message:
+                self.add_error('meter_reading', message)
+        return cleaned_data
 
 
 class RecordMediaForm(forms.ModelForm):
@@ -224,3 +244,22 @@ class RecordSearchForm(forms.Form):
             'type': 'date'
         })
     )
+
+
+class RecordImportForm(forms.Form):
+    """Admin upload of a CSV/XLSX sheet of records (see ingest.import_records)"""
+    
+    file = forms.FileField(
+        help_text='CSV or XLSX with a header row (e.g. a legacy meter-reading sheet)'
+    )
+    
+    operation = forms.ModelChoiceField(
+        queryset=Operation.objects.filter(is_deleted=False, is_active=True),
+        help_text='Records can only be imported into an active operation'
+    )
+    
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.csv', '.xlsx', '.xlsm')):
+            raise forms.ValidationError('Upload a .csv or .xlsx file.')
+        return file
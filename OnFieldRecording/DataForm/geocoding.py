@@ -0,0 +1,256 @@
+"""
+Offline reverse geocoding for DataForm app
+Resolves GPS coordinates to normalized addresses from a local gazetteer file,
+with an in-process LRU and a persistent GeocodeCache table in front of it
+"""
+
+import csv
+import logging
+import math
+import re
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from django.conf import settings
+
+from .utils import calculate_gps_distance
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+# Cache keys are coordinates rounded to 4 decimals (~11 m)
+COORDINATE_PRECISION = Decimal('0.0001')
+
+# Spatial index bucket size in degrees (~11 km at the equator)
+INDEX_CELL_SIZE = 0.1
+
+# Places further away than this are not considered a match
+MAX_MATCH_DISTANCE_KM = 25
+
+LRU_SIZE = 50000
+
+# Placeholder written by record_form.html when no address was typed
+COORDINATE_PLACEHOLDER = re.compile(r'^\s*Lat:\s*-?[\d.]+,\s*Lon:\s*-?[\d.]+\s*$')
+
+
+# =============================================
+# ADDRESS HELPERS
+# =============================================
+
+def normalize_address(*parts):
+    """
+    Build a normalized address from place name parts.
+
+    Collapses whitespace, drops empty and repeated parts and joins
+    them with ', ' so equal places always produce the same string.
+    """
+    normalized = []
+    for part in parts:
+        part = ' '.join(str(part or '').split())
+        if part and part.lower() not in (p.lower() for p in normalized):
+            normalized.append(part)
+    return ', '.join(normalized)
+
+
+def is_blank_address(address):
+    """True for empty addresses and the client-side 'Lat: .., Lon: ..' placeholder"""
+    return not address or not address.strip() or bool(COORDINATE_PLACEHOLDER.match(address))
+
+
+def round_coordinates(lat, lon):
+    """Round a coordinate pair to the cache key precision"""
+    return (
+        Decimal(str(lat)).quantize(COORDINATE_PRECISION, rounding=ROUND_HALF_UP),
+        Decimal(str(lon)).quantize(COORDINATE_PRECISION, rounding=ROUND_HALF_UP),
+    )
+
+
+# =============================================
+# GAZETTEER
+# =============================================
+
+class Gazetteer:
+    """
+    In-memory gazetteer with a grid-bucket spatial index.
+
+    Two file formats are supported:
+    - CSV with a header row: name, latitude, longitude[, region][, country]
+    - GeoNames dump (.txt/.tsv, e.g. cities500.txt)
+    """
+
+    def __init__(self, places=()):
+        self.places = []
+        self.index = {}
+        for place in places:
+            self.add(*place)
+
+    def __len__(self):
+        return len(self.places)
+
+    @staticmethod
+    def _cell(lat, lon):
+        return int(math.floor(lat / INDEX_CELL_SIZE)), int(math.floor(lon / INDEX_CELL_SIZE))
+
+    def add(self, lat, lon, address):
+        """Add a place to the gazetteer and the spatial index"""
+        position = len(self.places)
+        self.places.append((lat, lon, address))
+        self.index.setdefault(self._cell(lat, lon), []).append(position)
+
+    @classmethod
+    def load(cls, path):
+        """Load a gazetteer file"""
+        gazetteer = cls()
+        path = str(path)
+        with open(path, encoding='utf-8', newline='') as handle:
+            if path.endswith(('.txt', '.tsv')):
+                # GeoNames: id, name, asciiname, alternatenames, lat, lon, ..., country (8), admin1 (10)
+                for row in csv.reader(handle, delimiter='\t', quoting=csv.QUOTE_NONE):
+                    if len(row) < 11:
+                        continue
+                    gazetteer.add(float(row[4]), float(row[5]), normalize_address(row[1], row[10], row[8]))
+            else:
+                for row in csv.DictReader(handle):
+                    gazetteer.add(
+                        float(row['latitude']),
+                        float(row['longitude']),
+                        normalize_address(row.get('name'), row.get('region'), row.get('country')),
+                    )
+        logger.info(f"Loaded {len(gazetteer)} gazetteer places from {path}")
+        return gazetteer
+
+    def nearest(self, lat, lon, max_distance_km=MAX_MATCH_DISTANCE_KM):
+        """
+        Find the nearest place to a coordinate.
+
+        Searches rings of index cells around the coordinate until the
+        ring is further away than the best match found so far.
+
+        Returns:
+            str: Normalized address, or None if nothing is close enough
+        """
+        row, col = self._cell(lat, lon)
+        # One degree of latitude is ~111 km; longitude cells shrink towards the
+        # poles, so a ring is only guaranteed to be this far away per cell
+        ring_km = 111.0 * INDEX_CELL_SIZE * max(math.cos(math.radians(lat)), 0.01)
+        max_rings = int(max_distance_km / ring_km) + 1
+
+        best_address, best_distance = None, max_distance_km
+        for ring in range(max_rings + 1):
+            if best_address is not None and (ring - 1) * ring_km > best_distance:
+                break
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for position in self.index.get((r, c), ()):
+                        place_lat, place_lon, address = self.places[position]
+                        distance = calculate_gps_distance(lat, lon, place_lat, place_lon)
+                        if distance <= best_distance:
+                            best_address, best_distance = address, distance
+        return best_address
+
+
+_gazetteer_instance = None
+
+
+def get_gazetteer():
+    """Get or load the configured gazetteer (None if no file is available)"""
+    global _gazetteer_instance
+    if _gazetteer_instance is None:
+        path = getattr(settings, 'GAZETTEER_PATH', '')
+        try:
+            _gazetteer_instance = Gazetteer.load(path) if path else Gazetteer()
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Gazetteer could not be loaded from {path}: {e}")
+            _gazetteer_instance = Gazetteer()
+    return _gazetteer_instance
+
+
+# =============================================
+# REVERSE GEOCODING
+# =============================================
+
+@lru_cache(maxsize=LRU_SIZE)
+def _reverse_geocode_rounded(lat_key, lon_key):
+    """Resolve a rounded coordinate through the persistent cache, then the gazetteer"""
+    from .models import GeocodeCache
+
+    cached = GeocodeCache.objects.filter(latitude=lat_key, longitude=lon_key).values_list('address', flat=True).first()
+    if cached is not None:
+        return cached
+
+    gazetteer = get_gazetteer()
+    if not len(gazetteer):
+        # Don't persist misses while no gazetteer is configured
+        return ''
+
+    address = gazetteer.nearest(float(lat_key), float(lon_key)) or ''
+    # Runs inside Record's numbering transaction (pre_save): a row stored
+    # concurrently by another worker must not abort it
+    GeocodeCache.objects.bulk_create(
+        [GeocodeCache(latitude=lat_key, longitude=lon_key, address=address)],
+        ignore_conflicts=True,
+    )
+    return address
+
+
+def reverse_geocode(lat, lon):
+    """
+    Get a normalized address for a coordinate.
+
+    Args:
+        lat, lon: Coordinate in decimal degrees
+
+    Returns:
+        str: Address, or '' if no place is close enough
+    """
+    if lat is None or lon is None:
+        return ''
+    return _reverse_geocode_rounded(*round_coordinates(lat, lon))
+
+
+def reverse_geocode_many(coordinates):
+    """
+    reverse_geocode() for many coordinates with one cache query.
+
+    Args:
+        coordinates: Iterable of (lat, lon) pairs
+
+    Returns:
+        dict: Rounded (lat, lon) key → address ('' if no place is close enough)
+    """
+    from .models import GeocodeCache
+
+    keys = {round_coordinates(lat, lon) for lat, lon in coordinates if lat is not None and lon is not None}
+    if not keys:
+        return {}
+
+    addresses = {}
+    for lat, lon, address in GeocodeCache.objects.filter(latitude__in={lat for lat, _ in keys}).values_list(
+        'latitude', 'longitude', 'address'
+    ):
+        if (lat, lon) in keys:
+            addresses[(lat, lon)] = address
+
+    missing = keys - addresses.keys()
+    gazetteer = get_gazetteer()
+    if missing and len(gazetteer):
+        new_entries = {(lat, lon): gazetteer.nearest(float(lat), float(lon)) or '' for lat, lon in missing}
+        GeocodeCache.objects.bulk_create(
+            [GeocodeCache(latitude=lat, longitude=lon, address=address) for (lat, lon), address in new_entries.items()],
+            ignore_conflicts=True,
+        )
+        addresses.update(new_entries)
+    return addresses
+
+
+def clear_caches():
+    """Reset the in-process LRU and gazetteer (e.g. after replacing the file)"""
+    global _gazetteer_instance
+    _reverse_geocode_rounded.cache_clear()
+    _gazetteer_instance = None
@@ -0,0 +1,594 @@
+"""
+Bulk record ingest for DataForm app
+
+Creates many records with a handful of queries: numbers are allocated in
+one block per operation, rows go in with bulk_create (COPY on PostgreSQL
+for file imports), and the audit entries and map invalidations that the
+record signals would write one by one are written in bulk. Used by:
+- the batch endpoint for offline capture, where each record carries a
+  client-generated idempotency key so a replayed batch returns the records
+  created the first time
+- CSV/XLSX imports of legacy sheets (import_records command, admin upload)
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import geocoding, maps, metrics, readings, registry
+from .db import retry_on_locked
+from .forms import RecordForm, RecordMediaForm
+from .models import AuditLog, Operation, Record, RecordMedia, registry_key
+from .utils import allocate_record_numbers
+
+logger = logging.getLogger(__name__)
+
+# Largest batch accepted by ingest_batch()
+INGEST_MAX_BATCH = 500
+
+# Rows per INSERT statement
+BULK_BATCH_SIZE = 500
+
+# Rows validated and inserted per transaction by import_records()
+IMPORT_BATCH_SIZE = 2000
+
+CLIENT_KEY_MAX_LENGTH = Record._meta.get_field('client_key').max_length
+
+
+class IngestError(Exception):
+    """Raised when a whole batch is rejected"""
+
+
+# =============================================
+# BULK INSERT
+# =============================================
+
+def _copy_value(value):
+    # Quoted values never match COPY's CSV NULL (an unquoted empty field)
+    if value is None:
+        return ''
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_rows(records, fields):
+    """
+    COPY CSV data of the records.
+
+    Every value is quoted and None is an empty unquoted field, so text such
+    as '' or '\\N' is stored as written.
+    """
+    buffer = io.StringIO()
+    for record in records:
+        values = [field.get_db_prep_save(field.pre_save(record, True), connection) for field in fields]
+        buffer.write(','.join(_copy_value(value) for value in values) + '\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_records(records):
+    """
+    Insert records with COPY FROM STDIN (PostgreSQL).
+
+    COPY returns no ids, so they are read back by record_number.
+    """
+    fields = [field for field in Record._meta.concrete_fields if not field.primary_key]
+    buffer = _copy_rows(records, fields)
+
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        connection.ops.quote_name(Record._meta.db_table),
+        ', '.join(connection.ops.quote_name(field.column) for field in fields),
+    )
+    with connection.cursor() as cursor:
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+    ids = dict(Record.objects.filter(
+        record_number__in=[record.record_number for record in records]
+    ).values_list('record_number', 'id'))
+    for record in records:
+        record.pk = ids[record.record_number]
+        record._state.adding = False
+
+
+def bulk_insert_records(records, ip_address=None, use_copy=False):
+    """
+    Number and insert unsaved records of one operation.
+
+    Does for the whole list what Record.save() and the record signals do for
+    one record: links registry meters, fills blank GPS addresses, numbers
+    the records, inserts them and writes their 'create' audit entries,
+    latest meter readings and map tile invalidations.
+    Call inside a transaction so a failure also releases the number block.
+
+    Args:
+        records: Unsaved Record instances with operation and created_by set
+        ip_address: Client address for the audit entries
+        use_copy: Insert with COPY when the database is PostgreSQL
+
+    Returns:
+        list: The records, now with pk and record_number
+    """
+    if not records:
+        return records
+    operation = records[0].operation
+
+    meters = registry.meter_ids(record.meter_number for record in records)
+    for record in records:
+        record.meter_id = meters.get(registry_key(record.meter_number))
+
+    blank = [record for record in records if record.has_gps and geocoding.is_blank_address(record.gps_address)]
+    addresses = geocoding.reverse_geocode_many((record.gps_latitude, record.gps_longitude) for record in blank)
+    for record in blank:
+        key = geocoding.round_coordinates(record.gps_latitude, record.gps_longitude)
+        record.gps_address = addresses.get(key) or record.gps_address
+
+    for record, number in zip(records, allocate_record_numbers(operation, len(records))):
+        record.record_number = number
+
+    if use_copy and connection.vendor == 'postgresql':
+        _copy_records(records)
+    else:
+        Record.objects.bulk_create(records, batch_size=BULK_BATCH_SIZE)
+
+    AuditLog.objects.bulk_create([
+        AuditLog(
+            user_id=record.created_by_id,
+            action_type='create',
+            target_type='record',
+            target_id=record.pk,
+            details={
+                'record_number': record.record_number,
+                'operation': operation.name,
+                'customer_name': record.customer_name,
+                'status': record.status,
+            },
+            ip_address=ip_address,
+        )
+        for record in records
+    ], batch_size=BULK_BATCH_SIZE)
+    metrics.AUDIT_WRITES.labels('create').inc(len(records))
+
+    readings.update_latest_readings(records)
+    maps.invalidate_locations(operation.pk, [(record.gps_latitude, record.gps_longitude) for record in records])
+    return records
+
+
+# =============================================
+# BATCH SUBMISSION (OFFLINE CAPTURE)
+# =============================================
+
+def _created(record, status):
+    return {'client_key': record['client_key'], 'status': status, 'id': record['id'], 'record_number': record['record_number']}
+
+
+def _invalid(client_key, errors):
+    return {'client_key': client_key, 'status': 'invalid', 'errors': errors}
+
+
+def _validate_item(item, user, operations, active_operation, files, latest_readings):
+    """
+    Build an unsaved Record (and its media forms) from one batch item.
+
+    Returns:
+        tuple: (record, media_forms, errors); record is None when invalid
+    """
+    operation_id = item.get('operation')
+    operation = operations.get(operation_id) if operation_id is not None else active_operation
+    if operation is None:
+        message = 'No active operation found.' if operation_id is None else 'Unknown operation.'
+        return None, [], {'operation': [{'message': message, 'code': 'invalid'}]}
+    if not operation.is_active:
+        return None, [], {'operation': [{'message': 'Cannot create records for inactive operations.', 'code': 'inactive'}]}
+
+    form = RecordForm(data=item, previous_readings=latest_readings)
+    if not form.is_valid():
+        return None, [], form.errors.get_json_data()
+
+    media_forms = []
+    media = item.get('media') or []
+    if not isinstance(media, list):
+        return None, [], {'media': [{'message': 'Expected a list of file part names.', 'code': 'invalid'}]}
+    for name in media:
+        if name not in files:
+            return None, [], {'media': [{'message': f'Missing file part "{name}".', 'code': 'missing'}]}
+        media_form = RecordMediaForm(files={'image': files[name]})
+        if not media_form.is_valid():
+            return None, [], {'media': media_form.errors.get_json_data()['image']}
+        media_forms.append(media_form)
+
+    record = form.save(commit=False)
+    record.operation = operation
+    record.created_by = user
+    record.client_key = item['client_key']
+    return record, media_forms, None
+
+
+@retry_on_locked
+def _insert_batch(records, media_forms, user, ip_address):
+    """
+    Insert the validated records (grouped per operation) and their media.
+
+    If the transaction fails, the media files it already stored are deleted
+    again, so a retry does not leave copies behind.
+    """
+    media = []
+    try:
+        with transaction.atomic():
+            by_operation = defaultdict(list)
+            for record in records:
+                by_operation[record.operation_id].append(record)
+            for group in by_operation.values():
+                bulk_insert_records(group, ip_address=ip_address)
+
+            # Media files go to storage one by one; the records are already in
+            for record, forms in zip(records, media_forms):
+                for media_form in forms:
+                    media.append(RecordMedia(record=record, image=media_form.cleaned_data['image'], uploaded_by=user))
+                    media[-1].save()
+    except Exception:
+        for item in media:
+            # Committed: the file was written to storage
+            if item.image._committed:
+                item.image.storage.delete(item.image.name)
+        raise
+
+
+def ingest_batch(items, user, files=None, ip_address=None):
+    """
+    Create a batch of records captured offline.
+
+    Every item is a RecordForm payload plus a client_key, an optional
+    operation id (default: the active operation) and an optional list of
+    media file part names. Items whose key was already used by this user
+    are not created again; they report the original record.
+
+    Args:
+        items: List of dicts from the request body
+        user: Submitting user (becomes created_by)
+        files: Uploaded files by part name
+        ip_address: Client address for the audit entries
+
+    Returns:
+        list: One result per item, in order: status 'created', 'existing'
+        (with id and record_number) or 'invalid' (with errors)
+
+    Raises:
+        IngestError: If the batch is not a list or is too large
+    """
+    if not isinstance(items, list):
+        raise IngestError('Expected a list of records.')
+    if len(items) > INGEST_MAX_BATCH:
+        raise IngestError(f'At most {INGEST_MAX_BATCH} records per batch.')
+    files = files or {}
+
+    results = [None] * len(items)
+    first_index = {}  # client_key → index of its first item
+    for index, item in enumerate(items):
+        client_key = item.get('client_key') if isinstance(item, dict) else None
+        if not isinstance(client_key, str) or not 0 < len(client_key) <= CLIENT_KEY_MAX_LENGTH:
+            results[index] = _invalid(client_key, {'client_key': [{
+                'message': f'A string of 1 to {CLIENT_KEY_MAX_LENGTH} characters is required.',
+                'code': 'required',
+            }]})
+        else:
+            first_index.setdefault(client_key, index)
+
+    operation_ids = {items[i].get('operation') for i in first_index.values()} - {None}
+    operations = Operation.objects.filter(is_deleted=False).in_bulk(
+        [pk for pk in operation_ids if isinstance(pk, int)]
+    )
+    active_operation = Operation.objects.filter(is_active=True, is_deleted=False).first()
+    latest_readings = readings.previous_readings(
+        str(items[i].get('meter_number') or '') for i in first_index.values()
+    )
+
+    validated = {}
+    for attempt in range(2):
+        existing = {
+            row['client_key']: row
+            for row in Record.objects.filter(created_by=user, client_key__in=list(first_index)).values(
+                'client_key', 'id', 'record_number'
+            )
+        }
+        pending = []
+        for client_key, index in first_index.items():
+            if client_key in existing:
+                results[index] = _created(existing[client_key], 'existing')
+            elif client_key not in validated:
+                validated[client_key] = _validate_item(
+                    items[index], user, operations, active_operation, files, latest_readings
+                )
+            if client_key not in existing:
+                record, media_forms, errors = validated[client_key]
+                if errors:
+                    results[index] = _invalid(client_key, errors)
+                else:
+                    pending.append((index, record, media_forms))
+
+        try:
+            _insert_batch([record for _, record, _ in pending], [forms for _, _, forms in pending], user, ip_address)
+        except IntegrityError:
+            # A concurrent replay inserted some of the keys first: look them up again
+            if attempt:
+                raise
+            for _, record, _ in pending:
+                record.pk = None
+                record.record_number = ''
+                record._state.adding = True
+            continue
+        for index, record, _ in pending:
+            results[index] = _created(
+                {'client_key': record.client_key, 'id': record.pk, 'record_number': record.record_number}, 'created'
+            )
+        break
+
+    # Repeated keys within the batch share the first item's result
+    for index, item in enumerate(items):
+        if results[index] is None:
+            results[index] = dict(results[first_index[item['client_key']]])
+    created = sum(result['status'] == 'created' for result in results)
+    if created:
+        logger.info(f"Batch ingest by {user.username}: {created} of {len(items)} records created")
+    return results
+
+
+# =============================================
+# FILE IMPORT (CSV / XLSX)
+# =============================================
+
+IMPORT_FIELDS = RecordForm.Meta.fields
+REQUIRED_COLUMNS = [name for name in IMPORT_FIELDS if RecordForm.base_fields[name].required
+                    and not Record._meta.get_field(name).has_default()]
+
+
+def normalize_header(value):
+    """'Today's Balance' → 'today_s_balance'"""
+    return re.sub(r'[^a-z0-9]+', '_', str(value or '').strip().lower()).strip('_')
+
+
+def _column_aliases():
+    """Normalized header → record field (field name, verbose name, form label)"""
+    aliases = {}
+    for name in IMPORT_FIELDS:
+        aliases[normalize_header(name)] = name
+        aliases[normalize_header(Record._meta.get_field(name).verbose_name)] = name
+        label = RecordForm.Meta.labels.get(name)
+        if label:
+            aliases[normalize_header(label)] = name
+    return aliases
+
+
+def _choice_aliases(field_name):
+    """Accepted spellings of a choice field's values ('Meter Damaged', 'meter_damaged', ...)"""
+    aliases = {}
+    for value, label in Record._meta.get_field(field_name).choices:
+        for spelling in (value, label, value.replace('_', ' ')):
+            aliases[spelling.lower()] = value
+    return aliases
+
+
+def cell_value(value):
+    """Spreadsheet cell → form input string"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        # Phone and account numbers typed into numeric cells
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def read_rows(file, filename):
+    """
+    Stream the rows of a CSV or XLSX file.
+
+    Args:
+        file: Binary file object
+        filename: Name used to pick the format
+
+    Returns:
+        tuple: (headers, iterator of (row number, values)); blank rows skipped
+
+    Raises:
+        IngestError: If the format is unsupported or the file is empty
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+    elif ext == '.csv':
+        rows = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    else:
+        raise IngestError('Unsupported file type (use .csv or .xlsx).')
+
+    headers = next(rows, None)
+    if not headers:
+        raise IngestError('The file is empty.')
+
+    def numbered():
+        for number, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield number, values
+
+    return [cell_value(header) for header in headers], numbered()
+
+
+class RowValidator:
+    """
+    Validates import rows a batch at a time, column by column.
+
+    Applies the RecordForm field rules and the Record field validators
+    (what form.is_valid() would run for a single record) plus Record.clean()
+    and the previous-reading check of RecordForm.clean().
+    Each distinct value of a column is checked once per batch, so
+    low-cardinality columns (status, anomaly, amounts) cost almost nothing.
+    """
+
+    def __init__(self, headers):
+        aliases = _column_aliases()
+        self.columns = {}  # field → column index
+        for index, header in enumerate(headers):
+            name = aliases.get(normalize_header(header))
+            if name and name not in self.columns:
+                self.columns[name] = index
+
+        missing = [name for name in REQUIRED_COLUMNS if name not in self.columns]
+        if missing:
+            raise IngestError(f"Missing required columns: {', '.join(missing)}")
+
+        self.form_fields = RecordForm.base_fields
+        self.choices = {
+            name: _choice_aliases(name)
+            for name in IMPORT_FIELDS if Record._meta.get_field(name).choices
+        }
+
+    def _clean_value(self, name, raw):
+        model_field = Record._meta.get_field(name)
+        if raw == '' and model_field.has_default():
+            return model_field.get_default()
+        if name in self.choices:
+            raw = self.choices[name].get(raw.lower(), raw)
+        value = self.form_fields[name].clean(raw)
+        if value not in model_field.empty_values:
+            model_field.run_validators(value)
+        return value
+
+    def validate(self, rows):
+        """
+        Args:
+            rows: List of raw value tuples
+
+        Returns:
+            tuple: (cleaned dicts, error dicts) aligned with rows; a row is
+            valid when its error dict is empty
+        """
+        cleaned = [{} for _ in rows]
+        errors = [{} for _ in rows]
+
+        for name in IMPORT_FIELDS:
+            index = self.columns.get(name)
+            if index is None:
+                # Optional column absent from the sheet: model default
+                for data in cleaned:
+                    data[name] = Record._meta.get_field(name).get_default()
+                continue
+
+            results = {}
+            for row, data, row_errors in zip(rows, cleaned, errors):
+                raw = cell_value(row[index]) if index < len(row) else ''
+                if raw not in results:
+                    try:
+                        results[raw] = (self._clean_value(name, raw), None)
+                    except ValidationError as e:
+                        results[raw] = (None, e.messages)
+                value, messages = results[raw]
+                if messages:
+                    row_errors[name] = messages
+                else:
+                    data[name] = value
+
+        latest_readings = readings.previous_readings(
+            data['meter_number'] for data, row_errors in zip(cleaned, errors) if not row_errors
+        )
+        for data, row_errors in zip(cleaned, errors):
+            if row_errors:
+                continue
+            if (data['gps_latitude'] is None) != (data['gps_longitude'] is None):
+                row_errors['__all__'] = ['Both latitude and longitude must be provided together.']
+            message = readings.lower_reading_error(
+                data['meter_number'], data['meter_reading'], data['type_of_anomaly'], latest_readings
+            )
+            if message:
+                row_errors['meter_reading'] = [message]
+        return cleaned, errors
+
+
+@retry_on_locked
+def _insert_import_batch(records, ip_address):
+    with transaction.atomic():
+        bulk_insert_records(records, ip_address=ip_address, use_copy=True)
+
+
+def import_records(file, filename, operation, user, error_report=None,
+                   batch_size=IMPORT_BATCH_SIZE, dry_run=False, ip_address=None):
+    """
+    Import records from a CSV or XLSX sheet into an operation.
+
+    Rows are read in streaming mode and validated and inserted a batch at
+    a time, each batch in its own transaction with one block of record
+    numbers. Invalid rows are skipped and written to the error report.
+
+    Args:
+        file: Binary file object
+        filename: Name used to pick the format
+        operation: Target (active) operation
+        user: Becomes created_by of the records
+        error_report: Text stream for the CSV error report (optional)
+        batch_size: Rows per transaction
+        dry_run: Validate only
+        ip_address: Client address for the audit entries
+
+    Returns:
+        dict: Counts of rows read, records created and rows rejected
+
+    Raises:
+        IngestError: If the file or operation cannot be imported
+    """
+    if not operation.is_active:
+        raise IngestError('Cannot create records for inactive operations.')
+
+    headers, rows = read_rows(file, filename)
+    validator = RowValidator(headers)
+    writer = None
+    if error_report is not None:
+        writer = csv.writer(error_report)
+        writer.writerow(['row', 'errors'] + headers)
+
+    summary = {'rows': 0, 'created': 0, 'rejected': 0}
+
+    def flush(batch):
+        cleaned, errors = validator.validate([values for _, values in batch])
+        records = []
+        for (number, values), data, row_errors in zip(batch, cleaned, errors):
+            if row_errors:
+                summary['rejected'] += 1
+                if writer is not None:
+                    message = '; '.join(
+                        f"{name}: {' '.join(messages)}" if name != '__all__' else ' '.join(messages)
+                        for name, messages in row_errors.items()
+                    )
+                    writer.writerow([number, message] + [cell_value(value) for value in values])
+            else:
+                records.append(Record(operation=operation, created_by=user, **data))
+        if records and not dry_run:
+            _insert_import_batch(records, ip_address)
+        summary['created'] += len(records)
+
+    batch = []
+    for number, values in rows:
+        summary['rows'] += 1
+        batch.append((number, values))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    logger.info(
+        f"Imported {filename} into {operation.name}: {summary['created']} created, "
+        f"{summary['rejected']} rejected{' (dry run)' if dry_run else ''}"
+    )
+    return summary
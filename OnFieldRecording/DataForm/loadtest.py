@@ -0,0 +1,468 @@
+"""
+Load testing harness for DataForm app
+Simulates field agents (login → record_create with photos → record_list)
+and admins (dashboard, operation_detail, searches, exports) against a
+running server (runserver or gunicorn). Every virtual user is an asyncio
+HTTP/1.1 client from the standard library with its own keep-alive
+connection, session cookie and CSRF token; each request is timed per
+endpoint. Driven by the loadtest management command.
+"""
+
+import asyncio
+import random
+import re
+import ssl
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+USER_AGENT = 'onfield-loadtest/1.0'
+
+# Admins export a report every EXPORT_EVERY rounds (alternating PDF/XLSX)
+EXPORT_EVERY = 5
+
+SEARCH_TERMS = ['Load Agent', 'JOB-', 'LT-', 'MTR', 'Nairobi']
+
+# Field agents are spread around Nairobi
+GPS_CENTER = (-1.286389, 36.817223)
+GPS_SPREAD = 0.2
+
+CSRF_FIELD = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+RECORD_PATH = re.compile(r'/records/(\d+)/$')
+
+
+class HTTPError(Exception):
+    """Malformed response or connection closed mid-response"""
+
+
+# =============================================
+# HTTP CLIENT
+# =============================================
+
+@dataclass
+class Response:
+    status: int
+    headers: dict
+    body: bytes
+
+
+class Session:
+    """One virtual user: a keep-alive connection with its own cookie jar"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        parts = urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.https else 80)
+        self.netloc = parts.netloc
+        self.origin = f'{parts.scheme}://{parts.netloc}'
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, endpoint, method, path, body=b'', content_type=None, expect=(200,)):
+        """
+        Send a request and time it under the endpoint's name.
+
+        Returns:
+            Response: Or None if the connection failed or timed out
+        """
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._exchange(method, path, body, content_type), self.timeout)
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, HTTPError) as error:
+            await self.close()
+            self.stats.observe(endpoint, (time.perf_counter() - started) * 1000, type(error).__name__)
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats.observe(endpoint, elapsed_ms, None if response.status in expect else response.status)
+        return response
+
+    async def get(self, endpoint, path, query=None, expect=(200,)):
+        return await self.request(endpoint, 'GET', f'{path}?{urlencode(query)}' if query else path, expect=expect)
+
+    async def post(self, endpoint, path, body, content_type, expect=(302,)):
+        return await self.request(endpoint, 'POST', path, body, content_type, expect)
+
+    def csrf_token(self, response):
+        """Token of the form on the page, or the cookie secret (also accepted by Django)"""
+        match = CSRF_FIELD.search(response.body) if response else None
+        return match.group(1).decode() if match else self.cookies.get('csrftoken', '')
+
+    async def _exchange(self, method, path, body, content_type):
+        # A kept-alive connection may have been closed by the server while
+        # idle; retry once on a fresh one before counting an error
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                context = ssl.create_default_context() if self.https else None
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+            try:
+                self.writer.write(self._head(method, path, body, content_type) + body)
+                await self.writer.drain()
+                response = await self._read_response(method)
+            except ConnectionError:
+                # Only before any response byte, so a POST is never sent twice
+                await self.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.headers.get('connection', '').lower() == 'close':
+                await self.close()
+            return response
+
+    def _head(self, method, path, body, content_type):
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.netloc}',
+            f'User-Agent: {USER_AGENT}',
+            'Accept: text/html,application/json,*/*',
+            'Connection: keep-alive',
+            # Django checks the Referer of HTTPS POSTs against the host
+            f'Referer: {self.origin}{path}',
+        ]
+        if self.cookies:
+            lines.append('Cookie: ' + '; '.join(f'{name}={value}' for name, value in self.cookies.items()))
+        if method != 'GET':
+            lines.append(f'Content-Length: {len(body)}')
+            lines.append(f'Content-Type: {content_type}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _read_response(self, method):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise HTTPError(f'Bad status line: {status_line[:100]!r}')
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                self._store_cookie(value)
+            headers[name] = value
+
+        if method == 'HEAD' or status in (204, 304):
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        return Response(status, headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Skip trailers
+                while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def _store_cookie(self, header):
+        cookie = SimpleCookie()
+        cookie.load(header)
+        for name, morsel in cookie.items():
+            if morsel.value and morsel['max-age'] != '0':
+                self.cookies[name] = morsel.value
+            else:
+                self.cookies.pop(name, None)
+
+
+def multipart(fields, files):
+    """
+    Encode a multipart/form-data body.
+
+    Args:
+        fields: {name: value}
+        files: [(field name, filename, content bytes, content type)]
+
+    Returns:
+        tuple: (body, content type header)
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, content, content_type in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+# =============================================
+# STATISTICS
+# =============================================
+
+@dataclass
+class EndpointStats:
+    timings: list = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class Stats:
+    """Latencies and errors per endpoint"""
+
+    def __init__(self):
+        self.endpoints = defaultdict(EndpointStats)
+
+    def observe(self, endpoint, elapsed_ms, error=None):
+        """Record one request; error is the unexpected status code or exception name"""
+        stats = self.endpoints[endpoint]
+        stats.timings.append(elapsed_ms)
+        if error is not None:
+            stats.errors[str(error)] += 1
+
+    def report(self, elapsed):
+        """Throughput, error rate and latency percentiles per endpoint, plus a total row"""
+        rows = {name: self._row(stats.timings, stats.errors, elapsed) for name, stats in sorted(self.endpoints.items())}
+        rows['total'] = self._row(
+            [ms for stats in self.endpoints.values() for ms in stats.timings],
+            sum((stats.errors for stats in self.endpoints.values()), Counter()),
+            elapsed,
+        )
+        return rows
+
+    @staticmethod
+    def _row(timings, errors, elapsed):
+        ordered = sorted(timings)
+        failed = sum(errors.values())
+        row = {
+            'requests': len(ordered),
+            'errors': failed,
+            'error_rate': round(failed / len(ordered), 4) if ordered else 0,
+            'rps': round(len(ordered) / elapsed, 2) if elapsed else 0,
+            'error_kinds': dict(errors),
+        }
+        if ordered:
+            row.update({
+                'p50_ms': round(_percentile(ordered, 0.50), 1),
+                'p95_ms': round(_percentile(ordered, 0.95), 1),
+                'p99_ms': round(_percentile(ordered, 0.99), 1),
+                'max_ms': round(ordered[-1], 1),
+            })
+        return row
+
+
+# =============================================
+# VIRTUAL USERS
+# =============================================
+
+@dataclass
+class Plan:
+    """
+    What to run.
+
+    paths maps login, record_create, record_list, dashboard,
+    operation_detail, operation_search, system_search, export_pdf and
+    export_xlsx to server paths; photos are JPEG bytes attached to every
+    record an agent creates.
+    """
+
+    base_url: str
+    paths: dict
+    agents: list
+    admins: list
+    password: str
+    duration: float = 60
+    ramp_up: float = 10
+    think: float = 1.0
+    photos: list = field(default_factory=list)
+    timeout: float = 30
+    seed: int = 0
+
+
+class VirtualUser:
+    """Base of the simulated users: login, think time and the stop deadline"""
+
+    def __init__(self, plan, username, index, stats, deadline):
+        self.plan = plan
+        self.username = username
+        self.index = index
+        self.deadline = deadline
+        self.rng = random.Random(f'{plan.seed}:{username}')
+        self.session = Session(plan.base_url, stats, plan.timeout)
+
+    @property
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    async def think(self):
+        if self.plan.think > 0:
+            pause = self.rng.expovariate(1 / self.plan.think)
+            await asyncio.sleep(max(0, min(pause, self.deadline - time.monotonic())))
+
+    async def login(self):
+        path = self.plan.paths['login']
+        page = await self.session.get('GET login', path)
+        body = urlencode({
+            'csrfmiddlewaretoken': self.session.csrf_token(page),
+            'username': self.username,
+            'password': self.plan.password,
+        }).encode()
+        response = await self.session.post('POST login', path, body, 'application/x-www-form-urlencoded')
+        # A failed login re-renders the form (200) and is counted as an error
+        return response is not None and response.status == 302
+
+    async def run(self, start_delay):
+        await asyncio.sleep(start_delay)
+        try:
+            if self.running and await self.login():
+                while self.running:
+                    await self.round()
+        finally:
+            await self.session.close()
+
+
+class FieldAgent(VirtualUser):
+    """Creates records with photos and checks the record list"""
+
+    def __init__(self, *args, created):
+        super().__init__(*args)
+        self.created = created
+        self.visit = 0
+
+    def record_fields(self, token):
+        self.visit += 1
+        return {
+            'csrfmiddlewaretoken': token,
+            'customer_name': f'Load Agent {self.index} Visit {self.visit}',
+            'customer_contact': f'+2547{self.rng.randrange(10 ** 8):08d}',
+            'account_number': f'LT{self.index:05d}{self.visit:06d}',
+            # New meter per visit: no previous reading to validate against
+            'meter_number': f'LT-{self.index:05d}-{self.visit:06d}',
+            'meter_reading': f'{self.rng.uniform(100, 99999):.2f}',
+            'todays_balance': f'{self.rng.choice([0, self.rng.uniform(0, 5000)]):.2f}',
+            'gps_latitude': f'{GPS_CENTER[0] + self.rng.uniform(-GPS_SPREAD, GPS_SPREAD):.7f}',
+            'gps_longitude': f'{GPS_CENTER[1] + self.rng.uniform(-GPS_SPREAD, GPS_SPREAD):.7f}',
+            'gps_address': '',
+            'type_of_anomaly': 'none',
+            'remarks': '',
+            'status': 'submitted',
+        }
+
+    async def round(self):
+        paths = self.plan.paths
+        form = await self.session.get('GET record_create', paths['record_create'])
+        if form is not None and form.status == 200:
+            files = [
+                ('photos', f'meter_{self.visit}_{number}.jpg', photo, 'image/jpeg')
+                for number, photo in enumerate(self.plan.photos)
+            ]
+            body, content_type = multipart(self.record_fields(self.session.csrf_token(form)), files)
+            response = await self.session.post('POST record_create', paths['record_create'], body, content_type)
+            # Redirected to the new record's detail page
+            match = response and response.status == 302 and RECORD_PATH.search(response.headers.get('location', ''))
+            if match:
+                self.created.append(int(match.group(1)))
+        await self.think()
+        if self.running:
+            await self.session.get('GET record_list', paths['record_list'])
+            await self.think()
+
+
+class Admin(VirtualUser):
+    """Watches the dashboard and the active operation, searches and exports"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.rounds = 0
+
+    async def round(self):
+        paths = self.plan.paths
+        self.rounds += 1
+        steps = [
+            ('GET dashboard', paths['dashboard'], None),
+            ('GET operation_detail', paths['operation_detail'], None),
+            ('GET operation_search', paths['operation_search'], {'q': self.rng.choice(SEARCH_TERMS)}),
+            ('GET system_search', paths['system_search'], {'q': self.rng.choice(SEARCH_TERMS)}),
+        ]
+        if self.rounds % EXPORT_EVERY == 0:
+            export = 'export_pdf' if self.rounds // EXPORT_EVERY % 2 else 'export_xlsx'
+            steps.append((f'GET {export}', paths[export], None))
+        for endpoint, path, query in steps:
+            if not self.running:
+                return
+            await self.session.get(endpoint, path, query)
+            await self.think()
+
+
+# =============================================
+# RUNNING
+# =============================================
+
+async def _run(plan):
+    stats = Stats()
+    created = []
+    deadline = time.monotonic() + plan.ramp_up + plan.duration
+    users = [
+        FieldAgent(plan, username, index, stats, deadline, created=created)
+        for index, username in enumerate(plan.agents)
+    ] + [
+        Admin(plan, username, index, stats, deadline)
+        for index, username in enumerate(plan.admins)
+    ]
+    # Users start evenly over the ramp-up, agents and admins mixed
+    random.Random(plan.seed).shuffle(users)
+    started = time.monotonic()
+    await asyncio.gather(*(
+        user.run(plan.ramp_up * position / len(users))
+        for position, user in enumerate(users)
+    ))
+    elapsed = time.monotonic() - started
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'agents': len(plan.agents),
+        'admins': len(plan.admins),
+        'created_record_ids': created,
+        'endpoints': stats.report(elapsed),
+    }
+
+
+def run(plan):
+    """
+    Run the load test to completion.
+
+    Returns:
+        dict: elapsed_s, agents, admins, created_record_ids and per-endpoint
+        requests, errors, error_rate, rps and p50/p95/p99/max latency (ms)
+    """
+    return asyncio.run(_run(plan))
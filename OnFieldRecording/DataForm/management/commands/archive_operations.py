@@ -0,0 +1,83 @@
+"""
+Management command to move closed operations to cold storage.
+
+Usage:
+    python manage.py archive_operations --operation 3
+    python manage.py archive_operations --closed-before 90
+    python manage.py archive_operations --closed-before 90 --format jsonl.gz --dry-run
+
+Each operation's records, media rows and record audit entries are written
+to compressed files (Parquet when pyarrow is installed), verified, and
+then deleted from the live tables in batches. Reports and operation search
+keep working from the archive.
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from DataForm.archive import ArchiveError, archive_operation
+from DataForm.models import Operation
+
+
+class Command(BaseCommand):
+    help = 'Archive closed operations to compressed files and purge their live rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operation',
+            type=int,
+            action='append',
+            help='Operation ID to archive (repeatable)',
+        )
+        parser.add_argument(
+            '--closed-before',
+            type=int,
+            metavar='DAYS',
+            help='Archive every operation closed more than DAYS days ago',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['parquet', 'jsonl.gz'],
+            default=None,
+            help='Archive format (default: parquet if pyarrow is installed, else jsonl.gz)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the operations that would be archived',
+        )
+
+    def handle(self, *args, **options):
+        operations = Operation.objects.filter(is_deleted=False, is_active=False, closed_at__isnull=False)
+        if options['operation']:
+            operations = operations.filter(pk__in=options['operation'])
+        elif options['closed_before'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['closed_before'])
+            operations = operations.filter(closed_at__lt=cutoff)
+        else:
+            raise CommandError('Pass --operation or --closed-before.')
+
+        # Skip finished archives; interrupted purges are resumed
+        operations = operations.exclude(archive__purged_at__isnull=False)
+
+        for operation in operations.order_by('closed_at'):
+            if options['dry_run']:
+                self.stdout.write(f'  Would archive {operation.name} ({operation.total_records} records)')
+                continue
+            try:
+                archive = archive_operation(operation, fmt=options['format'], batch_size=options['batch_size'])
+            except ArchiveError as e:
+                self.stdout.write(self.style.ERROR(f'  ✗ {operation.name}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'  ✓ Archived {operation.name}: {archive.record_count} records, '
+                f'{archive.media_count} media, {archive.audit_count} audit entries → {archive.location}'
+            ))
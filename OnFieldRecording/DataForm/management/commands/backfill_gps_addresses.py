@@ -0,0 +1,121 @@
+"""
+Management command to fill blank gps_address values of historical records
+from the local gazetteer.
+
+Usage:
+    python manage.py backfill_gps_addresses
+    python manage.py backfill_gps_addresses --workers 4 --batch-size 20000 --operation 3
+
+Records sharing a rounded coordinate are resolved once. Gazetteer lookups
+run in a process pool; records are updated with bulk_update (no signals),
+bumping updated_at so sync clients pick up the new addresses.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from DataForm import geocoding
+from DataForm.models import Record, GeocodeCache
+
+
+def nearest_addresses(keys):
+    """Resolve (lat, lon) keys against the gazetteer inherited from the parent process"""
+    gazetteer = geocoding.get_gazetteer()
+    return [gazetteer.nearest(float(lat), float(lon)) or '' for lat, lon in keys]
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Reverse-geocode blank gps_address values of existing records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of worker processes (default: CPU count)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Records processed per batch',
+        )
+        parser.add_argument(
+            '--operation',
+            type=int,
+            help='Only backfill records of this operation ID',
+        )
+
+    def handle(self, *args, **options):
+        # Load once in the parent so forked workers share it
+        if not len(geocoding.get_gazetteer()):
+            raise CommandError('No gazetteer loaded. Set GAZETTEER_PATH to a gazetteer file.')
+
+        records = Record.objects.filter(
+            Q(gps_address='') | Q(gps_address__startswith='Lat:'),
+            gps_latitude__isnull=False,
+            gps_longitude__isnull=False,
+        )
+        if options['operation']:
+            records = records.filter(operation_id=options['operation'])
+
+        ids = list(records.order_by('pk').values_list('pk', flat=True))
+        self.stdout.write(f'Backfilling {len(ids)} records...')
+
+        updated = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for batch_ids in chunked(ids, options['batch_size']):
+                updated += self.backfill_batch(pool, batch_ids)
+                self.stdout.write(f'  Updated {updated} records...')
+
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Backfilled {updated} records'))
+
+    def backfill_batch(self, pool, batch_ids):
+        batch = list(
+            Record.objects.filter(pk__in=batch_ids).only('pk', 'gps_latitude', 'gps_longitude', 'gps_address')
+        )
+        keys = {geocoding.round_coordinates(r.gps_latitude, r.gps_longitude) for r in batch}
+
+        # Persistent cache first
+        addresses = {}
+        lats = {lat for lat, _ in keys}
+        for lat, lon, address in GeocodeCache.objects.filter(latitude__in=lats).values_list(
+            'latitude', 'longitude', 'address'
+        ):
+            if (lat, lon) in keys:
+                addresses[(lat, lon)] = address
+
+        # Remaining keys through the gazetteer in parallel
+        missing = sorted(keys - addresses.keys())
+        if missing:
+            connections.close_all()
+            chunks = list(chunked(missing, 500))
+            resolved = []
+            for result in pool.map(nearest_addresses, chunks):
+                resolved.extend(result)
+            new_entries = dict(zip(missing, resolved))
+            GeocodeCache.objects.bulk_create(
+                [GeocodeCache(latitude=lat, longitude=lon, address=address) for (lat, lon), address in new_entries.items()],
+                ignore_conflicts=True,
+            )
+            addresses.update(new_entries)
+
+        changed = []
+        now = timezone.now()
+        for record in batch:
+            address = addresses.get(geocoding.round_coordinates(record.gps_latitude, record.gps_longitude))
+            if address:
+                record.gps_address = address
+                record.updated_at = now
+                changed.append(record)
+        Record.objects.bulk_update(changed, ['gps_address', 'updated_at'], batch_size=1000)
+        return len(changed)
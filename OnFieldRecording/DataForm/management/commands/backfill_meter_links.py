@@ -0,0 +1,46 @@
+"""
+Management command to link records to registry meters.
+
+Usage:
+    python manage.py backfill_meter_links
+    python manage.py backfill_meter_links --seed
+    python manage.py backfill_meter_links --relink --batch-size 10000
+
+Records are matched by meter number (case and spaces ignored) in batches.
+--seed first registers every meter number only known from records, using
+the customer details of its latest record.
+"""
+
+from django.core.management.base import BaseCommand
+
+from DataForm.registry import LINK_BATCH_SIZE, link_records, seed_from_records
+
+
+class Command(BaseCommand):
+    help = 'Link historical records to their registry meter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=LINK_BATCH_SIZE,
+            help='Records updated per batch',
+        )
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Register unknown meter numbers from their latest record first',
+        )
+        parser.add_argument(
+            '--relink',
+            action='store_true',
+            help='Also revisit records that are already linked',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            created = seed_from_records()
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Registered {created} meters from records'))
+
+        linked = link_records(batch_size=options['batch_size'], relink=options['relink'])
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Linked {linked} records'))
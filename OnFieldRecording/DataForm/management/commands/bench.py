@@ -0,0 +1,124 @@
+"""
+Management command to benchmark the hot paths and track regressions.
+
+Usage:
+    python manage.py bench --output bench.json
+    python manage.py bench --sizes 10000 100000 --iterations 10
+    python manage.py bench --only record_list export_pdf --compare baseline.json
+    python manage.py bench --compare baseline.json --threshold 0.1 --output latest.json
+
+Scenarios run against a freshly migrated scratch copy of the database
+(never the live data): record creation with and without photos, record
+numbering under concurrent writers, PDF and XLSX export, audit-heavy
+cascade deletes, and record_list, system_search and the dashboard at each
+table size. With --compare, the command fails if any scenario's median
+is more than --threshold slower than the baseline or issues more queries.
+"""
+
+import json
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.conf import settings
+
+from DataForm.bench import (
+    DEFAULT_ITERATIONS, DEFAULT_SIZES, DEFAULT_THRESHOLD, SCENARIOS, BenchRun, compare, environment,
+    scratch_database,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the core views and write the timings as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=DEFAULT_SIZES,
+            help='Record table sizes for the list, search and dashboard scenarios',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=DEFAULT_ITERATIONS,
+            help='Timed runs per scenario',
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            choices=SCENARIOS,
+            help='Run only these scenarios',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file',
+        )
+        parser.add_argument(
+            '--compare',
+            help='Baseline JSON file to check the results against',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help='Allowed median slowdown before a scenario counts as a regression (0.2 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {e}")
+
+        run = BenchRun(
+            sizes=options['sizes'],
+            iterations=options['iterations'],
+            only=options['only'],
+            log=lambda message: self.stdout.write(f'  {message}'),
+        )
+        # Production-like settings: no debug toolbar or query log; uploaded
+        # photos land in a throwaway directory
+        bench_settings = {
+            'DEBUG': False,
+            'MIDDLEWARE': [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')],
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+        }
+        with tempfile.TemporaryDirectory() as media_root, scratch_database():
+            with override_settings(MEDIA_ROOT=media_root, **bench_settings):
+                results = run.run()
+                report = {'environment': environment(), 'sizes': run.sizes, 'results': results}
+
+        self.stdout.write('')
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<36} median {result['median_ms']:>10.1f} ms  p95 {result['p95_ms']:>10.1f} ms"
+                f"  {result.get('queries', '-'):>5} queries"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"  ✓ Results written to {options['output']}"))
+
+        if baseline is not None:
+            self.report_comparison(compare(report, baseline, options['threshold']), options['threshold'])
+
+    def report_comparison(self, rows, threshold):
+        self.stdout.write('')
+        self.stdout.write(f'Against baseline (threshold {threshold:.0%}):')
+        for row in rows:
+            line = (
+                f"  {row['name']:<36} {row['baseline_ms']:>10.1f} → {row['current_ms']:>10.1f} ms "
+                f"({row['change']:+.1%}), queries {row['baseline_queries']} → {row['current_queries']}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['regressed'] else line)
+
+        regressions = [row['name'] for row in rows if row['regressed']]
+        if regressions:
+            raise CommandError(f"{len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS(f'  ✓ No regressions in {len(rows)} scenarios'))
@@ -0,0 +1,63 @@
+"""
+Management command to delete expired database sessions in batches.
+
+Usage:
+    python manage.py clear_expired_sessions
+    python manage.py clear_expired_sessions --batch-size 1000 --pause 0.2
+
+Unlike Django's clearsessions, which issues a single DELETE over the whole
+table, each batch is its own short transaction so the sweeper never holds
+the SQLite write lock for long. Only needed for the db and cached_db
+session engines; cache-only sessions expire by themselves.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Sessions deleted per batch',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SESSION_ENGINE.endswith(('.db', '.cached_db')):
+            self.stdout.write(self.style.WARNING(
+                f'Session engine {settings.SESSION_ENGINE} does not store sessions in the database.'
+            ))
+            return
+
+        now = timezone.now()
+        deleted = 0
+
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+
+            count, _ = Session.objects.filter(session_key__in=keys).delete()
+            deleted += count
+            self.stdout.write(f'  Deleted {deleted} sessions...')
+
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Deleted {deleted} expired sessions'))
@@ -0,0 +1,185 @@
+"""
+Management command to EXPLAIN the hottest record queries issued by the views
+and report which index each one uses.
+
+Usage:
+    python manage.py explain_queries
+    python manage.py explain_queries --operation 3 --user 5 --verbose
+    python manage.py explain_queries --analyze   # PostgreSQL: EXPLAIN ANALYZE
+
+Queries are built exactly as the views build them and executed once; the
+captured SQL is then re-run under EXPLAIN. Plans that scan the record table
+without an index are flagged.
+"""
+
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from DataForm.models import Operation, Record
+
+
+# SQLite: "SEARCH r USING INDEX x", "SCAN r USING COVERING INDEX x"
+# PostgreSQL: "Index Scan using x", "Index Only Scan Backward using x", "Bitmap Index Scan on x"
+INDEX_PATTERNS = [
+    re.compile(r'USING (?:COVERING )?INDEX (\w+)'),
+    re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\w+)'),
+    re.compile(r'Bitmap Index Scan on (\w+)'),
+]
+FULL_SCAN_PATTERNS = [
+    re.compile(r'^SCAN "?DataForm_record"?\s*$'),
+    re.compile(r'Seq Scan on "?DataForm_record"?'),
+]
+
+
+def live_records():
+    return Record.objects.filter(is_deleted=False)
+
+
+def top_queries(operation, user):
+    """(name, callable) pairs mirroring the record queries in views.py"""
+    return [
+        ('dashboard: total records',
+            lambda: live_records().count()),
+        ('dashboard: recent records',
+            lambda: list(live_records().order_by('-created_at')[:10])),
+        ('dashboard: anomaly distribution',
+            lambda: list(live_records().values('type_of_anomaly').annotate(count=Count('id')).order_by('-count'))),
+        ('staff dashboard: own records',
+            lambda: list(live_records().filter(created_by=user).order_by('-created_at')[:20])),
+        ('staff dashboard: own total',
+            lambda: live_records().filter(created_by=user).count()),
+        ('staff dashboard: own drafts',
+            lambda: live_records().filter(created_by=user, status='draft').count()),
+        ('operation list: record count',
+            lambda: live_records().filter(operation=operation).count()),
+        ('operation detail: records',
+            lambda: list(live_records().filter(operation=operation).order_by('-created_at')[:50])),
+        ('operation detail: submitted count',
+            lambda: live_records().filter(operation=operation, status='submitted').count()),
+        ('operation detail: with anomaly',
+            lambda: live_records().filter(operation=operation).exclude(type_of_anomaly='none').count()),
+        ('operation detail: anomaly distribution',
+            lambda: list(live_records().filter(operation=operation).exclude(type_of_anomaly='none').values(
+                'type_of_anomaly').annotate(count=Count('id')).order_by('-count'))),
+        ('operation export: records by number',
+            lambda: list(live_records().filter(operation=operation).select_related(
+                'created_by', 'operation').order_by('record_number')[:50])),
+        ('record list: latest',
+            lambda: list(live_records().select_related('operation', 'created_by').order_by('-created_at')[:50])),
+        ('record list: by status',
+            lambda: list(live_records().select_related('operation', 'created_by').filter(
+                status='submitted').order_by('-created_at')[:50])),
+        ('record list: by anomaly',
+            lambda: list(live_records().select_related('operation', 'created_by').filter(
+                type_of_anomaly='meter_tampered').order_by('-created_at')[:50])),
+        ('record list: by operation',
+            lambda: list(live_records().select_related('operation', 'created_by').filter(
+                operation=operation).order_by('-created_at')[:50])),
+    ]
+
+
+def capture_last_query(func):
+    """Run func and return the (sql, params) of the last query it executed"""
+    captured = []
+
+    def wrapper(execute, sql, params, many, context):
+        captured.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        func()
+    if not captured:
+        raise CommandError('Query did not hit the database')
+    return captured[-1]
+
+
+def explain(sql, params, analyze=False):
+    """EXPLAIN a query and return the plan lines"""
+    options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        rows = cursor.fetchall()
+    # SQLite rows are (id, parent, notused, detail); PostgreSQL rows are (line,)
+    return [str(row[-1]) for row in rows]
+
+
+def used_indexes(plan):
+    indexes = []
+    for line in plan:
+        for pattern in INDEX_PATTERNS:
+            indexes.extend(name for name in pattern.findall(line) if name not in indexes)
+    return indexes
+
+
+def is_full_scan(plan):
+    return any(pattern.search(line.strip()) for line in plan for pattern in FULL_SCAN_PATTERNS)
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the main record queries from the views and report index usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operation',
+            type=int,
+            help='Operation ID used for operation-scoped queries (default: latest)',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='User ID used for staff queries (default: most active creator)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Use EXPLAIN ANALYZE (PostgreSQL only)',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Print full query plans',
+        )
+
+    def handle(self, *args, **options):
+        if options['operation']:
+            operation = Operation.objects.filter(pk=options['operation']).first()
+        else:
+            operation = Operation.objects.order_by('-created_at').first()
+        if options['user']:
+            user = User.objects.filter(pk=options['user']).first()
+        else:
+            top_creator = live_records().values('created_by').annotate(n=Count('id')).order_by('-n').first()
+            user = User.objects.filter(pk=top_creator['created_by']).first() if top_creator else User.objects.first()
+        if operation is None or user is None:
+            raise CommandError('Need at least one operation and one user to build the queries.')
+
+        self.stdout.write(f'Explaining queries on {connection.vendor} '
+                          f'(operation {operation.pk}, user {user.pk})...')
+
+        full_scans = 0
+        for name, func in top_queries(operation, user):
+            sql, params = capture_last_query(func)
+            plan = explain(sql, params, analyze=options['analyze'])
+            indexes = used_indexes(plan)
+
+            if is_full_scan(plan):
+                full_scans += 1
+                self.stdout.write(self.style.WARNING(f'  ✗ {name}: full table scan'))
+            elif indexes:
+                self.stdout.write(f'  ✓ {name}: {", ".join(indexes)}')
+            else:
+                self.stdout.write(f'  ? {name}: no index reported')
+
+            if options['verbose']:
+                for line in plan:
+                    self.stdout.write(f'      {line}')
+
+        if full_scans:
+            self.stdout.write(self.style.WARNING(f'  {full_scans} queries scan the record table'))
+        else:
+            self.stdout.write(self.style.SUCCESS('  ✓ All queries use an index'))
@@ -0,0 +1,109 @@
+"""
+Management command to generate production-scale synthetic data.
+
+Usage:
+    python manage.py generate_load_data --records 100000
+    python manage.py generate_load_data --records 5000000 --operations 24 --agents 300 --photos-ratio 0.4
+    python manage.py generate_load_data --records 1000000 --seed 7 --workers 8
+
+Creates staff agents (synthetic_agent_<n>, no usable password), closed
+operations of 30 days each ending today, and records with GPS points
+clustered around towns, per-meter reading histories and realistic
+balances and anomaly rates. Rows are bulk inserted (COPY on PostgreSQL)
+without signals or audit entries, by parallel worker processes; the same
+--seed always produces the same data. Afterwards run
+rebuild_latest_readings (and render_density_tiles if tiles are used).
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DataForm import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Bulk generate synthetic agents, operations and records for load tests and benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--records',
+            type=int,
+            default=100000,
+            help='Total number of records',
+        )
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=10,
+            help='Number of operations the records are spread over',
+        )
+        parser.add_argument(
+            '--agents',
+            type=int,
+            default=50,
+            help='Number of field agents',
+        )
+        parser.add_argument(
+            '--photos-ratio',
+            type=float,
+            default=0.3,
+            help='Share of records with a photo (all point to one placeholder image)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; operations are named after it',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of worker processes (default: CPU count; 1 runs in this process)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=synthetic.CHUNK_SIZE,
+            help='Records built and inserted per task',
+        )
+
+    def handle(self, *args, **options):
+        if options['records'] < 1 or options['operations'] < 1 or options['agents'] < 1:
+            raise CommandError('--records, --operations and --agents must be positive.')
+        if not 0 <= options['photos_ratio'] <= 1:
+            raise CommandError('--photos-ratio must be between 0 and 1.')
+
+        workers = options['workers'] or os.cpu_count()
+        self.stdout.write(
+            f"Generating {options['records']} records in {options['operations']} operations "
+            f"for {options['agents']} agents with {workers} workers..."
+        )
+        step = max(options['records'] // 20, 1)
+        reported = [0]
+
+        def progress(done, total):
+            if done - reported[0] >= step or done == total:
+                reported[0] = done
+                self.stdout.write(f'  Inserted {done}/{total} records...')
+
+        try:
+            summary = synthetic.generate(
+                options['records'],
+                operations=options['operations'],
+                agents=options['agents'],
+                photos_ratio=options['photos_ratio'],
+                seed=options['seed'],
+                workers=workers,
+                chunk_size=options['chunk_size'],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(f'{e}. Use another --seed.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ Created {summary['records']} records and {summary['photos']} photos in "
+            f"{summary['operations']} operations by {summary['agents']} agents"
+        ))
+        self.stdout.write('  Run rebuild_latest_readings to index the new meter readings.')
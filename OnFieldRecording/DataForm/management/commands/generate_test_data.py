@@ -10,6 +10,8 @@ This command creates:
 - 3 operations (2 closed, 1 active)
 - 30-50 sample records with varied statuses and anomalies
 - Sample photos for some records
+
+For production-scale datasets use generate_load_data.
 """
 
 from django.core.management.base import BaseCommand
@@ -66,7 +68,7 @@ class Command(BaseCommand):
             'Kiambu, Ruaka', 'Machakos Town', 'Kitale, Township'
         ]
 
-        anomaly_types = ['none', 'meter_bypass', 'illegal_connection', 'meter_tampered', 'meter_reversed']
+        anomaly_types = [code for code, _ in Record.ANOMALY_CHOICES if code != 'none']
         statuses = ['draft', 'submitted', 'verified']
 
         # Create groups if they don't exist
@@ -231,13 +233,11 @@ class Command(BaseCommand):
                 customer_contact = f'07{random.randint(10000000, 99999999)}'
                 
                 # Anomaly (20% chance)
-                type_of_anomaly = random.choice(anomaly_types) if random.random() < 0.2 else ''
-                if type_of_anomaly == 'none':
-                    type_of_anomaly = ''
+                type_of_anomaly = random.choice(anomaly_types) if random.random() < 0.2 else 'none'
                 
                 # Remarks for anomalies
                 remarks = ''
-                if type_of_anomaly:
+                if type_of_anomaly != 'none':
                     remarks = f'Detected {type_of_anomaly.replace("_", " ")}. Requires immediate attention and follow-up.'
                 
                 # Status (more verified records for closed operations)
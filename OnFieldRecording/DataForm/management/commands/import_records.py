@@ -0,0 +1,98 @@
+"""
+Management command to import records from a CSV or XLSX sheet.
+
+Usage:
+    python manage.py import_records readings.xlsx --user admin
+    python manage.py import_records readings.csv --user admin --operation 4 --errors rejected.csv
+    python manage.py import_records readings.csv --user admin --dry-run
+
+Columns are matched by field name or label ("Customer Name", "Today's
+Balance", ...); unknown columns such as "Job Number" are ignored and new
+record numbers are allocated. Rows are validated with the RecordForm
+rules; rejected rows are written with their errors to the error report
+(default: <file>.errors.csv next to the input).
+"""
+
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from DataForm.ingest import IMPORT_BATCH_SIZE, IngestError, import_records
+from DataForm.models import Operation
+
+
+class Command(BaseCommand):
+    help = 'Import records from a CSV or XLSX file into an operation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Username recorded as the creator of the records',
+        )
+        parser.add_argument(
+            '--operation',
+            type=int,
+            help='Target operation ID (default: the active operation)',
+        )
+        parser.add_argument(
+            '--errors',
+            help='Error report path (default: <file>.errors.csv)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Rows validated and inserted per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file and write the error report without importing',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' not found.")
+
+        operations = Operation.objects.filter(is_deleted=False)
+        if options['operation']:
+            operation = operations.filter(pk=options['operation']).first()
+        else:
+            operation = operations.filter(is_active=True).first()
+        if operation is None:
+            raise CommandError('Operation not found (pass --operation or activate one).')
+
+        errors_path = options['errors'] or f'{os.path.splitext(path)[0]}.errors.csv'
+        started = time.perf_counter()
+        try:
+            with open(path, 'rb') as file, open(errors_path, 'w', newline='', encoding='utf-8') as report:
+                summary = import_records(
+                    file, path, operation, user,
+                    error_report=report,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+        except IngestError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        rate = summary['rows'] / elapsed * 60 if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ {verb} {summary['created']} of {summary['rows']} rows into {operation.name} "
+            f"in {elapsed:.1f}s ({rate:,.0f} rows/min)"
+        ))
+        if summary['rejected']:
+            self.stdout.write(self.style.WARNING(f"  {summary['rejected']} rows rejected, see {errors_path}"))
+        else:
+            os.remove(errors_path)
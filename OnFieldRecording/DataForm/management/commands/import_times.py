@@ -0,0 +1,164 @@
+"""
+Management command to measure worker startup (import) cost.
+
+Usage:
+    python manage.py import_times
+    python manage.py import_times --runs 5 --top 30
+    python manage.py import_times --output boot.json --check
+
+Boots the project the way a web worker does (settings, apps, the WSGI
+handler and the URLconf, which imports every view) in fresh interpreters
+and reports the median boot time and peak RSS, then an import breakdown
+from one more run under python -X importtime: time per top-level package
+and the slowest direct imports. Libraries that should only load on first
+use (see LAZY_MODULES) are flagged when a worker imports them at boot;
+--check turns that into a failure for CI.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Loaded on demand by the code that needs them (exports, Supabase storage,
+# archives, background jobs), never at worker startup
+LAZY_MODULES = ['reportlab', 'openpyxl', 'xlsxwriter', 'supabase', 'pyarrow', 'celery']
+
+BOOT_SCRIPT = '''
+import json, os, resource, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'OnFieldRecording.settings')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'boot_ms': (time.perf_counter() - started) * 1000,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure how long a worker takes to import the project, and what it imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Timed boots (the median is reported)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Packages and imports listed in the breakdown',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail if a module from LAZY_MODULES is imported at boot',
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1.')
+
+        boots = [self.boot() for _ in range(options['runs'])]
+        profiled = self.boot('-X', 'importtime')
+        packages, imports = self.breakdown(profiled['stderr'], options['top'])
+        modules = profiled['modules']
+        lazy_loaded = sorted({name.split('.')[0] for name in modules} & set(LAZY_MODULES))
+
+        report = {
+            'runs': len(boots),
+            'boot_ms': round(statistics.median(boot['boot_ms'] for boot in boots), 1),
+            'max_rss_mb': round(statistics.median(boot['max_rss_kb'] for boot in boots) / 1024, 1),
+            'modules': len(modules),
+            'packages': packages,
+            'imports': imports,
+            'lazy_modules_loaded': lazy_loaded,
+        }
+
+        self.stdout.write(
+            f"Boot: {report['boot_ms']:.0f} ms (median of {report['runs']}), "
+            f"peak RSS {report['max_rss_mb']:.1f} MB, {report['modules']} modules"
+        )
+        self.stdout.write('')
+        self.stdout.write('Import time by package (python -X importtime, self time):')
+        for row in packages:
+            self.stdout.write(f"  {row['package']:<40} {row['ms']:>8.1f} ms  {row['modules']:>5} modules")
+        self.stdout.write('')
+        self.stdout.write('Slowest imports (cumulative):')
+        for row in imports:
+            self.stdout.write(f"  {row['module']:<40} {row['ms']:>8.1f} ms")
+        self.stdout.write('')
+
+        if lazy_loaded:
+            self.stdout.write(self.style.WARNING(f"  Loaded at boot but meant to be lazy: {', '.join(lazy_loaded)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('  ✓ No lazily loaded library imported at boot'))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"  ✓ Results written to {options['output']}"))
+
+        if options['check'] and lazy_loaded:
+            raise CommandError(f"Imported at boot: {', '.join(lazy_loaded)}")
+
+    def boot(self, *flags):
+        """Boot the project in a fresh interpreter; returns its measurements and stderr"""
+        result = subprocess.run(
+            [sys.executable, *flags, '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Boot failed:\n{result.stderr[-2000:]}')
+        boot = json.loads(result.stdout.strip().splitlines()[-1])
+        boot['stderr'] = result.stderr
+        return boot
+
+    def breakdown(self, importtime_output, top):
+        """
+        Parse python -X importtime output.
+
+        Returns:
+            tuple: (slowest top-level packages by total self time, slowest
+            direct imports by cumulative time)
+        """
+        package_us = defaultdict(int)
+        package_modules = defaultdict(int)
+        direct = []
+        for line in importtime_output.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            module = name.strip()
+            package = module.split('.')[0]
+            package_us[package] += int(self_us)
+            package_modules[package] += 1
+            # Nested imports are indented by two more spaces per level
+            if len(name) - len(name.lstrip()) == 1:
+                direct.append((int(cumulative_us), module))
+
+        packages = [
+            {'package': package, 'ms': round(us / 1000, 1), 'modules': package_modules[package]}
+            for package, us in sorted(package_us.items(), key=lambda item: -item[1])[:top]
+        ]
+        imports = [{'module': module, 'ms': round(us / 1000, 1)} for us, module in sorted(direct, reverse=True)[:top]]
+        return packages, imports
@@ -0,0 +1,48 @@
+"""
+Management command to load the customer/meter registry from a sheet.
+
+Usage:
+    python manage.py load_registry meters.csv
+    python manage.py load_registry meters.xlsx --batch-size 10000
+
+Columns: meter_number (required), account_number, customer_name,
+customer_contact, address. Rows for known meters and accounts update them.
+Run backfill_meter_links afterwards to link existing records.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DataForm.ingest import IngestError
+from DataForm.registry import LOAD_BATCH_SIZE, load_registry
+
+
+class Command(BaseCommand):
+    help = 'Insert or update registry meters and customers from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=LOAD_BATCH_SIZE,
+            help='Rows upserted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        try:
+            with open(path, 'rb') as file:
+                summary = load_registry(file, path, batch_size=options['batch_size'])
+        except IngestError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"  ✓ Loaded {summary['rows'] - summary['skipped']} registry rows"
+        ))
+        if summary['skipped']:
+            self.stdout.write(self.style.WARNING(f"  {summary['skipped']} rows without a meter number skipped"))
@@ -0,0 +1,265 @@
+"""
+Management command to load-test a running server with simulated users.
+
+Usage:
+    python manage.py loadtest --setup --agents 50 --admins 5
+    python manage.py loadtest --url http://10.0.0.5:8000 --agents 2000 --admins 20 --duration 600 --ramp-up 120
+    python manage.py loadtest --agents 200 --think 0 --photos 2 --output load.json
+
+Field agents log in, create records with photos through record_create and
+open record_list; admins cycle through the dashboard, operation_detail,
+both searches and the PDF/XLSX exports (see DataForm.loadtest). Reports
+throughput, error rate and latency percentiles per endpoint.
+
+--setup creates the loadtest_agent_<n> / loadtest_admin_<n> users with
+--password and, if no operation is active, an active "Load test"
+operation. When the server shares this database, the records it created
+are checked for missing or duplicate record numbers afterwards. Run it
+against a staging copy, never the live deployment; each simulated user
+keeps a connection open, so raise the open file limit (ulimit -n) for
+thousands of agents.
+"""
+
+import io
+import json
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from DataForm.loadtest import Plan, run
+from DataForm.models import Operation, Record, UserProfile
+
+AGENT_USERNAME = 'loadtest_agent_{:04d}'
+ADMIN_USERNAME = 'loadtest_admin_{:02d}'
+
+
+class Command(BaseCommand):
+    help = 'Simulate concurrent field agents and admins against a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://127.0.0.1:8000',
+            help='Base URL of the server under test',
+        )
+        parser.add_argument(
+            '--agents',
+            type=int,
+            default=20,
+            help='Simulated field agents',
+        )
+        parser.add_argument(
+            '--admins',
+            type=int,
+            default=2,
+            help='Simulated admins',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=60,
+            help='Seconds to keep running once every user has started',
+        )
+        parser.add_argument(
+            '--ramp-up',
+            type=float,
+            default=10,
+            help='Seconds over which the users start',
+        )
+        parser.add_argument(
+            '--think',
+            type=float,
+            default=1.0,
+            help='Mean pause between a user\'s requests in seconds (0 = none)',
+        )
+        parser.add_argument(
+            '--photos',
+            type=int,
+            default=1,
+            help='Photos attached to every record',
+        )
+        parser.add_argument(
+            '--operation',
+            type=int,
+            help='Operation the admins view and export (default: the active one)',
+        )
+        parser.add_argument(
+            '--password',
+            default='loadtest-pass',
+            help='Password of the load test users',
+        )
+        parser.add_argument(
+            '--setup',
+            action='store_true',
+            help='Create the load test users and an active operation first',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30,
+            help='Seconds before a request counts as failed',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for think times and form values',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        if options['agents'] < 0 or options['admins'] < 0 or options['agents'] + options['admins'] == 0:
+            raise CommandError('Simulate at least one agent or admin.')
+        if options['duration'] <= 0 or options['ramp_up'] < 0 or options['think'] < 0:
+            raise CommandError('--duration must be positive, --ramp-up and --think not negative.')
+
+        agents = [AGENT_USERNAME.format(index + 1) for index in range(options['agents'])]
+        admins = [ADMIN_USERNAME.format(index + 1) for index in range(options['admins'])]
+        if options['setup']:
+            self.setup(agents, admins, options['password'])
+
+        operation = self.target_operation(options['operation'])
+        plan = Plan(
+            base_url=options['url'].rstrip('/'),
+            paths=self.paths(operation),
+            agents=agents,
+            admins=admins,
+            password=options['password'],
+            duration=options['duration'],
+            ramp_up=options['ramp_up'],
+            think=options['think'],
+            photos=[self.photo(number) for number in range(options['photos'])],
+            timeout=options['timeout'],
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Running {len(agents)} agents and {len(admins)} admins against {plan.base_url} "
+            f"for {plan.ramp_up + plan.duration:.0f}s (operation: {operation.name})..."
+        )
+        report = run(plan)
+
+        self.stdout.write('')
+        for name, row in report['endpoints'].items():
+            latency = (
+                f"p50 {row['p50_ms']:>8.1f}  p95 {row['p95_ms']:>8.1f}  p99 {row['p99_ms']:>8.1f} ms"
+                if row['requests'] else ''
+            )
+            line = (
+                f"  {name:<26} {row['requests']:>7} req  {row['rps']:>8.2f}/s  "
+                f"{row['error_rate']:>6.1%} errors  {latency}"
+            )
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+            if row['error_kinds']:
+                kinds = ', '.join(f'{kind} x{count}' for kind, count in row['error_kinds'].items())
+                self.stdout.write(f'  {"":<26} {kinds}')
+
+        report['numbering'] = self.check_numbering(report['created_record_ids'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"  ✓ Results written to {options['output']}"))
+
+        numbering = report['numbering']
+        if numbering['duplicates'] or numbering['missing']:
+            raise CommandError(
+                f"Record numbering broke under load: {numbering['duplicates']} duplicated number(s), "
+                f"{numbering['missing']} created record(s) missing"
+            )
+
+    def setup(self, agents, admins, password):
+        """Create or reset the load test users; activate an operation if none is"""
+        hashed = make_password(password)
+        usernames = agents + admins
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        User.objects.bulk_create(
+            User(username=username, first_name='Load', last_name='Test', password=hashed)
+            for username in usernames if username not in existing
+        )
+        User.objects.filter(username__in=usernames).update(password=hashed, is_active=True)
+        # bulk_create skips the signal that creates profiles
+        ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        UserProfile.objects.bulk_create(
+            (UserProfile(user_id=user_id) for user_id in ids.values()),
+            ignore_conflicts=True,
+        )
+        UserProfile.objects.filter(user__username__in=agents).update(role='staff')
+        UserProfile.objects.filter(user__username__in=admins).update(role='admin')
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {len(agents)} agents and {len(admins)} admins ready'))
+
+        if not Operation.objects.filter(is_active=True, is_deleted=False).exists():
+            creator = ids.get(admins[0] if admins else agents[0])
+            operation = Operation.objects.create(
+                name=f'Load test {timezone.localtime():%Y-%m-%d %H:%M:%S}',
+                description='Created by the loadtest command',
+                created_by_id=creator,
+                is_active=True,
+            )
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Activated operation "{operation.name}"'))
+
+    def target_operation(self, pk):
+        if pk is not None:
+            operation = Operation.objects.filter(pk=pk, is_deleted=False).first()
+            if operation is None:
+                raise CommandError(f'Operation {pk} not found.')
+            return operation
+        operation = Operation.objects.filter(is_active=True, is_deleted=False).first()
+        if operation is None:
+            raise CommandError('No active operation: agents cannot create records. Use --setup or activate one.')
+        return operation
+
+    def paths(self, operation):
+        paths = {
+            name: reverse(name)
+            for name in ('login', 'record_create', 'record_list', 'dashboard', 'system_search')
+        }
+        for name in ('operation_detail', 'operation_search'):
+            paths[name] = reverse(name, args=[operation.pk])
+        paths['export_pdf'] = reverse('operation_export_pdf', args=[operation.pk])
+        paths['export_xlsx'] = reverse('operation_export_xlsx', args=[operation.pk])
+        return paths
+
+    def photo(self, number):
+        """Noisy 800x600 JPEG, about the size of a compressed phone photo"""
+        rng = np.random.default_rng(number)
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (600, 800, 3), dtype=np.uint8)).save(buffer, 'JPEG', quality=70)
+        return buffer.getvalue()
+
+    def check_numbering(self, record_ids):
+        """
+        Compare the records the agents created with this database.
+
+        Returns:
+            dict: created, found, missing and duplicates (numbers shared by
+            more than one record of the same operation)
+        """
+        records = Record.objects.filter(pk__in=record_ids)
+        found = records.count()
+        result = {'created': len(record_ids), 'found': found, 'missing': 0, 'duplicates': 0}
+        if record_ids and not found:
+            self.stdout.write(self.style.WARNING(
+                '  Numbering not checked: the server uses a different database.'
+            ))
+            return result
+
+        operations = records.values_list('operation_id', flat=True).distinct()
+        result['missing'] = len(set(record_ids)) - found
+        result['duplicates'] = (
+            Record.objects.filter(operation_id__in=operations)
+            .values('operation_id', 'record_number')
+            .annotate(records=Count('id'))
+            .filter(records__gt=1)
+            .count()
+        )
+        if record_ids and not result['missing'] and not result['duplicates']:
+            self.stdout.write(self.style.SUCCESS(f'  ✓ {found} records created, all numbers unique'))
+        return result
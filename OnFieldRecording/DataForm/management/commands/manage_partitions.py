@@ -0,0 +1,72 @@
+"""
+Management command to maintain the monthly AuditLog partitions (PostgreSQL).
+
+Usage:
+    python manage.py manage_partitions
+    python manage.py manage_partitions --months-ahead 6
+    python manage.py manage_partitions --drop-older-than 24
+    python manage.py manage_partitions --convert
+
+Run daily from cron so next months' partitions always exist before the
+first row for them arrives. --drop-older-than removes whole months of
+audit history by dropping their partitions.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from DataForm import partitioning
+from DataForm.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = 'Create future AuditLog partitions and drop expired ones (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=None,
+            help='Months of partitions to keep created ahead (default: AUDITLOG_PARTITION_MONTHS_AHEAD)',
+        )
+        parser.add_argument(
+            '--drop-older-than',
+            type=int,
+            metavar='MONTHS',
+            help='Drop partitions that ended more than MONTHS months ago',
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the existing AuditLog table to a partitioned table first',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING('Partitioning is only available on PostgreSQL.'))
+            return
+
+        table = AuditLog._meta.db_table
+
+        if options['convert']:
+            with connection.schema_editor() as schema_editor:
+                if partitioning.convert_to_partitioned(schema_editor, AuditLog, options['months_ahead']):
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ Converted {table} to monthly partitions'))
+
+        if not partitioning.is_partitioned(connection, table):
+            raise CommandError(f'{table} is not partitioned. Run with --convert first.')
+
+        created = partitioning.ensure_future_partitions(connection, table, options['months_ahead'])
+        for name in created:
+            self.stdout.write(f'  Created {name}')
+
+        if options['drop_older_than'] is not None:
+            cutoff = partitioning.add_months(
+                partitioning.month_start(timezone.now()), -options['drop_older_than']
+            )
+            for name in partitioning.drop_partitions_before(connection, table, cutoff):
+                self.stdout.write(f'  Dropped {name}')
+
+        partitions = partitioning.list_partitions(connection, table)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ {table} has {len(partitions)} partitions'))
@@ -0,0 +1,21 @@
+"""
+Management command to rebuild the latest reading of every meter.
+
+Usage:
+    python manage.py rebuild_latest_readings
+
+The index is kept current on record save; run this after loading records
+that bypassed the ORM or to repair it.
+"""
+
+from django.core.management.base import BaseCommand
+
+from DataForm.readings import rebuild_latest_readings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-meter latest reading index from the live records'
+
+    def handle(self, *args, **options):
+        meters = rebuild_latest_readings()
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Indexed the latest reading of {meters} meters'))
@@ -0,0 +1,88 @@
+"""
+Management command to pre-render record density tiles for operations.
+
+Usage:
+    python manage.py render_density_tiles
+    python manage.py render_density_tiles --operation 3 --zooms 6-12 --workers 4
+    python manage.py render_density_tiles --full
+
+Only tiles containing records created or updated since the previous run
+are re-rendered, unless --full is given.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DataForm.models import Operation
+from DataForm.tiles import DEFAULT_ZOOM_LEVELS, render_operation_tiles
+
+
+def parse_zoom_levels(value):
+    """Parse '4-14' or '4,6,8' into a sorted list of zoom levels"""
+    levels = set()
+    for part in value.split(','):
+        if '-' in part:
+            start, end = part.split('-', 1)
+            levels.update(range(int(start), int(end) + 1))
+        else:
+            levels.add(int(part))
+    return sorted(levels)
+
+
+class Command(BaseCommand):
+    help = 'Pre-render density heatmap tiles for operations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operation',
+            type=int,
+            action='append',
+            help='Operation ID to render (repeatable). Defaults to all operations.',
+        )
+        parser.add_argument(
+            '--zooms',
+            default=f'{DEFAULT_ZOOM_LEVELS[0]}-{DEFAULT_ZOOM_LEVELS[-1]}',
+            help='Zoom levels, e.g. "4-14" or "6,8,10"',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of worker processes (default: CPU count)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['png', 'grid', 'both'],
+            default='both',
+            help='Store PNG heatmaps, raw count grids, or both',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-render all tiles instead of only changed ones',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            zoom_levels = parse_zoom_levels(options['zooms'])
+        except ValueError:
+            raise CommandError(f"Invalid --zooms value: {options['zooms']}")
+
+        formats = ('png', 'grid') if options['format'] == 'both' else (options['format'],)
+
+        operations = Operation.objects.filter(is_deleted=False)
+        if options['operation']:
+            operations = operations.filter(pk__in=options['operation'])
+
+        for operation in operations.order_by('pk'):
+            summary = render_operation_tiles(
+                operation,
+                zoom_levels=zoom_levels,
+                workers=options['workers'],
+                full=options['full'],
+                formats=formats,
+            )
+            mode = 'full' if summary['full'] else 'incremental'
+            self.stdout.write(self.style.SUCCESS(
+                f"  ✓ {operation.name}: {summary['rendered']} tiles rendered, "
+                f"{summary['removed']} removed ({mode})"
+            ))
@@ -0,0 +1,118 @@
+"""
+Management command to stress-test record numbering under concurrent writers.
+
+Usage:
+    python manage.py stress_record_numbering
+    python manage.py stress_record_numbering --agents 20 --records 50 --keep
+
+Simulates field agents creating records at the same time, half through
+generate_record_number() (the record_create view path) and half through
+Record.save() auto-numbering, each in its own scratch operation. Fails if
+any record is lost, any number is duplicated, or a "database is locked"
+error escapes the retries. Meant for SQLite deployments; run it against a
+copy of the database.
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from DataForm.models import Operation, Record
+from DataForm.utils import generate_record_number
+
+
+class Command(BaseCommand):
+    help = 'Create records from concurrent threads and check numbering integrity'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--agents',
+            type=int,
+            default=20,
+            help='Number of concurrent writer threads',
+        )
+        parser.add_argument(
+            '--records',
+            type=int,
+            default=25,
+            help='Records created per agent',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the scratch operations and records',
+        )
+
+    def handle(self, *args, **options):
+        agents, per_agent = options['agents'], options['records']
+        vendor = connections['default'].vendor
+        if vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(f'Running against {vendor}, not SQLite.'))
+
+        user, _ = User.objects.get_or_create(username='stress_agent')
+        stamp = int(time.time())
+        # Inactive so the stress run never displaces the live operation
+        view_op = Operation.objects.create(name=f'Stress {stamp} (view)', created_by=user, is_active=False)
+        model_op = Operation.objects.create(name=f'Stress {stamp} (model)', created_by=user, is_active=False)
+
+        errors = []
+        barrier = threading.Barrier(agents)
+
+        def agent(index):
+            operation = view_op if index % 2 == 0 else model_op
+            try:
+                barrier.wait()
+                for i in range(per_agent):
+                    record = Record(
+                        operation=operation,
+                        customer_name=f'Stress Agent {index}',
+                        customer_contact='+1234567890',
+                        account_number=f'ACC{index:03d}{i:04d}',
+                        meter_number=f'MTR{index:03d}{i:04d}',
+                        todays_balance=Decimal('0.00'),
+                        meter_reading=Decimal('0.00'),
+                        type_of_anomaly='none',
+                        created_by=user,
+                    )
+                    if operation is view_op:
+                        record.record_number = generate_record_number(operation)
+                    record.save()
+            except DatabaseError as e:
+                errors.append(f'agent {index}: {e}')
+            finally:
+                connections.close_all()
+
+        self.stdout.write(f'Starting {agents} agents x {per_agent} records...')
+        started = time.monotonic()
+        threads = [threading.Thread(target=agent, args=(index,)) for index in range(agents)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        numbers = list(
+            Record.objects.filter(operation__in=[view_op, model_op]).values_list('record_number', flat=True)
+        )
+        expected = agents * per_agent
+        duplicates = len(numbers) - len(set(numbers))
+
+        self.stdout.write(f'  Records created: {len(numbers)}/{expected} in {elapsed:.2f}s '
+                          f'({len(numbers) / elapsed:.0f} records/s)')
+        self.stdout.write(f'  Duplicate numbers: {duplicates}')
+        self.stdout.write(f'  Errors: {len(errors)}')
+        for error in errors[:10]:
+            self.stdout.write(f'    {error}')
+
+        if not options['keep']:
+            for operation in (view_op, model_op):
+                Record.objects.filter(operation=operation).delete()
+                operation.delete()
+
+        if errors or duplicates or len(numbers) != expected:
+            raise CommandError('Record numbering stress test failed')
+        self.stdout.write(self.style.SUCCESS('  ✓ Record numbering held up under concurrent writers'))
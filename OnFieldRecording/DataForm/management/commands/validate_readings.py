@@ -0,0 +1,42 @@
+"""
+Management command to queue suspicious meter readings of an operation.
+
+Usage:
+    python manage.py validate_readings --operation 4
+    python manage.py validate_readings --operation 4 --z-threshold 5
+
+Each reading is compared with the previous visit of the same meter.
+Negative consumption and consumption spikes are queued as anomaly
+suggestions for review in the admin.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DataForm.models import Operation
+from DataForm.readings import SPIKE_Z_THRESHOLD, queue_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Flag negative consumption and consumption spikes of an operation for review'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operation',
+            type=int,
+            required=True,
+            help='Operation ID',
+        )
+        parser.add_argument(
+            '--z-threshold',
+            type=float,
+            default=SPIKE_Z_THRESHOLD,
+            help='Modified z-score above which a consumption rate is a spike',
+        )
+
+    def handle(self, *args, **options):
+        operation = Operation.objects.filter(pk=options['operation'], is_deleted=False).first()
+        if operation is None:
+            raise CommandError(f"Operation {options['operation']} not found.")
+
+        queued = queue_suggestions(operation, z_threshold=options['z_threshold'])
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Queued {queued} anomaly suggestions for {operation.name}'))
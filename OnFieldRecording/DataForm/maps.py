@@ -0,0 +1,314 @@
+"""
+Map data services for DataForm app
+Web-mercator tile math and server-side grid clustering of record locations
+"""
+
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Record
+from .utils import bump_cache_version, cache_version
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+MIN_ZOOM = 0
+MAX_ZOOM = 18
+
+# From this zoom level on, individual records are returned instead of clusters
+CLUSTER_MAX_ZOOM = 16
+
+# Each tile is split into GRID_SIZE x GRID_SIZE clustering cells (32px on a 256px tile)
+GRID_SIZE = 8
+
+# Upper bounds that keep a single response small enough for the browser
+MAX_TILES_PER_REQUEST = 64
+MAX_FEATURES = 5000
+
+# 1 hour; tiles are also invalidated on record writes. Only used with
+# MAP_CLUSTER_CACHE, which needs a cache shared by all workers
+CLUSTER_CACHE_TIMEOUT = 60 * 60
+
+# Web-mercator cannot represent the poles
+MAX_LATITUDE = 85.05112878
+
+
+# =============================================
+# TILE MATH
+# =============================================
+
+def lonlat_to_tile(lon, lat, zoom):
+    """
+    Convert a coordinate to fractional web-mercator tile coordinates.
+
+    Args:
+        lon, lat: Coordinate in decimal degrees
+        zoom: Zoom level
+
+    Returns:
+        tuple: (x, y) as floats; the integer part is the tile index
+    """
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, float(lat)))
+    n = 2 ** zoom
+    x = (float(lon) + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    # Clamp so that lon=180 / lat=-85 still fall inside the last tile
+    return min(max(x, 0.0), n - 1e-9), min(max(y, 0.0), n - 1e-9)
+
+
+def tile_bounds(zoom, x, y):
+    """
+    Get the geographic bounds of a tile.
+
+    Returns:
+        tuple: (west, south, east, north) in decimal degrees
+    """
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, south, east, north
+
+
+def tiles_for_bbox(bbox, zoom):
+    """
+    List the tiles covering a bounding box at a zoom level.
+
+    Args:
+        bbox: (west, south, east, north) in decimal degrees
+        zoom: Zoom level
+
+    Returns:
+        list: [(x, y), ...] tile indexes
+    """
+    west, south, east, north = bbox
+    x_min, y_min = lonlat_to_tile(west, north, zoom)
+    x_max, y_max = lonlat_to_tile(east, south, zoom)
+    return [
+        (x, y)
+        for x in range(int(x_min), int(x_max) + 1)
+        for y in range(int(y_min), int(y_max) + 1)
+    ]
+
+
+def parse_bbox(value):
+    """
+    Parse a 'west,south,east,north' query parameter.
+
+    Raises:
+        ValueError: If the bbox is malformed or out of range
+    """
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("bbox must have four comma-separated values")
+    west, south, east, north = parts
+    if not (-180 <= west < east <= 180 and -90 <= south < north <= 90):
+        raise ValueError("bbox is out of range or inverted")
+    return west, south, east, north
+
+
+# =============================================
+# CLUSTER CACHE
+# =============================================
+
+def _generation_key(operation_id, zoom, x, y):
+    return f"map:gen:{operation_id or 'all'}:{zoom}:{x}:{y}"
+
+
+def _clusters_key(operation_id, zoom, x, y, generation, status, anomaly):
+    return f"map:tile:{operation_id or 'all'}:{zoom}:{x}:{y}:{generation}:{status or '-'}:{anomaly or '-'}"
+
+
+def invalidate_record_tiles(operation_id, lat, lon):
+    """
+    Invalidate the cached clusters of every tile containing a location.
+
+    Only one tile per zoom level is affected, both in the operation's
+    own cache and in the cross-operation ('all') cache. Filtered variants
+    (status/anomaly) share the tile generation and are dropped as well.
+    """
+    if lat is None or lon is None or not settings.MAP_CLUSTER_CACHE:
+        return
+
+    for zoom in range(MIN_ZOOM, CLUSTER_MAX_ZOOM):
+        fx, fy = lonlat_to_tile(lon, lat, zoom)
+        x, y = int(fx), int(fy)
+        bump_cache_version(_generation_key(operation_id, zoom, x, y))
+        bump_cache_version(_generation_key(None, zoom, x, y))
+
+
+def invalidate_locations(operation_id, locations):
+    """invalidate_record_tiles() for many (lat, lon) pairs, bumping each tile once"""
+    if not settings.MAP_CLUSTER_CACHE:
+        return
+
+    tiles = set()
+    for lat, lon in locations:
+        if lat is None or lon is None:
+            continue
+        for zoom in range(MIN_ZOOM, CLUSTER_MAX_ZOOM):
+            fx, fy = lonlat_to_tile(lon, lat, zoom)
+            tiles.add((zoom, int(fx), int(fy)))
+
+    for zoom, x, y in tiles:
+        bump_cache_version(_generation_key(operation_id, zoom, x, y))
+        bump_cache_version(_generation_key(None, zoom, x, y))
+
+
+# =============================================
+# CLUSTERING
+# =============================================
+
+def _records_in_bounds(bounds, operation_id=None, status=None, anomaly=None):
+    """Queryset of located, non-deleted records inside (west, south, east, north)"""
+    west, south, east, north = bounds
+    records = Record.objects.filter(
+        is_deleted=False,
+        gps_latitude__gte=south,
+        gps_latitude__lte=north,
+        gps_longitude__gte=west,
+        gps_longitude__lte=east,
+    )
+    if operation_id:
+        records = records.filter(operation_id=operation_id)
+    if status:
+        records = records.filter(status=status)
+    if anomaly:
+        records = records.filter(type_of_anomaly=anomaly)
+    return records
+
+
+def compute_tile_clusters(zoom, x, y, operation_id=None, status=None, anomaly=None):
+    """
+    Grid-cluster the records of one tile.
+
+    Returns:
+        list: [[lon, lat, count, record_id], ...] where lon/lat is the
+        centroid of the cell and record_id is only set for single records
+    """
+    cells = defaultdict(lambda: [0.0, 0.0, 0, None])
+    rows = _records_in_bounds(
+        tile_bounds(zoom, x, y), operation_id, status, anomaly
+    ).order_by().values_list('id', 'gps_latitude', 'gps_longitude')
+
+    for record_id, lat, lon in rows.iterator(chunk_size=5000):
+        fx, fy = lonlat_to_tile(lon, lat, zoom)
+        # Points on the shared edge of two tiles belong to the lower one
+        if int(fx) != x or int(fy) != y:
+            continue
+        cell = cells[(int((fx - x) * GRID_SIZE), int((fy - y) * GRID_SIZE))]
+        cell[0] += float(lon)
+        cell[1] += float(lat)
+        cell[2] += 1
+        cell[3] = record_id
+
+    clusters = []
+    for sum_lon, sum_lat, count, record_id in cells.values():
+        clusters.append([
+            round(sum_lon / count, 6),
+            round(sum_lat / count, 6),
+            count,
+            record_id if count == 1 else None,
+        ])
+    return clusters
+
+
+def get_tile_clusters(zoom, x, y, operation_id=None, status=None, anomaly=None):
+    """
+    Cached version of compute_tile_clusters().
+
+    Without MAP_CLUSTER_CACHE every call computes: with a per-process cache
+    the invalidations would not reach the other workers.
+    """
+    if not settings.MAP_CLUSTER_CACHE:
+        return compute_tile_clusters(zoom, x, y, operation_id, status, anomaly)
+
+    generation = cache_version(_generation_key(operation_id, zoom, x, y))
+    key = _clusters_key(operation_id, zoom, x, y, generation, status, anomaly)
+    clusters = cache.get(key)
+    if clusters is None:
+        clusters = compute_tile_clusters(zoom, x, y, operation_id, status, anomaly)
+        cache.set(key, clusters, CLUSTER_CACHE_TIMEOUT)
+    return clusters
+
+
+def get_map_features(bbox, zoom, operation_id=None, status=None, anomaly=None):
+    """
+    Get map features (clusters or single records) for a viewport.
+
+    Args:
+        bbox: (west, south, east, north)
+        zoom: Map zoom level
+        operation_id, status, anomaly: Optional filters
+
+    Returns:
+        tuple: (features, truncated) where features is a list of
+        [lon, lat, count, record_id] and truncated is True when
+        MAX_FEATURES was reached
+
+    Raises:
+        ValueError: If the viewport covers too many tiles
+    """
+    zoom = max(MIN_ZOOM, min(MAX_ZOOM, int(zoom)))
+
+    if zoom >= CLUSTER_MAX_ZOOM:
+        rows = _records_in_bounds(bbox, operation_id, status, anomaly).order_by().values_list(
+            'id', 'gps_latitude', 'gps_longitude'
+        )[:MAX_FEATURES + 1]
+        features = [
+            [round(float(lon), 6), round(float(lat), 6), 1, record_id]
+            for record_id, lat, lon in rows
+        ]
+    else:
+        tiles = tiles_for_bbox(bbox, zoom)
+        if len(tiles) > MAX_TILES_PER_REQUEST:
+            raise ValueError("Viewport too large for this zoom level")
+
+        features = []
+        west, south, east, north = bbox
+        for x, y in tiles:
+            for feature in get_tile_clusters(zoom, x, y, operation_id, status, anomaly):
+                if west <= feature[0] <= east and south <= feature[1] <= north:
+                    features.append(feature)
+
+    truncated = len(features) > MAX_FEATURES
+    return features[:MAX_FEATURES], truncated
+
+
+# =============================================
+# SERIALIZATION
+# =============================================
+
+def features_to_geojson(features):
+    """Convert [lon, lat, count, record_id] rows to a GeoJSON FeatureCollection"""
+    collection = []
+    for lon, lat, count, record_id in features:
+        if record_id is not None:
+            properties = {'id': record_id}
+        else:
+            properties = {'count': count}
+        collection.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+            'properties': properties,
+        })
+    return {'type': 'FeatureCollection', 'features': collection}
+
+
+def features_to_packed(features):
+    """
+    Convert features to a flat array: [lon, lat, count, id, lon, lat, ...]
+
+    Clusters use id 0, which is never a valid primary key.
+    """
+    packed = []
+    for lon, lat, count, record_id in features:
+        packed.extend((lon, lat, count, record_id or 0))
+    return {'stride': 4, 'fields': ['lon', 'lat', 'count', 'id'], 'data': packed}
@@ -0,0 +1,344 @@
+"""
+Request instrumentation for DataForm app
+Per-view query count, DB time, template render time, latency and response
+size, aggregated into in-memory histograms (see RequestMetricsMiddleware)
+and logged with over-budget warnings. The same measurements, plus storage,
+export, audit log and queue metrics, are exported to Prometheus at /metrics.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory before
+the workers start: each worker then writes its counters to memory-mapped
+files there and /metrics adds up all workers (see gunicorn.conf.py).
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+
+import prometheus_client as prometheus
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+from prometheus_client import CONTENT_TYPE_LATEST, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+# Histogram bucket upper bounds per metric; the last bucket is unbounded
+BUCKETS = {
+    'queries': (1, 2, 5, 10, 20, 50, 100, 200, 500),
+    'db_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'template_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'latency_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+    'size_bytes': (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000),
+}
+
+DEFAULT_BUDGET = {'queries': 30, 'latency_ms': 1000}
+
+
+# =============================================
+# REQUEST SAMPLES
+# =============================================
+
+@dataclass
+class RequestSample:
+    """Measurements of one request"""
+
+    view: str = ''
+    queries: int = 0
+    db_ms: float = 0.0
+    template_ms: float = 0.0
+    latency_ms: float = 0.0
+    size_bytes: int = 0
+
+
+_current = ContextVar('request_sample', default=None)
+
+
+def start_sample():
+    """Begin measuring the current request (returns the token for finish_sample())"""
+    return _current.set(RequestSample())
+
+
+def finish_sample(token):
+    """Stop measuring and return the sample"""
+    sample = _current.get()
+    _current.reset(token)
+    return sample
+
+
+def query_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper() hook counting queries and DB time"""
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db_ms += (time.perf_counter() - started) * 1000
+
+
+class _TimedTemplate:
+    """Template wrapper adding its render time to the current sample"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        sample = _current.get()
+        if sample is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            sample.template_ms += (time.perf_counter() - started) * 1000
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend timing top-level renders.
+
+    Included and extended templates render inside the top-level one, so
+    each request's render time is counted once.
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+# =============================================
+# PROMETHEUS METRICS
+# =============================================
+
+def _seconds(bounds_ms):
+    return [bound / 1000 for bound in bounds_ms]
+
+
+REQUEST_LATENCY = prometheus.Histogram(
+    'onfield_request_latency_seconds', 'Request latency by view',
+    ['view'], buckets=_seconds(BUCKETS['latency_ms']),
+)
+REQUEST_QUERIES = prometheus.Histogram(
+    'onfield_request_queries', 'Database queries per request by view',
+    ['view'], buckets=BUCKETS['queries'],
+)
+REQUEST_DB_TIME = prometheus.Histogram(
+    'onfield_request_db_seconds', 'Database time per request by view',
+    ['view'], buckets=_seconds(BUCKETS['db_ms']),
+)
+STORAGE_LATENCY = prometheus.Histogram(
+    'onfield_storage_seconds', 'Supabase storage call latency',
+    ['operation'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+STORAGE_ERRORS = prometheus.Counter(
+    'onfield_storage_errors', 'Failed Supabase storage calls', ['operation'],
+)
+EXPORT_DURATION = prometheus.Histogram(
+    'onfield_export_seconds', 'Report export duration',
+    ['format'], buckets=(0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+EXPORT_SIZE = prometheus.Histogram(
+    'onfield_export_bytes', 'Report export size',
+    ['format'], buckets=(10_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000),
+)
+AUDIT_WRITES = prometheus.Counter(
+    'onfield_audit_log_writes', 'Audit log entries written', ['action'],
+)
+
+
+@contextmanager
+def storage_call(operation):
+    """Time a storage call; an exception escaping the block counts as an error"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STORAGE_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        STORAGE_LATENCY.labels(operation).observe(time.perf_counter() - started)
+
+
+def observe_export(export_format):
+    """View decorator recording the duration and size of successful exports"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            started = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                EXPORT_DURATION.labels(export_format).observe(time.perf_counter() - started)
+                EXPORT_SIZE.labels(export_format).observe(len(response.content))
+            return response
+        return wrapper
+    return decorator
+
+
+class QueueDepthCollector:
+    """Work waiting for background jobs and reviewers, counted at scrape time"""
+
+    def collect(self):
+        from .models import AnomalySuggestion, OperationArchive, RecordMedia
+
+        queues = {
+            'media_processing': RecordMedia.objects.filter(is_processed=False),
+            'anomaly_review': AnomalySuggestion.objects.filter(status='pending'),
+            'archive_purge': OperationArchive.objects.filter(purged_at__isnull=True),
+        }
+        family = GaugeMetricFamily('onfield_queue_depth', 'Items waiting in background work queues', labels=['queue'])
+        for name, queryset in queues.items():
+            family.add_metric([name], queryset.count())
+        yield family
+
+
+# Queue depths come from the database, so every worker reports the same
+# values; they are collected once per scrape outside the per-process files
+_queue_registry = prometheus.CollectorRegistry(auto_describe=False)
+_queue_registry.register(QueueDepthCollector())
+
+
+def exposition():
+    """Metrics of all workers in the text exposition format"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus.REGISTRY
+    return prometheus.generate_latest(registry) + prometheus.generate_latest(_queue_registry)
+
+
+# =============================================
+# HISTOGRAMS
+# =============================================
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative counts are derived on read)"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf for the last bucket)"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+_lock = threading.Lock()
+_histograms = defaultdict(lambda: {name: Histogram(bounds) for name, bounds in BUCKETS.items()})
+_last_flush = time.monotonic()
+_listeners = []
+
+
+def budget_for(view):
+    """Query and latency budget of a view (VIEW_BUDGETS entry over the defaults)"""
+    budgets = getattr(settings, 'VIEW_BUDGETS', {})
+    return {**DEFAULT_BUDGET, **budgets.get('default', {}), **budgets.get(view, {})}
+
+
+def over_budget(sample):
+    """Names of the budgets the sample exceeds"""
+    budget = budget_for(sample.view)
+    return [name for name in ('queries', 'latency_ms') if getattr(sample, name) > budget[name]]
+
+
+def record(sample):
+    """Add a finished sample to its view's histograms and warn when over budget"""
+    with _lock:
+        histograms = _histograms[sample.view]
+        for name in BUCKETS:
+            histograms[name].observe(getattr(sample, name))
+    REQUEST_LATENCY.labels(sample.view).observe(sample.latency_ms / 1000)
+    REQUEST_QUERIES.labels(sample.view).observe(sample.queries)
+    REQUEST_DB_TIME.labels(sample.view).observe(sample.db_ms / 1000)
+    for listener in list(_listeners):
+        listener.append(sample)
+
+    exceeded = over_budget(sample)
+    if exceeded:
+        budget = budget_for(sample.view)
+        logger.warning(
+            f"View {sample.view} over budget ({', '.join(exceeded)}): "
+            f"{sample.queries} queries (budget {budget['queries']}), "
+            f"{sample.latency_ms:.0f} ms (budget {budget['latency_ms']})"
+        )
+
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS:
+        flush()
+
+
+def snapshot():
+    """Copy of the current histograms as {view: {metric: Histogram}}"""
+    with _lock:
+        copies = {}
+        for view, histograms in _histograms.items():
+            copies[view] = {}
+            for name, histogram in histograms.items():
+                copy = Histogram(histogram.bounds)
+                copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+                copies[view][name] = copy
+        return copies
+
+
+def flush():
+    """Log one summary line per view and start a new interval"""
+    global _last_flush
+    with _lock:
+        histograms = dict(_histograms)
+        _histograms.clear()
+        _last_flush = time.monotonic()
+
+    for view, metrics in sorted(histograms.items()):
+        latency, queries = metrics['latency_ms'], metrics['queries']
+        logger.info(
+            f"{view}: {latency.count} requests, "
+            f"latency p50<={latency.quantile(0.5)} p95<={latency.quantile(0.95)} ms, "
+            f"queries avg {queries.sum / queries.count:.1f} p95<={queries.quantile(0.95)}, "
+            f"db {metrics['db_ms'].sum / latency.count:.1f} ms avg, "
+            f"template {metrics['template_ms'].sum / latency.count:.1f} ms avg, "
+            f"size {metrics['size_bytes'].sum / latency.count:.0f} B avg"
+        )
+
+
+@contextmanager
+def capture():
+    """Collect the samples recorded inside the block (for tests)"""
+    samples = []
+    _listeners.append(samples)
+    try:
+        yield samples
+    finally:
+        _listeners.remove(samples)
@@ -0,0 +1,214 @@
+"""
+Custom middleware for DataForm app
+All of it runs natively under both WSGI and ASGI, so async views are not
+pushed back into a worker thread by a sync-only middleware.
+"""
+
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that is both sync and async capable.
+
+    Subclasses implement handle() for WSGI and __acall__() for ASGI; Django
+    picks the mode from the handler below them.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware that passes other requests straight through under ASGI.
+
+    WhiteNoise is sync-only; in its place every ASGI request would hold a
+    worker thread for its whole lifetime. Static files are still served by
+    WhiteNoise, in a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class SlidingSessionMiddleware(HybridMiddleware):
+    """
+    Sliding session expiry without a session write on every request.
+
+    Replaces SESSION_SAVE_EVERY_REQUEST: the session is only marked as
+    modified (and therefore saved, with a fresh expiry and cookie) once
+    less than SESSION_REFRESH_THRESHOLD seconds of its lifetime remain.
+    Must come after SessionMiddleware.
+    """
+
+    REFRESH_KEY = '_session_refreshed_at'
+
+    def handle(self, request):
+        session = getattr(request, 'session', None)
+
+        if session is not None and session.session_key:
+            refreshed_at = session.get(self.REFRESH_KEY)
+
+            # Loading clears the key when the cookie points to an expired session
+            if session.session_key:
+                now = int(time.time())
+                remaining = session.get_expiry_age() - (now - (refreshed_at or 0))
+                if remaining < settings.SESSION_REFRESH_THRESHOLD:
+                    session[self.REFRESH_KEY] = now
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        session = getattr(request, 'session', None)
+
+        if session is not None and session.session_key:
+            refreshed_at = await session.aget(self.REFRESH_KEY)
+
+            if session.session_key:
+                now = int(time.time())
+                remaining = await session.aget_expiry_age() - (now - (refreshed_at or 0))
+                if remaining < settings.SESSION_REFRESH_THRESHOLD:
+                    await session.aset(self.REFRESH_KEY, now)
+
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """
+    Per-view query count, DB time, template time, latency and response size.
+
+    Queries are counted with connection.execute_wrapper(), so it works with
+    DEBUG off. Samples are labelled with the URL name and aggregated in
+    DataForm.metrics; requests that resolve to no named URL are skipped.
+    Place it near the top so the session and auth queries are included.
+    """
+
+    def handle(self, request):
+        token = metrics.start_sample()
+        started = time.perf_counter()
+        try:
+            with self.counting_queries():
+                response = self.get_response(request)
+        finally:
+            sample = metrics.finish_sample(token)
+        self.record(request, response, sample, started)
+        return response
+
+    async def __acall__(self, request):
+        token = metrics.start_sample()
+        started = time.perf_counter()
+        try:
+            # Connections are shared with the threads the async ORM and
+            # sync_to_async() run queries in, so those are counted too
+            with self.counting_queries():
+                response = await self.get_response(request)
+        finally:
+            sample = metrics.finish_sample(token)
+        self.record(request, response, sample, started)
+        return response
+
+    @staticmethod
+    def counting_queries():
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.query_wrapper))
+        return stack
+
+    @staticmethod
+    def record(request, response, sample, started):
+        sample.latency_ms = (time.perf_counter() - started) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.view_name:
+            sample.view = match.view_name
+            if not response.streaming:
+                sample.size_bytes = len(response.content)
+            metrics.record(sample)
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """
+    Profile requests carrying a signed admin profiling token.
+
+    The token (?_profile= or X-Profile-Token, issued from the Profile Runs
+    admin) must belong to the requesting admin; each admin may profile
+    PROFILING_RATE_LIMIT requests per hour. Profiled responses carry the
+    X-Profile-Run header with the id of the stored ProfileRun. Must come
+    after AuthenticationMiddleware.
+    """
+
+    def handle(self, request):
+        if not self.allowed(request):
+            return self.get_response(request)
+
+        response, run = profiling.profile_request(request, self.get_response)
+        if run is not None:
+            response['X-Profile-Run'] = str(run.pk)
+        return response
+
+    async def __acall__(self, request):
+        if not profiling.requested_token(request) or not await sync_to_async(self.allowed)(request):
+            return await self.get_response(request)
+
+        response, run = await profiling.aprofile_request(request, self.get_response)
+        if run is not None:
+            response['X-Profile-Run'] = str(run.pk)
+        return response
+
+    def allowed(self, request):
+        token = profiling.requested_token(request)
+        if not token or not profiling.may_profile(request, token):
+            return False
+        if not profiling.within_rate_limit(request.user):
+            logger.warning(f"Profiling rate limit reached for {request.user}")
+            return False
+        return True
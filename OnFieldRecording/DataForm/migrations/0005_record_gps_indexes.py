@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0004_recordmedia_storage_url'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['gps_latitude', 'gps_longitude'], name='DataForm_re_gps_lat_796117_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['operation', 'gps_latitude', 'gps_longitude'], name='DataForm_re_operati_b28de8_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0005_record_gps_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TileRenderState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom_levels', models.JSONField(default=list, help_text='Zoom levels covered by the last render')),
+                ('rendered_at', models.DateTimeField(help_text='Records changed after this time are re-rendered')),
+                ('tile_count', models.IntegerField(default=0, help_text='Number of tiles written by the last render')),
+                ('operation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tile_render_state', to='DataForm.operation')),
+            ],
+            options={
+                'verbose_name': 'Tile Render State',
+                'verbose_name_plural': 'Tile Render States',
+            },
+        ),
+    ]
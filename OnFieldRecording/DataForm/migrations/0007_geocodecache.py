@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0006_tilerenderstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('longitude', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('address', models.TextField(blank=True, help_text='Normalized address (blank if no gazetteer match)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Geocode Cache Entry',
+                'verbose_name_plural': 'Geocode Cache',
+                'constraints': [models.UniqueConstraint(fields=('latitude', 'longitude'), name='unique_geocode_coordinates')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0007_geocodecache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='record',
+            name='DataForm_re_status_9ffb73_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='record',
+            name='DataForm_re_type_of_038b82_idx',
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='record_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['status', '-created_at'], name='record_live_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['type_of_anomaly', '-created_at'], name='record_live_anomaly_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_by', '-created_at'], name='record_live_creator_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['created_by', 'status'], name='record_live_creator_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['operation', '-created_at'], name='record_live_op_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['operation', 'status'], name='record_live_op_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['operation', 'type_of_anomaly'], name='record_live_op_anomaly_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['operation', 'record_number'], name='record_live_op_number_idx'),
+        ),
+    ]
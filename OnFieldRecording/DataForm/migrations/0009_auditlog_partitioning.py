@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def partition_auditlog(apps, schema_editor):
+    """Convert AuditLog to monthly partitions on PostgreSQL when enabled"""
+    from DataForm.partitioning import convert_to_partitioned
+
+    if getattr(settings, 'AUDITLOG_PARTITIONING', False):
+        convert_to_partitioned(schema_editor, apps.get_model('DataForm', 'AuditLog'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0008_record_live_partial_indexes'),
+    ]
+
+    operations = [
+        # A partitioned table works with the previous schema, so reversing is a no-op
+        migrations.RunPython(partition_auditlog, migrations.RunPython.noop),
+    ]
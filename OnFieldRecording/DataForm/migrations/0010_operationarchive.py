@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0009_auditlog_partitioning'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(help_text='Storage path prefix of the archive files', max_length=255)),
+                ('format', models.CharField(choices=[('parquet', 'Parquet'), ('jsonl.gz', 'Compressed JSON Lines')], max_length=20)),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('media_count', models.PositiveIntegerField(default=0)),
+                ('audit_count', models.PositiveIntegerField(default=0)),
+                ('checksums', models.JSONField(default=dict, help_text='SHA-256 of each archived table')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('purged_at', models.DateTimeField(blank=True, help_text='When the archived rows were removed from the live tables', null=True)),
+                ('archived_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('operation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='DataForm.operation')),
+            ],
+            options={
+                'verbose_name': 'Operation Archive',
+                'verbose_name_plural': 'Operation Archives',
+                'ordering': ['-archived_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0010_operationarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deletionlog',
+            index=models.Index(fields=['deleted_at', 'id'], name='deletion_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='record',
+            index=models.Index(fields=['updated_at', 'id'], name='record_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recordmedia',
+            index=models.Index(fields=['uploaded_at', 'id'], name='media_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0011_sync_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='record',
+            name='client_key',
+            field=models.CharField(blank=True, editable=False, help_text='Idempotency key sent by the capturing device (batch ingest)', max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='record',
+            constraint=models.UniqueConstraint(fields=('created_by', 'client_key'), name='record_client_key_uniq'),
+        ),
+    ]
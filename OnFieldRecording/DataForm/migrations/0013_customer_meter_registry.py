@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0012_record_client_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_number', models.CharField(max_length=100, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('contact', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Customer',
+                'verbose_name_plural': 'Customers',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Meter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meter_number', models.CharField(max_length=100, unique=True)),
+                ('address', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='meters', to='DataForm.customer')),
+            ],
+            options={
+                'verbose_name': 'Meter',
+                'verbose_name_plural': 'Meters',
+                'ordering': ['meter_number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='record',
+            name='meter',
+            field=models.ForeignKey(blank=True, help_text='Registry meter matching meter_number (linked on save)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='records', to='DataForm.meter'),
+        ),
+    ]
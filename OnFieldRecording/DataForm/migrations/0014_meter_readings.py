@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0013_customer_meter_registry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeterLatestReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('meter_number', models.CharField(help_text='Canonical meter number (registry_key)', max_length=100, unique=True)),
+                ('reading', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('read_at', models.DateTimeField(help_text='created_at of the record holding the reading')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('record', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='DataForm.record')),
+            ],
+            options={
+                'verbose_name': 'Meter Latest Reading',
+                'verbose_name_plural': 'Meter Latest Readings',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnomalySuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('negative_consumption', 'Reading lower than the previous visit'), ('consumption_spike', 'Implausible consumption')], max_length=30)),
+                ('suggested_type', models.CharField(choices=[('none', 'No Anomaly'), ('meter_damaged', 'Meter Damaged'), ('meter_missing', 'Meter Missing'), ('meter_tampered', 'Meter Tampered'), ('incorrect_reading', 'Incorrect Reading'), ('access_denied', 'Access Denied'), ('customer_relocated', 'Customer Relocated'), ('other', 'Other')], default='incorrect_reading', max_length=50)),
+                ('details', models.JSONField(blank=True, default=dict, help_text='Previous reading, consumption and score')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('dismissed', 'Dismissed')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly_suggestions', to='DataForm.record')),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Anomaly Suggestion',
+                'verbose_name_plural': 'Anomaly Suggestions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', '-created_at'], name='DataForm_an_status_b49870_idx')],
+                'constraints': [models.UniqueConstraint(fields=('record', 'reason'), name='anomaly_suggestion_uniq')],
+            },
+        ),
+    ]
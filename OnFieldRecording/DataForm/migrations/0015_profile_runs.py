@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0014_meter_readings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(blank=True, max_length=100)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('db_ms', models.FloatField(default=0)),
+                ('summary', models.TextField(help_text='Top functions by cumulative time')),
+                ('queries', models.JSONField(default=list, help_text='SQL, duration and stack origin of each query')),
+                ('stats', models.BinaryField(help_text='Raw cProfile stats (load with pstats or snakeviz)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Profile Run',
+                'verbose_name_plural': 'Profile Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0015_profile_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TileLocationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gps_latitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('gps_longitude', models.DecimalField(decimal_places=7, max_digits=10)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+                ('operation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='DataForm.operation')),
+            ],
+            options={
+                'verbose_name': 'Tile Location Change',
+                'verbose_name_plural': 'Tile Location Changes',
+                'indexes': [models.Index(fields=['operation', 'changed_at'], name='tile_change_op_idx')],
+            },
+        ),
+    ]
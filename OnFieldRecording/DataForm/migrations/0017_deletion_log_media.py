@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataForm', '0016_tile_location_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deletionlog',
+            name='item_type',
+            field=models.CharField(choices=[('operation', 'Operation'), ('record', 'Record'), ('media', 'Media')], max_length=20),
+        ),
+    ]
@@ -4,6 +4,9 @@ from django.core.validators import MinValueValidator, MaxValueValidator, RegexVa
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 import os
+import re
+
+from .db import retry_on_locked
 
 
 # =============================================
@@ -130,10 +133,67 @@ class Operation(models.Model):
         return 0
 
 
+# =============================================
+# CUSTOMER / METER REGISTRY
+# =============================================
+
+def registry_key(value):
+    """Canonical form of meter and account numbers (' mtr 001 ' → 'MTR001')"""
+    return re.sub(r'\s+', '', str(value or '')).upper()
+
+
+class Customer(models.Model):
+    """Registered customer, identified by account number"""
+    
+    account_number = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=200)
+    contact = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Customer'
+        verbose_name_plural = 'Customers'
+        ordering = ['name']
+    
+    def __str__(self):
+        return f"{self.account_number} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        self.account_number = registry_key(self.account_number)
+        super().save(*args, **kwargs)
+
+
+class Meter(models.Model):
+    """Registered meter and the customer it bills"""
+    
+    meter_number = models.CharField(max_length=100, unique=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='meters')
+    address = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Meter'
+        verbose_name_plural = 'Meters'
+        ordering = ['meter_number']
+    
+    def __str__(self):
+        return self.meter_number
+    
+    def save(self, *args, **kwargs):
+        self.meter_number = registry_key(self.meter_number)
+        super().save(*args, **kwargs)
+
+
 # =============================================
 # RECORD MODEL
 # =============================================
 
+# Condition of the partial indexes covering non-deleted records
+LIVE_RECORDS = models.Q(is_deleted=False)
+
+
 class Record(models.Model):
     """On-field data entry record"""
     
@@ -211,6 +271,21 @@ class Record(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
+    meter = models.ForeignKey(
+        Meter,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='records',
+        help_text="Registry meter matching meter_number (linked on save)"
+    )
+    client_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Idempotency key sent by the capturing device (batch ingest)"
+    )
     
     class Meta:
         verbose_name = 'Record'
@@ -221,8 +296,28 @@ class Record(models.Model):
             models.Index(fields=['record_number']),
             models.Index(fields=['account_number']),
             models.Index(fields=['meter_number']),
-            models.Index(fields=['status']),
-            models.Index(fields=['type_of_anomaly']),
+            # Map viewport (bbox) queries
+            models.Index(fields=['gps_latitude', 'gps_longitude']),
+            models.Index(fields=['operation', 'gps_latitude', 'gps_longitude']),
+            # Live records only (views always filter is_deleted=False).
+            # Composite keys hold every filtered/grouped column, so the
+            # per-status/anomaly counts are answered from the index alone.
+            # Check with: python manage.py explain_queries
+            models.Index(fields=['-created_at'], condition=LIVE_RECORDS, name='record_live_created_idx'),
+            models.Index(fields=['status', '-created_at'], condition=LIVE_RECORDS, name='record_live_status_idx'),
+            models.Index(fields=['type_of_anomaly', '-created_at'], condition=LIVE_RECORDS, name='record_live_anomaly_idx'),
+            models.Index(fields=['created_by', '-created_at'], condition=LIVE_RECORDS, name='record_live_creator_idx'),
+            models.Index(fields=['created_by', 'status'], condition=LIVE_RECORDS, name='record_live_creator_st_idx'),
+            models.Index(fields=['operation', '-created_at'], condition=LIVE_RECORDS, name='record_live_op_created_idx'),
+            models.Index(fields=['operation', 'status'], condition=LIVE_RECORDS, name='record_live_op_status_idx'),
+            models.Index(fields=['operation', 'type_of_anomaly'], condition=LIVE_RECORDS, name='record_live_op_anomaly_idx'),
+            models.Index(fields=['operation', 'record_number'], condition=LIVE_RECORDS, name='record_live_op_number_idx'),
+            # Delta sync keyset (deleted rows included: they become tombstones)
+            models.Index(fields=['updated_at', 'id'], name='record_sync_idx'),
+        ]
+        constraints = [
+            # Replayed batch submissions must not create duplicates
+            models.UniqueConstraint(fields=['created_by', 'client_key'], name='record_client_key_uniq'),
         ]
     
     def __str__(self):
@@ -247,9 +342,21 @@ class Record(models.Model):
     def save(self, *args, **kwargs):
         """Auto-generate record_number if not set"""
         if not self.record_number:
-            # Get the last record for this operation to determine next number
-            from django.db import transaction
-            
+            self._save_with_record_number(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+    
+    @retry_on_locked
+    def _save_with_record_number(self, *args, **kwargs):
+        """
+        Number and insert the record in one transaction.
+        
+        select_for_update() is a no-op on SQLite; there the transaction
+        itself (BEGIN IMMEDIATE) holds the write lock until the insert.
+        """
+        from django.db import transaction
+        
+        try:
             with transaction.atomic():
                 # Lock the operation to prevent race conditions
                 last_record = Record.objects.filter(
@@ -268,8 +375,11 @@ class Record(models.Model):
                 
                 # Generate record number: REC-OP{operation_id}-{number:04d}
                 self.record_number = f"REC-OP{self.operation.id}-{new_num:04d}"
-        
-        super().save(*args, **kwargs)
+                super().save(*args, **kwargs)
+        except Exception:
+            # Renumber on retry
+            self.record_number = ''
+            raise
     
     @property
     def has_gps(self):
@@ -312,6 +422,10 @@ class RecordMedia(models.Model):
         verbose_name = 'Record Media'
         verbose_name_plural = 'Record Media Files'
         ordering = ['-uploaded_at']
+        indexes = [
+            # Delta sync keyset
+            models.Index(fields=['uploaded_at', 'id'], name='media_sync_idx'),
+        ]
     
     def __str__(self):
         return f"Media for {self.record.record_number}"
@@ -337,6 +451,77 @@ class RecordMedia(models.Model):
                 raise ValidationError(f"Unsupported file extension. Allowed: {', '.join(valid_extensions)}")
 
 
+# =============================================
+# METER READING MODELS
+# =============================================
+
+class MeterLatestReading(models.Model):
+    """
+    Most recent reading of each meter, maintained on record save.
+    
+    Keeps the previous reading one indexed lookup away when a new visit is
+    submitted. Rows outlive archived records (no FK constraint on record).
+    """
+    
+    meter_number = models.CharField(max_length=100, unique=True, help_text="Canonical meter number (registry_key)")
+    record = models.ForeignKey(
+        Record,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+'
+    )
+    reading = models.DecimalField(max_digits=12, decimal_places=2)
+    read_at = models.DateTimeField(help_text="created_at of the record holding the reading")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Meter Latest Reading'
+        verbose_name_plural = 'Meter Latest Readings'
+    
+    def __str__(self):
+        return f"{self.meter_number}: {self.reading}"
+
+
+class AnomalySuggestion(models.Model):
+    """Reading flagged by the batch validator, waiting for review"""
+    
+    REASON_CHOICES = [
+        ('negative_consumption', 'Reading lower than the previous visit'),
+        ('consumption_spike', 'Implausible consumption'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('accepted', 'Accepted'),
+        ('dismissed', 'Dismissed'),
+    ]
+    
+    record = models.ForeignKey(Record, on_delete=models.CASCADE, related_name='anomaly_suggestions')
+    reason = models.CharField(max_length=30, choices=REASON_CHOICES)
+    suggested_type = models.CharField(max_length=50, choices=Record.ANOMALY_CHOICES, default='incorrect_reading')
+    details = models.JSONField(default=dict, blank=True, help_text="Previous reading, consumption and score")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reviewed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Anomaly Suggestion'
+        verbose_name_plural = 'Anomaly Suggestions'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at']),
+        ]
+        constraints = [
+            # Re-running the validator does not queue the same finding twice
+            models.UniqueConstraint(fields=['record', 'reason'], name='anomaly_suggestion_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.record.record_number}: {self.get_reason_display()}"
+
+
 # =============================================
 # AUDIT LOG MODEL
 # =============================================
@@ -392,11 +577,12 @@ class AuditLog(models.Model):
 # =============================================
 
 class DeletionLog(models.Model):
-    """Audit log for tracking deletions of operations and records"""
+    """Audit log for tracking deletions of operations, records and media"""
     
     ITEM_TYPE_CHOICES = [
         ('operation', 'Operation'),
         ('record', 'Record'),
+        ('media', 'Media'),
     ]
     
     # Who deleted it
@@ -431,8 +617,150 @@ class DeletionLog(models.Model):
             models.Index(fields=['-deleted_at']),
             models.Index(fields=['item_type', '-deleted_at']),
             models.Index(fields=['deleted_by', '-deleted_at']),
+            # Delta sync tombstones
+            models.Index(fields=['deleted_at', 'id'], name='deletion_sync_idx'),
         ]
     
     def __str__(self):
         user_str = self.deleted_by.username if self.deleted_by else "System"
         return f"{user_str} deleted {self.get_item_type_display()}: {self.item_name} on {self.deleted_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+# =============================================
+# DENSITY TILE RENDER STATE
+# =============================================
+
+class TileRenderState(models.Model):
+    """Tracks the last density tile render of an operation for incremental re-rendering"""
+    
+    operation = models.OneToOneField(Operation, on_delete=models.CASCADE, related_name='tile_render_state')
+    zoom_levels = models.JSONField(default=list, help_text="Zoom levels covered by the last render")
+    rendered_at = models.DateTimeField(help_text="Records changed after this time are re-rendered")
+    tile_count = models.IntegerField(default=0, help_text="Number of tiles written by the last render")
+    
+    class Meta:
+        verbose_name = 'Tile Render State'
+        verbose_name_plural = 'Tile Render States'
+    
+    def __str__(self):
+        return f"Tiles for {self.operation.name} ({self.rendered_at:%Y-%m-%d %H:%M})"
+
+
+class TileLocationChange(models.Model):
+    """
+    Former location of a record that moved or left its operation.
+    
+    Incremental density tile renders also re-render the tiles of these
+    points; rows are deleted once a render has covered them.
+    """
+    
+    operation = models.ForeignKey(Operation, on_delete=models.CASCADE, related_name='+')
+    gps_latitude = models.DecimalField(max_digits=10, decimal_places=7)
+    gps_longitude = models.DecimalField(max_digits=10, decimal_places=7)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Tile Location Change'
+        verbose_name_plural = 'Tile Location Changes'
+        indexes = [
+            models.Index(fields=['operation', 'changed_at'], name='tile_change_op_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.gps_latitude}, {self.gps_longitude} ({self.changed_at:%Y-%m-%d %H:%M})"
+
+
+# =============================================
+# REVERSE GEOCODING CACHE
+# =============================================
+
+class GeocodeCache(models.Model):
+    """Persistent cache of reverse-geocoded addresses keyed on rounded coordinates"""
+    
+    latitude = models.DecimalField(max_digits=8, decimal_places=4)
+    longitude = models.DecimalField(max_digits=8, decimal_places=4)
+    address = models.TextField(blank=True, help_text="Normalized address (blank if no gazetteer match)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Geocode Cache Entry'
+        verbose_name_plural = 'Geocode Cache'
+        constraints = [
+            models.UniqueConstraint(fields=['latitude', 'longitude'], name='unique_geocode_coordinates')
+        ]
+    
+    def __str__(self):
+        return f"({self.latitude}, {self.longitude}) → {self.address or '-'}"
+
+
+# =============================================
+# OPERATION ARCHIVE MODEL
+# =============================================
+
+class OperationArchive(models.Model):
+    """
+    Stub left behind when a closed operation's records are moved to cold storage.
+    The Operation row stays; its records, media rows and record audit entries
+    live in compressed files under `location` (see DataForm.archive).
+    """
+    
+    FORMAT_CHOICES = [
+        ('parquet', 'Parquet'),
+        ('jsonl.gz', 'Compressed JSON Lines'),
+    ]
+    
+    operation = models.OneToOneField(Operation, on_delete=models.CASCADE, related_name='archive')
+    location = models.CharField(max_length=255, help_text="Storage path prefix of the archive files")
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES)
+    record_count = models.PositiveIntegerField(default=0)
+    media_count = models.PositiveIntegerField(default=0)
+    audit_count = models.PositiveIntegerField(default=0)
+    checksums = models.JSONField(default=dict, help_text="SHA-256 of each archived table")
+    archived_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(auto_now_add=True)
+    purged_at = models.DateTimeField(null=True, blank=True, help_text="When the archived rows were removed from the live tables")
+    
+    class Meta:
+        verbose_name = 'Operation Archive'
+        verbose_name_plural = 'Operation Archives'
+        ordering = ['-archived_at']
+    
+    def __str__(self):
+        return f"{self.operation.name} → {self.location}"
+    
+    @property
+    def is_purged(self):
+        return self.purged_at is not None
+
+
+# =============================================
+# PROFILE RUN MODEL
+# =============================================
+
+class ProfileRun(models.Model):
+    """
+    One request run under the on-demand profiler (see DataForm.profiling).
+    Keeps the cProfile stats, a text summary and every SQL query with its
+    duration and the application frames it came from.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+')
+    view_name = models.CharField(max_length=100, blank=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    summary = models.TextField(help_text="Top functions by cumulative time")
+    queries = models.JSONField(default=list, help_text="SQL, duration and stack origin of each query")
+    stats = models.BinaryField(help_text="Raw cProfile stats (load with pstats or snakeviz)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Profile Run'
+        verbose_name_plural = 'Profile Runs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
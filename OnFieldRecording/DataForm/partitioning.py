@@ -0,0 +1,242 @@
+"""
+Time partitioning of the audit log for PostgreSQL deployments
+
+AuditLog is range-partitioned by month on timestamp, with a default
+partition catching anything outside the pre-created months. Old months
+are dropped by detaching their partition instead of a long DELETE.
+
+Record is not partitioned: PostgreSQL requires the partition key in every
+unique constraint, so Record.id could no longer back the RecordMedia
+foreign key.
+
+Enable with AUDITLOG_PARTITIONING=True before migrating, or convert an
+existing database later with `manage.py manage_partitions --convert`.
+"""
+
+import logging
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+PARTITION_KEY = 'timestamp'
+
+# Partitions are named <table>_YYYY_MM; the catch-all is <table>_default
+PARTITION_NAME = re.compile(r'_(\d{4})_(\d{2})$')
+
+
+def months_ahead():
+    return getattr(settings, 'AUDITLOG_PARTITION_MONTHS_AHEAD', 3)
+
+
+# =============================================
+# MONTH HELPERS
+# =============================================
+
+def month_start(value):
+    """First day of the month of a date or datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Shift a first-of-month date by count months"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first, last):
+    """First-of-month dates from first to last, inclusive"""
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_{month.year:04d}_{month.month:02d}'
+
+
+def partition_bound(month):
+    """UTC timestamp literal of a month boundary"""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat(sep=' ')
+
+
+# =============================================
+# CATALOG QUERIES
+# =============================================
+
+def is_partitioned(connection, table):
+    """True if table is a partitioned PostgreSQL table"""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection, table):
+    """Names of the partitions attached to table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s ORDER BY c.relname',
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def partition_month(table, name):
+    """Month covered by a partition name, or None for the default partition"""
+    if not name.startswith(f'{table}_'):
+        return None
+    match = PARTITION_NAME.search(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+# =============================================
+# PARTITION MANAGEMENT
+# =============================================
+
+def create_month_partition(connection, table, month):
+    """
+    Create and attach the partition for one month.
+
+    Rows that already landed in the default partition for that month are
+    moved into the new partition before it is attached.
+
+    Returns:
+        bool: True if the partition was created
+    """
+    name = partition_name(table, month)
+    if name in list_partitions(connection, table):
+        return False
+
+    qn = connection.ops.quote_name
+    start, end = partition_bound(month), partition_bound(add_months(month, 1))
+    default = f'{table}_default'
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        if default in list_partitions(connection, table):
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {qn(default)} '
+                f'WHERE {qn(PARTITION_KEY)} >= %s AND {qn(PARTITION_KEY)} < %s RETURNING *) '
+                f'INSERT INTO {qn(name)} SELECT * FROM moved',
+                [start, end],
+            )
+        cursor.execute(
+            f'ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    logger.info(f"Created partition {name}")
+    return True
+
+
+def ensure_future_partitions(connection, table, ahead=None):
+    """
+    Make sure partitions exist from the current month through `ahead` months.
+
+    Returns:
+        list: Names of the partitions created
+    """
+    ahead = months_ahead() if ahead is None else ahead
+    current = month_start(timezone.now())
+    created = []
+    for month in month_range(current, add_months(current, ahead)):
+        if create_month_partition(connection, table, month):
+            created.append(partition_name(table, month))
+    return created
+
+
+def drop_partitions_before(connection, table, cutoff):
+    """
+    Detach and drop every monthly partition that ends on or before cutoff.
+
+    Returns:
+        list: Names of the dropped partitions
+    """
+    qn = connection.ops.quote_name
+    dropped = []
+    for name in list_partitions(connection, table):
+        month = partition_month(table, name)
+        if month is None or add_months(month, 1) > month_start(cutoff):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}')
+            cursor.execute(f'DROP TABLE {qn(name)}')
+        dropped.append(name)
+        logger.info(f"Dropped partition {name}")
+    return dropped
+
+
+def convert_to_partitioned(schema_editor, model, ahead=None):
+    """
+    Rebuild a model's table as a monthly partitioned table.
+
+    The rows are copied into a new partitioned table which then replaces the
+    original. The primary key becomes (id, timestamp) as PostgreSQL requires;
+    ids keep coming from a sequence since identity columns on partitioned
+    tables need PostgreSQL 17. Indexes and foreign keys are recreated with
+    the names Django expects. Takes an exclusive lock for the copy.
+
+    Returns:
+        bool: True if the table was converted
+    """
+    connection = schema_editor.connection
+    table = model._meta.db_table
+    if connection.vendor != 'postgresql' or is_partitioned(connection, table):
+        return False
+
+    qn = schema_editor.quote_name
+    staging = f'{table}_partitioned'
+    sequence = f'{table}_pk_seq'
+    ahead = months_ahead() if ahead is None else ahead
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN({qn(PARTITION_KEY)}), COALESCE(MAX("id"), 0) FROM {qn(table)}')
+        oldest, max_id = cursor.fetchone()
+
+        cursor.execute(f'CREATE SEQUENCE {qn(sequence)} START WITH {max_id + 1}')
+        cursor.execute(
+            f'CREATE TABLE {qn(staging)} (LIKE {qn(table)} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE ({qn(PARTITION_KEY)})'
+        )
+        cursor.execute(f"""ALTER TABLE {qn(staging)} ALTER COLUMN "id" SET DEFAULT nextval('{qn(sequence)}')""")
+        cursor.execute(f'ALTER TABLE {qn(staging)} ADD PRIMARY KEY ("id", {qn(PARTITION_KEY)})')
+
+        current = month_start(timezone.now())
+        for month in month_range(oldest or current, add_months(current, ahead)):
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(table, month))} PARTITION OF {qn(staging)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [partition_bound(month), partition_bound(add_months(month, 1))],
+            )
+        cursor.execute(f'CREATE TABLE {qn(table + "_default")} PARTITION OF {qn(staging)} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {qn(staging)} SELECT * FROM {qn(table)}')
+        cursor.execute(f'DROP TABLE {qn(table)}')
+        cursor.execute(f'ALTER TABLE {qn(staging)} RENAME TO {qn(table)}')
+        cursor.execute(f'ALTER SEQUENCE {qn(sequence)} OWNED BY {qn(table)}."id"')
+
+        for statement in schema_editor._model_indexes_sql(model):
+            cursor.execute(str(statement))
+        for field in model._meta.local_fields:
+            if field.remote_field and field.db_constraint:
+                cursor.execute(str(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s')))
+
+    logger.info(f"Converted {table} to a partitioned table")
+    return True
@@ -0,0 +1,225 @@
+"""
+On-demand request profiling for DataForm app
+An admin adds a signed token (?_profile=<token> or the X-Profile-Token
+header) to any request; ProfilingMiddleware then runs it under cProfile,
+records every SQL query with its duration and originating application
+frames, and stores the result as a ProfileRun viewable in the Django admin.
+"""
+
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+import traceback
+import cProfile
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.utils import timezone
+
+from .auth import get_principal
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+QUERY_PARAM = '_profile'
+HEADER = 'HTTP_X_PROFILE_TOKEN'
+
+SIGNING_SALT = 'DataForm.profiling'
+
+# Functions listed in the stored text summary
+SUMMARY_LINES = 40
+
+# Application frames kept per query origin (innermost last)
+ORIGIN_DEPTH = 5
+
+# Longest SQL text stored per query
+SQL_MAX_LENGTH = 2000
+
+APP_ROOT = str(Path(__file__).resolve().parent)
+
+# Only one profiler can be active per process
+_profiler_lock = threading.Lock()
+
+
+# =============================================
+# TOKENS
+# =============================================
+
+def make_token(user):
+    """Signed profiling token of an admin (valid for PROFILING_TOKEN_MAX_AGE seconds)"""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(str(user.pk))
+
+
+def token_user_id(token):
+    """User id a token was issued to (None if it is forged or expired)"""
+    try:
+        return int(signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        ))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def requested_token(request):
+    return request.GET.get(QUERY_PARAM) or request.META.get(HEADER)
+
+
+def _stored_path(request):
+    """Request path without the profiling token"""
+    query = request.GET.copy()
+    query.pop(QUERY_PARAM, None)
+    return f"{request.path}?{query.urlencode()}" if query else request.path
+
+
+def may_profile(request, token):
+    """The token is valid and was issued to the admin making the request"""
+    user = request.user
+    if not user.is_authenticated or token_user_id(token) != user.pk:
+        return False
+    return user.is_superuser or get_principal(request).is_admin
+
+
+def within_rate_limit(user):
+    """
+    Whether the user stored fewer than PROFILING_RATE_LIMIT runs in the last hour.
+
+    Counted from the ProfileRun rows, so the limit holds across worker
+    processes (a run in flight is counted once it is stored).
+    """
+    from .models import ProfileRun
+
+    since = timezone.now() - timedelta(hours=1)
+    return ProfileRun.objects.filter(user=user, created_at__gt=since).count() < settings.PROFILING_RATE_LIMIT
+
+
+# =============================================
+# SQL CAPTURE
+# =============================================
+
+def _origin():
+    """Innermost application frames of the current stack"""
+    frames = [
+        f"{Path(frame.filename).name}:{frame.lineno} {frame.name}"
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(APP_ROOT) and not frame.filename.endswith(('profiling.py', 'middleware.py'))
+    ]
+    return frames[-ORIGIN_DEPTH:]
+
+
+class QueryRecorder:
+    """connection.execute_wrapper() hook keeping every query with its timing and origin"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql[:SQL_MAX_LENGTH],
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+                'many': many,
+                'origin': _origin(),
+            })
+
+
+# =============================================
+# PROFILED REQUESTS
+# =============================================
+
+@contextmanager
+def _profiled(profiler, recorder):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+
+
+def profile_request(request, get_response):
+    """
+    Run a request under cProfile and store the run.
+
+    Returns:
+        tuple: (response, ProfileRun), or (response, None) when another
+        request of this process is being profiled
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return get_response(request), None
+    try:
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with _profiled(profiler, recorder):
+            response = get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+    finally:
+        _profiler_lock.release()
+
+    return response, _store_run(request, response, profiler, recorder, duration_ms)
+
+
+async def aprofile_request(request, get_response):
+    """
+    profile_request() for ASGI requests.
+
+    cProfile only sees the event loop thread: code the view runs through
+    sync_to_async() shows up as time spent awaiting, but its queries are
+    still recorded.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return await get_response(request), None
+    try:
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with _profiled(profiler, recorder):
+            response = await get_response(request)
+        duration_ms = (time.perf_counter() - started) * 1000
+    finally:
+        _profiler_lock.release()
+
+    run = await sync_to_async(_store_run)(request, response, profiler, recorder, duration_ms)
+    return response, run
+
+
+def _store_run(request, response, profiler, recorder, duration_ms):
+    from .models import ProfileRun
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    profiler.create_stats()
+
+    match = getattr(request, 'resolver_match', None)
+    run = ProfileRun.objects.create(
+        user=request.user,
+        view_name=match.view_name if match else '',
+        method=request.method,
+        path=_stored_path(request)[:500],
+        status_code=response.status_code,
+        duration_ms=round(duration_ms, 3),
+        query_count=len(recorder.queries),
+        db_ms=round(sum(query['ms'] for query in recorder.queries), 3),
+        summary=summary.getvalue(),
+        queries=recorder.queries,
+        stats=marshal.dumps(profiler.stats),
+    )
+    logger.info(f"Profiled {run.method} {run.path} for {request.user}: {run.duration_ms:.0f} ms, {run.query_count} queries")
+    return run
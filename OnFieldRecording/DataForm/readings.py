@@ -0,0 +1,323 @@
+"""
+Meter reading history for DataForm app
+Latest reading per meter (kept current on record save, so the previous
+reading is one indexed lookup at submit time) and a vectorized validator
+that queues suspicious readings of an operation for review
+"""
+
+import logging
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Replace, Upper
+from django.utils import timezone
+
+from .models import AnomalySuggestion, Meter, MeterLatestReading, Record, registry_key
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+REBUILD_BATCH_SIZE = 5000
+
+# Modified z-score above which a consumption rate is a spike (Iglewicz & Hoaglin)
+SPIKE_Z_THRESHOLD = 3.5
+
+# Fewer consumption values than this give no meaningful spread
+SPIKE_MIN_SAMPLES = 5
+
+# Visits closer than this are rated as if a day apart
+MIN_INTERVAL_DAYS = 1.0
+
+
+# =============================================
+# LATEST READING INDEX
+# =============================================
+
+def previous_reading(meter_number):
+    """Latest known reading of a meter (None if it was never read)"""
+    key = registry_key(meter_number)
+    if not key:
+        return None
+    return MeterLatestReading.objects.filter(meter_number=key).first()
+
+
+def previous_readings(meter_numbers):
+    """Latest readings of many meters at once, keyed by registry_key"""
+    keys = {registry_key(number) for number in meter_numbers} - {''}
+    return MeterLatestReading.objects.in_bulk(list(keys), field_name='meter_number')
+
+
+def lower_reading_error(meter_number, reading, type_of_anomaly, latest_readings=None):
+    """
+    Check a new visit's reading against the meter's previous one.
+
+    A reading below the last one needs an explanation: it is accepted only
+    with an anomaly type. Shared by RecordForm and the file importer.
+
+    Args:
+        latest_readings: Optional {meter key: MeterLatestReading} preloaded
+            for a batch (see previous_readings())
+
+    Returns:
+        str: Error message, or None if the reading is acceptable
+    """
+    if reading is None or type_of_anomaly != 'none':
+        return None
+    if latest_readings is not None:
+        previous = latest_readings.get(registry_key(meter_number))
+    else:
+        previous = previous_reading(meter_number)
+    if previous is None or reading >= previous.reading:
+        return None
+    return (
+        f"Lower than the previous reading of this meter ({previous.reading} on "
+        f"{timezone.localtime(previous.read_at):%Y-%m-%d}). "
+        f"Check the meter or choose an anomaly type."
+    )
+
+
+def _meter_records(key):
+    """Live records of a meter, newest first"""
+    records = Record.objects.filter(is_deleted=False).order_by('-created_at', '-pk')
+    if Meter.objects.filter(meter_number=key).exists():
+        # Records of registered meters are linked on save
+        return records.filter(meter__meter_number=key)
+    normalized = Replace(Upper('meter_number'), Value(' '), Value(''))
+    return records.annotate(meter_key=normalized).filter(meter_key=key)
+
+
+def _recompute(key):
+    """Point a meter's latest reading at its newest remaining live record"""
+    latest = _meter_records(key).only('pk', 'meter_reading', 'created_at').first()
+    if latest is None:
+        MeterLatestReading.objects.filter(meter_number=key).delete()
+        return
+    MeterLatestReading.objects.update_or_create(
+        meter_number=key,
+        defaults={'record': latest, 'reading': latest.meter_reading, 'read_at': latest.created_at},
+    )
+
+
+def record_latest_reading(record):
+    """
+    Update the latest reading of the record's meter after it was saved.
+
+    Only a reading at least as recent as the stored one replaces it, so a
+    late upload of an older visit leaves the index untouched.
+    """
+    if record.is_deleted:
+        forget_reading(record)
+        return
+
+    key = registry_key(record.meter_number)
+    # The record may have been the latest of a meter number it no longer has
+    for stale in MeterLatestReading.objects.filter(record_id=record.pk).exclude(meter_number=key):
+        _recompute(stale.meter_number)
+    if not key:
+        return
+
+    updated = MeterLatestReading.objects.filter(meter_number=key, read_at__lte=record.created_at).update(
+        record=record, reading=record.meter_reading, read_at=record.created_at, updated_at=timezone.now(),
+    )
+    if updated or MeterLatestReading.objects.filter(meter_number=key).exists():
+        return
+    try:
+        with transaction.atomic():
+            MeterLatestReading.objects.create(
+                meter_number=key, record=record, reading=record.meter_reading, read_at=record.created_at,
+            )
+    except IntegrityError:
+        # Created concurrently: settle on whichever record is newest
+        _recompute(key)
+
+
+def forget_reading(record):
+    """Fall back to the previous visit when the latest one is deleted"""
+    for latest in MeterLatestReading.objects.filter(record_id=record.pk):
+        _recompute(latest.meter_number)
+
+
+def update_latest_readings(records):
+    """Bulk record_latest_reading() for freshly inserted records"""
+    newest = {}
+    for record in records:
+        key = registry_key(record.meter_number)
+        if key and (key not in newest or (record.created_at, record.pk) > (newest[key].created_at, newest[key].pk)):
+            newest[key] = record
+    if not newest:
+        return
+
+    current = dict(MeterLatestReading.objects.filter(meter_number__in=list(newest)).values_list('meter_number', 'read_at'))
+    rows = [
+        MeterLatestReading(meter_number=key, record=record, reading=record.meter_reading, read_at=record.created_at)
+        for key, record in newest.items()
+        if key not in current or current[key] <= record.created_at
+    ]
+    MeterLatestReading.objects.bulk_create(
+        rows,
+        batch_size=REBUILD_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['meter_number'],
+        update_fields=['record', 'reading', 'read_at', 'updated_at'],
+    )
+
+
+@transaction.atomic
+def rebuild_latest_readings():
+    """
+    Recreate the whole index from the live records.
+
+    Returns:
+        int: Number of meters indexed
+    """
+    newest = {}
+    records = Record.objects.filter(is_deleted=False).order_by('created_at', 'pk').values_list(
+        'pk', 'meter_number', 'meter_reading', 'created_at'
+    )
+    for pk, meter_number, reading, created_at in records.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        key = registry_key(meter_number)
+        if key:
+            newest[key] = (pk, reading, created_at)
+
+    MeterLatestReading.objects.all().delete()
+    MeterLatestReading.objects.bulk_create(
+        (
+            MeterLatestReading(meter_number=key, record_id=pk, reading=reading, read_at=created_at)
+            for key, (pk, reading, created_at) in newest.items()
+        ),
+        batch_size=REBUILD_BATCH_SIZE,
+    )
+    logger.info(f"Latest readings rebuilt: {len(newest)} meters")
+    return len(newest)
+
+
+# =============================================
+# BATCH VALIDATION
+# =============================================
+
+def _reading_history(operation):
+    """
+    Live readings of every meter visited in the operation, across operations.
+
+    Returns:
+        tuple: Arrays (meter code, timestamp, reading, record id, in operation,
+        anomaly already set)
+    """
+    visits = Record.objects.filter(operation=operation, is_deleted=False)
+    meter_ids = set(visits.exclude(meter__isnull=True).values_list('meter_id', flat=True))
+    numbers = set(visits.values_list('meter_number', flat=True))
+    rows = list(Record.objects.filter(
+        Q(meter_id__in=meter_ids) | Q(meter_number__in=numbers), is_deleted=False
+    ).values_list('pk', 'meter_number', 'created_at', 'meter_reading', 'operation_id', 'type_of_anomaly'))
+
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return empty, np.array([]), np.array([]), empty, np.array([], dtype=bool), np.array([], dtype=bool)
+
+    pks, meter_numbers, created, readings, operation_ids, anomalies = zip(*rows)
+    _, codes = np.unique([registry_key(number) for number in meter_numbers], return_inverse=True)
+    return (
+        codes,
+        np.array([ts.timestamp() for ts in created]),
+        np.array(readings, dtype=np.float64),
+        np.array(pks, dtype=np.int64),
+        np.array(operation_ids) == operation.pk,
+        np.array(anomalies) != 'none',
+    )
+
+
+def _modified_z_scores(values):
+    """Robust z-scores (median/MAD); zeros when the values have no spread"""
+    median = np.median(values)
+    deviation = np.abs(values - median)
+    mad = np.median(deviation)
+    if mad > 0:
+        return 0.6745 * (values - median) / mad
+    mean_deviation = deviation.mean()
+    if mean_deviation > 0:
+        return (values - median) / (1.253314 * mean_deviation)
+    return np.zeros_like(values)
+
+
+def find_reading_outliers(operation, z_threshold=SPIKE_Z_THRESHOLD):
+    """
+    Flag implausible readings of an operation against each meter's previous visit.
+
+    Consumption is the difference to the previous reading of the same meter
+    (from any operation). A negative consumption is always flagged; a
+    positive daily consumption rate is a spike when its modified z-score
+    across the operation exceeds z_threshold. Records whose agent already
+    chose an anomaly type are skipped.
+
+    Returns:
+        list: Findings as dicts with record_id, reason and details
+    """
+    codes, times, readings, pks, in_operation, flagged = _reading_history(operation)
+    if len(pks) < 2:
+        return []
+
+    order = np.lexsort((pks, times, codes))
+    codes, times, readings, pks = codes[order], times[order], readings[order], pks[order]
+    in_operation, flagged = in_operation[order], flagged[order]
+
+    # Pair every visit with the one before it; index i compares rows i and i + 1
+    same_meter = codes[1:] == codes[:-1]
+    candidate = same_meter & in_operation[1:] & ~flagged[1:]
+    consumption = readings[1:] - readings[:-1]
+    days = np.maximum((times[1:] - times[:-1]) / 86400, MIN_INTERVAL_DAYS)
+    rates = consumption / days
+
+    findings = []
+    for i in np.flatnonzero(candidate & (consumption < 0)):
+        findings.append(_finding(pks[i + 1], 'negative_consumption', readings[i], readings[i + 1], rates[i]))
+
+    positive = np.flatnonzero(candidate & (consumption >= 0))
+    if len(positive) >= SPIKE_MIN_SAMPLES:
+        scores = _modified_z_scores(rates[positive])
+        for i, score in zip(positive[scores > z_threshold], scores[scores > z_threshold]):
+            findings.append(_finding(
+                pks[i + 1], 'consumption_spike', readings[i], readings[i + 1], rates[i], score=round(float(score), 2),
+            ))
+    return findings
+
+
+def _finding(record_id, reason, previous, reading, rate, **extra):
+    return {
+        'record_id': int(record_id),
+        'reason': reason,
+        'details': {
+            'previous_reading': round(float(previous), 2),
+            'reading': round(float(reading), 2),
+            'consumption': round(float(reading - previous), 2),
+            'daily_rate': round(float(rate), 2),
+            **extra,
+        },
+    }
+
+
+def queue_suggestions(operation, z_threshold=SPIKE_Z_THRESHOLD):
+    """
+    Run the validator and queue new findings as pending AnomalySuggestions.
+
+    Findings already queued (in any status) are not queued again.
+
+    Returns:
+        int: Number of suggestions added
+    """
+    findings = find_reading_outliers(operation, z_threshold)
+    known = set(AnomalySuggestion.objects.filter(
+        record_id__in=[finding['record_id'] for finding in findings]
+    ).values_list('record_id', 'reason'))
+    suggestions = [
+        AnomalySuggestion(record_id=finding['record_id'], reason=finding['reason'], details=finding['details'])
+        for finding in findings
+        if (finding['record_id'], finding['reason']) not in known
+    ]
+    AnomalySuggestion.objects.bulk_create(suggestions, batch_size=REBUILD_BATCH_SIZE, ignore_conflicts=True)
+    logger.info(f"Reading validation of operation {operation.pk}: {len(suggestions)} new suggestions")
+    return len(suggestions)
@@ -0,0 +1,355 @@
+"""
+Customer/meter registry for DataForm app
+In-process prefix index behind the record form typeahead, bulk loading of
+the registry from CSV/XLSX, and linking of records to their meters (by
+indexed meter_number lookups, never through the typeahead index)
+"""
+
+import logging
+import time
+from array import array
+from bisect import bisect_left
+
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import Customer, Meter, Record, registry_key
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+# Seconds a process serves its index before re-checking the registry's
+# version in the database (edits made by other processes show up after this)
+VERSION_CHECK_INTERVAL = 30
+
+LOOKUP_MIN_LENGTH = 2
+LOOKUP_MAX_RESULTS = 20
+
+LOAD_BATCH_SIZE = 5000
+LINK_BATCH_SIZE = 5000
+
+# Entry tuple layout
+ENTRY_FIELDS = ['meter_id', 'meter_number', 'account_number', 'customer_name', 'customer_contact', 'address']
+
+
+# =============================================
+# PREFIX INDEX
+# =============================================
+
+class RegistryIndex:
+    """
+    Sorted-array prefix index over registered meters.
+
+    Every meter is one entry tuple; it is reachable from its meter number,
+    its customer's account number and each word of the customer's name.
+    A lookup is a binary search plus a scan over the matching keys.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = list(entries)
+        self.by_meter = {entry[1]: index for index, entry in enumerate(self.entries)}
+
+        pairs = []
+        for index, (_, meter_number, account_number, name, _, _) in enumerate(self.entries):
+            pairs.append((meter_number, index))
+            if account_number:
+                pairs.append((account_number, index))
+            for word in (name or '').upper().split():
+                pairs.append((word, index))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.positions = array('I', (index for _, index in pairs))
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def from_database(cls):
+        return cls(Meter.objects.order_by('meter_number').values_list(
+            'pk', 'meter_number', 'customer__account_number', 'customer__name', 'customer__contact', 'address'
+        ).iterator(chunk_size=LOAD_BATCH_SIZE))
+
+    def _prefix_range(self, prefix):
+        """Positions of the keys starting with prefix"""
+        return range(bisect_left(self.keys, prefix), bisect_left(self.keys, prefix + '\uffff'))
+
+    def _prefix_matches(self, prefix):
+        for position in self._prefix_range(prefix):
+            yield self.positions[position]
+
+    def search(self, query, limit=LOOKUP_MAX_RESULTS):
+        """
+        Entries matching a meter/account number prefix or name word prefixes.
+
+        Args:
+            query: Typed text, e.g. 'MTR12', 'acc 4' or 'ama men'
+            limit: Maximum entries returned
+
+        Returns:
+            list: Entry tuples (see ENTRY_FIELDS), exact meter match first
+        """
+        words = query.upper().split()
+        if not words:
+            return []
+
+        results = []
+        seen = set()
+        exact = self.by_meter.get(registry_key(query))
+        if exact is not None:
+            results.append(self.entries[exact])
+            seen.add(exact)
+
+        candidates = [self._prefix_matches(registry_key(query))]
+        if len(words) > 1:
+            # Scan the rarest word; the others are checked on the entry
+            candidates.append(self._prefix_matches(min(words, key=lambda word: len(self._prefix_range(word)))))
+        for matches in candidates:
+            for index in matches:
+                if len(results) >= limit:
+                    return results
+                if index in seen:
+                    continue
+                entry = self.entries[index]
+                if len(words) > 1 and not self._name_matches(entry[3], words):
+                    continue
+                seen.add(index)
+                results.append(entry)
+        return results
+
+    @staticmethod
+    def _name_matches(name, words):
+        """Every query word is a prefix of some word of the name"""
+        name_words = (name or '').upper().split()
+        return all(any(part.startswith(word) for part in name_words) for word in words)
+
+
+
+_index = None
+_index_version = None
+_checked_at = None
+
+
+def _database_version():
+    """Row counts and latest updates of the registry tables (changes with any write)"""
+    meters = Meter.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    customers = Customer.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+    return meters['count'], meters['updated'], customers['count'], customers['updated']
+
+
+def invalidate():
+    """
+    Re-check the registry on this process's next lookup.
+
+    Other processes pick the change up within VERSION_CHECK_INTERVAL.
+    """
+    global _checked_at
+    _checked_at = None
+
+
+def get_index():
+    """The process-wide index, rebuilt when the registry changed"""
+    global _index, _index_version, _checked_at
+    now = time.monotonic()
+    if _index is not None and _checked_at is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return _index
+
+    version = _database_version()
+    _checked_at = now
+    if _index is None or version != _index_version:
+        _index = RegistryIndex.from_database()
+        _index_version = version
+        logger.info(f"Registry index built: {len(_index)} meters")
+    return _index
+
+
+def lookup(query, limit=LOOKUP_MAX_RESULTS):
+    """Typeahead results as dicts (empty for queries shorter than LOOKUP_MIN_LENGTH)"""
+    if len(query.strip()) < LOOKUP_MIN_LENGTH:
+        return []
+    return [dict(zip(ENTRY_FIELDS, entry)) for entry in get_index().search(query, limit)]
+
+
+# =============================================
+# BULK LOADING
+# =============================================
+
+COLUMN_ALIASES = {
+    'meter_number': 'meter_number', 'meter': 'meter_number', 'meter_no': 'meter_number',
+    'account_number': 'account_number', 'account': 'account_number', 'account_no': 'account_number',
+    'customer_name': 'name', 'name': 'name',
+    'customer_contact': 'contact', 'contact': 'contact', 'phone': 'contact',
+    'address': 'address', 'gps_address': 'address',
+}
+
+
+def load_registry(file, filename, batch_size=LOAD_BATCH_SIZE):
+    """
+    Insert or update meters and customers from a CSV/XLSX sheet.
+
+    Columns: meter_number (required), account_number, customer_name,
+    customer_contact, address. Existing rows are updated in place.
+
+    Returns:
+        dict: Counts of rows read and rows skipped (no meter number)
+
+    Raises:
+        IngestError: If the file cannot be read or has no meter_number column
+    """
+    from .ingest import IngestError, cell_value, normalize_header, read_rows
+
+    headers, rows = read_rows(file, filename)
+    columns = {}
+    for index, header in enumerate(headers):
+        name = COLUMN_ALIASES.get(normalize_header(header))
+        if name and name not in columns:
+            columns[name] = index
+    if 'meter_number' not in columns:
+        raise IngestError('Missing required column: meter_number')
+
+    summary = {'rows': 0, 'skipped': 0}
+    batch = []
+    for _, values in rows:
+        summary['rows'] += 1
+        row = {name: cell_value(values[index]) if index < len(values) else '' for name, index in columns.items()}
+        if not registry_key(row['meter_number']):
+            summary['skipped'] += 1
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _load_batch(batch)
+            batch = []
+    if batch:
+        _load_batch(batch)
+
+    invalidate()
+    logger.info(f"Registry loaded from {filename}: {summary['rows']} rows")
+    return summary
+
+
+@transaction.atomic
+def _load_batch(rows):
+    customers = {}
+    for row in rows:
+        account_number = registry_key(row.get('account_number'))
+        if account_number:
+            customers[account_number] = Customer(
+                account_number=account_number,
+                name=row.get('name', '')[:200],
+                contact=row.get('contact', '')[:20],
+            )
+    Customer.objects.bulk_create(
+        customers.values(),
+        update_conflicts=True,
+        unique_fields=['account_number'],
+        update_fields=['name', 'contact', 'updated_at'],
+    )
+    customer_ids = dict(Customer.objects.filter(account_number__in=list(customers)).values_list('account_number', 'pk'))
+
+    meters = {}
+    for row in rows:
+        meter_number = registry_key(row['meter_number'])
+        meters[meter_number] = Meter(
+            meter_number=meter_number,
+            customer_id=customer_ids.get(registry_key(row.get('account_number'))),
+            address=row.get('address', ''),
+        )
+    Meter.objects.bulk_create(
+        meters.values(),
+        update_conflicts=True,
+        unique_fields=['meter_number'],
+        update_fields=['customer', 'address', 'updated_at'],
+    )
+
+
+# =============================================
+# RECORD LINKING
+# =============================================
+
+def meter_id(meter_number):
+    """Registry id of a meter number (None if not registered)"""
+    key = registry_key(meter_number)
+    if not key:
+        return None
+    return Meter.objects.filter(meter_number=key).values_list('pk', flat=True).first()
+
+
+def meter_ids(meter_numbers):
+    """
+    Registry ids of many meter numbers in one query.
+
+    Returns:
+        dict: registry_key(meter_number) → meter id, for registered meters only
+    """
+    keys = {registry_key(meter_number) for meter_number in meter_numbers} - {''}
+    if not keys:
+        return {}
+    return dict(Meter.objects.filter(meter_number__in=keys).values_list('meter_number', 'pk'))
+
+
+def link_records(batch_size=LINK_BATCH_SIZE, relink=False):
+    """
+    Point records at their registry meter (batched backfill).
+
+    Args:
+        batch_size: Records updated per query
+        relink: Also revisit records that are already linked
+
+    Returns:
+        int: Number of records linked
+    """
+    records = Record.objects.all() if relink else Record.objects.filter(meter__isnull=True)
+    ids = list(records.order_by('pk').values_list('pk', flat=True))
+
+    linked = 0
+    for start in range(0, len(ids), batch_size):
+        batch = list(Record.objects.filter(pk__in=ids[start:start + batch_size]).only('pk', 'meter_number', 'meter'))
+        registered = meter_ids(record.meter_number for record in batch)
+        changed = []
+        for record in batch:
+            linked_id = registered.get(registry_key(record.meter_number))
+            if linked_id != record.meter_id:
+                record.meter_id = linked_id
+                changed.append(record)
+        # bulk_update bypasses save(): updated_at and the record signals are untouched
+        Record.objects.bulk_update(changed, ['meter'], batch_size=1000)
+        linked += sum(record.meter_id is not None for record in changed)
+    return linked
+
+
+def seed_from_records():
+    """
+    Create registry entries for meter numbers only known from records.
+
+    The latest record of each meter provides the customer details.
+
+    Returns:
+        int: Number of meters created
+    """
+    known = set(Meter.objects.values_list('meter_number', flat=True))
+    latest = {}
+    for row in Record.objects.filter(is_deleted=False).order_by('created_at').values(
+        'meter_number', 'account_number', 'customer_name', 'customer_contact', 'gps_address'
+    ).iterator(chunk_size=LOAD_BATCH_SIZE):
+        meter_number = registry_key(row['meter_number'])
+        if meter_number and meter_number not in known:
+            latest[meter_number] = row
+
+    rows = [
+        {
+            'meter_number': meter_number,
+            'account_number': row['account_number'],
+            'name': row['customer_name'],
+            'contact': row['customer_contact'],
+            'address': row['gps_address'],
+        }
+        for meter_number, row in latest.items()
+    ]
+    for start in range(0, len(rows), LOAD_BATCH_SIZE):
+        _load_batch(rows[start:start + LOAD_BATCH_SIZE])
+    if rows:
+        invalidate()
+    return len(rows)
@@ -0,0 +1,44 @@
+"""
+REST framework renderers for DataForm app
+"""
+
+from decimal import Decimal
+
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib-based JSONRenderer
+    orjson = None
+
+
+def _orjson_default(value):
+    """Types orjson does not serialize natively"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Promise):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    JSON renderer backed by orjson.
+
+    Several times faster than JSONRenderer on large record pages; datetimes
+    are rendered natively and Decimals as strings, matching DRF's
+    COERCE_DECIMAL_TO_STRING default. Uses JSONRenderer when orjson is not
+    installed.
+    """
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return JSONRenderer().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,428 @@
+"""
+Operation reports for DataForm app
+PDF (ReportLab) and Excel (openpyxl) exports of an operation's details,
+statistics, anomaly breakdown and records. Both libraries take a few
+hundred milliseconds and several MB to import, so the export views import
+this module on first use instead of every worker loading it at startup
+(check with: python manage.py import_times).
+"""
+
+from io import BytesIO
+
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from .archive import operation_records, anomaly_distribution
+
+
+# =============================================
+# REPORT DATA
+# =============================================
+
+def operation_summary(operation):
+    """
+    Records and statistics of an operation (live or archived).
+
+    Returns:
+        dict: records, total_records, stats (counts per status) and
+        anomaly_stats, as taken by build_pdf() and build_workbook()
+    """
+    records = operation_records(operation).select_related(
+        'created_by', 'operation'
+    ).order_by('record_number')
+    return {
+        'records': records,
+        'total_records': records.count(),
+        'stats': {
+            'draft': records.filter(status='draft').count(),
+            'submitted': records.filter(status='submitted').count(),
+            'verified': records.filter(status='verified').count(),
+        },
+        'anomaly_stats': anomaly_distribution(records),
+    }
+
+
+def export_filename(operation, extension):
+    """Operation name sanitized for filesystems, with a timestamp"""
+    safe_operation_name = "".join(c for c in operation.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    safe_operation_name = safe_operation_name.replace(' ', '_')
+    return f"{safe_operation_name}_{timezone.now().strftime('%Y%m%d_%H%M')}.{extension}"
+
+
+# =============================================
+# PDF
+# =============================================
+
+def build_pdf(operation, records, total_records, stats, anomaly_stats):
+    """Operation report as PDF bytes"""
+    # Landscape so the records table fits
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
+    
+    # Container for PDF elements
+    elements = []
+    
+    # Get styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1f2937'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#374151'),
+        spaceAfter=12,
+        spaceBefore=20
+    )
+    normal_style = styles['Normal']
+    
+    # Title
+    title = Paragraph(f"<b>Operation Report</b>", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Operation Details Table
+    operation_data = [
+        ['Operation Name:', operation.name],
+        ['Description:', operation.description or 'N/A'],
+        ['Status:', 'Active' if operation.is_active else 'Inactive'],
+        ['Created By:', operation.created_by.username if operation.created_by else 'N/A'],
+        ['Start Date:', operation.start_at.strftime('%Y-%m-%d %H:%M') if operation.start_at else 'N/A'],
+        ['End Date:', operation.end_at.strftime('%Y-%m-%d %H:%M') if operation.end_at else 'N/A'],
+        ['Generated:', timezone.now().strftime('%Y-%m-%d %H:%M')],
+    ]
+    
+    operation_table = Table(operation_data, colWidths=[2*inch, 4.5*inch])
+    operation_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1f2937')),
+        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
+    ]))
+    
+    elements.append(operation_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Statistics Section
+    elements.append(Paragraph("<b>Statistics</b>", heading_style))
+    
+    stats_data = [
+        ['Total Records', 'Draft', 'Submitted', 'Verified', 'Anomalies'],
+        [str(total_records), str(stats['draft']), str(stats['submitted']), str(stats['verified']), str(len(anomaly_stats))]
+    ]
+    
+    stats_table = Table(stats_data, colWidths=[1.3*inch, 1.3*inch, 1.3*inch, 1.3*inch, 1.3*inch])
+    stats_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 0), (-1, -1), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
+    ]))
+    
+    elements.append(stats_table)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    # Anomaly Breakdown (if any)
+    if anomaly_stats:
+        elements.append(Paragraph("<b>Anomaly Breakdown</b>", heading_style))
+        
+        anomaly_data = [['Anomaly Type', 'Count']]
+        for anomaly in anomaly_stats:
+            anomaly_type = anomaly['type_of_anomaly'].replace('_', ' ').title()
+            anomaly_data.append([anomaly_type, str(anomaly['count'])])
+        
+        anomaly_table = Table(anomaly_data, colWidths=[4*inch, 2.5*inch])
+        anomaly_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
+        ]))
+        
+        elements.append(anomaly_table)
+        elements.append(Spacer(1, 0.3*inch))
+    
+    # Records Table (all records)
+    if total_records > 0:
+        elements.append(Paragraph("<b>Records</b>", heading_style))
+        
+        # Table headers - only specified fields
+        records_data = [[
+            'Job #', 
+            'Customer Name', 
+            'Contact', 
+            'GPS Address', 
+            'Account #', 
+            'Meter #', 
+            'Balance', 
+            'Reading', 
+            'Anomaly', 
+            'Remarks'
+        ]]
+        
+        # Add all records with specified fields
+        for idx, record in enumerate(records, 1):
+            anomaly_display = record.type_of_anomaly.replace('_', ' ').title() if record.type_of_anomaly != 'none' else 'None'
+            records_data.append([
+                record.record_number,
+                record.customer_name[:30] or 'N/A',  # Increased from 25
+                record.customer_contact or 'N/A',
+                (record.gps_address[:40] + '...') if len(record.gps_address) > 40 else (record.gps_address or 'N/A'),  # Increased from 30
+                record.account_number or 'N/A',
+                record.meter_number or 'N/A',
+                f"{record.todays_balance:,.2f}",
+                f"{record.meter_reading:,.2f}",
+                anomaly_display,
+                (record.remarks[:25] + '...') if len(record.remarks) > 25 else (record.remarks or '-')  # Increased from 20
+            ])
+        
+        # Adjusted column widths for landscape layout (total ~10 inches)
+        records_table = Table(records_data, colWidths=[
+            0.95*inch,  # Job #
+            1.35*inch,  # Customer Name
+            1.0*inch,   # Contact
+            1.5*inch,   # GPS Address
+            0.95*inch,  # Account #
+            0.95*inch,  # Meter #
+            0.75*inch,  # Balance
+            0.75*inch,  # Reading
+            1.0*inch,   # Anomaly
+            0.8*inch    # Remarks
+        ])
+        records_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
+        ]))
+        
+        elements.append(records_table)
+    
+    # Build PDF
+    doc.build(elements)
+    
+    return buffer.getvalue()
+
+
+# =============================================
+# EXCEL
+# =============================================
+
+def build_workbook(operation, records, total_records, stats, anomaly_stats):
+    """Operation report as an openpyxl Workbook (Summary and Records sheets)"""
+    wb = Workbook()
+    
+    # Define styles
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    header_fill = PatternFill(start_color="1F2937", end_color="1F2937", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    
+    cell_alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
+    border = Border(
+        left=Side(style='thin', color='D1D5DB'),
+        right=Side(style='thin', color='D1D5DB'),
+        top=Side(style='thin', color='D1D5DB'),
+        bottom=Side(style='thin', color='D1D5DB')
+    )
+    
+    # ========== SHEET 1: Summary ==========
+    ws_summary = wb.active
+    ws_summary.title = "Summary"
+    
+    # Title
+    ws_summary['A1'] = "Operation Report"
+    ws_summary['A1'].font = Font(bold=True, size=16)
+    ws_summary['A1'].alignment = Alignment(horizontal="center")
+    ws_summary.merge_cells('A1:B1')
+    ws_summary.row_dimensions[1].height = 25
+    
+    # Operation Details
+    ws_summary['A3'] = "Operation Details"
+    ws_summary['A3'].font = Font(bold=True, size=12)
+    ws_summary.merge_cells('A3:B3')
+    
+    details = [
+        ['Operation Name:', operation.name],
+        ['Description:', operation.description or 'N/A'],
+        ['Status:', 'Active' if operation.is_active else 'Inactive'],
+        ['Created By:', operation.created_by.username if operation.created_by else 'N/A'],
+        ['Start Date:', operation.start_at.strftime('%Y-%m-%d %H:%M') if operation.start_at else 'N/A'],
+        ['End Date:', operation.end_at.strftime('%Y-%m-%d %H:%M') if operation.end_at else 'N/A'],
+        ['Total Records:', str(total_records)],
+        ['Generated:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')],
+    ]
+    
+    row = 4
+    for label, value in details:
+        ws_summary[f'A{row}'] = label
+        ws_summary[f'A{row}'].font = Font(bold=True)
+        ws_summary[f'A{row}'].fill = PatternFill(start_color="F3F4F6", end_color="F3F4F6", fill_type="solid")
+        ws_summary[f'B{row}'] = value
+        ws_summary[f'A{row}'].border = border
+        ws_summary[f'B{row}'].border = border
+        row += 1
+    
+    # Statistics
+    row += 1
+    ws_summary[f'A{row}'] = "Record Statistics"
+    ws_summary[f'A{row}'].font = Font(bold=True, size=12)
+    ws_summary.merge_cells(f'A{row}:E{row}')
+    
+    row += 1
+    stats_headers = ['Total Records', 'Draft', 'Submitted', 'Verified', 'Anomalies']
+    for col, header in enumerate(stats_headers, 1):
+        cell = ws_summary.cell(row, col, header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        cell.border = border
+    
+    row += 1
+    stats_values = [total_records, stats['draft'], stats['submitted'], stats['verified'], len(anomaly_stats)]
+    for col, value in enumerate(stats_values, 1):
+        cell = ws_summary.cell(row, col, value)
+        cell.alignment = Alignment(horizontal="center")
+        cell.border = border
+    
+    # Anomaly Breakdown
+    if anomaly_stats:
+        row += 2
+        ws_summary[f'A{row}'] = "Anomaly Breakdown"
+        ws_summary[f'A{row}'].font = Font(bold=True, size=12)
+        ws_summary.merge_cells(f'A{row}:B{row}')
+        
+        row += 1
+        ws_summary[f'A{row}'] = "Anomaly Type"
+        ws_summary[f'B{row}'] = "Count"
+        for col in range(1, 3):
+            cell = ws_summary.cell(row, col)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            cell.border = border
+        
+        for anomaly in anomaly_stats:
+            row += 1
+            anomaly_type = anomaly['type_of_anomaly'].replace('_', ' ').title()
+            ws_summary[f'A{row}'] = anomaly_type
+            ws_summary[f'B{row}'] = anomaly['count']
+            ws_summary[f'A{row}'].border = border
+            ws_summary[f'B{row}'].border = border
+            ws_summary[f'B{row}'].alignment = Alignment(horizontal="center")
+    
+    # Set column widths for summary sheet
+    ws_summary.column_dimensions['A'].width = 20
+    ws_summary.column_dimensions['B'].width = 40
+    ws_summary.column_dimensions['C'].width = 15
+    ws_summary.column_dimensions['D'].width = 15
+    ws_summary.column_dimensions['E'].width = 15
+    
+    # ========== SHEET 2: Records Data ==========
+    ws_records = wb.create_sheet(title="Records")
+    
+    # Headers - only specified fields
+    headers = [
+        'Job Number', 
+        'Customer Name', 
+        'Customer Contact', 
+        'GPS Address', 
+        'Account Number', 
+        'Meter Number',
+        'Today\'s Balance', 
+        'Meter Reading', 
+        'Type of Anomaly', 
+        'Remarks'
+    ]
+    
+    for col, header in enumerate(headers, 1):
+        cell = ws_records.cell(1, col, header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        cell.border = border
+    
+    # Data rows with specified fields only
+    for idx, record in enumerate(records, 1):
+        row_data = [
+            record.record_number,
+            record.customer_name or '',
+            record.customer_contact or '',
+            record.gps_address or '',
+            record.account_number or '',
+            record.meter_number or '',
+            float(record.todays_balance) if record.todays_balance else 0,
+            float(record.meter_reading) if record.meter_reading else 0,
+            record.type_of_anomaly.replace('_', ' ').title() if record.type_of_anomaly != 'none' else 'None',
+            record.remarks or '',
+        ]
+        
+        for col, value in enumerate(row_data, 1):
+            cell = ws_records.cell(idx + 1, col, value)
+            cell.alignment = cell_alignment
+            cell.border = border
+            
+            # Format currency columns
+            if col in [7, 8]:  # Balance and Reading columns
+                cell.number_format = '#,##0.00'
+    
+    # Set column widths for records sheet
+    column_widths = {
+        'A': 18,  # Job Number
+        'B': 25,  # Customer Name
+        'C': 18,  # Customer Contact
+        'D': 35,  # GPS Address
+        'E': 18,  # Account Number
+        'F': 18,  # Meter Number
+        'G': 15,  # Today's Balance
+        'H': 15,  # Meter Reading
+        'I': 20,  # Type of Anomaly
+        'J': 30,  # Remarks
+    }
+    
+    for col_letter, width in column_widths.items():
+        ws_records.column_dimensions[col_letter].width = width
+    
+    # Freeze header row
+    ws_records.freeze_panes = 'A2'
+    
+    return wb
@@ -0,0 +1,165 @@
+"""
+REST framework serializers for DataForm app
+
+List endpoints serialize plain dicts from .values() querysets: no model
+instances are built, and plain columns are copied straight from the row.
+"""
+
+from rest_framework import serializers
+
+from .models import Record, RecordMedia
+
+
+# =============================================
+# HELPERS
+# =============================================
+
+def media_url(row):
+    """Public URL of a media .values() row (needs image and storage_url)"""
+    if row['storage_url']:
+        return row['storage_url']
+    return RecordMedia._meta.get_field('image').storage.url(row['image'])
+
+
+# =============================================
+# BASE CLASSES
+# =============================================
+
+class FieldSelectionMixin:
+    """Lets clients choose fields with ?fields=id,record_number,status"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = request.query_params.get('fields') if request is not None else None
+        if requested:
+            wanted = {name.strip() for name in requested.split(',')}
+            # Unknown names are ignored; an empty selection keeps all fields
+            if wanted & set(self.fields):
+                for name in set(self.fields) - wanted:
+                    self.fields.pop(name)
+
+
+class ValuesSerializer(FieldSelectionMixin, serializers.Serializer):
+    """
+    Read-only serializer over .values() rows.
+
+    ReadOnlyField columns are copied from the row as-is (the renderer takes
+    care of datetimes and Decimals); other fields go through DRF as usual.
+    Fields computed from other columns list them in `extra_columns`.
+    """
+
+    extra_columns = {}
+
+    def value_columns(self):
+        """Columns to pass to .values() for the selected fields"""
+        columns = []
+        for name, field in self.fields.items():
+            columns.extend(self.extra_columns.get(name, [] if field.source == '*' else [field.source]))
+        return list(dict.fromkeys(columns))
+
+    def to_representation(self, row):
+        data = {}
+        for name, field in self.fields.items():
+            if type(field) is serializers.ReadOnlyField:
+                data[name] = row[field.source]
+            else:
+                data[name] = field.to_representation(field.get_attribute(row))
+        return data
+
+
+# =============================================
+# RECORDS
+# =============================================
+
+class RecordValuesSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    record_number = serializers.ReadOnlyField()
+    operation = serializers.ReadOnlyField(source='operation_id')
+    operation_name = serializers.ReadOnlyField(source='operation__name')
+    customer_name = serializers.ReadOnlyField()
+    customer_contact = serializers.ReadOnlyField()
+    gps_latitude = serializers.ReadOnlyField()
+    gps_longitude = serializers.ReadOnlyField()
+    gps_address = serializers.ReadOnlyField()
+    account_number = serializers.ReadOnlyField()
+    meter_number = serializers.ReadOnlyField()
+    todays_balance = serializers.ReadOnlyField()
+    meter_reading = serializers.ReadOnlyField()
+    type_of_anomaly = serializers.ReadOnlyField()
+    remarks = serializers.ReadOnlyField()
+    status = serializers.ReadOnlyField()
+    created_by = serializers.ReadOnlyField(source='created_by_id')
+    created_by_username = serializers.ReadOnlyField(source='created_by__username')
+    created_at = serializers.ReadOnlyField()
+    updated_at = serializers.ReadOnlyField()
+
+
+class MediaSerializer(serializers.ModelSerializer):
+    """Media of a single record (record detail)"""
+
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = RecordMedia
+        fields = ['id', 'image_url', 'uploaded_at', 'file_size', 'is_processed']
+
+    def get_image_url(self, media):
+        return media.storage_url or media.image.url
+
+
+class RecordDetailSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """Single record with its operation, creator and media"""
+
+    operation_name = serializers.CharField(source='operation.name', read_only=True)
+    created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    media = MediaSerializer(source='media_files', many=True, read_only=True)
+
+    class Meta:
+        model = Record
+        fields = [
+            'id', 'record_number', 'operation', 'operation_name',
+            'customer_name', 'customer_contact',
+            'gps_latitude', 'gps_longitude', 'gps_address',
+            'account_number', 'meter_number', 'todays_balance', 'meter_reading',
+            'type_of_anomaly', 'remarks', 'status',
+            'created_by', 'created_by_username', 'created_at', 'updated_at',
+            'media',
+        ]
+        read_only_fields = fields
+
+
+# =============================================
+# OPERATIONS
+# =============================================
+
+class OperationValuesSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    name = serializers.ReadOnlyField()
+    description = serializers.ReadOnlyField()
+    is_active = serializers.ReadOnlyField()
+    start_at = serializers.ReadOnlyField()
+    end_at = serializers.ReadOnlyField()
+    closed_at = serializers.ReadOnlyField()
+    created_at = serializers.ReadOnlyField()
+    record_count = serializers.ReadOnlyField()
+
+
+# =============================================
+# MEDIA
+# =============================================
+
+class MediaValuesSerializer(ValuesSerializer):
+    id = serializers.ReadOnlyField()
+    record = serializers.ReadOnlyField(source='record_id')
+    record_number = serializers.ReadOnlyField(source='record__record_number')
+    image_url = serializers.SerializerMethodField()
+    uploaded_by = serializers.ReadOnlyField(source='uploaded_by_id')
+    uploaded_at = serializers.ReadOnlyField()
+    file_size = serializers.ReadOnlyField()
+    is_processed = serializers.ReadOnlyField()
+
+    extra_columns = {'image_url': ['image', 'storage_url']}
+
+    def get_image_url(self, row):
+        return media_url(row)
@@ -2,10 +2,12 @@
 Django signals for automatic model creation and audit logging
 """
 
+from django.db.models import QuerySet
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import UserProfile, Operation, Record, AuditLog, RecordMedia
+from .models import UserProfile, Operation, Record, AuditLog, DeletionLog, RecordMedia, Customer, Meter
+from . import maps, metrics, geocoding, readings, registry, tiles
 import json
 
 
@@ -140,6 +142,21 @@ def log_operation_delete(sender, instance, **kwargs):
     )
 
 
+@receiver(pre_save, sender=Record)
+def link_record_meter(sender, instance, **kwargs):
+    """Point the record at the registry meter matching its meter number"""
+    instance.meter_id = registry.meter_id(instance.meter_number)
+
+
+@receiver(pre_save, sender=Record)
+def fill_record_gps_address(sender, instance, **kwargs):
+    """Reverse-geocode gps_address from the coordinates when it was left blank"""
+    if instance.has_gps and geocoding.is_blank_address(instance.gps_address):
+        address = geocoding.reverse_geocode(instance.gps_latitude, instance.gps_longitude)
+        if address:
+            instance.gps_address = address
+
+
 @receiver(pre_save, sender=Record)
 def cache_record_state(sender, instance, **kwargs):
     """Cache the previous state before saving"""
@@ -151,6 +168,11 @@ def cache_record_state(sender, instance, **kwargs):
                 'customer_name': old_instance.customer_name,
                 'meter_reading': str(old_instance.meter_reading),
             }
+            # The record may move away from its current map tiles
+            maps.invalidate_record_tiles(
+                old_instance.operation_id, old_instance.gps_latitude, old_instance.gps_longitude
+            )
+            tiles.track_record_move(old_instance, instance)
         except Record.DoesNotExist:
             pass
 
@@ -244,3 +266,73 @@ def log_media_upload(sender, instance, created, **kwargs):
             },
             ip_address=ip_address
         )
+
+
+@receiver(post_delete, sender=RecordMedia)
+def log_media_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Log deleted media files, so devices get a sync tombstone for them.
+    
+    Media deleted along with its record or operation is covered by the
+    parent's own tombstone.
+    """
+    from threading import current_thread
+    
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if origin_model is not RecordMedia:
+        return
+    
+    DeletionLog.objects.create(
+        deleted_by=getattr(current_thread(), 'user', None),
+        item_type='media',
+        item_id=instance.pk,
+        item_name=(instance.image.name or instance.storage_url)[:255],
+        metadata={'record_id': instance.record_id},
+    )
+
+
+# =============================================
+# LATEST METER READINGS
+# =============================================
+
+@receiver(post_save, sender=Record)
+def update_latest_reading(sender, instance, **kwargs):
+    """Keep the meter's latest reading current (soft deletes fall back a visit)"""
+    readings.record_latest_reading(instance)
+
+
+@receiver(post_delete, sender=Record)
+def forget_latest_reading(sender, instance, **kwargs):
+    """Fall back to the previous visit when the latest one is deleted"""
+    readings.forget_reading(instance)
+
+
+@receiver(post_save, sender=AuditLog)
+def count_audit_write(sender, instance, created, **kwargs):
+    """Audit log write rate for /metrics (bulk writes count themselves)"""
+    if created:
+        metrics.AUDIT_WRITES.labels(instance.action_type).inc()
+
+
+# =============================================
+# MAP CLUSTER CACHE INVALIDATION
+# =============================================
+
+@receiver(post_save, sender=Record)
+@receiver(post_delete, sender=Record)
+def invalidate_record_map_tiles(sender, instance, **kwargs):
+    """Drop cached map clusters for the tiles containing the record"""
+    maps.invalidate_record_tiles(instance.operation_id, instance.gps_latitude, instance.gps_longitude)
+
+
+# =============================================
+# REGISTRY INDEX INVALIDATION
+# =============================================
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+@receiver(post_save, sender=Meter)
+@receiver(post_delete, sender=Meter)
+def invalidate_registry_index(sender, **kwargs):
+    """Rebuild the typeahead index after registry edits (e.g. in the admin)"""
+    registry.invalidate()
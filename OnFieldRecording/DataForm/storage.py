@@ -5,8 +5,8 @@ Handles file uploads to Supabase Storage bucket
 import os
 from io import BytesIO
 from decouple import config
-from supabase import create_client, Client
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from .metrics import storage_call
 import logging
 
 logger = logging.getLogger(__name__)
@@ -28,7 +28,11 @@ class SupabaseStorage:
             self.client = None
         else:
             try:
-                self.client: Client = create_client(self.url, self.key)
+                # The Supabase client pulls in an HTTP stack; only load it
+                # when storage is actually configured
+                from supabase import create_client
+                
+                self.client = create_client(self.url, self.key)
                 logger.info(f"Supabase storage initialized for bucket: {self.bucket_name}")
             except Exception as e:
                 logger.error(f"Failed to initialize Supabase client: {e}")
@@ -65,11 +69,12 @@ class SupabaseStorage:
                 file_content = file.read()
             
             # Upload to Supabase Storage
-            response = self.client.storage.from_(self.bucket_name).upload(
-                path=path,
-                file=file_content,
-                file_options={"content-type": self._get_content_type(file)}
-            )
+            with storage_call('upload'):
+                response = self.client.storage.from_(self.bucket_name).upload(
+                    path=path,
+                    file=file_content,
+                    file_options={"content-type": self._get_content_type(file)}
+                )
             
             # Get public URL
             public_url = self.client.storage.from_(self.bucket_name).get_public_url(path)
@@ -107,7 +112,8 @@ class SupabaseStorage:
             }
         
         try:
-            self.client.storage.from_(self.bucket_name).remove([path])
+            with storage_call('delete'):
+                self.client.storage.from_(self.bucket_name).remove([path])
             logger.info(f"File deleted successfully: {path}")
             return {'success': True, 'error': None}
             
@@ -134,22 +140,30 @@ class SupabaseStorage:
             logger.error(f"Failed to get public URL: {e}")
             return None
     
-    def list_files(self, prefix=''):
+    def list_files(self, prefix='', page_size=1000):
         """
         List files in a folder
         
         Args:
             prefix: Folder prefix (e.g., 'records/2024/')
+            page_size: Entries fetched per request
         
         Returns:
-            list: List of file objects
+            list: List of file objects (folders have no id)
         """
         if not self.is_configured():
             return []
         
         try:
-            files = self.client.storage.from_(self.bucket_name).list(prefix)
-            return files
+            files = []
+            while True:
+                with storage_call('list'):
+                    page = self.client.storage.from_(self.bucket_name).list(
+                        prefix, {'limit': page_size, 'offset': len(files)}
+                    )
+                files.extend(page)
+                if len(page) < page_size:
+                    return files
         except Exception as e:
             logger.error(f"Failed to list files: {e}")
             return []
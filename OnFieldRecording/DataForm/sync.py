@@ -0,0 +1,181 @@
+"""
+Delta sync for field devices (served at /api/v1/sync/)
+
+A device keeps one opaque cursor and asks for what changed since it:
+records, media, operation state and tombstones for deletions. Each stream
+is read by keyset on (timestamp, id), so a call costs the same however
+large the tables grow, and rows are sent packed as {fields, rows}.
+
+Clients apply upserts first, then tombstones. A tombstoned or archived
+operation takes its records with it (they are deleted without their own
+DeletionLog entries), and a tombstoned record its media; media deleted on
+its own gets a 'media' tombstone.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DeletionLog, Operation, Record, RecordMedia
+from .serializers import media_url
+
+# Rows per stream per call
+SYNC_PAGE_SIZE = 1000
+SYNC_MAX_PAGE_SIZE = 5000
+
+RECORD_FIELDS = [
+    'id', 'record_number', 'operation_id',
+    'customer_name', 'customer_contact',
+    'gps_latitude', 'gps_longitude', 'gps_address',
+    'account_number', 'meter_number', 'todays_balance', 'meter_reading',
+    'type_of_anomaly', 'remarks', 'status',
+    'created_by_id', 'created_by__username', 'created_at', 'updated_at',
+    'client_key',
+]
+MEDIA_FIELDS = ['id', 'record_id', 'image_url', 'uploaded_at', 'file_size', 'is_processed']
+OPERATION_FIELDS = [
+    'id', 'name', 'description', 'is_active',
+    'start_at', 'end_at', 'closed_at', 'archived', 'updated_at',
+]
+TOMBSTONE_FIELDS = ['type', 'id', 'deleted_at']
+
+
+class InvalidCursor(Exception):
+    """Raised for a sync cursor that cannot be decoded"""
+
+
+# =============================================
+# CURSOR
+# =============================================
+
+def encode_cursor(watermarks):
+    """Pack {stream: (timestamp, id)} into an opaque URL-safe token"""
+    data = {stream: [ts.isoformat(), pk] for stream, (ts, pk) in watermarks.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor(); an empty token means a full sync"""
+    if not token:
+        return {}
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return {
+            stream: (datetime.fromisoformat(ts), int(pk))
+            for stream, (ts, pk) in data.items()
+            if stream in STREAMS
+        }
+    except (ValueError, TypeError, AttributeError):
+        raise InvalidCursor('Malformed sync cursor.')
+
+
+# =============================================
+# STREAMS
+# =============================================
+
+def _after(queryset, timestamp_field, watermark, horizon):
+    """Rows in (watermark, horizon] in keyset order"""
+    queryset = queryset.filter(**{f'{timestamp_field}__lte': horizon})
+    if watermark is not None:
+        ts, pk = watermark
+        queryset = queryset.filter(
+            Q(**{f'{timestamp_field}__gt': ts}) | Q(**{timestamp_field: ts, 'id__gt': pk})
+        )
+    return queryset.order_by(timestamp_field, 'id')
+
+
+def _record_rows(watermark, horizon, limit, operation_id):
+    queryset = Record.objects.all()
+    if operation_id is not None:
+        queryset = queryset.filter(operation_id=operation_id)
+    # Soft-deleted rows are read too: they become tombstones
+    return list(_after(queryset, 'updated_at', watermark, horizon).values(*RECORD_FIELDS, 'is_deleted')[:limit])
+
+
+def _media_rows(watermark, horizon, limit, operation_id):
+    queryset = RecordMedia.objects.all()
+    if operation_id is not None:
+        queryset = queryset.filter(record__operation_id=operation_id)
+    rows = _after(queryset, 'uploaded_at', watermark, horizon).values(
+        'id', 'record_id', 'image', 'storage_url', 'uploaded_at', 'file_size', 'is_processed'
+    )[:limit]
+    return [dict(row, image_url=media_url(row)) for row in rows]
+
+
+def _operation_rows(watermark, horizon, limit, operation_id):
+    rows = _after(Operation.objects.all(), 'updated_at', watermark, horizon).values(
+        *[name for name in OPERATION_FIELDS if name != 'archived'], 'is_deleted', 'archive__purged_at'
+    )[:limit]
+    return [dict(row, archived=row['archive__purged_at'] is not None) for row in rows]
+
+
+def _deletion_rows(watermark, horizon, limit, operation_id):
+    return list(_after(DeletionLog.objects.all(), 'deleted_at', watermark, horizon).values(
+        'id', 'item_type', 'item_id', 'deleted_at'
+    )[:limit])
+
+
+# stream name → (reader, keyset timestamp column)
+STREAMS = {
+    'records': (_record_rows, 'updated_at'),
+    'media': (_media_rows, 'uploaded_at'),
+    'operations': (_operation_rows, 'updated_at'),
+    'deletions': (_deletion_rows, 'deleted_at'),
+}
+
+
+def _packed(fields, rows):
+    return {'fields': fields, 'rows': [[row[name] for name in fields] for row in rows]}
+
+
+def changes_since(cursor=None, limit=SYNC_PAGE_SIZE, operation_id=None):
+    """
+    Collect the changes after a sync cursor.
+
+    Rows newer than SYNC_SETTLE_SECONDS are left for the next call, so a
+    row whose transaction commits late with an earlier timestamp is not
+    skipped by the watermark.
+
+    Args:
+        cursor: Token from a previous call (None for a full sync)
+        limit: Maximum rows per stream
+        operation_id: Only records and media of this operation
+
+    Returns:
+        dict: Packed records, media, operations and tombstones, the next
+        cursor and has_more (call again straight away when True)
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    watermarks = decode_cursor(cursor)
+    horizon = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+    rows = {}
+    has_more = False
+    for stream, (reader, timestamp_field) in STREAMS.items():
+        # One extra row tells whether the stream has more
+        rows[stream] = reader(watermarks.get(stream), horizon, limit + 1, operation_id)
+        if len(rows[stream]) > limit:
+            has_more = True
+            rows[stream] = rows[stream][:limit]
+        if rows[stream]:
+            last = rows[stream][-1]
+            watermarks[stream] = (last[timestamp_field], last['id'])
+
+    tombstones = [('record', row['id'], row['updated_at']) for row in rows['records'] if row['is_deleted']]
+    tombstones += [('operation', row['id'], row['updated_at']) for row in rows['operations'] if row['is_deleted']]
+    tombstones += [(row['item_type'], row['item_id'], row['deleted_at']) for row in rows['deletions']]
+
+    return {
+        'records': _packed(RECORD_FIELDS, [row for row in rows['records'] if not row['is_deleted']]),
+        'media': _packed(MEDIA_FIELDS, rows['media']),
+        'operations': _packed(OPERATION_FIELDS, [row for row in rows['operations'] if not row['is_deleted']]),
+        'tombstones': {'fields': TOMBSTONE_FIELDS, 'rows': [list(tombstone) for tombstone in tombstones]},
+        'cursor': encode_cursor(watermarks),
+        'has_more': has_more,
+    }
@@ -0,0 +1,479 @@
+"""
+Synthetic field data for DataForm app
+Production-scale datasets for load tests and benchmarks: agents,
+operations and records whose GPS points cluster around towns and
+neighbourhoods, with per-meter reading histories, skewed balances and
+agent-dependent anomaly rates. Rows are inserted with bulk_create (COPY on
+PostgreSQL) and no signals, in chunks spread over worker processes; every
+chunk has its own seed, so a seed always produces the same data whatever
+the number of workers. See the generate_load_data command.
+"""
+
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models.sql import InsertQuery
+from django.utils import timezone
+
+from . import maps
+from .db import retry_on_locked
+from .models import Operation, Record, RecordMedia, UserProfile
+from .utils import allocate_record_numbers
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+CHUNK_SIZE = 20000
+INSERT_BATCH_SIZE = 2000
+
+# Town centres (name, latitude, longitude, share of meters)
+TOWNS = [
+    ('Nairobi', -1.2864, 36.8172, 0.38),
+    ('Mombasa', -4.0435, 39.6682, 0.14),
+    ('Kisumu', -0.0917, 34.7680, 0.09),
+    ('Nakuru', -0.3031, 36.0800, 0.09),
+    ('Eldoret', 0.5143, 35.2698, 0.07),
+    ('Thika', -1.0333, 37.0693, 0.06),
+    ('Machakos', -1.5177, 37.2634, 0.05),
+    ('Nyeri', -0.4201, 36.9476, 0.05),
+    ('Kakamega', 0.2827, 34.7519, 0.04),
+    ('Kitale', 1.0157, 35.0062, 0.03),
+]
+NEIGHBOURHOODS_PER_TOWN = 12
+NEIGHBOURHOOD_SPREAD_DEGREES = 0.05  # neighbourhood centres around the town centre
+METER_SPREAD_DEGREES = 0.004  # meters around their neighbourhood centre (~400 m)
+GPS_ERROR_DEGREES = 0.00005  # fix error of a visit (~5 m)
+NO_GPS_RATIO = 0.04
+
+FIRST_NAMES = [
+    'John', 'Mary', 'Peter', 'Jane', 'David', 'Sarah', 'James', 'Grace', 'Samuel', 'Lucy',
+    'Michael', 'Anne', 'Paul', 'Catherine', 'Joseph', 'Rose', 'Daniel', 'Faith', 'Eric', 'Alice',
+]
+LAST_NAMES = [
+    'Kamau', 'Wanjiku', 'Ochieng', 'Akinyi', 'Mwangi', 'Njeri', 'Otieno', 'Wambui', 'Mutua', 'Chebet',
+    'Kiprono', 'Nyambura', 'Omondi', 'Mumbi', 'Kipchoge', 'Achieng', 'Kariuki', 'Wangari', 'Owino', 'Njoki',
+]
+
+# Balance owed: log-normal (median about 1,800), a share fully paid up
+BALANCE_LOG_MEAN, BALANCE_LOG_SIGMA = 7.5, 1.1
+ZERO_BALANCE_RATIO = 0.15
+
+# Meter consumption per day: log-normal per meter (median about 7.4 units)
+CONSUMPTION_LOG_MEAN, CONSUMPTION_LOG_SIGMA = 2.0, 0.6
+INITIAL_READING_MAX = 20000
+METERS_INSTALLED = datetime(2020, 1, 1, tzinfo=dt_timezone.utc).timestamp()
+
+# Anomalies: base rate scaled by a per-agent factor, then a type by weight
+ANOMALY_RATE = 0.06
+ANOMALY_WEIGHTS = {
+    'meter_damaged': 0.25,
+    'meter_tampered': 0.20,
+    'incorrect_reading': 0.20,
+    'access_denied': 0.20,
+    'meter_missing': 0.05,
+    'customer_relocated': 0.05,
+    'other': 0.05,
+}
+
+# Visits happen during working hours (local time), most around late morning
+VISIT_HOUR_MEAN, VISIT_HOUR_SIGMA = 11.5, 2.2
+VISIT_HOURS = (7.0, 18.0)
+
+OPERATION_DAYS = 30
+
+# Status mix of records in closed operations
+STATUS_WEIGHTS = {'draft': 0.05, 'submitted': 0.15, 'verified': 0.80}
+
+PLACEHOLDER_PHOTO = 'synthetic/placeholder.jpg'
+
+
+def _rng(seed, *keys):
+    return np.random.default_rng([seed, *keys])
+
+
+# =============================================
+# METERS AND AGENTS
+# =============================================
+
+@lru_cache(maxsize=2)
+def meter_pool(count, seed):
+    """
+    Fixed attributes of every synthetic meter, as arrays indexed by meter.
+
+    Meters belong to a town (by TOWNS share) and one of its neighbourhoods;
+    their position, starting reading and consumption rate never change.
+    """
+    rng = _rng(seed, 0)
+    shares = np.array([town[3] for town in TOWNS])
+    town = rng.choice(len(TOWNS), size=count, p=shares / shares.sum())
+
+    centres = rng.normal(0, NEIGHBOURHOOD_SPREAD_DEGREES, size=(len(TOWNS), NEIGHBOURHOODS_PER_TOWN, 2))
+    centres += np.array([[town[1], town[2]] for town in TOWNS])[:, None, :]
+    neighbourhood = rng.integers(0, NEIGHBOURHOODS_PER_TOWN, size=count)
+    position = centres[town, neighbourhood] + rng.normal(0, METER_SPREAD_DEGREES, size=(count, 2))
+
+    return {
+        'town': town,
+        'neighbourhood': neighbourhood,
+        'lat': position[:, 0],
+        'lon': position[:, 1],
+        'initial_reading': rng.uniform(0, INITIAL_READING_MAX, size=count),
+        'daily_consumption': rng.lognormal(CONSUMPTION_LOG_MEAN, CONSUMPTION_LOG_SIGMA, size=count),
+        'first_name': rng.integers(0, len(FIRST_NAMES), size=count),
+        'last_name': rng.integers(0, len(LAST_NAMES), size=count),
+    }
+
+
+@lru_cache(maxsize=2)
+def agent_profiles(count, seed):
+    """
+    Home town, productivity and anomaly tendency of every agent.
+
+    The first agents cover one town each, the rest follow the meter shares;
+    meters of a town without agents are read by any agent.
+    """
+    rng = _rng(seed, 1)
+    shares = np.array([town[3] for town in TOWNS])
+    town = np.concatenate([
+        np.arange(min(count, len(TOWNS))),
+        rng.choice(len(TOWNS), size=max(count - len(TOWNS), 0), p=shares / shares.sum()),
+    ])
+    return {
+        'town': town,
+        'productivity': rng.lognormal(0, 0.5, size=count),
+        'anomaly_factor': rng.lognormal(0, 0.5, size=count),
+    }
+
+
+def create_agents(count):
+    """
+    Staff users synthetic_agent_<n> (reused if they exist), without usable passwords.
+
+    Returns:
+        list: User ids, in agent order
+    """
+    usernames = [f'synthetic_agent_{index:04d}' for index in range(count)]
+    existing = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    User.objects.bulk_create(
+        User(username=username, first_name='Synthetic', last_name=f'Agent {index}', password='!')
+        for index, username in enumerate(usernames)
+        if username not in existing
+    )
+    ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+    # bulk_create skips the signal that creates profiles
+    UserProfile.objects.bulk_create(
+        (UserProfile(user_id=user_id, role='staff') for user_id in ids.values()),
+        ignore_conflicts=True,
+    )
+    return [ids[username] for username in usernames]
+
+
+# =============================================
+# RECORD CHUNKS
+# =============================================
+
+@contextmanager
+def _explicit_timestamps():
+    """Let bulk inserts keep the generated created_at/uploaded_at values"""
+    fields = [
+        Record._meta.get_field('created_at'),
+        Record._meta.get_field('updated_at'),
+        RecordMedia._meta.get_field('uploaded_at'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def build_chunk(task):
+    """
+    Unsaved records (and the indices of those with a photo) of one chunk.
+
+    A task describes the chunk: seed, operation (id, index, window start
+    as local epoch seconds, UTC offset), its first visit index,
+    record numbers, meter and agent counts, agent ids and photo ratio.
+    """
+    seed, operation_index = task['seed'], task['operation_index']
+    rng = _rng(seed, 2, operation_index, task['chunk_index'])
+    size = len(task['record_numbers'])
+    meters = meter_pool(task['meters'], seed)
+    agents = agent_profiles(len(task['agent_ids']), seed)
+
+    # Every meter is visited at most once per operation: visit v of
+    # operation o reads meter (v * stride + o) mod meters
+    visits = np.arange(task['first_visit'], task['first_visit'] + size, dtype=np.int64)
+    meter = (visits * _stride(task['meters']) + operation_index) % task['meters']
+    town = meters['town'][meter]
+
+    # The agent is one of the town's agents, weighted by productivity
+    agent = np.empty(size, dtype=np.int64)
+    for town_index in np.unique(town):
+        members = np.flatnonzero(agents['town'] == town_index)
+        if not len(members):
+            members = np.arange(len(task['agent_ids']))
+        weights = agents['productivity'][members]
+        in_town = town == town_index
+        agent[in_town] = rng.choice(members, size=int(in_town.sum()), p=weights / weights.sum())
+
+    day = rng.integers(0, OPERATION_DAYS, size=size)
+    hour = np.clip(rng.normal(VISIT_HOUR_MEAN, VISIT_HOUR_SIGMA, size=size), *VISIT_HOURS)
+    # In time order: record numbers follow the visits, and inserts into the
+    # created_at indexes stay mostly sequential
+    timestamp = np.sort(task['window_start'] + day * 86400 + hour * 3600 - task['utc_offset'])
+
+    days_installed = (timestamp - METERS_INSTALLED) / 86400
+    reading = meters['initial_reading'][meter] + meters['daily_consumption'][meter] * days_installed
+    balance = np.where(
+        rng.random(size) < ZERO_BALANCE_RATIO, 0.0, rng.lognormal(BALANCE_LOG_MEAN, BALANCE_LOG_SIGMA, size=size)
+    )
+
+    anomaly_types = np.array(list(ANOMALY_WEIGHTS))
+    type_weights = np.array(list(ANOMALY_WEIGHTS.values()))
+    has_anomaly = rng.random(size) < ANOMALY_RATE * agents['anomaly_factor'][agent]
+    anomaly = np.where(
+        has_anomaly, rng.choice(anomaly_types, size=size, p=type_weights / type_weights.sum()), 'none'
+    )
+    # A misread meter shows less than it should
+    misread = anomaly == 'incorrect_reading'
+    reading[misread] *= rng.uniform(0.3, 0.9, size=int(misread.sum()))
+
+    located = rng.random(size) >= NO_GPS_RATIO
+    lat = meters['lat'][meter] + rng.normal(0, GPS_ERROR_DEGREES, size=size)
+    lon = meters['lon'][meter] + rng.normal(0, GPS_ERROR_DEGREES, size=size)
+
+    status = rng.choice(list(STATUS_WEIGHTS), size=size, p=list(STATUS_WEIGHTS.values()))
+    photo = rng.random(size) < task['photos_ratio']
+
+    labels = dict(Record.ANOMALY_CHOICES)
+    records = []
+    for i in range(size):
+        m = int(meter[i])
+        created_at = datetime.fromtimestamp(float(timestamp[i]), dt_timezone.utc)
+        records.append(Record(
+            operation_id=task['operation_id'],
+            record_number=task['record_numbers'][i],
+            customer_name=f"{FIRST_NAMES[meters['first_name'][m]]} {LAST_NAMES[meters['last_name'][m]]}",
+            customer_contact=f'+2547{(m * 7919 + 10_000_000) % 100_000_000:08d}',
+            gps_latitude=round(float(lat[i]), 7) if located[i] else None,
+            gps_longitude=round(float(lon[i]), 7) if located[i] else None,
+            gps_address=f"{TOWNS[town[i]][0]}, Zone {meters['neighbourhood'][m] + 1}" if located[i] else '',
+            account_number=f'ACC-{m:08d}',
+            meter_number=f'MTR-{m:08d}',
+            todays_balance=round(float(balance[i]), 2),
+            meter_reading=round(float(reading[i]), 2),
+            type_of_anomaly=str(anomaly[i]),
+            remarks=f'{labels[anomaly[i]]} observed on site.' if has_anomaly[i] else '',
+            status=str(status[i]),
+            created_by_id=task['agent_ids'][agent[i]],
+            created_at=created_at,
+            updated_at=created_at,
+        ))
+    return records, np.flatnonzero(photo)
+
+
+@lru_cache(maxsize=8)
+def _stride(count):
+    """Step coprime with count, so visits walk over distinct meters"""
+    stride = int(count * 0.618) | 1
+    while np.gcd(stride, count) != 1:
+        stride += 2
+    return stride
+
+
+def _insert_statements(model, objs):
+    """Compiled INSERT statements for unsaved instances"""
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    batch_size = min(INSERT_BATCH_SIZE, connection.ops.bulk_batch_size(fields, objs) or INSERT_BATCH_SIZE)
+    statements = []
+    with _explicit_timestamps():
+        for start in range(0, len(objs), batch_size):
+            query = InsertQuery(model)
+            query.insert_values(fields, objs[start:start + batch_size])
+            statements.extend(query.get_compiler(using=DEFAULT_DB_ALIAS).as_sql())
+    return statements
+
+
+@retry_on_locked
+def _execute(statements):
+    with transaction.atomic(), connection.cursor() as cursor:
+        for sql, params in statements:
+            cursor.execute(sql, params)
+
+
+def insert_chunk(task):
+    """
+    Build and insert one chunk (runs in a worker process).
+
+    SQLite has a single writer, so the statements are compiled before the
+    write transaction starts and workers only queue to execute them.
+
+    Returns:
+        tuple: (records inserted, photos attached)
+    """
+    from .ingest import _copy_records
+
+    records, with_photo = build_chunk(task)
+    if connection.vendor == 'postgresql':
+        with _explicit_timestamps(), transaction.atomic():
+            _copy_records(records)
+    else:
+        _execute(_insert_statements(Record, records))
+
+    photographed = [records[i] for i in with_photo]
+    ids = dict(Record.objects.filter(
+        record_number__in=[record.record_number for record in photographed]
+    ).values_list('record_number', 'id'))
+    _execute(_insert_statements(RecordMedia, [
+        RecordMedia(
+            record_id=ids[record.record_number],
+            image=PLACEHOLDER_PHOTO,
+            file_size=task['photo_size'],
+            uploaded_by_id=record.created_by_id,
+            uploaded_at=record.created_at + timedelta(minutes=2),
+            is_processed=True,
+        )
+        for record in photographed
+    ]))
+
+    maps.invalidate_locations(
+        task['operation_id'], [(record.gps_latitude, record.gps_longitude) for record in records]
+    )
+    return len(records), len(photographed)
+
+
+def _init_worker():
+    # Spawned (non-forked) workers start without Django set up
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+# =============================================
+# DATASET
+# =============================================
+
+def _placeholder_photo():
+    """Store the image every synthetic photo points to; returns its size"""
+    if not default_storage.exists(PLACEHOLDER_PHOTO):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1280, 960), (120, 160, 90)).save(buffer, 'JPEG', quality=85)
+        default_storage.save(PLACEHOLDER_PHOTO, ContentFile(buffer.getvalue()))
+    return default_storage.size(PLACEHOLDER_PHOTO)
+
+
+def create_operations(count, seed, created_by):
+    """
+    Closed operations of OPERATION_DAYS each, back to back up to today.
+
+    Raises:
+        ValueError: If this seed's operations already exist
+    """
+    names = [f'Synthetic {seed} - Operation {index + 1:03d}' for index in range(count)]
+    if Operation.objects.filter(name__in=names).exists():
+        raise ValueError(f'Synthetic operations of seed {seed} already exist')
+
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    operations = []
+    for index, name in enumerate(names):
+        start = today - timedelta(days=(count - index) * OPERATION_DAYS)
+        operations.append(Operation.objects.create(
+            name=name,
+            description=f'Synthetic load data (seed {seed})',
+            created_by_id=created_by,
+            start_at=start,
+            end_at=start + timedelta(days=OPERATION_DAYS),
+            closed_at=start + timedelta(days=OPERATION_DAYS),
+        ))
+    return operations
+
+
+def generate(records, operations=10, agents=50, photos_ratio=0.3, seed=0, workers=None,
+             chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Generate a synthetic dataset.
+
+    Args:
+        records: Total records, spread evenly over the operations
+        operations: Number of (closed) operations
+        agents: Number of field agents
+        photos_ratio: Share of records with a photo
+        seed: Random seed; the same seed gives the same data
+        workers: Worker processes (default: CPU count; 1 runs inline)
+        chunk_size: Records built and inserted per task
+        progress: Called with (records inserted so far, total)
+
+    Returns:
+        dict: Counts of records, photos, operations and agents
+
+    Raises:
+        ValueError: If this seed's operations already exist
+    """
+    agent_ids = create_agents(agents)
+    created = create_operations(operations, seed, agent_ids[0])
+    photo_size = _placeholder_photo() if photos_ratio > 0 else 0
+    meters = -(-records // operations)
+
+    # Numbers are allocated here, in order, so they do not depend on which
+    # worker finishes first
+    tasks = []
+    for index, operation in enumerate(created):
+        count = records // operations + (index < records % operations)
+        offset = timezone.localtime(operation.start_at).utcoffset().total_seconds()
+        for chunk_index, first in enumerate(range(0, count, chunk_size)):
+            tasks.append({
+                'seed': seed,
+                'operation_id': operation.pk,
+                'operation_index': index,
+                'chunk_index': chunk_index,
+                'window_start': operation.start_at.timestamp() + offset,
+                'utc_offset': offset,
+                'first_visit': first,
+                'record_numbers': allocate_record_numbers(operation, min(chunk_size, count - first)),
+                'meters': meters,
+                'agent_ids': agent_ids,
+                'photos_ratio': photos_ratio,
+                'photo_size': photo_size,
+            })
+
+    summary = {'records': 0, 'photos': 0, 'operations': len(created), 'agents': len(agent_ids)}
+
+    def done(result):
+        summary['records'] += result[0]
+        summary['photos'] += result[1]
+        if progress:
+            progress(summary['records'], records)
+
+    if workers == 1:
+        for task in tasks:
+            done(insert_chunk(task))
+    else:
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            for future in as_completed([pool.submit(insert_chunk, task) for task in tasks]):
+                done(future.result())
+
+    logger.info(f"Synthetic data (seed {seed}): {summary['records']} records in {len(created)} operations")
+    return summary
@@ -0,0 +1,41 @@
+"""
+Test helpers for DataForm app
+"""
+
+from . import metrics
+
+
+class ViewBudgetMixin:
+    """
+    TestCase mixin asserting the per-view budgets of settings.VIEW_BUDGETS.
+
+    Measures through RequestMetricsMiddleware, so the numbers are the ones
+    production logs.
+    """
+
+    def assertWithinBudget(self, url, method='get', check_latency=False, **kwargs):
+        """
+        Request url with the test client and check its view's budget.
+
+        Latency is only checked on request (check_latency=True); test
+        databases are too noisy for it to be a default.
+
+        Returns:
+            HttpResponse: The response, for further assertions
+        """
+        with metrics.capture() as samples:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertTrue(samples, f'No named view handled {url}')
+
+        sample = samples[-1]
+        budget = metrics.budget_for(sample.view)
+        self.assertLessEqual(
+            sample.queries, budget['queries'],
+            f"{sample.view} ran {sample.queries} queries (budget {budget['queries']})",
+        )
+        if check_latency:
+            self.assertLessEqual(
+                sample.latency_ms, budget['latency_ms'],
+                f"{sample.view} took {sample.latency_ms:.0f} ms (budget {budget['latency_ms']})",
+            )
+        return response
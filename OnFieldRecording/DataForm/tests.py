@@ -3,7 +3,7 @@ Unit Tests for OnField Recording System
 Tests models, views, and critical business logic
 """
 import pytest
-from django.test import TestCase, Client
+from django.test import TestCase, Client, LiveServerTestCase
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
@@ -12,7 +12,9 @@ from DataForm.models import (
     UserProfile, Operation, Record, RecordMedia,
     AuditLog, DeletionLog
 )
+from DataForm.testing import ViewBudgetMixin
 from datetime import timedelta
+import os
 
 
 # ============================================
@@ -349,3 +351,1976 @@ class AuditLogTest(TestCase):
         self.assertEqual(log.user, self.user)
         self.assertIsNotNone(log.timestamp)
 
+
+
+class MapDataViewTest(TestCase):
+    """Test map clustering endpoint"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        self.client = Client()
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='admin123'
+        )
+        self.admin_user.profile.role = 'admin'
+        self.admin_user.profile.save()
+        
+        self.operation = Operation.objects.create(
+            name='Map Operation',
+            created_by=self.admin_user,
+            is_active=True
+        )
+        for i in range(5):
+            self.create_record(Decimal('-1.2800') + Decimal(i) / 10000, Decimal('36.8200'))
+    
+    def create_record(self, lat, lon):
+        return Record.objects.create(
+            operation=self.operation,
+            customer_name='Map Customer',
+            customer_contact='+1234567890',
+            account_number='ACC001',
+            meter_number='MTR001',
+            todays_balance=Decimal('10.00'),
+            meter_reading=Decimal('100'),
+            gps_latitude=lat,
+            gps_longitude=lon,
+            created_by=self.admin_user
+        )
+    
+    def get_map(self, **params):
+        params.setdefault('bbox', '36,-2,38,0')
+        return self.client.get(reverse('api_map_data'), params)
+    
+    def test_clusters_at_low_zoom(self):
+        """Nearby records are returned as one cluster"""
+        self.client.login(username='admin', password='admin123')
+        response = self.get_map(zoom=5, operation=self.operation.pk)
+        self.assertEqual(response.status_code, 200)
+        features = response.json()['features']
+        self.assertEqual(len(features), 1)
+        self.assertEqual(features[0]['properties']['count'], 5)
+    
+    def test_cache_invalidated_on_record_write(self):
+        """A new record shows up in an already cached tile"""
+        from django.test import override_settings
+        
+        self.client.login(username='admin', password='admin123')
+        with override_settings(MAP_CLUSTER_CACHE=True):
+            self.get_map(zoom=5)
+            self.create_record(Decimal('-1.2805'), Decimal('36.8201'))
+            response = self.get_map(zoom=5, format='packed')
+        data = response.json()['data']
+        self.assertEqual(sum(data[2::4]), 6)
+    
+    def test_uncached_without_shared_cache(self):
+        """Without MAP_CLUSTER_CACHE tiles are neither cached nor invalidated"""
+        from unittest import mock
+        from DataForm import maps
+        
+        self.client.login(username='admin', password='admin123')
+        with mock.patch.object(maps, 'cache') as cache, mock.patch.object(maps, 'bump_cache_version') as bump:
+            self.get_map(zoom=5)
+            self.create_record(Decimal('-1.2805'), Decimal('36.8201'))
+        self.assertFalse(cache.method_calls)
+        bump.assert_not_called()
+    
+    def test_invalid_bbox(self):
+        """Malformed bbox is rejected"""
+        self.client.login(username='admin', password='admin123')
+        response = self.get_map(bbox='1,2,3')
+        self.assertEqual(response.status_code, 400)
+
+
+class DensityTileRenderTest(TestCase):
+    """Test density tile pre-rendering"""
+    
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_dir.name)
+        self.settings_override.enable()
+        
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.operation = Operation.objects.create(
+            name='Tile Operation',
+            created_by=self.user,
+            is_active=True
+        )
+        self.record = Record.objects.create(
+            operation=self.operation,
+            customer_name='Tile Customer',
+            customer_contact='+1234567890',
+            account_number='ACC001',
+            meter_number='MTR001',
+            todays_balance=Decimal('10.00'),
+            meter_reading=Decimal('100'),
+            gps_latitude=Decimal('-1.2800'),
+            gps_longitude=Decimal('36.8200'),
+            created_by=self.user
+        )
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_dir.cleanup()
+    
+    def test_render_zoom_counts(self):
+        """Points are counted into the right tile"""
+        import zlib
+        from array import array
+        from DataForm.tiles import render_zoom
+        
+        results = render_zoom(0, array('d', [36.82, 36.82]), array('d', [-1.28, -1.28]), None, ('grid',))
+        self.assertEqual(len(results), 1)
+        x, y, rendered = results[0]
+        grid = array('I', zlib.decompress(rendered['grid']))
+        self.assertEqual((x, y), (0, 0))
+        self.assertEqual(sum(grid), 2)
+    
+    def test_incremental_render(self):
+        """Second run only re-renders tiles with changed records"""
+        from django.core.files.storage import default_storage
+        from DataForm.tiles import render_operation_tiles, tile_path
+        
+        summary = render_operation_tiles(self.operation, zoom_levels=[2, 3], workers=1)
+        self.assertTrue(summary['full'])
+        self.assertEqual(summary['rendered'], 2)
+        self.assertTrue(default_storage.exists(tile_path(self.operation.pk, 2, 2, 2, 'png')))
+        
+        summary = render_operation_tiles(self.operation, zoom_levels=[2, 3], workers=1)
+        self.assertFalse(summary['full'])
+        self.assertEqual(summary['rendered'], 0)
+    
+    def test_moved_record_clears_old_tile(self):
+        """Tiles a record moved out of, or left with its operation, are re-rendered"""
+        from django.core.files.storage import default_storage
+        from DataForm.models import TileLocationChange
+        from DataForm.tiles import render_operation_tiles, tile_path
+        
+        render_operation_tiles(self.operation, zoom_levels=[2], workers=1)
+        old_tile = tile_path(self.operation.pk, 2, 2, 2, 'png')
+        self.assertTrue(default_storage.exists(old_tile))
+        
+        self.record.gps_latitude = Decimal('40.7128')
+        self.record.gps_longitude = Decimal('-74.0060')
+        self.record.save()
+        summary = render_operation_tiles(self.operation, zoom_levels=[2], workers=1)
+        self.assertFalse(summary['full'])
+        self.assertEqual((summary['rendered'], summary['removed']), (1, 1))
+        self.assertFalse(default_storage.exists(old_tile))
+        self.assertFalse(TileLocationChange.objects.exists())
+        
+        other = Operation.objects.create(name='Other Operation', created_by=self.user)
+        self.record.operation = other
+        self.record.save()
+        summary = render_operation_tiles(self.operation, zoom_levels=[2], workers=1)
+        self.assertEqual((summary['rendered'], summary['removed']), (0, 1))
+
+
+    def test_full_render_removes_stale_tiles(self):
+        """Tiles of dropped zoom levels or left empty by a deletion are removed"""
+        from django.core.files.storage import default_storage
+        from DataForm.tiles import render_operation_tiles, tile_path
+        
+        render_operation_tiles(self.operation, zoom_levels=[2, 3], workers=1)
+        summary = render_operation_tiles(self.operation, zoom_levels=[2], workers=1)
+        self.assertTrue(summary['full'])
+        self.assertEqual((summary['rendered'], summary['removed']), (1, 1))
+        self.assertFalse(default_storage.exists(tile_path(self.operation.pk, 3, 4, 4, 'png')))
+        self.assertTrue(default_storage.exists(tile_path(self.operation.pk, 2, 2, 2, 'png')))
+        
+        # As the record delete view does
+        DeletionLog.objects.create(
+            deleted_by=self.user, item_type='record', item_id=self.record.pk,
+            item_name=self.record.record_number, metadata={'operation': self.operation.name},
+        )
+        self.record.delete()
+        summary = render_operation_tiles(self.operation, zoom_levels=[2], workers=1)
+        self.assertTrue(summary['full'])
+        self.assertEqual((summary['rendered'], summary['removed']), (0, 1))
+        self.assertFalse(default_storage.exists(tile_path(self.operation.pk, 2, 2, 2, 'png')))
+
+
+class ReverseGeocodingTest(TestCase):
+    """Test offline reverse geocoding of gps_address"""
+    
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from DataForm import geocoding
+        
+        self.gazetteer_file = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        self.gazetteer_file.write(
+            'name,latitude,longitude,region,country\n'
+            'Westlands,-1.2676,36.8108,Nairobi,KE\n'
+            'Kasarani,-1.2219,36.8969,Nairobi,KE\n'
+        )
+        self.gazetteer_file.close()
+        self.settings_override = override_settings(GAZETTEER_PATH=self.gazetteer_file.name)
+        self.settings_override.enable()
+        geocoding.clear_caches()
+        
+        self.user = User.objects.create_user(username='staff', password='staff123')
+        self.operation = Operation.objects.create(
+            name='Geo Operation',
+            created_by=self.user,
+            is_active=True
+        )
+    
+    def tearDown(self):
+        from DataForm import geocoding
+        
+        self.settings_override.disable()
+        os.unlink(self.gazetteer_file.name)
+        geocoding.clear_caches()
+    
+    def create_record(self, address):
+        return Record.objects.create(
+            operation=self.operation,
+            customer_name='Geo Customer',
+            customer_contact='+1234567890',
+            account_number='ACC001',
+            meter_number='MTR001',
+            todays_balance=Decimal('10.00'),
+            meter_reading=Decimal('100'),
+            gps_latitude=Decimal('-1.2680'),
+            gps_longitude=Decimal('36.8110'),
+            gps_address=address,
+            created_by=self.user
+        )
+    
+    def test_blank_address_is_filled(self):
+        """Blank and placeholder addresses are resolved to the nearest place"""
+        from DataForm.models import GeocodeCache
+        
+        self.assertEqual(self.create_record('').gps_address, 'Westlands, Nairobi, KE')
+        self.assertEqual(self.create_record('Lat: -1.268, Lon: 36.811').gps_address, 'Westlands, Nairobi, KE')
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+    
+    def test_manual_address_is_kept(self):
+        """Typed addresses are never overwritten"""
+        self.assertEqual(self.create_record('AH-2324-2424').gps_address, 'AH-2324-2424')
+    
+    def test_backfill_command(self):
+        """Historical records are backfilled in bulk"""
+        from django.core.management import call_command
+        
+        record = self.create_record('AH-1')
+        Record.objects.filter(pk=record.pk).update(gps_address='')
+        call_command('backfill_gps_addresses', workers=1, stdout=open(os.devnull, 'w'))
+        updated_at = record.updated_at
+        record.refresh_from_db()
+        self.assertEqual(record.gps_address, 'Westlands, Nairobi, KE')
+        # Sync clients see the change
+        self.assertGreater(record.updated_at, updated_at)
+    
+    def test_cached_concurrently_inside_transaction(self):
+        """A cache row stored by another worker does not break the record save"""
+        from unittest import mock
+        from django.db import transaction
+        from DataForm import geocoding
+        from DataForm.models import GeocodeCache
+        
+        lat, lon = geocoding.round_coordinates(Decimal('-1.2680'), Decimal('36.8110'))
+        GeocodeCache.objects.create(latitude=lat, longitude=lon, address='Stored elsewhere')
+        with transaction.atomic():
+            # The cache lookup misses, as if the other worker committed just after it
+            with mock.patch.object(GeocodeCache.objects, 'filter', return_value=GeocodeCache.objects.none()):
+                record = self.create_record('')
+            self.assertEqual(Record.objects.filter(pk=record.pk).count(), 1)
+        self.assertEqual(record.gps_address, 'Westlands, Nairobi, KE')
+    
+    def test_nearest_at_high_latitude(self):
+        """Rings are not cut off early where longitude cells are narrow"""
+        from DataForm.geocoding import Gazetteer
+        
+        gazetteer = Gazetteer([(60.19, 10.19, 'North-east'), (60.05, 10.35, 'East')])
+        self.assertEqual(gazetteer.nearest(60.05, 10.05), 'East')
+
+
+class SlidingSessionTest(TestCase):
+    """Test sliding session expiry and the expired-session sweeper"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='staff', password='staff123')
+        self.client.login(username='staff', password='staff123')
+    
+    def get_session(self):
+        from django.contrib.sessions.models import Session
+        return Session.objects.get(session_key=self.client.session.session_key)
+    
+    def test_session_not_saved_on_every_request(self):
+        """Requests well within the session lifetime do not write the session"""
+        self.client.get(reverse('api_active_operation'))
+        expire_date = self.get_session().expire_date
+        self.client.get(reverse('api_active_operation'))
+        self.assertEqual(self.get_session().expire_date, expire_date)
+    
+    def test_session_refreshed_near_expiry(self):
+        """The session is re-saved once the remaining lifetime drops below the threshold"""
+        import time
+        from django.conf import settings
+        from DataForm.middleware import SlidingSessionMiddleware
+        
+        self.client.get(reverse('api_active_operation'))
+        session = self.client.session
+        session[SlidingSessionMiddleware.REFRESH_KEY] = int(time.time()) - settings.SESSION_COOKIE_AGE + 10
+        session.save()
+        
+        self.client.get(reverse('api_active_operation'))
+        refreshed_at = self.client.session[SlidingSessionMiddleware.REFRESH_KEY]
+        self.assertGreater(refreshed_at, int(time.time()) - 5)
+    
+    def test_clear_expired_sessions(self):
+        """Expired sessions are deleted in batches, live ones are kept"""
+        from django.contrib.sessions.models import Session
+        from django.core.management import call_command
+        
+        for i in range(5):
+            Session.objects.create(
+                session_key=f'expired{i}',
+                session_data='',
+                expire_date=timezone.now() - timedelta(days=1)
+            )
+        call_command('clear_expired_sessions', batch_size=2, stdout=open(os.devnull, 'w'))
+        self.assertEqual(Session.objects.filter(expire_date__lt=timezone.now()).count(), 0)
+        self.assertTrue(Session.objects.filter(session_key=self.client.session.session_key).exists())
+
+
+class PrincipalTest(TestCase):
+    """Test request-scoped role resolution"""
+    
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='admin123')
+        self.admin_user.profile.role = 'admin'
+        self.admin_user.profile.save()
+    
+    def test_backend_loads_profile_with_user(self):
+        """Session user comes with its profile, no extra query for role checks"""
+        from DataForm.auth import ProfileModelBackend
+        
+        with self.assertNumQueries(1):
+            user = ProfileModelBackend().get_user(self.admin_user.pk)
+            self.assertEqual(user.profile.role, 'admin')
+    
+    def test_principal_memoized_on_request(self):
+        """Role is resolved once per request"""
+        from django.test import RequestFactory
+        from DataForm.auth import get_principal
+        
+        request = RequestFactory().get('/')
+        request.user = self.admin_user
+        principal = get_principal(request)
+        self.assertTrue(principal.is_admin)
+        self.assertTrue(principal.can_access_staff_views)
+        self.assertIs(get_principal(request), principal)
+    
+    def test_sessions_of_model_backend_stay_valid(self):
+        """Users logged in through ModelBackend are not logged out"""
+        from django.contrib.auth import get_user
+        from django.test import RequestFactory
+        
+        self.client.force_login(self.admin_user, backend='django.contrib.auth.backends.ModelBackend')
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        self.assertEqual(get_user(request), self.admin_user)
+
+
+class RecordResolutionTest(TestCase):
+    """Test that record views load the record once"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.staff_user = User.objects.create_user(username='staff', password='staff123')
+        self.operation = Operation.objects.create(
+            name='Resolution Operation',
+            created_by=self.staff_user,
+            is_active=True
+        )
+        self.record = Record.objects.create(
+            operation=self.operation,
+            customer_name='Resolution Customer',
+            customer_contact='+1234567890',
+            account_number='ACC001',
+            meter_number='MTR001',
+            todays_balance=Decimal('10.00'),
+            meter_reading=Decimal('100.00'),
+            type_of_anomaly='none',
+            created_by=self.staff_user
+        )
+        self.client.login(username='staff', password='staff123')
+    
+    def test_record_update_fetches_record_once(self):
+        """Permission check and view share one record query plus the media prefetch"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('record_update', args=[self.record.pk]))
+        self.assertEqual(response.status_code, 200)
+        
+        record_queries = [
+            q['sql'] for q in queries.captured_queries
+            if 'FROM "DataForm_record"' in q['sql'] or 'FROM "DataForm_recordmedia"' in q['sql']
+        ]
+        self.assertEqual(len(record_queries), 2)
+    
+    def test_record_detail_query_count(self):
+        """Detail page: session, user+profile, active operation, record, media"""
+        # First request after login stamps the sliding-session refresh time
+        self.client.get(reverse('record_detail', args=[self.record.pk]))
+        
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('record_detail', args=[self.record.pk]))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_deleted_record_not_found(self):
+        """Soft-deleted records 404 on detail"""
+        self.record.is_deleted = True
+        self.record.save()
+        response = self.client.get(reverse('record_detail', args=[self.record.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class SQLiteConcurrencyTest(TestCase):
+    """Stress-test record numbering with concurrent writers on a SQLite file database"""
+    
+    def run_manage(self, db_path, *args):
+        import subprocess
+        import sys
+        from django.conf import settings
+        
+        env = dict(os.environ, DB_ENGINE='django.db.backends.sqlite3', DB_NAME=db_path)
+        return subprocess.run(
+            [sys.executable, 'manage.py', *args],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=300
+        )
+    
+    def test_sqlite_connection_pragmas(self):
+        """SQLite connections use WAL settings and BEGIN IMMEDIATE"""
+        from django.db import connection
+        
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+    
+    def test_concurrent_agents_get_unique_numbers(self):
+        """20 concurrent agents create records without lost writes or duplicate numbers"""
+        import tempfile
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'stress.sqlite3')
+            migrate = self.run_manage(db_path, 'migrate', '--verbosity', '0')
+            self.assertEqual(migrate.returncode, 0, migrate.stderr)
+            
+            result = self.run_manage(db_path, 'stress_record_numbering', '--agents', '20', '--records', '10')
+            self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+            self.assertIn('200/200', result.stdout)
+
+
+class PartialIndexTest(TestCase):
+    """Test that view queries use the live-record indexes"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='staff', password='staff123')
+        self.operation = Operation.objects.create(
+            name='Index Operation',
+            created_by=self.user,
+            is_active=True
+        )
+        Record.objects.create(
+            operation=self.operation,
+            customer_name='Index Customer',
+            customer_contact='+1234567890',
+            account_number='ACC001',
+            meter_number='MTR001',
+            todays_balance=Decimal('10.00'),
+            meter_reading=Decimal('100.00'),
+            type_of_anomaly='none',
+            created_by=self.user
+        )
+    
+    def test_explain_queries_reports_no_full_scans(self):
+        """Every query from explain_queries is answered through an index"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn('All queries use an index', out.getvalue())
+        self.assertIn('record_live_creator_st_idx', out.getvalue())
+    
+    def test_record_list_date_filter(self):
+        """Date range filter keeps records of the whole end day"""
+        self.client.login(username='staff', password='staff123')
+        today = timezone.localdate().isoformat()
+        response = self.client.get(reverse('record_list'), {'date_from': today, 'date_to': today})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_count'], 1)
+
+
+class AuditLogPartitioningTest(TestCase):
+    """Test partition helpers and partition-aware audit queries"""
+    
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin', password='admin123', is_staff=True, is_superuser=True)
+        self.admin_user.profile.role = 'admin'
+        self.admin_user.profile.save()
+    
+    def test_month_helpers(self):
+        """Month arithmetic and partition naming"""
+        from datetime import date
+        from DataForm import partitioning
+        
+        self.assertEqual(partitioning.add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partitioning.add_months(date(2025, 1, 1), -1), date(2024, 12, 1))
+        self.assertEqual(
+            list(partitioning.month_range(date(2025, 11, 15), date(2026, 1, 1))),
+            [date(2025, 11, 1), date(2025, 12, 1), date(2026, 1, 1)]
+        )
+        self.assertEqual(partitioning.partition_name('DataForm_auditlog', date(2026, 2, 1)), 'DataForm_auditlog_2026_02')
+        self.assertEqual(partitioning.partition_month('DataForm_auditlog', 'DataForm_auditlog_2026_02'), date(2026, 2, 1))
+        self.assertIsNone(partitioning.partition_month('DataForm_auditlog', 'DataForm_auditlog_default'))
+        self.assertEqual(partitioning.partition_bound(date(2026, 2, 1)), '2026-02-01 00:00:00+00:00')
+    
+    def test_manage_partitions_requires_postgresql(self):
+        """Command is a no-op on other databases"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.db import connection
+        
+        if connection.vendor == 'postgresql':
+            self.skipTest('Checks the non-PostgreSQL fallback')
+        out = StringIO()
+        call_command('manage_partitions', stdout=out)
+        self.assertIn('only available on PostgreSQL', out.getvalue())
+    
+    def test_admin_defaults_to_recent_period(self):
+        """Audit changelist hides entries older than the default period"""
+        recent = AuditLog.objects.create(user=self.admin_user, action_type='login', target_type='user', target_id=1)
+        old = AuditLog.objects.create(user=self.admin_user, action_type='login', target_type='user', target_id=2)
+        AuditLog.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=400))
+        
+        self.client.login(username='admin', password='admin123')
+        url = reverse('admin:DataForm_auditlog_changelist')
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        shown = {log.pk for log in response.context['cl'].result_list}
+        self.assertIn(recent.pk, shown)
+        self.assertNotIn(old.pk, shown)
+        
+        response = self.client.get(url, {'period': 'all'})
+        shown = {log.pk for log in response.context['cl'].result_list}
+        self.assertIn(old.pk, shown)
+    
+    def test_record_detail_shows_audit_trail_to_admin(self):
+        """Admins see the record's audit entries"""
+        operation = Operation.objects.create(name='Audit Operation', created_by=self.admin_user, is_active=True)
+        record = Record.objects.create(
+            operation=operation,
+            customer_name='Audit Customer',
+            customer_contact='+1234567890',
+            account_number='ACC001',
+            meter_number='MTR001',
+            todays_balance=Decimal('10.00'),
+            meter_reading=Decimal('100.00'),
+            type_of_anomaly='none',
+            created_by=self.admin_user
+        )
+        self.client.login(username='admin', password='admin123')
+        response = self.client.get(reverse('record_detail', args=[record.pk]))
+        self.assertEqual([log.action_type for log in response.context['audit_logs']], ['create'])
+
+
+class OperationArchiveTest(TestCase):
+    """Test cold archival of closed operations"""
+    
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_dir.name)
+        self.settings_override.enable()
+        
+        self.admin_user = User.objects.create_user(username='admin', password='admin123')
+        self.admin_user.profile.role = 'admin'
+        self.admin_user.profile.save()
+        
+        self.operation = Operation.objects.create(
+            name='Archive Operation',
+            created_by=self.admin_user,
+            is_active=True
+        )
+        for i, anomaly in enumerate(['none', 'meter_damaged', 'meter_damaged']):
+            Record.objects.create(
+                operation=self.operation,
+                customer_name=f'Archive Customer {i}',
+                customer_contact='+1234567890',
+                account_number=f'ACC00{i}',
+                meter_number=f'MTR00{i}',
+                todays_balance=Decimal('10.50'),
+                meter_reading=Decimal('100.25'),
+                gps_latitude=Decimal('-1.2800000'),
+                gps_longitude=Decimal('36.8200000'),
+                gps_address='Nairobi',
+                type_of_anomaly=anomaly,
+                created_by=self.admin_user
+            )
+        self.operation.close_operation(self.admin_user)
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_dir.cleanup()
+    
+    def test_archive_purges_live_rows(self):
+        """Archived rows leave the live tables and the stub records the counts"""
+        from DataForm.archive import archive_operation
+        
+        record_ids = list(Record.objects.filter(operation=self.operation).values_list('pk', flat=True))
+        archive = archive_operation(self.operation, user=self.admin_user, fmt='jsonl.gz')
+        
+        self.assertTrue(archive.is_purged)
+        self.assertEqual(archive.record_count, 3)
+        self.assertEqual(archive.audit_count, 3)
+        self.assertFalse(Record.objects.filter(operation=self.operation).exists())
+        self.assertFalse(AuditLog.objects.filter(target_type='record', target_id__in=record_ids).exists())
+    
+    def test_records_edited_before_purge_are_kept(self):
+        """Edits made between export and purge are not lost"""
+        from unittest import mock
+        from DataForm import archive as archive_module
+        from DataForm.archive import ArchiveError, archive_operation, operation_records
+        
+        with mock.patch.object(archive_module, 'purge_archived_rows'):
+            archive = archive_operation(self.operation, fmt='jsonl.gz')
+        edited = Record.objects.filter(operation=self.operation).order_by('pk').last()
+        edited.remarks = 'Corrected after closing'
+        edited.save()
+        
+        with self.assertRaises(ArchiveError):
+            archive_module.purge_archived_rows(archive, batch_size=2)
+        self.assertEqual(list(Record.objects.filter(operation=self.operation)), [edited])
+        self.assertTrue(AuditLog.objects.filter(target_type='record', target_id=edited.pk).exists())
+        archive.refresh_from_db()
+        self.assertFalse(archive.is_purged)
+        
+        # Running the archival again exports the edit, then purges
+        archive = archive_operation(Operation.objects.get(pk=self.operation.pk), fmt='jsonl.gz')
+        self.assertTrue(archive.is_purged)
+        self.assertEqual(archive.record_count, 3)
+        self.assertFalse(Record.objects.filter(operation=self.operation).exists())
+        records = operation_records(Operation.objects.get(pk=self.operation.pk))
+        self.assertEqual(records.order_by('id')[2].remarks, 'Corrected after closing')
+    
+    def test_archived_records_round_trip(self):
+        """Records read back from the archive keep their values"""
+        from DataForm.archive import archive_operation, operation_records
+        
+        original = Record.objects.filter(operation=self.operation).order_by('pk').first()
+        archive_operation(self.operation, fmt='jsonl.gz')
+        
+        records = operation_records(Operation.objects.get(pk=self.operation.pk))
+        restored = records.order_by('id')[0]
+        self.assertEqual(records.count(), 3)
+        self.assertEqual(restored.record_number, original.record_number)
+        self.assertEqual(restored.todays_balance, Decimal('10.50'))
+        self.assertEqual(restored.gps_latitude, original.gps_latitude)
+        self.assertEqual(restored.created_at, original.created_at)
+        self.assertEqual(restored.created_by, self.admin_user)
+    
+    def test_reports_and_search_read_archive(self):
+        """Operation detail, search and exports work on archived operations"""
+        from DataForm.archive import archive_operation
+        
+        archive_operation(self.operation, fmt='jsonl.gz')
+        self.client.login(username='admin', password='admin123')
+        
+        response = self.client.get(reverse('operation_detail', args=[self.operation.pk]))
+        self.assertEqual(response.context['stats']['total_records'], 3)
+        self.assertEqual(response.context['anomaly_stats'], [{'type_of_anomaly': 'meter_damaged', 'count': 2}])
+        
+        response = self.client.get(reverse('operation_search', args=[self.operation.pk]), {'q': 'customer 1'})
+        self.assertEqual(response.context['total_results'], 1)
+        
+        response = self.client.get(reverse('operation_export_xlsx', args=[self.operation.pk]))
+        self.assertEqual(response.status_code, 200)
+    
+    def test_active_operation_cannot_be_archived(self):
+        """Only closed operations are archived"""
+        from DataForm.archive import ArchiveError, archive_operation
+        
+        self.operation.reopen_operation()
+        with self.assertRaises(ArchiveError):
+            archive_operation(self.operation, fmt='jsonl.gz')
+        self.assertEqual(Record.objects.filter(operation=self.operation).count(), 3)
+    
+    def test_verification_detects_corruption(self):
+        """A checksum mismatch fails verification"""
+        from DataForm.archive import ArchiveError, _write_table, verify_table
+        
+        count, checksum = _write_table(Record.objects.filter(operation=self.operation), 'archives/test.jsonl.gz', 'jsonl.gz')
+        verify_table('archives/test.jsonl.gz', 'jsonl.gz', count, checksum)
+        with self.assertRaises(ArchiveError):
+            verify_table('archives/test.jsonl.gz', 'jsonl.gz', count, '0' * 64)
+
+
+class RecordAPITest(TestCase):
+    """Test the REST API for records, operations and media"""
+    
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+        
+        self.user = User.objects.create_user(username='staff', password='staff123')
+        self.token = Token.objects.create(user=self.user)
+        self.operation = Operation.objects.create(
+            name='API Operation',
+            created_by=self.user,
+            is_active=True
+        )
+        for i in range(5):
+            Record.objects.create(
+                operation=self.operation,
+                customer_name=f'API Customer {i}',
+                customer_contact='+1234567890',
+                account_number=f'ACC00{i}',
+                meter_number=f'MTR00{i}',
+                todays_balance=Decimal('10.50'),
+                meter_reading=Decimal('100.00'),
+                type_of_anomaly='none' if i % 2 else 'meter_damaged',
+                created_by=self.user
+            )
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+    
+    def test_requires_authentication(self):
+        """Anonymous clients are rejected"""
+        response = self.client.get('/api/v1/records/')
+        self.assertIn(response.status_code, (401, 403))
+    
+    def test_record_list_values_and_fields(self):
+        """List returns only the selected fields with decimals as strings"""
+        response = self.client.get('/api/v1/records/', {'fields': 'id,record_number,todays_balance'}, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(len(payload['results']), 5)
+        self.assertEqual(set(payload['results'][0]), {'id', 'record_number', 'todays_balance'})
+        self.assertEqual(payload['results'][0]['todays_balance'], '10.50')
+    
+    def test_cursor_pagination_walks_all_records(self):
+        """Keyset pages cover every record exactly once"""
+        seen = []
+        url = '/api/v1/records/?page_size=2&fields=id'
+        while url:
+            payload = self.client.get(url, **self.auth).json()
+            seen.extend(row['id'] for row in payload['results'])
+            url = payload['next']
+        self.assertEqual(sorted(seen), sorted(Record.objects.values_list('pk', flat=True)))
+    
+    def test_record_list_filters(self):
+        """Anomaly filter narrows the list"""
+        payload = self.client.get('/api/v1/records/', {'anomaly': 'meter_damaged'}, **self.auth).json()
+        self.assertEqual(len(payload['results']), 3)
+        
+        response = self.client.get('/api/v1/records/', {'operation': 'abc'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+    
+    def test_record_list_query_count(self):
+        """A page of records is one query (plus auth and the token lookup)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/records/', **self.auth)
+        record_queries = [q for q in queries.captured_queries if 'DataForm_record' in q['sql']]
+        self.assertEqual(len(record_queries), 1)
+    
+    def test_record_detail_includes_media(self):
+        """Detail returns the full record with its media list"""
+        record = Record.objects.first()
+        payload = self.client.get(f'/api/v1/records/{record.pk}/', **self.auth).json()
+        self.assertEqual(payload['record_number'], record.record_number)
+        self.assertEqual(payload['operation_name'], 'API Operation')
+        self.assertEqual(payload['media'], [])
+    
+    def test_operation_list_counts_records(self):
+        """Operations carry their live record counts"""
+        payload = self.client.get('/api/v1/operations/', **self.auth).json()
+        self.assertEqual(payload['results'][0]['record_count'], 5)
+    
+    def test_media_list(self):
+        """Media rows come with their record number and a storage URL"""
+        record = Record.objects.first()
+        RecordMedia.objects.bulk_create([
+            RecordMedia(record=record, image='records/photo.jpg', file_size=10, uploaded_by=self.user),
+            RecordMedia(record=record, image='records/cloud.jpg', storage_url='https://cdn.example.com/cloud.jpg',
+                        file_size=10, uploaded_by=self.user),
+        ])
+        payload = self.client.get('/api/v1/media/', {'record': record.pk}, **self.auth).json()
+        urls = sorted(row['image_url'] for row in payload['results'])
+        self.assertEqual(urls, ['/media/records/photo.jpg', 'https://cdn.example.com/cloud.jpg'])
+        self.assertEqual(payload['results'][0]['record_number'], record.record_number)
+
+
+class SyncAPITest(TestCase):
+    """Test the delta sync endpoint"""
+    
+    def setUp(self):
+        from django.test import override_settings
+        from rest_framework.authtoken.models import Token
+        
+        self.settings_override = override_settings(SYNC_SETTLE_SECONDS=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        
+        self.user = User.objects.create_user(username='agent', password='agent123')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+        self.operation = Operation.objects.create(
+            name='Sync Operation',
+            created_by=self.user,
+            is_active=True
+        )
+        self.records = [
+            Record.objects.create(
+                operation=self.operation,
+                customer_name=f'Sync Customer {i}',
+                customer_contact='+1234567890',
+                account_number=f'ACC10{i}',
+                meter_number=f'MTR10{i}',
+                todays_balance=Decimal('10.00'),
+                meter_reading=Decimal('100.00'),
+                type_of_anomaly='none',
+                created_by=self.user
+            )
+            for i in range(5)
+        ]
+    
+    def sync(self, **params):
+        response = self.client.get('/api/v1/sync/', params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def rows(self, payload, stream, field='id'):
+        index = payload[stream]['fields'].index(field)
+        return [row[index] for row in payload[stream]['rows']]
+    
+    def test_full_then_incremental_sync(self):
+        """A cursor only returns what changed after it"""
+        payload = self.sync()
+        self.assertEqual(sorted(self.rows(payload, 'records')), sorted(r.pk for r in self.records))
+        self.assertEqual(self.rows(payload, 'operations'), [self.operation.pk])
+        self.assertFalse(payload['has_more'])
+        
+        payload = self.sync(cursor=payload['cursor'])
+        self.assertEqual(self.rows(payload, 'records'), [])
+        self.assertEqual(self.rows(payload, 'operations'), [])
+        
+        record = self.records[0]
+        record.remarks = 'Updated in the field'
+        record.save()
+        payload = self.sync(cursor=payload['cursor'])
+        self.assertEqual(self.rows(payload, 'records'), [record.pk])
+        self.assertEqual(self.rows(payload, 'records', 'remarks'), ['Updated in the field'])
+    
+    def test_tombstones(self):
+        """Hard deletes (DeletionLog) and soft deletes come back as tombstones"""
+        cursor = self.sync()['cursor']
+        
+        deleted = self.records[0]
+        deleted_id = deleted.pk
+        DeletionLog.objects.create(
+            deleted_by=self.user, item_type='record',
+            item_id=deleted_id, item_name=deleted.record_number
+        )
+        deleted.delete()
+        soft_deleted = self.records[1]
+        soft_deleted.is_deleted = True
+        soft_deleted.save()
+        
+        payload = self.sync(cursor=cursor)
+        tombstones = [row[:2] for row in payload['tombstones']['rows']]
+        self.assertCountEqual(tombstones, [['record', deleted_id], ['record', soft_deleted.pk]])
+        self.assertEqual(self.rows(payload, 'records'), [])
+    
+    def test_media_tombstones(self):
+        """Deleted photos come back as media tombstones; cascades rely on the record's"""
+        media = [
+            RecordMedia.objects.create(record=record, storage_url='https://cdn.example.com/photo.jpg', file_size=10, uploaded_by=self.user)
+            for record in self.records[:2]
+        ]
+        cursor = self.sync()['cursor']
+        
+        media_id = media[0].pk
+        media[0].delete()
+        self.records[1].delete()
+        
+        payload = self.sync(cursor=cursor)
+        tombstones = [row[:2] for row in payload['tombstones']['rows']]
+        self.assertEqual(tombstones, [['media', media_id]])
+        self.assertFalse(DeletionLog.objects.filter(item_type='media', item_id=media[1].pk).exists())
+    
+    def test_keyset_paging(self):
+        """Small pages walk every record exactly once"""
+        seen = []
+        cursor = ''
+        while True:
+            payload = self.sync(cursor=cursor, limit=2)
+            seen.extend(self.rows(payload, 'records'))
+            cursor = payload['cursor']
+            if not payload['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(r.pk for r in self.records))
+    
+    def test_recent_changes_are_held_back(self):
+        """Rows younger than the settle window wait for the next call"""
+        from django.test import override_settings
+        
+        with override_settings(SYNC_SETTLE_SECONDS=60):
+            payload = self.sync()
+        self.assertEqual(self.rows(payload, 'records'), [])
+    
+    def test_bad_parameters(self):
+        """Malformed cursors and limits are rejected"""
+        response = self.client.get('/api/v1/sync/', {'cursor': 'not-a-cursor'}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/sync/', {'limit': 0}, **self.auth)
+        self.assertEqual(response.status_code, 400)
+    
+    def test_payload_is_compressed(self):
+        """Clients accepting gzip get a compressed payload"""
+        response = self.client.get('/api/v1/sync/', HTTP_ACCEPT_ENCODING='gzip', **self.auth)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class RecordBatchIngestTest(TestCase):
+    """Test batch submission of records captured offline"""
+    
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        from rest_framework.authtoken.models import Token
+        
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_dir.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_dir.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        
+        self.user = User.objects.create_user(username='agent', password='agent123')
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.user).key}'}
+        self.operation = Operation.objects.create(
+            name='Batch Operation',
+            created_by=self.user,
+            is_active=True
+        )
+    
+    def item(self, key, **fields):
+        data = {
+            'client_key': key,
+            'customer_name': f'Customer {key}',
+            'customer_contact': '+1234567890',
+            'account_number': f'ACC-{key}',
+            'meter_number': f'MTR-{key}',
+            'todays_balance': '10.00',
+            'meter_reading': '100.00',
+            'type_of_anomaly': 'none',
+            'status': 'submitted',
+        }
+        data.update(fields)
+        return data
+    
+    def post(self, items):
+        response = self.client.post(
+            '/api/v1/records/batch/', {'records': items}, content_type='application/json', **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+    
+    def test_batch_creates_numbered_records(self):
+        """Records get consecutive numbers and their audit entries"""
+        results = self.post([self.item(f'k{i}') for i in range(3)])
+        self.assertEqual([r['status'] for r in results], ['created'] * 3)
+        self.assertEqual(
+            [r['record_number'] for r in results],
+            [f'JOB-{self.operation.pk:03d}-{seq:04d}' for seq in (1, 2, 3)]
+        )
+        self.assertEqual(Record.objects.filter(created_by=self.user).count(), 3)
+        self.assertEqual(AuditLog.objects.filter(target_type='record', action_type='create').count(), 3)
+        self.operation.refresh_from_db()
+        self.assertEqual(self.operation.next_record_seq, 4)
+    
+    def test_replay_is_a_no_op(self):
+        """Resubmitting a batch returns the original record numbers"""
+        first = self.post([self.item('a'), self.item('b')])
+        second = self.post([self.item('a'), self.item('b'), self.item('c')])
+        
+        self.assertEqual([r['status'] for r in second], ['existing', 'existing', 'created'])
+        self.assertEqual(second[0]['record_number'], first[0]['record_number'])
+        self.assertEqual(second[1]['id'], first[1]['id'])
+        self.assertEqual(Record.objects.count(), 3)
+    
+    def test_invalid_items_do_not_block_the_batch(self):
+        """Bad items report errors; repeated keys share one record"""
+        results = self.post([
+            self.item('ok'),
+            self.item('bad', customer_contact='not a phone'),
+            {'customer_name': 'No key'},
+            self.item('ok'),
+        ])
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid', 'invalid', 'created'])
+        self.assertIn('customer_contact', results[1]['errors'])
+        self.assertIn('client_key', results[2]['errors'])
+        self.assertEqual(results[3]['id'], results[0]['id'])
+        self.assertEqual(Record.objects.count(), 1)
+    
+    def test_inactive_operation_is_rejected(self):
+        """Records for a closed operation are invalid"""
+        self.operation.close_operation(self.user)
+        results = self.post([self.item('late')])
+        self.assertEqual(results[0]['status'], 'invalid')
+        self.assertIn('operation', results[0]['errors'])
+    
+    def test_multipart_with_media(self):
+        """Photos are attached from the named file parts"""
+        import io
+        import json
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='JPEG')
+        photo = SimpleUploadedFile('meter.jpg', buffer.getvalue(), content_type='image/jpeg')
+        
+        response = self.client.post('/api/v1/records/batch/', {
+            'records': json.dumps([self.item('photo', media=['p1']), self.item('missing', media=['p2'])]),
+            'p1': photo,
+        }, **self.auth)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'invalid'])
+        self.assertEqual(RecordMedia.objects.filter(record_id=results[0]['id']).count(), 1)
+    
+    def test_retried_batch_leaves_no_media_copies(self):
+        """Files stored by a rolled-back attempt are deleted before the retry"""
+        import io
+        import json
+        from unittest import mock
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import IntegrityError
+        
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(buffer, format='JPEG')
+        photo = SimpleUploadedFile('meter.jpg', buffer.getvalue(), content_type='image/jpeg')
+        
+        create = AuditLog.objects.create
+        calls = []
+        
+        def fail_once(**kwargs):
+            # The media upload entry of the first attempt hits a concurrent replay
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise IntegrityError('duplicate key')
+            return create(**kwargs)
+        
+        with mock.patch.object(AuditLog.objects, 'create', side_effect=fail_once):
+            response = self.client.post('/api/v1/records/batch/', {
+                'records': json.dumps([self.item('photo', media=['p1'])]),
+                'p1': photo,
+            }, **self.auth)
+        self.assertEqual(response.json()['results'][0]['status'], 'created')
+        
+        stored = [name for _, _, names in os.walk(self.media_dir.name) for name in names]
+        self.assertEqual(len(stored), 1)
+        self.assertEqual(os.path.basename(RecordMedia.objects.get().image.name), stored[0])
+    
+    def test_batch_uses_bulk_queries(self):
+        """Query count does not grow with the batch size"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self.post([self.item('warm-up')])
+        with CaptureQueriesContext(connection) as small:
+            self.post([self.item(f's{i}') for i in range(2)])
+        with CaptureQueriesContext(connection) as large:
+            self.post([self.item(f'l{i}') for i in range(40)])
+        self.assertEqual(len(large), len(small))
+
+
+class RecordImportTest(TestCase):
+    """Test CSV/XLSX import of legacy record sheets"""
+    
+    HEADER = "Job Number,Customer Name,Customer Contact,Account Number,Meter Number,Today's Balance,Meter Reading,Type of Anomaly\n"
+    
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='importer', password='importer123')
+        self.operation = Operation.objects.create(
+            name='Import Operation',
+            created_by=self.user,
+            is_active=True
+        )
+    
+    def csv_file(self, rows):
+        import io
+        return io.BytesIO((self.HEADER + ''.join(rows)).encode('utf-8'))
+    
+    def test_csv_import_with_error_report(self):
+        """Valid rows are imported; rejected rows go to the report"""
+        import io
+        from DataForm.ingest import import_records
+        
+        report = io.StringIO()
+        summary = import_records(self.csv_file([
+            'OLD-1,Ama Mensah,+233241234567,ACC1,MTR1,10.50,100,Meter Damaged\n',
+            'OLD-2,Kofi Boateng,not-a-phone,ACC2,MTR2,5,200,none\n',
+            'OLD-3,Esi Owusu,+233241234568,ACC3,MTR3,-1,300,\n',
+            'OLD-4,Yaw Asante,+233241234569,ACC4,MTR4,0,400,\n',
+        ]), 'legacy.csv', self.operation, self.user, error_report=report, batch_size=2)
+        
+        self.assertEqual(summary, {'rows': 4, 'created': 2, 'rejected': 2})
+        records = list(Record.objects.order_by('record_number'))
+        self.assertEqual([r.customer_name for r in records], ['Ama Mensah', 'Yaw Asante'])
+        self.assertEqual(records[0].type_of_anomaly, 'meter_damaged')
+        self.assertEqual(records[1].type_of_anomaly, 'none')
+        self.assertEqual(records[0].record_number, f'JOB-{self.operation.pk:03d}-0001')
+        self.assertEqual(AuditLog.objects.filter(target_type='record').count(), 2)
+        
+        lines = report.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('3,customer_contact:'))
+        self.assertTrue(lines[2].startswith('4,todays_balance:'))
+    
+    def test_lower_reading_is_rejected(self):
+        """Imports apply RecordForm's previous-reading check"""
+        import io
+        from DataForm.ingest import import_records
+        
+        import_records(self.csv_file([
+            'OLD-1,Ama Mensah,+233241234567,ACC1,MTR1,0,500,\n',
+        ]), 'first.csv', self.operation, self.user)
+        
+        report = io.StringIO()
+        summary = import_records(self.csv_file([
+            'OLD-2,Ama Mensah,+233241234567,ACC1,mtr1,0,450,\n',
+            'OLD-3,Ama Mensah,+233241234567,ACC1,MTR1,0,450,Meter Tampered\n',
+        ]), 'second.csv', self.operation, self.user, error_report=report)
+        
+        self.assertEqual(summary, {'rows': 2, 'created': 1, 'rejected': 1})
+        self.assertEqual(Record.objects.filter(meter_reading=Decimal('450')).get().type_of_anomaly, 'meter_tampered')
+        self.assertTrue(report.getvalue().splitlines()[1].startswith('2,meter_reading: Lower than the previous reading'))
+    
+    def test_literal_null_marker_is_kept(self):
+        """A cell reading \\N is imported as text, not NULL"""
+        import io
+        from DataForm.ingest import _copy_rows, import_records
+        
+        summary = import_records(io.BytesIO(
+            b'Customer Name,Customer Contact,Account Number,Meter Number,Today\'s Balance,Meter Reading,Remarks\n'
+            b'Ama Mensah,+233241234567,ACC1,MTR1,0,100,\\N\n'
+        ), 'nulls.csv', self.operation, self.user)
+        self.assertEqual(summary['created'], 1)
+        record = Record.objects.get()
+        self.assertEqual(record.remarks, '\\N')
+        
+        # COPY (PostgreSQL) data: only unquoted empty fields are NULL
+        fields = [Record._meta.get_field(name) for name in ('remarks', 'gps_latitude', 'account_number')]
+        self.assertEqual(_copy_rows([record], fields).getvalue().strip(), '"\\N",,"ACC1"')
+    
+    def test_xlsx_import(self):
+        """XLSX numeric cells (phone numbers, amounts) are accepted"""
+        import io
+        from openpyxl import Workbook
+        from DataForm.ingest import import_records
+        
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['customer_name', 'customer_contact', 'account_number', 'meter_number',
+                      'todays_balance', 'meter_reading', 'status'])
+        sheet.append(['Abena Darko', 233241234567.0, 'ACC9', 'MTR9', 12.5, 900, 'Verified'])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        
+        summary = import_records(buffer, 'sheet.xlsx', self.operation, self.user)
+        self.assertEqual(summary['created'], 1)
+        record = Record.objects.get()
+        self.assertEqual(record.customer_contact, '233241234567')
+        self.assertEqual(record.todays_balance, Decimal('12.50'))
+        self.assertEqual(record.status, 'verified')
+    
+    def test_missing_columns_are_rejected(self):
+        """Sheets without the required columns fail up front"""
+        import io
+        from DataForm.ingest import IngestError, import_records
+        
+        with self.assertRaises(IngestError):
+            import_records(io.BytesIO(b'Customer Name\nAma\n'), 'x.csv', self.operation, self.user)
+    
+    def test_command_and_admin_upload(self):
+        """The management command and the admin view both import"""
+        import io
+        import tempfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import call_command
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'legacy.csv')
+            with open(path, 'wb') as f:
+                f.write(self.csv_file([
+                    'OLD-1,Ama Mensah,+233241234567,ACC1,MTR1,10,100,none\n',
+                    'OLD-2,Kofi Boateng,bad,ACC2,MTR2,5,200,none\n',
+                ]).getvalue())
+            call_command('import_records', path, user='importer', stdout=io.StringIO())
+            self.assertTrue(os.path.exists(os.path.join(directory, 'legacy.errors.csv')))
+        self.assertEqual(Record.objects.count(), 1)
+        
+        self.client.login(username='importer', password='importer123')
+        response = self.client.get(reverse('admin:DataForm_record_changelist'))
+        self.assertContains(response, reverse('admin:DataForm_record_import'))
+        self.assertEqual(self.client.get(reverse('admin:DataForm_record_import')).status_code, 200)
+        upload = SimpleUploadedFile('more.csv', self.csv_file([
+            'OLD-3,Esi Owusu,+233241234568,ACC3,MTR3,1,300,none\n',
+        ]).getvalue())
+        response = self.client.post(
+            reverse('admin:DataForm_record_import'),
+            {'file': upload, 'operation': self.operation.pk}
+        )
+        self.assertRedirects(response, reverse('admin:DataForm_record_changelist'))
+        self.assertEqual(Record.objects.count(), 2)
+
+
+class RegistryTest(TestCase):
+    """Test the customer/meter registry, its typeahead and record linking"""
+    
+    def setUp(self):
+        import io
+        from DataForm import registry
+        
+        self.user = User.objects.create_user(username='agent', password='agent123')
+        self.operation = Operation.objects.create(
+            name='Registry Operation',
+            created_by=self.user,
+            is_active=True
+        )
+        registry.load_registry(io.BytesIO(
+            b'Meter Number,Account Number,Customer Name,Customer Contact,Address\n'
+            b'mtr 1001,ACC-1,Ama Mensah,+233241234567,Osu\n'
+            b'MTR1002,ACC-2,Kofi Mensah,+233241234568,Labone\n'
+            b'MTR2001,ACC-3,Esi Owusu,+233241234569,Tema\n'
+        ), 'meters.csv')
+    
+    def make_record(self, meter_number):
+        return Record.objects.create(
+            operation=self.operation,
+            customer_name='Typed Name',
+            customer_contact='+1234567890',
+            account_number='ACC',
+            meter_number=meter_number,
+            todays_balance=Decimal('0.00'),
+            meter_reading=Decimal('1.00'),
+            created_by=self.user
+        )
+    
+    def test_prefix_search(self):
+        """Meter, account and name-word prefixes all match"""
+        from DataForm import registry
+        
+        self.assertEqual([r['meter_number'] for r in registry.lookup('mtr10')], ['MTR1001', 'MTR1002'])
+        self.assertEqual([r['meter_number'] for r in registry.lookup('acc-3')], ['MTR2001'])
+        self.assertEqual({r['customer_name'] for r in registry.lookup('mensah')}, {'Ama Mensah', 'Kofi Mensah'})
+        self.assertEqual([r['customer_name'] for r in registry.lookup('ko men')], ['Kofi Mensah'])
+        self.assertEqual(registry.lookup('m'), [])
+    
+    def test_lookup_endpoint(self):
+        """The typeahead endpoint answers from the in-process index"""
+        self.client.login(username='agent', password='agent123')
+        self.client.get(reverse('api_registry_lookup'), {'q': 'warm'})
+        with self.assertNumQueries(2):  # session and user
+            response = self.client.get(reverse('api_registry_lookup'), {'q': 'MTR1001'})
+        result = response.json()['results'][0]
+        self.assertEqual(result['account_number'], 'ACC-1')
+        self.assertEqual(result['customer_contact'], '+233241234567')
+        self.assertEqual(result['address'], 'Osu')
+    
+    def test_index_follows_other_processes(self):
+        """Registry writes that skip this process's signals show up after the check interval"""
+        import time
+        from unittest import mock
+        from DataForm import registry
+        from DataForm.models import Meter
+        
+        self.assertEqual(registry.lookup('MTR1001')[0]['address'], 'Osu')
+        # Another worker's write: no signal reaches this process
+        Meter.objects.filter(meter_number='MTR1001').update(address='Cantonments', updated_at=timezone.now())
+        self.assertEqual(registry.lookup('MTR1001')[0]['address'], 'Osu')
+        
+        later = time.monotonic() + registry.VERSION_CHECK_INTERVAL
+        with mock.patch.object(registry.time, 'monotonic', return_value=later):
+            self.assertEqual(registry.lookup('MTR1001')[0]['address'], 'Cantonments')
+    
+    def test_records_link_on_save(self):
+        """Records are linked by meter number; edits to the registry are picked up"""
+        from DataForm.models import Meter
+        
+        record = self.make_record(' mtr1002 ')
+        self.assertEqual(record.meter.meter_number, 'MTR1002')
+        self.assertIsNone(self.make_record('MTR9999').meter)
+        
+        Meter.objects.create(meter_number='MTR9999')
+        self.assertEqual(self.make_record('mtr9999').meter.meter_number, 'MTR9999')
+    
+    def test_linking_does_not_build_index(self):
+        """Record saves link with an indexed query, not the typeahead index"""
+        from unittest import mock
+        from DataForm import registry
+        
+        with mock.patch.object(registry, 'get_index', side_effect=AssertionError('index built')):
+            record = self.make_record('MTR2001')
+            self.assertEqual(record.meter.meter_number, 'MTR2001')
+            Record.objects.filter(pk=record.pk).update(meter=None)
+            self.assertEqual(registry.link_records(), 1)
+    
+    def test_backfill_links_and_seeds(self):
+        """The backfill links old records and can seed unknown meters"""
+        import io
+        from django.core.management import call_command
+        from DataForm.models import Meter
+        
+        linked = self.make_record('MTR1001')
+        unknown = self.make_record('NEW-7')
+        Record.objects.filter(pk=linked.pk).update(meter=None)
+        
+        call_command('backfill_meter_links', '--seed', stdout=io.StringIO())
+        linked.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual(linked.meter.meter_number, 'MTR1001')
+        self.assertEqual(unknown.meter.meter_number, 'NEW-7')
+        self.assertEqual(Meter.objects.get(meter_number='NEW-7').customer.name, 'Typed Name')
+
+
+class ReadingValidationTest(TestCase):
+    """Test the latest reading index, the submit-time check and the batch validator"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='agent', password='agent123')
+        self.previous = Operation.objects.create(name='March Round', created_by=self.user)
+        self.operation = Operation.objects.create(name='April Round', created_by=self.user, is_active=True)
+    
+    def make_record(self, operation, meter_number, reading, days_ago=0, anomaly='none'):
+        record = Record.objects.create(
+            operation=operation,
+            customer_name='Customer',
+            customer_contact='+1234567890',
+            account_number='ACC',
+            meter_number=meter_number,
+            todays_balance=Decimal('0.00'),
+            meter_reading=Decimal(reading),
+            type_of_anomaly=anomaly,
+            created_by=self.user
+        )
+        if days_ago:
+            Record.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return record
+    
+    def test_latest_reading_follows_saves_and_deletes(self):
+        """The index points at the newest live visit of each meter"""
+        from DataForm.readings import previous_reading
+        
+        first = self.make_record(self.previous, 'mtr 7', '100.00')
+        second = self.make_record(self.operation, 'MTR7', '150.00')
+        self.assertEqual(previous_reading('MTR7').record_id, second.pk)
+        
+        second.delete()
+        self.assertEqual(previous_reading('mtr7').reading, Decimal('100.00'))
+        
+        first.is_deleted = True
+        first.save()
+        self.assertIsNone(previous_reading('MTR7'))
+    
+    def test_form_rejects_reading_below_previous(self):
+        """A lower reading needs an anomaly type on new visits"""
+        from DataForm.forms import RecordForm
+        
+        self.make_record(self.previous, 'MTR7', '100.00')
+        data = {
+            'customer_name': 'Customer', 'customer_contact': '+1234567890',
+            'account_number': 'ACC', 'meter_number': 'mtr7',
+            'meter_reading': '90.00', 'todays_balance': '0.00',
+            'type_of_anomaly': 'none', 'status': 'draft',
+        }
+        form = RecordForm(data=data)
+        self.assertFalse(form.is_valid())
+        self.assertIn('previous reading', form.errors['meter_reading'][0])
+        
+        self.assertTrue(RecordForm(data=dict(data, type_of_anomaly='meter_tampered')).is_valid())
+        self.assertTrue(RecordForm(data=dict(data, meter_reading='100.00')).is_valid())
+    
+    def test_validator_queues_negative_consumption_and_spikes(self):
+        """Outliers against the previous visit are queued once"""
+        from DataForm.models import AnomalySuggestion
+        from DataForm.readings import queue_suggestions
+        
+        for index, consumption in enumerate(['30', '32', '28', '31', '29', '33', '900', '-20']):
+            meter_number = f'MTR{index}'
+            self.make_record(self.previous, meter_number, '1000.00', days_ago=30)
+            self.make_record(self.operation, meter_number, str(Decimal('1000.00') + Decimal(consumption)))
+        # Already explained by the agent
+        self.make_record(self.previous, 'MTR99', '1000.00', days_ago=30)
+        self.make_record(self.operation, 'MTR99', '10.00', anomaly='meter_damaged')
+        
+        self.assertEqual(queue_suggestions(self.operation), 2)
+        suggestions = {s.record.meter_number: s for s in AnomalySuggestion.objects.select_related('record')}
+        self.assertEqual(set(suggestions), {'MTR6', 'MTR7'})
+        self.assertEqual(suggestions['MTR6'].reason, 'consumption_spike')
+        self.assertEqual(suggestions['MTR7'].reason, 'negative_consumption')
+        self.assertEqual(suggestions['MTR7'].details['consumption'], -20.0)
+        
+        self.assertEqual(queue_suggestions(self.operation), 0)
+    
+    def test_batch_ingest_updates_latest_readings(self):
+        """Bulk inserts maintain the index without per-record signals"""
+        from DataForm.ingest import bulk_insert_records
+        from DataForm.readings import previous_reading
+        
+        self.make_record(self.previous, 'MTR7', '100.00', days_ago=30)
+        bulk_insert_records([
+            Record(
+                operation=self.operation, customer_name='Customer', customer_contact='+1234567890',
+                account_number='ACC', meter_number='mtr7', todays_balance=Decimal('0.00'),
+                meter_reading=Decimal('140.00'), created_by=self.user,
+            )
+        ])
+        self.assertEqual(previous_reading('MTR7').reading, Decimal('140.00'))
+
+
+class OperationAnalyticsTest(TestCase):
+    """Test the vectorized operation analytics and their cache"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(username='analyst', password='analyst123')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.agents = [User.objects.create_user(username=f'agent{i}', password='agent123') for i in range(2)]
+        self.operation = Operation.objects.create(name='Analytics Operation', created_by=self.admin, is_active=True)
+        # agent0: 3 records, 1 anomaly; agent1: 1 record with an anomaly and no GPS
+        for balance, agent, anomaly, gps in [
+            ('10.00', 0, 'none', True), ('20.00', 0, 'none', True), ('30.00', 0, 'meter_damaged', True),
+            ('40.00', 1, 'access_denied', False),
+        ]:
+            self.make_record(balance, self.agents[agent], anomaly, gps)
+        self.client.login(username='analyst', password='analyst123')
+    
+    def make_record(self, balance, agent, anomaly='none', gps=True):
+        return Record.objects.create(
+            operation=self.operation,
+            customer_name='Customer',
+            customer_contact='+1234567890',
+            account_number='ACC',
+            meter_number='MTR1',
+            todays_balance=Decimal(balance),
+            meter_reading=Decimal(balance) * 10,
+            type_of_anomaly=anomaly,
+            gps_latitude=Decimal('5.6037') if gps else None,
+            gps_longitude=Decimal('-0.1870') if gps else None,
+            gps_address='GA-123-4567',
+            created_by=agent
+        )
+    
+    def test_statistics(self):
+        """Percentiles and rates match a hand computation"""
+        data = self.client.get(reverse('operation_analytics', args=[self.operation.pk])).json()
+        
+        self.assertEqual(data['summary'], {'records': 4, 'anomalies': 2, 'anomaly_rate': 0.5, 'without_gps': 1})
+        self.assertEqual(data['distributions']['todays_balance']['percentiles']['p50'], 25.0)
+        self.assertEqual(data['distributions']['meter_reading']['max'], 400.0)
+        
+        by_agent = {row['agent']: row for row in data['by_agent']}
+        self.assertEqual(by_agent['agent0']['anomaly_rate'], round(1 / 3, 4))
+        self.assertEqual(by_agent['agent1']['records'], 1)
+        self.assertEqual(sum(row['records'] for row in data['by_hour']), 4)
+        self.assertEqual(data['by_area'], [{
+            'latitude': 5.605, 'longitude': -0.185, 'records': 3, 'anomalies': 1, 'anomaly_rate': round(1 / 3, 4),
+        }])
+        curves = {row['agent']: row for row in data['productivity']['agents']}
+        self.assertEqual(curves['agent0']['cumulative'][-1], 3)
+        self.assertEqual(len(data['productivity']['dates']), 1)
+    
+    def test_cached_until_records_change(self):
+        """Repeat requests are served from the cache; a new record invalidates it"""
+        url = reverse('operation_analytics', args=[self.operation.pk])
+        self.client.get(url)
+        with self.assertNumQueries(4):  # session, user, operation and data version
+            self.client.get(url)
+        
+        self.make_record('50.00', self.agents[1])
+        self.assertEqual(self.client.get(url).json()['summary']['records'], 5)
+        
+        # Written by another process: no signal reaches this one
+        Record.objects.filter(operation=self.operation, todays_balance=Decimal('50.00')).update(
+            todays_balance=Decimal('60.00'), updated_at=timezone.now(),
+        )
+        self.assertEqual(self.client.get(url).json()['distributions']['todays_balance']['max'], 60.0)
+    
+    def test_empty_operation(self):
+        """An operation without records returns empty breakdowns"""
+        from DataForm.analytics import get_operation_analytics
+        
+        empty = Operation.objects.create(name='Empty Operation', created_by=self.admin)
+        data = get_operation_analytics(empty)
+        self.assertEqual(data['summary']['records'], 0)
+        self.assertIsNone(data['distributions']['todays_balance'])
+        self.assertEqual(data['by_agent'], [])
+
+
+class RequestMetricsTest(ViewBudgetMixin, TestCase):
+    """Test the request metrics middleware and the per-view budgets"""
+    
+    def setUp(self):
+        from DataForm import metrics
+        
+        metrics.flush()
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.user.profile.role = 'admin'
+        self.user.profile.save()
+        self.operation = Operation.objects.create(name='Budget Operation', created_by=self.user, is_active=True)
+        self.records = [
+            Record.objects.create(
+                operation=self.operation,
+                customer_name=f'Customer {i}',
+                customer_contact='+1234567890',
+                account_number=f'ACC{i}',
+                meter_number=f'MTR{i}',
+                todays_balance=Decimal('10.00'),
+                meter_reading=Decimal('100.00'),
+                gps_latitude=Decimal('5.6037'),
+                gps_longitude=Decimal('-0.1870'),
+                gps_address='GA-123-4567',
+                created_by=self.user
+            )
+            for i in range(25)
+        ]
+        self.client.login(username='admin', password='admin123')
+    
+    def test_views_within_budget(self):
+        """Every listed view stays within its query budget"""
+        for url in [
+            reverse('dashboard'),
+            reverse('operation_list'),
+            reverse('operation_detail', args=[self.operation.pk]),
+            reverse('operation_analytics', args=[self.operation.pk]),
+            reverse('record_list'),
+            reverse('record_detail', args=[self.records[0].pk]),
+            reverse('api_map_data') + '?bbox=-1,5,1,6&zoom=10',
+            reverse('api_registry_lookup') + '?q=MTR',
+            reverse('api-record-list'),
+            reverse('api_sync'),
+        ]:
+            self.assertWithinBudget(url)
+    
+    def test_sample_contents(self):
+        """Samples carry the URL name, queries, template time and size"""
+        from DataForm import metrics
+        
+        with metrics.capture() as samples:
+            response = self.client.get(reverse('record_list'))
+        sample = samples[-1]
+        self.assertEqual(sample.view, 'record_list')
+        self.assertGreater(sample.queries, 0)
+        self.assertGreater(sample.template_ms, 0)
+        self.assertEqual(sample.size_bytes, len(response.content))
+        self.assertEqual(metrics.snapshot()['record_list']['latency_ms'].count, 1)
+    
+    def test_over_budget_warning_and_flush(self):
+        """Exceeding a budget logs a warning; flush() logs and resets the histograms"""
+        from django.test import override_settings
+        from DataForm import metrics
+        
+        with override_settings(VIEW_BUDGETS={'record_list': {'queries': 1}}):
+            with self.assertLogs('DataForm.metrics', 'WARNING') as logs:
+                self.client.get(reverse('record_list'))
+        self.assertIn('record_list over budget (queries)', logs.output[0])
+        
+        with self.assertLogs('DataForm.metrics', 'INFO') as logs:
+            metrics.flush()
+        self.assertIn('record_list: 1 requests', logs.output[0])
+        self.assertEqual(metrics.snapshot(), {})
+
+
+class PrometheusMetricsTest(TestCase):
+    """Test the /metrics scrape endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='admin', password='admin123')
+        self.user.profile.role = 'admin'
+        self.user.profile.save()
+        self.operation = Operation.objects.create(name='Metrics Operation', created_by=self.user, is_active=True)
+        self.client.login(username='admin', password='admin123')
+    
+    def test_exposition(self):
+        """Request, audit and queue metrics are exported"""
+        self.client.get(reverse('record_list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        
+        body = response.content.decode()
+        self.assertIn('onfield_request_latency_seconds_bucket{le="0.005",view="record_list"}', body)
+        self.assertIn('onfield_request_queries_count{view="record_list"}', body)
+        self.assertIn('onfield_audit_log_writes_total{action="create"}', body)
+        self.assertIn('onfield_queue_depth{queue="anomaly_review"} 0.0', body)
+    
+    def test_export_metrics(self):
+        """Exports record their duration and size"""
+        from DataForm import metrics
+        
+        before = metrics.EXPORT_SIZE.labels('xlsx')._sum.get()
+        response = self.client.get(reverse('operation_export_xlsx', args=[self.operation.pk]))
+        self.assertEqual(metrics.EXPORT_SIZE.labels('xlsx')._sum.get() - before, len(response.content))
+    
+    def test_storage_errors_counted(self):
+        """Failed storage calls are counted and re-raised"""
+        from DataForm import metrics
+        
+        errors = metrics.STORAGE_ERRORS.labels('upload')
+        before = errors._value.get()
+        with self.assertRaises(ConnectionError):
+            with metrics.storage_call('upload'):
+                raise ConnectionError('storage unavailable')
+        self.assertEqual(errors._value.get(), before + 1)
+    
+    def test_token_required(self):
+        """With METRICS_TOKEN set, scrapes must present it"""
+        from django.test import override_settings
+        
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+        with override_settings(INTERNAL_IPS=[]):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+
+class ProfilingTest(TestCase):
+    """Test the signed on-demand request profiler"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from DataForm.profiling import make_token
+        
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='admin123')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.operation = Operation.objects.create(name='Profiled Operation', created_by=self.admin, is_active=True)
+        self.token = make_token(self.admin)
+        self.url = reverse('operation_detail', args=[self.operation.pk])
+        self.client.login(username='admin', password='admin123')
+    
+    def test_profiled_request(self):
+        """A request with the admin's token is profiled and stored"""
+        from DataForm.models import ProfileRun
+        
+        response = self.client.get(self.url, {'_profile': self.token, 'page': 1})
+        self.assertEqual(response.status_code, 200)
+        run = ProfileRun.objects.get(pk=response['X-Profile-Run'])
+        self.assertEqual(run.view_name, 'operation_detail')
+        self.assertEqual(run.path, f'{self.url}?page=1')
+        self.assertEqual(run.query_count, len(run.queries))
+        self.assertGreater(run.query_count, 0)
+        self.assertIn('operation_detail', run.summary)
+        self.assertTrue(any('views.py' in frame for query in run.queries for frame in query['origin']))
+        
+        # The header works too, and the admin can view and download the run
+        response = self.client.get(self.url, HTTP_X_PROFILE_TOKEN=self.token)
+        self.assertIn('X-Profile-Run', response)
+        self.admin.is_staff = self.admin.is_superuser = True
+        self.admin.save()
+        self.assertEqual(self.client.get(reverse('admin:DataForm_profilerun_change', args=[run.pk])).status_code, 200)
+        download = self.client.get(reverse('admin:DataForm_profilerun_stats', args=[run.pk]))
+        self.assertEqual(download['Content-Disposition'], f'attachment; filename="profile_{run.pk}.prof"')
+    
+    def test_requests_without_valid_token_not_profiled(self):
+        """Forged tokens, other users' tokens and non-admins are ignored"""
+        from DataForm.models import ProfileRun
+        from DataForm.profiling import make_token
+        
+        staff = User.objects.create_user(username='staff', password='staff123')
+        self.assertNotIn('X-Profile-Run', self.client.get(self.url, {'_profile': self.token + 'x'}))
+        self.assertNotIn('X-Profile-Run', self.client.get(self.url, {'_profile': make_token(staff)}))
+        self.client.login(username='staff', password='staff123')
+        self.assertNotIn('X-Profile-Run', self.client.get(reverse('record_list'), {'_profile': make_token(staff)}))
+        self.assertFalse(ProfileRun.objects.exists())
+    
+    def test_rate_limit(self):
+        """Each admin may only profile PROFILING_RATE_LIMIT requests per hour"""
+        from django.core.cache import cache
+        from django.test import override_settings
+        from DataForm.models import ProfileRun
+        
+        profiled = []
+        with override_settings(PROFILING_RATE_LIMIT=2):
+            for _ in range(3):
+                # Every request on a different worker: nothing shared but the database
+                cache.clear()
+                profiled.append('X-Profile-Run' in self.client.get(self.url, {'_profile': self.token}))
+        self.assertEqual(profiled, [True, True, False])
+        
+        ProfileRun.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertIn('X-Profile-Run', self.client.get(self.url, {'_profile': self.token}))
+
+
+class BenchTest(TestCase):
+    """Test the benchmark scenarios and baseline comparison"""
+    
+    def test_sized_scenarios(self):
+        """Sized scenarios run once per table size, smallest first"""
+        from DataForm.bench import BenchRun
+        
+        run = BenchRun(sizes=[40, 20], iterations=2, only=['record_list', 'system_search'])
+        results = run.run()
+        self.assertEqual(list(results), [
+            'record_list[20]', 'system_search[20]', 'record_list[40]', 'system_search[40]',
+        ])
+        self.assertEqual(Record.objects.filter(operation=run.big_operation).count(), 40)
+        self.assertEqual(results['record_list[40]']['iterations'], 2)
+        self.assertGreater(results['record_list[40]']['queries'], 0)
+    
+    def test_compare(self):
+        """Slower medians beyond the threshold and extra queries are regressions"""
+        from DataForm.bench import compare
+        
+        def report(**medians):
+            return {'results': {
+                name: {'median_ms': median, 'queries': queries} for name, (median, queries) in medians.items()
+            }}
+        
+        baseline = report(list=(100.0, 5), search=(100.0, 5), export=(1.0, 5), dropped=(10.0, 1))
+        current = report(list=(115.0, 5), search=(130.0, 5), export=(2.0, 6), added=(10.0, 1))
+        rows = {row['name']: row for row in compare(current, baseline, threshold=0.2)}
+        self.assertEqual(set(rows), {'list', 'search', 'export'})
+        self.assertFalse(rows['list']['regressed'])
+        self.assertTrue(rows['search']['regressed'])
+        self.assertEqual(rows['search']['change'], 0.3)
+        # 100% slower but within timer noise; regressed on the extra query
+        self.assertTrue(rows['export']['regressed'])
+
+
+class SyntheticDataTest(TestCase):
+    """Test the synthetic load data generator"""
+    
+    def generate(self, seed):
+        import tempfile
+        from django.test import override_settings
+        from DataForm.synthetic import generate
+        
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            return generate(records=300, operations=2, agents=4, photos_ratio=0.5, seed=seed, workers=1, chunk_size=100)
+    
+    def fields(self, seed):
+        return list(
+            Record.objects.filter(operation__name__startswith=f'Synthetic {seed}')
+            .order_by('operation__name', 'created_at', 'meter_number')
+            .values_list('meter_number', 'customer_name', 'meter_reading', 'type_of_anomaly', 'status', 'created_at')
+        )
+    
+    def test_dataset_shape(self):
+        """Records are valid, inside their operation window and numbered uniquely"""
+        summary = self.generate(seed=7)
+        records = Record.objects.filter(operation__name__startswith='Synthetic 7')
+        
+        self.assertEqual(summary['records'], 300)
+        self.assertEqual(records.count(), 300)
+        self.assertEqual(records.values('record_number').distinct().count(), 300)
+        anomaly_codes = {code for code, _ in Record.ANOMALY_CHOICES}
+        self.assertTrue(set(records.values_list('type_of_anomaly', flat=True)) <= anomaly_codes)
+        for record in records.select_related('operation'):
+            self.assertGreaterEqual(record.created_at, record.operation.start_at)
+            self.assertLess(record.created_at, record.operation.end_at)
+        self.assertEqual(summary['photos'], RecordMedia.objects.filter(record__in=records).count())
+        self.assertTrue(100 < summary['photos'] < 200)
+    
+    def test_same_seed_same_data(self):
+        """A seed always produces the same records; reusing it is refused"""
+        self.generate(seed=3)
+        first = self.fields(3)
+        with self.assertRaises(ValueError):
+            self.generate(seed=3)
+        Record.objects.filter(operation__name__startswith='Synthetic 3').delete()
+        Operation.objects.filter(name__startswith='Synthetic 3').delete()
+        self.generate(seed=3)
+        self.assertEqual(self.fields(3), first)
+        self.generate(seed=4)
+        self.assertNotEqual(self.fields(4), first)
+
+
+class LoadTestHarnessTest(LiveServerTestCase):
+    """Test the load test harness against a live server"""
+    
+    @classmethod
+    def setUpClass(cls):
+        from django.core.servers.basehttp import WSGIServer
+        from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+        
+        # The in-memory test database is one connection shared by the
+        # server threads, so requests must be served one at a time
+        class SingleThreadedLiveServer(LiveServerThread):
+            def _create_server(self, connections_override=None):
+                return WSGIServer((self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False)
+        
+        cls.server_thread_class = SingleThreadedLiveServer
+        super().setUpClass()
+    
+    def test_agents_and_admins(self):
+        """Agents create numbered records with photos; admin pages are served without errors"""
+        import io
+        import json
+        import tempfile
+        from django.core.management import call_command
+        from django.test import override_settings
+        
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+                call_command(
+                    'loadtest', url=self.live_server_url, setup=True, agents=3, admins=1,
+                    duration=3, ramp_up=0, think=0, output=output.name, stdout=io.StringIO(),
+                )
+                report = json.load(output)
+        
+        endpoints = report['endpoints']
+        self.assertEqual(endpoints['total']['errors'], 0)
+        self.assertGreater(endpoints['POST record_create']['requests'], 0)
+        self.assertGreater(endpoints['GET dashboard']['requests'], 0)
+        created = Record.objects.filter(pk__in=report['created_record_ids'])
+        self.assertEqual(created.count(), len(report['created_record_ids']))
+        self.assertEqual(created.values('record_number').distinct().count(), created.count())
+        self.assertEqual(RecordMedia.objects.filter(record__in=created).count(), created.count())
+        self.assertEqual(report['numbering']['duplicates'], 0)
+
+
+class ImportTimesTest(TestCase):
+    """Test the worker startup measurement"""
+    
+    def test_report_libraries_not_loaded_at_boot(self):
+        """A booted worker has not imported the export or storage libraries"""
+        import io
+        import json
+        import tempfile
+        from django.core.management import call_command
+        
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command('import_times', runs=1, top=5, check=True, output=output.name, stdout=io.StringIO())
+            report = json.load(output)
+        
+        self.assertGreater(report['boot_ms'], 0)
+        self.assertEqual(report['lazy_modules_loaded'], [])
+        self.assertEqual(len(report['packages']), 5)
+        self.assertIn('django', [row['package'] for row in report['packages']])
+
+
+class AsyncViewsTest(TestCase):
+    """Test the async read views and the long-polling sync endpoint"""
+    
+    def setUp(self):
+        from django.test import override_settings
+        from rest_framework.authtoken.models import Token
+        
+        self.settings_override = override_settings(SYNC_SETTLE_SECONDS=0, SYNC_POLL_INTERVAL=0.1)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        
+        self.admin = User.objects.create_user(username='admin', password='admin123')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.create(user=self.admin).key}'}
+        self.operation = Operation.objects.create(
+            name='Async Operation',
+            created_by=self.admin,
+            is_active=True
+        )
+        for i in range(3):
+            Record.objects.create(
+                operation=self.operation,
+                customer_name=f'Async Customer {i}',
+                customer_contact='+1234567890',
+                account_number=f'ACC20{i}',
+                meter_number=f'MTR20{i}',
+                todays_balance=Decimal('10.00'),
+                meter_reading=Decimal('100.00'),
+                type_of_anomaly='none',
+                created_by=self.admin
+            )
+    
+    async def test_active_operation_and_search(self):
+        """Async views resolve the user and render through the async client"""
+        from django.test import AsyncClient
+        
+        client = AsyncClient()
+        await client.aforce_login(self.admin)
+        
+        response = await client.get(reverse('api_active_operation'))
+        self.assertEqual(response.json()['name'], 'Async Operation')
+        
+        response = await client.get(reverse('system_search'), {'q': 'Async Customer 1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_results'], 1)
+        
+        response = await client.get(reverse('operation_search', args=[self.operation.pk]), {'q': 'ACC20'})
+        self.assertEqual(response.context['total_results'], 3)
+    
+    async def test_blocking_work_runs_in_pool(self):
+        """run_blocking() calls run in parallel on the pool threads"""
+        import asyncio
+        import threading
+        import time
+        from DataForm import aio
+        
+        def work():
+            time.sleep(0.2)
+            return threading.current_thread().name
+        
+        started = time.monotonic()
+        names = await asyncio.gather(aio.run_blocking(work), aio.run_blocking(work))
+        self.assertLess(time.monotonic() - started, 0.35)
+        self.assertTrue(all(name.startswith('aio') for name in names))
+    
+    def test_record_list_json(self):
+        """record_list?format=json returns the filtered page as rows"""
+        self.client.force_login(self.admin)
+        
+        response = self.client.get(reverse('record_list'), {'format': 'json', 'search': 'MTR201'})
+        payload = response.json()
+        self.assertEqual(payload['count'], 1)
+        self.assertEqual(payload['num_pages'], 1)
+        self.assertEqual(payload['results'][0]['meter_number'], 'MTR201')
+        self.assertEqual(payload['results'][0]['operation__name'], 'Async Operation')
+        
+        response = self.client.get(reverse('record_list'))
+        self.assertEqual(response.context['total_count'], 3)
+    
+    def test_sync_poll(self):
+        """Changes are returned at once; an up-to-date cursor waits, then returns empty"""
+        import time
+        
+        response = self.client.get(reverse('api_sync_poll'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(len(payload['records']['rows']), 3)
+        
+        started = time.monotonic()
+        response = self.client.get(reverse('api_sync_poll'), {'cursor': payload['cursor'], 'wait': 0.3}, **self.auth)
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+        self.assertEqual(response.json()['records']['rows'], [])
+        self.assertEqual(response.json()['cursor'], payload['cursor'])
+    
+    def test_sync_poll_requires_staff(self):
+        """Anonymous requests are refused and bad cursors rejected"""
+        self.assertEqual(self.client.get(reverse('api_sync_poll')).status_code, 401)
+        self.assertEqual(
+            self.client.get(reverse('api_sync_poll'), {'cursor': 'garbage'}, **self.auth).status_code, 400
+        )
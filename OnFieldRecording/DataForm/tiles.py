@@ -0,0 +1,325 @@
+"""
+Density tile pre-rendering for DataForm app
+Renders per-operation heatmap tiles (PNG) and raw count grids (zlib-compressed
+uint32 arrays) and stores them through the configured storage backend
+"""
+
+import logging
+import math
+import zlib
+from array import array
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .maps import lonlat_to_tile
+from .models import Record, DeletionLog, TileLocationChange, TileRenderState
+from .utils import overwrite_stored_file
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================
+# CONFIGURATION
+# =============================================
+
+DEFAULT_ZOOM_LEVELS = list(range(4, 15))
+
+TILE_SIZE = 256  # pixels per tile side
+
+# Heatmap colour ramp from sparse (transparent blue) to dense (opaque red)
+HEAT_RAMP = [
+    (37, 99, 235),
+    (16, 185, 129),
+    (250, 204, 21),
+    (249, 115, 22),
+    (220, 38, 38),
+]
+
+
+def tile_path(operation_id, zoom, x, y, extension):
+    """Storage path of a density tile ('png' or 'grid')"""
+    return f'{tile_root(operation_id)}/{zoom}/{x}/{y}.{extension}'
+
+
+def tile_root(operation_id):
+    return f'tiles/operation_{operation_id}'
+
+
+def stored_tiles(operation_id):
+    """Yield (zoom, x, y, extension) of every tile stored for an operation"""
+    root = tile_root(operation_id)
+    try:
+        zooms, _ = default_storage.listdir(root)
+    except FileNotFoundError:
+        return
+    for zoom in zooms:
+        columns, _ = default_storage.listdir(f'{root}/{zoom}')
+        for x in columns:
+            _, names = default_storage.listdir(f'{root}/{zoom}/{x}')
+            for name in names:
+                y, _, extension = name.partition('.')
+                yield int(zoom), int(x), int(y), extension
+
+
+# =============================================
+# RENDERING (runs in worker processes)
+# =============================================
+
+def _heat_colour(count, max_count):
+    """Map a pixel count to an RGBA colour on a log scale"""
+    level = math.log1p(count) / math.log1p(max_count) if max_count > 1 else 1.0
+    position = level * (len(HEAT_RAMP) - 1)
+    low = int(position)
+    high = min(low + 1, len(HEAT_RAMP) - 1)
+    blend = position - low
+    r, g, b = (
+        int(HEAT_RAMP[low][i] + (HEAT_RAMP[high][i] - HEAT_RAMP[low][i]) * blend)
+        for i in range(3)
+    )
+    return r, g, b, int(120 + 135 * level)
+
+
+def render_png(pixels):
+    """
+    Render a density tile as PNG.
+
+    Args:
+        pixels: Counter mapping pixel index (row * TILE_SIZE + col) to count
+
+    Returns:
+        bytes: PNG image data
+    """
+    from PIL import Image
+
+    max_count = max(pixels.values())
+    buffer = bytearray(TILE_SIZE * TILE_SIZE * 4)
+    for index, count in pixels.items():
+        buffer[index * 4:index * 4 + 4] = bytes(_heat_colour(count, max_count))
+
+    image = Image.frombytes('RGBA', (TILE_SIZE, TILE_SIZE), bytes(buffer))
+    output = BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def render_grid(pixels):
+    """Encode a density tile as a zlib-compressed row-major uint32 count grid"""
+    grid = array('I', bytes(TILE_SIZE * TILE_SIZE * 4))
+    for index, count in pixels.items():
+        grid[index] = count
+    return zlib.compress(grid.tobytes(), 6)
+
+
+def render_zoom(zoom, lons, lats, dirty_tiles, formats):
+    """
+    Render every (or every dirty) tile of one zoom level.
+
+    Top-level function so it can be pickled for a process pool.
+
+    Args:
+        zoom: Zoom level
+        lons, lats: array('d') of record coordinates
+        dirty_tiles: set of (x, y) to render, or None for all tiles with data
+        formats: iterable of 'png' and/or 'grid'
+
+    Returns:
+        list: [(x, y, {format: bytes}), ...]; the dict is empty for dirty
+        tiles that no longer contain any record
+    """
+    tiles = defaultdict(Counter)
+    for lon, lat in zip(lons, lats):
+        fx, fy = lonlat_to_tile(lon, lat, zoom)
+        x, y = int(fx), int(fy)
+        if dirty_tiles is not None and (x, y) not in dirty_tiles:
+            continue
+        col = int((fx - x) * TILE_SIZE)
+        row = int((fy - y) * TILE_SIZE)
+        tiles[(x, y)][row * TILE_SIZE + col] += 1
+
+    results = []
+    for (x, y), pixels in tiles.items():
+        rendered = {}
+        if 'png' in formats:
+            rendered['png'] = render_png(pixels)
+        if 'grid' in formats:
+            rendered['grid'] = render_grid(pixels)
+        results.append((x, y, rendered))
+
+    for x, y in (dirty_tiles or set()) - set(tiles):
+        results.append((x, y, {}))
+
+    return results
+
+
+# =============================================
+# CHANGE TRACKING
+# =============================================
+
+def track_record_move(old, new):
+    """
+    Remember a record's previous location when it moves or changes operation.
+
+    Called from pre_save with the stored and the new instance; only
+    operations that have density tiles are tracked.
+    """
+    if old.gps_latitude is None or old.gps_longitude is None:
+        return
+    if (old.operation_id, old.gps_latitude, old.gps_longitude) == (new.operation_id, new.gps_latitude, new.gps_longitude):
+        return
+    if TileRenderState.objects.filter(operation_id=old.operation_id).exists():
+        TileLocationChange.objects.create(
+            operation_id=old.operation_id,
+            gps_latitude=old.gps_latitude,
+            gps_longitude=old.gps_longitude,
+        )
+
+
+def _changed_tiles(operation, zoom_levels, since):
+    """
+    Tiles containing records created or updated after `since`.
+
+    Soft-deleted records are included so their tiles are re-rendered
+    without them, and so are the former locations of records that moved
+    or left the operation (see track_record_move).
+
+    Returns:
+        dict: {zoom: set((x, y), ...)}
+    """
+    changed = Record.objects.filter(
+        Q(created_at__gt=since) | Q(updated_at__gt=since),
+        operation=operation,
+        gps_latitude__isnull=False,
+        gps_longitude__isnull=False,
+    ).order_by().values_list('gps_longitude', 'gps_latitude')
+    moved = TileLocationChange.objects.filter(
+        operation=operation,
+        changed_at__gt=since,
+    ).values_list('gps_longitude', 'gps_latitude')
+
+    dirty = {zoom: set() for zoom in zoom_levels}
+    for locations in (changed.iterator(chunk_size=5000), moved):
+        for lon, lat in locations:
+            for zoom in zoom_levels:
+                fx, fy = lonlat_to_tile(lon, lat, zoom)
+                dirty[zoom].add((int(fx), int(fy)))
+    return dirty
+
+
+def _needs_full_render(operation, zoom_levels, state):
+    """
+    A full render is needed on the first run, when the zoom levels change,
+    or when records were hard-deleted since the last run (their former
+    location is no longer known).
+    """
+    if state is None or sorted(state.zoom_levels) != sorted(zoom_levels):
+        return True
+    return DeletionLog.objects.filter(
+        item_type='record',
+        deleted_at__gt=state.rendered_at,
+        metadata__operation=operation.name,
+    ).exists()
+
+
+# =============================================
+# ORCHESTRATION
+# =============================================
+
+def render_operation_tiles(operation, zoom_levels=None, workers=None, full=False, formats=('png', 'grid')):
+    """
+    Render the density tiles of an operation, incrementally when possible.
+
+    A full render also removes every stored tile it did not produce: tiles
+    left empty by deleted or moved records and tiles of dropped zoom levels.
+
+    Args:
+        operation: Operation instance
+        zoom_levels: Zoom levels to render (default DEFAULT_ZOOM_LEVELS)
+        workers: Process pool size (default: CPU count)
+        full: Re-render every tile regardless of changes
+        formats: Tile formats to store ('png', 'grid')
+
+    Returns:
+        dict: {'rendered': int, 'removed': int, 'full': bool}
+    """
+    zoom_levels = sorted(zoom_levels or DEFAULT_ZOOM_LEVELS)
+    state = TileRenderState.objects.filter(operation=operation).first()
+    started_at = timezone.now()
+
+    full = full or _needs_full_render(operation, zoom_levels, state)
+    if full:
+        dirty = {zoom: None for zoom in zoom_levels}
+    else:
+        dirty = _changed_tiles(operation, zoom_levels, state.rendered_at)
+        dirty = {zoom: tiles for zoom, tiles in dirty.items() if tiles}
+
+    summary = {'rendered': 0, 'removed': 0, 'full': full}
+    # Moves before this render are covered by it
+    covered_moves = TileLocationChange.objects.filter(operation=operation, changed_at__lte=started_at)
+    if not dirty:
+        state.rendered_at = started_at
+        state.save(update_fields=['rendered_at'])
+        covered_moves.delete()
+        return summary
+
+    lons, lats = array('d'), array('d')
+    points = Record.objects.filter(
+        operation=operation,
+        is_deleted=False,
+        gps_latitude__isnull=False,
+        gps_longitude__isnull=False,
+    ).order_by().values_list('gps_longitude', 'gps_latitude')
+    for lon, lat in points.iterator(chunk_size=5000):
+        lons.append(float(lon))
+        lats.append(float(lat))
+
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+
+    rendered_tiles = set()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            zoom: pool.submit(render_zoom, zoom, lons, lats, tiles, tuple(formats))
+            for zoom, tiles in dirty.items()
+        }
+        for zoom, future in futures.items():
+            for x, y, rendered in future.result():
+                if rendered:
+                    for extension, content in rendered.items():
+                        overwrite_stored_file(tile_path(operation.pk, zoom, x, y, extension), ContentFile(content))
+                    rendered_tiles.add((zoom, x, y))
+                    summary['rendered'] += 1
+                else:
+                    for extension in formats:
+                        default_storage.delete(tile_path(operation.pk, zoom, x, y, extension))
+                    summary['removed'] += 1
+
+    if full:
+        stale = set()
+        for zoom, x, y, extension in list(stored_tiles(operation.pk)):
+            if (zoom, x, y) not in rendered_tiles or extension not in formats:
+                default_storage.delete(tile_path(operation.pk, zoom, x, y, extension))
+                if (zoom, x, y) not in rendered_tiles:
+                    stale.add((zoom, x, y))
+        summary['removed'] += len(stale)
+
+    TileRenderState.objects.update_or_create(
+        operation=operation,
+        defaults={
+            'zoom_levels': zoom_levels,
+            'rendered_at': started_at,
+            'tile_count': summary['rendered'],
+        },
+    )
+    covered_moves.delete()
+    logger.info(
+        f"Rendered {summary['rendered']} density tiles for operation {operation.pk} "
+        f"({'full' if full else 'incremental'})"
+    )
+    return summary
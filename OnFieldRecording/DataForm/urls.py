@@ -2,8 +2,8 @@
 URL configuration for DataForm app
 """
 
-from django.urls import path
-from . import views
+from django.urls import path, include
+from . import views, api
 
 urlpatterns = [
     # Authentication
@@ -24,6 +24,8 @@ urlpatterns = [
     path('operations/<int:pk>/export/pdf/', views.operation_export_pdf, name='operation_export_pdf'),
     path('operations/<int:pk>/export/xlsx/', views.operation_export_xlsx, name='operation_export_xlsx'),
     path('operations/<int:pk>/search/', views.operation_search, name='operation_search'),
+    path('operations/<int:pk>/analytics/', views.operation_analytics, name='operation_analytics'),
+    path('operations/<int:pk>/tiles/<int:zoom>/<int:x>/<int:y>.png', views.operation_density_tile, name='operation_density_tile'),
     
     # Search (Admin only)
     path('search/', views.system_search, name='system_search'),
@@ -37,4 +39,13 @@ urlpatterns = [
     
     # API
     path('api/active-operation/', views.get_active_operation, name='api_active_operation'),
+    path('api/v1/sync/', api.SyncView.as_view(), name='api_sync'),
+    path('api/v1/sync/poll/', api.sync_poll, name='api_sync_poll'),
+    path('api/v1/records/batch/', api.RecordBatchView.as_view(), name='api_record_batch'),
+    path('api/v1/', include(api.router.urls)),
+    path('api/map/', views.map_data, name='api_map_data'),
+    path('api/registry/lookup/', views.registry_lookup, name='api_registry_lookup'),
+    
+    # Monitoring
+    path('metrics', views.prometheus_metrics, name='metrics'),
 ]
@@ -2,17 +2,26 @@
 Utility functions for DataForm app
 """
 
+from datetime import datetime, time
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.utils import timezone
+from .db import retry_on_locked
 from .models import Operation
 
 
+@retry_on_locked
 def generate_record_number(operation):
     """
     Generate a unique record number for a given operation.
     Format: JOB-{operation_id:03d}-{sequence:04d}
     Example: JOB-001-0042
     
-    Uses select_for_update() to prevent race conditions.
+    Uses select_for_update() to prevent race conditions (on SQLite the
+    BEGIN IMMEDIATE transaction holds the write lock instead), retrying
+    with jittered backoff if the database stays locked.
     
     Args:
         operation: Operation instance
@@ -23,18 +32,34 @@ def generate_record_number(operation):
     Raises:
         Operation.DoesNotExist: If operation doesn't exist
     """
+    return allocate_record_numbers(operation, 1)[0]
+
+
+@retry_on_locked
+def allocate_record_numbers(operation, count):
+    """
+    Reserve a block of consecutive record numbers in one locked update.
+    
+    Numbers of a block whose records are never saved are skipped, as
+    with generate_record_number(); call this inside the transaction that
+    inserts the records so a rollback releases the block.
+    
+    Args:
+        operation: Operation instance
+        count: Number of record numbers to reserve
+    
+    Returns:
+        list: Formatted record numbers, in sequence order
+    """
     with transaction.atomic():
         # Lock the operation row to prevent concurrent updates
         op = Operation.objects.select_for_update().get(pk=operation.pk)
         
-        # Generate the record number
-        record_number = f"JOB-{op.id:03d}-{op.next_record_seq:04d}"
-        
-        # Increment the sequence for next record
-        op.next_record_seq += 1
+        first = op.next_record_seq
+        op.next_record_seq += count
         op.save(update_fields=['next_record_seq'])
         
-        return record_number
+        return [f"JOB-{op.id:03d}-{seq:04d}" for seq in range(first, first + count)]
 
 
 def validate_phone_number(phone):
@@ -96,3 +121,60 @@ def get_client_ip_from_request(request):
     else:
         ip = request.META.get('REMOTE_ADDR')
     return ip
+
+
+def day_start(day):
+    """
+    Get the start of a calendar day in the current timezone.
+    
+    Filtering created_at__gte/__lt against day boundaries keeps the
+    created_at indexes usable, unlike created_at__date lookups.
+    
+    Args:
+        day: date object
+    
+    Returns:
+        datetime: Timezone-aware midnight of that day
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def bump_cache_version(key):
+    """
+    Increment a version counter in the default cache, creating it if needed.
+    
+    Readers put the version in their cache keys, so a bump drops every
+    entry built from older data. Other worker processes only see the bump
+    when the cache is shared (Redis).
+    
+    Args:
+        key: Cache key of the counter
+    """
+    if cache.add(key, 1, timeout=None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def cache_version(key):
+    """Current value of a bump_cache_version() counter (0 if never bumped)"""
+    return cache.get(key, 0)
+
+
+def overwrite_stored_file(name, content):
+    """
+    Save a file to the default storage under a fixed name, replacing any old one.
+    
+    The old file is deleted unconditionally: not every backend reports
+    existence reliably (see SupabaseMediaStorage.exists), and save() would
+    otherwise store the new file under another name.
+    
+    Args:
+        name: Storage path
+        content: django File
+    """
+    default_storage.delete(name)
+    default_storage.save(name, content)
@@ -1,32 +1,26 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.db.models import Q, Count
+from django.conf import settings
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
-from datetime import datetime
-from io import BytesIO
-
-# PDF and Excel generation
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4, landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+from datetime import datetime, timedelta
 
 from .models import Operation, Record, RecordMedia, AuditLog
 from .forms import (
     CustomLoginForm, CustomPasswordChangeForm, OperationForm,
     RecordForm, RecordMediaForm, RecordSearchForm
 )
-from .decorators import staff_required, admin_required, active_operation_required, staff_can_edit_record
-from .utils import generate_record_number
+from .decorators import (
+    staff_required, admin_required, active_operation_required, staff_can_edit_record,
+    get_record_or_404
+)
+from .auth import get_principal
+from .utils import generate_record_number, day_start
+from . import aio, analytics, maps, metrics, registry
+from .archive import ArchivedRecordSet, operation_records, anomaly_distribution, get_archive
 
 
 # =============================================
@@ -133,21 +127,23 @@ def dashboard(request):
     user = request.user
     context = {
         'user': user,
-        'is_admin': hasattr(user, 'profile') and user.profile.role == 'admin'
+        'is_admin': get_principal(request).is_admin
     }
     
     # Note: active_operation is now provided by context processor
     
     if context['is_admin']:
         # Admin dashboard - show all operations and stats
-        operations = Operation.objects.filter(is_deleted=False).order_by('-created_at')[:10]
+        operations = Operation.objects.filter(is_deleted=False).select_related('created_by').order_by('-created_at')[:10]
         
         # Overall stats
         total_operations = Operation.objects.filter(is_deleted=False).count()
         total_records = Record.objects.filter(is_deleted=False).count()
         
         # Recent records
-        recent_records = Record.objects.filter(is_deleted=False).order_by('-created_at')[:10]
+        recent_records = Record.objects.filter(is_deleted=False).select_related(
+            'operation', 'created_by'
+        ).order_by('-created_at')[:10]
         
         # Anomaly distribution
         anomaly_stats = Record.objects.filter(is_deleted=False).values('type_of_anomaly').annotate(
@@ -191,11 +187,15 @@ def dashboard(request):
 @admin_required
 def operation_list(request):
     """List all operations"""
-    operations = Operation.objects.filter(is_deleted=False).order_by('-created_at')
+    operations = Operation.objects.filter(is_deleted=False).select_related('archive').order_by('-created_at')
     
     # Add record counts
     for op in operations:
-        op.record_count = Record.objects.filter(operation=op, is_deleted=False).count()
+        archive = getattr(op, 'archive', None)
+        if archive is not None and archive.is_purged:
+            op.record_count = archive.record_count
+        else:
+            op.record_count = Record.objects.filter(operation=op, is_deleted=False).count()
     
     context = {
         'operations': operations,
@@ -229,34 +229,30 @@ def operation_detail(request, pk):
     """View operation details"""
     operation = get_object_or_404(Operation, pk=pk)
     
+    # Live records, or read back from cold storage for archived operations
+    all_records = operation_records(operation)
+    
     # Get records for this operation
-    records = Record.objects.filter(operation=operation, is_deleted=False).order_by('-created_at')[:50]
+    records = all_records.select_related('created_by').order_by('-created_at')[:50]
     
     # Stats
     stats = {
-        'total_records': Record.objects.filter(operation=operation, is_deleted=False).count(),
-        'draft': Record.objects.filter(operation=operation, status='draft', is_deleted=False).count(),
-        'submitted': Record.objects.filter(operation=operation, status='submitted', is_deleted=False).count(),
-        'verified': Record.objects.filter(operation=operation, status='verified', is_deleted=False).count(),
-        'with_anomaly': Record.objects.filter(operation=operation, is_deleted=False).exclude(type_of_anomaly='none').count(),
+        'total_records': all_records.count(),
+        'draft': all_records.filter(status='draft').count(),
+        'submitted': all_records.filter(status='submitted').count(),
+        'verified': all_records.filter(status='verified').count(),
+        'with_anomaly': all_records.exclude(type_of_anomaly='none').count(),
     }
     
     # Anomaly distribution
-    from django.db.models import Count
-    anomaly_stats = Record.objects.filter(
-        operation=operation, 
-        is_deleted=False
-    ).exclude(
-        type_of_anomaly='none'
-    ).values('type_of_anomaly').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    anomaly_stats = anomaly_distribution(all_records)
     
     context = {
         'operation': operation,
         'records': records,
         'stats': stats,
         'anomaly_stats': anomaly_stats,
+        'archive': get_archive(operation),
     }
     return render(request, 'dataform/operation_detail.html', context)
 
@@ -266,6 +262,10 @@ def operation_activate(request, pk):
     """Activate an operation"""
     operation = get_object_or_404(Operation, pk=pk)
     
+    if get_archive(operation):
+        messages.error(request, f'Operation "{operation.name}" is archived and cannot be reactivated.')
+        return redirect('operation_detail', pk=pk)
+    
     try:
         operation.reopen_operation()
         messages.success(request, f'Operation "{operation.name}" has been activated.')
@@ -292,7 +292,7 @@ def operation_delete(request, pk):
     operation = get_object_or_404(Operation, pk=pk)
     
     if request.method == 'POST':
-        from ..OnFieldRecording.DataForm.models import DeletionLog
+        from .models import DeletionLog
         
         operation_name = operation.name
         operation_id = operation.pk
@@ -333,218 +333,18 @@ def operation_delete(request, pk):
 
 
 @admin_required
+@metrics.observe_export('pdf')
 def operation_export_pdf(request, pk):
     """Export operation details and records to PDF"""
-    operation = get_object_or_404(Operation, pk=pk)
-    records = Record.objects.filter(operation=operation, is_deleted=False).select_related(
-        'created_by', 'operation'
-    ).order_by('record_number')
+    # ReportLab is imported on the first export, not at worker startup
+    from . import reports
     
-    # Get statistics
-    total_records = records.count()
-    stats = {
-        'draft': records.filter(status='draft').count(),
-        'submitted': records.filter(status='submitted').count(),
-        'verified': records.filter(status='verified').count(),
-    }
-    
-    # Anomaly stats
-    anomaly_stats = records.exclude(type_of_anomaly='none').values('type_of_anomaly').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Create filename from operation name (sanitize for filesystem)
-    safe_operation_name = "".join(c for c in operation.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-    safe_operation_name = safe_operation_name.replace(' ', '_')
-    filename = f"{safe_operation_name}_{timezone.now().strftime('%Y%m%d_%H%M')}.pdf"
+    operation = get_object_or_404(Operation, pk=pk)
+    summary = reports.operation_summary(operation)
     
-    # Create the HttpResponse object with PDF headers
     response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Create the PDF object using ReportLab with LANDSCAPE orientation
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), topMargin=0.5*inch, bottomMargin=0.5*inch, leftMargin=0.5*inch, rightMargin=0.5*inch)
-    
-    # Container for PDF elements
-    elements = []
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#1f2937'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=12,
-        spaceBefore=20
-    )
-    normal_style = styles['Normal']
-    
-    # Title
-    title = Paragraph(f"<b>Operation Report</b>", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.2*inch))
-    
-    # Operation Details Table
-    operation_data = [
-        ['Operation Name:', operation.name],
-        ['Description:', operation.description or 'N/A'],
-        ['Status:', 'Active' if operation.is_active else 'Inactive'],
-        ['Created By:', operation.created_by.username if operation.created_by else 'N/A'],
-        ['Start Date:', operation.start_at.strftime('%Y-%m-%d %H:%M') if operation.start_at else 'N/A'],
-        ['End Date:', operation.end_at.strftime('%Y-%m-%d %H:%M') if operation.end_at else 'N/A'],
-        ['Generated:', timezone.now().strftime('%Y-%m-%d %H:%M')],
-    ]
-    
-    operation_table = Table(operation_data, colWidths=[2*inch, 4.5*inch])
-    operation_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f3f4f6')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1f2937')),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
-    ]))
-    
-    elements.append(operation_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Statistics Section
-    elements.append(Paragraph("<b>Statistics</b>", heading_style))
-    
-    stats_data = [
-        ['Total Records', 'Draft', 'Submitted', 'Verified', 'Anomalies'],
-        [str(total_records), str(stats['draft']), str(stats['submitted']), str(stats['verified']), str(len(anomaly_stats))]
-    ]
-    
-    stats_table = Table(stats_data, colWidths=[1.3*inch, 1.3*inch, 1.3*inch, 1.3*inch, 1.3*inch])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
-    ]))
-    
-    elements.append(stats_table)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    # Anomaly Breakdown (if any)
-    if anomaly_stats:
-        elements.append(Paragraph("<b>Anomaly Breakdown</b>", heading_style))
-        
-        anomaly_data = [['Anomaly Type', 'Count']]
-        for anomaly in anomaly_stats:
-            anomaly_type = anomaly['type_of_anomaly'].replace('_', ' ').title()
-            anomaly_data.append([anomaly_type, str(anomaly['count'])])
-        
-        anomaly_table = Table(anomaly_data, colWidths=[4*inch, 2.5*inch])
-        anomaly_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#d1d5db')),
-        ]))
-        
-        elements.append(anomaly_table)
-        elements.append(Spacer(1, 0.3*inch))
-    
-    # Records Table (all records)
-    if total_records > 0:
-        elements.append(Paragraph("<b>Records</b>", heading_style))
-        
-        # Table headers - only specified fields
-        records_data = [[
-            'Job #', 
-            'Customer Name', 
-            'Contact', 
-            'GPS Address', 
-            'Account #', 
-            'Meter #', 
-            'Balance', 
-            'Reading', 
-            'Anomaly', 
-            'Remarks'
-        ]]
-        
-        # Add all records with specified fields
-        for idx, record in enumerate(records, 1):
-            anomaly_display = record.type_of_anomaly.replace('_', ' ').title() if record.type_of_anomaly != 'none' else 'None'
-            records_data.append([
-                record.record_number,
-                record.customer_name[:30] or 'N/A',  # Increased from 25
-                record.customer_contact or 'N/A',
-                (record.gps_address[:40] + '...') if len(record.gps_address) > 40 else (record.gps_address or 'N/A'),  # Increased from 30
-                record.account_number or 'N/A',
-                record.meter_number or 'N/A',
-                f"{record.todays_balance:,.2f}",
-                f"{record.meter_reading:,.2f}",
-                anomaly_display,
-                (record.remarks[:25] + '...') if len(record.remarks) > 25 else (record.remarks or '-')  # Increased from 20
-            ])
-        
-        # Adjusted column widths for landscape layout (total ~10 inches)
-        records_table = Table(records_data, colWidths=[
-            0.95*inch,  # Job #
-            1.35*inch,  # Customer Name
-            1.0*inch,   # Contact
-            1.5*inch,   # GPS Address
-            0.95*inch,  # Account #
-            0.95*inch,  # Meter #
-            0.75*inch,  # Balance
-            0.75*inch,  # Reading
-            1.0*inch,   # Anomaly
-            0.8*inch    # Remarks
-        ])
-        records_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#d1d5db')),
-        ]))
-        
-        elements.append(records_table)
-    
-    # Build PDF
-    doc.build(elements)
-    
-    # Get the value of the BytesIO buffer and write it to the response
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
+    response['Content-Disposition'] = f'attachment; filename="{reports.export_filename(operation, "pdf")}"'
+    response.write(reports.build_pdf(operation, **summary))
     
     # Log export action
     AuditLog.objects.create(
@@ -552,7 +352,7 @@ def operation_export_pdf(request, pk):
         action_type='export',
         target_type='operation',
         target_id=operation.pk,
-        details={'format': 'pdf', 'record_count': total_records},
+        details={'format': 'pdf', 'record_count': summary['total_records']},
         ip_address=request.META.get('REMOTE_ADDR')
     )
     
@@ -560,216 +360,20 @@ def operation_export_pdf(request, pk):
 
 
 @admin_required
+@metrics.observe_export('xlsx')
 def operation_export_xlsx(request, pk):
     """Export operation details and records to Excel (XLSX)"""
-    operation = get_object_or_404(Operation, pk=pk)
-    records = Record.objects.filter(operation=operation, is_deleted=False).select_related(
-        'created_by', 'operation'
-    ).order_by('record_number')
-    
-    # Get statistics
-    total_records = records.count()
-    stats = {
-        'draft': records.filter(status='draft').count(),
-        'submitted': records.filter(status='submitted').count(),
-        'verified': records.filter(status='verified').count(),
-    }
-    
-    # Anomaly stats
-    anomaly_stats = records.exclude(type_of_anomaly='none').values('type_of_anomaly').annotate(
-        count=Count('id')
-    ).order_by('-count')
-    
-    # Create workbook
-    wb = Workbook()
-    
-    # Define styles
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="1F2937", end_color="1F2937", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    cell_alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-    border = Border(
-        left=Side(style='thin', color='D1D5DB'),
-        right=Side(style='thin', color='D1D5DB'),
-        top=Side(style='thin', color='D1D5DB'),
-        bottom=Side(style='thin', color='D1D5DB')
-    )
-    
-    # ========== SHEET 1: Summary ==========
-    ws_summary = wb.active
-    ws_summary.title = "Summary"
-    
-    # Title
-    ws_summary['A1'] = "Operation Report"
-    ws_summary['A1'].font = Font(bold=True, size=16)
-    ws_summary['A1'].alignment = Alignment(horizontal="center")
-    ws_summary.merge_cells('A1:B1')
-    ws_summary.row_dimensions[1].height = 25
-    
-    # Operation Details
-    ws_summary['A3'] = "Operation Details"
-    ws_summary['A3'].font = Font(bold=True, size=12)
-    ws_summary.merge_cells('A3:B3')
-    
-    details = [
-        ['Operation Name:', operation.name],
-        ['Description:', operation.description or 'N/A'],
-        ['Status:', 'Active' if operation.is_active else 'Inactive'],
-        ['Created By:', operation.created_by.username if operation.created_by else 'N/A'],
-        ['Start Date:', operation.start_at.strftime('%Y-%m-%d %H:%M') if operation.start_at else 'N/A'],
-        ['End Date:', operation.end_at.strftime('%Y-%m-%d %H:%M') if operation.end_at else 'N/A'],
-        ['Total Records:', str(total_records)],
-        ['Generated:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')],
-    ]
-    
-    row = 4
-    for label, value in details:
-        ws_summary[f'A{row}'] = label
-        ws_summary[f'A{row}'].font = Font(bold=True)
-        ws_summary[f'A{row}'].fill = PatternFill(start_color="F3F4F6", end_color="F3F4F6", fill_type="solid")
-        ws_summary[f'B{row}'] = value
-        ws_summary[f'A{row}'].border = border
-        ws_summary[f'B{row}'].border = border
-        row += 1
-    
-    # Statistics
-    row += 1
-    ws_summary[f'A{row}'] = "Record Statistics"
-    ws_summary[f'A{row}'].font = Font(bold=True, size=12)
-    ws_summary.merge_cells(f'A{row}:E{row}')
-    
-    row += 1
-    stats_headers = ['Total Records', 'Draft', 'Submitted', 'Verified', 'Anomalies']
-    for col, header in enumerate(stats_headers, 1):
-        cell = ws_summary.cell(row, col, header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    row += 1
-    stats_values = [total_records, stats['draft'], stats['submitted'], stats['verified'], len(anomaly_stats)]
-    for col, value in enumerate(stats_values, 1):
-        cell = ws_summary.cell(row, col, value)
-        cell.alignment = Alignment(horizontal="center")
-        cell.border = border
-    
-    # Anomaly Breakdown
-    if anomaly_stats:
-        row += 2
-        ws_summary[f'A{row}'] = "Anomaly Breakdown"
-        ws_summary[f'A{row}'].font = Font(bold=True, size=12)
-        ws_summary.merge_cells(f'A{row}:B{row}')
-        
-        row += 1
-        ws_summary[f'A{row}'] = "Anomaly Type"
-        ws_summary[f'B{row}'] = "Count"
-        for col in range(1, 3):
-            cell = ws_summary.cell(row, col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = border
-        
-        for anomaly in anomaly_stats:
-            row += 1
-            anomaly_type = anomaly['type_of_anomaly'].replace('_', ' ').title()
-            ws_summary[f'A{row}'] = anomaly_type
-            ws_summary[f'B{row}'] = anomaly['count']
-            ws_summary[f'A{row}'].border = border
-            ws_summary[f'B{row}'].border = border
-            ws_summary[f'B{row}'].alignment = Alignment(horizontal="center")
-    
-    # Set column widths for summary sheet
-    ws_summary.column_dimensions['A'].width = 20
-    ws_summary.column_dimensions['B'].width = 40
-    ws_summary.column_dimensions['C'].width = 15
-    ws_summary.column_dimensions['D'].width = 15
-    ws_summary.column_dimensions['E'].width = 15
-    
-    # ========== SHEET 2: Records Data ==========
-    ws_records = wb.create_sheet(title="Records")
-    
-    # Headers - only specified fields
-    headers = [
-        'Job Number', 
-        'Customer Name', 
-        'Customer Contact', 
-        'GPS Address', 
-        'Account Number', 
-        'Meter Number',
-        'Today\'s Balance', 
-        'Meter Reading', 
-        'Type of Anomaly', 
-        'Remarks'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws_records.cell(1, col, header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = border
-    
-    # Data rows with specified fields only
-    for idx, record in enumerate(records, 1):
-        row_data = [
-            record.record_number,
-            record.customer_name or '',
-            record.customer_contact or '',
-            record.gps_address or '',
-            record.account_number or '',
-            record.meter_number or '',
-            float(record.todays_balance) if record.todays_balance else 0,
-            float(record.meter_reading) if record.meter_reading else 0,
-            record.type_of_anomaly.replace('_', ' ').title() if record.type_of_anomaly != 'none' else 'None',
-            record.remarks or '',
-        ]
-        
-        for col, value in enumerate(row_data, 1):
-            cell = ws_records.cell(idx + 1, col, value)
-            cell.alignment = cell_alignment
-            cell.border = border
-            
-            # Format currency columns
-            if col in [7, 8]:  # Balance and Reading columns
-                cell.number_format = '#,##0.00'
-    
-    # Set column widths for records sheet
-    column_widths = {
-        'A': 18,  # Job Number
-        'B': 25,  # Customer Name
-        'C': 18,  # Customer Contact
-        'D': 35,  # GPS Address
-        'E': 18,  # Account Number
-        'F': 18,  # Meter Number
-        'G': 15,  # Today's Balance
-        'H': 15,  # Meter Reading
-        'I': 20,  # Type of Anomaly
-        'J': 30,  # Remarks
-    }
-    
-    for col_letter, width in column_widths.items():
-        ws_records.column_dimensions[col_letter].width = width
-    
-    # Freeze header row
-    ws_records.freeze_panes = 'A2'
+    # openpyxl is imported on the first export, not at worker startup
+    from . import reports
     
-    # Create sanitized filename with operation name
-    safe_operation_name = "".join(c for c in operation.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-    safe_operation_name = safe_operation_name.replace(' ', '_')
-    timestamp = timezone.now().strftime('%Y%m%d_%H%M')
-    filename = f"{safe_operation_name}_{timestamp}.xlsx"
+    operation = get_object_or_404(Operation, pk=pk)
+    summary = reports.operation_summary(operation)
     
-    # Create the HTTP response
     response = HttpResponse(
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    # Save workbook to response
-    wb.save(response)
+    response['Content-Disposition'] = f'attachment; filename="{reports.export_filename(operation, "xlsx")}"'
+    reports.build_workbook(operation, **summary).save(response)
     
     # Log export action
     AuditLog.objects.create(
@@ -777,7 +381,7 @@ def operation_export_xlsx(request, pk):
         action_type='export',
         target_type='operation',
         target_id=operation.pk,
-        details={'format': 'xlsx', 'record_count': total_records},
+        details={'format': 'xlsx', 'record_count': summary['total_records']},
         ip_address=request.META.get('REMOTE_ADDR')
     )
     
@@ -837,13 +441,19 @@ def record_create(request):
     return render(request, 'dataform/record_form.html', context)
 
 
-@staff_required
-def record_list(request):
-    """List records with filtering"""
-    records = Record.objects.filter(is_deleted=False).select_related('operation', 'created_by')
-    
-    # Apply filters
-    search_form = RecordSearchForm(request.GET)
+# Columns of record_list?format=json
+RECORD_LIST_FIELDS = [
+    'id', 'record_number', 'customer_name', 'account_number', 'meter_number',
+    'status', 'type_of_anomaly', 'operation_id', 'operation__name',
+    'created_by__username', 'created_at', 'updated_at',
+]
+
+
+def _filter_record_list(records, search_form):
+    """Apply the RecordSearchForm filters (validating the form queries operations)"""
+    # Fetch the operation choices now, so the form renders without queries
+    operation_field = search_form.fields['operation']
+    operation_field.choices = list(operation_field.choices)
     
     if search_form.is_valid():
         search = search_form.cleaned_data.get('search')
@@ -870,39 +480,73 @@ def record_list(request):
         
         date_from = search_form.cleaned_data.get('date_from')
         if date_from:
-            records = records.filter(created_at__date__gte=date_from)
+            records = records.filter(created_at__gte=day_start(date_from))
         
         date_to = search_form.cleaned_data.get('date_to')
         if date_to:
-            records = records.filter(created_at__date__lte=date_to)
+            records = records.filter(created_at__lt=day_start(date_to + timedelta(days=1)))
     
     # Order by latest first
-    records = records.order_by('-created_at')
+    return records.order_by('-created_at')
+
+
+@staff_required
+async def record_list(request):
+    """List records with filtering (?format=json for the page as JSON)"""
+    records = Record.objects.filter(is_deleted=False).select_related('operation', 'created_by')
+    
+    # Apply filters
+    search_form = RecordSearchForm(request.GET)
+    records = await aio.run_sync(_filter_record_list, records, search_form)
+    
+    if request.GET.get('format') == 'json':
+        page_obj = await aio.paginate(records.values(*RECORD_LIST_FIELDS), request.GET.get('page'))
+        return JsonResponse({
+            'count': page_obj.paginator.count,
+            'page': page_obj.number,
+            'num_pages': page_obj.paginator.num_pages,
+            'results': page_obj.object_list,
+        })
     
     # Pagination
-    paginator = Paginator(records, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = await aio.paginate(records, request.GET.get('page'))
     
     context = {
         'page_obj': page_obj,
         'search_form': search_form,
-        'total_count': records.count(),
+        'total_count': page_obj.paginator.count,
     }
-    return render(request, 'dataform/record_list.html', context)
+    return await aio.render(request, 'dataform/record_list.html', context)
 
 
 @staff_required
 def record_detail(request, pk):
     """View record details"""
-    record = get_object_or_404(Record, pk=pk, is_deleted=False)
+    record = get_record_or_404(request, pk)
     
     # Check permissions
-    is_admin = hasattr(request.user, 'profile') and request.user.profile.role == 'admin'
-    can_edit = is_admin or (record.created_by == request.user and record.operation.is_active)
+    principal = get_principal(request)
+    is_admin = principal.is_admin
+    can_edit = principal.can_edit_record(record)
+    
+    # Prefetched with the record; evaluate once for the template
+    media_files = list(record.media_files.all())
+    
+    # Audit trail for admins. Entries can't predate the record, which lets
+    # PostgreSQL skip the older monthly audit log partitions.
+    audit_logs = []
+    if is_admin:
+        audit_logs = AuditLog.objects.filter(
+            target_type='record',
+            target_id=record.pk,
+            timestamp__gte=record.created_at,
+        ).select_related('user').order_by('-timestamp')[:20]
     
     context = {
         'record': record,
+        'media_files': media_files,
+        'media_count': len(media_files),
+        'audit_logs': audit_logs,
         'can_edit': can_edit,
         'is_admin': is_admin,
     }
@@ -913,7 +557,8 @@ def record_detail(request, pk):
 @staff_can_edit_record
 def record_update(request, pk):
     """Update a record"""
-    record = get_object_or_404(Record, pk=pk, is_deleted=False)
+    # Already loaded by staff_can_edit_record
+    record = get_record_or_404(request, pk)
     
     if request.method == 'POST':
         form = RecordForm(request.POST, instance=record)
@@ -947,10 +592,10 @@ def record_update(request, pk):
 @login_required
 def record_delete(request, pk):
     """Delete a record (admin or record owner only) with audit logging"""
-    record = get_object_or_404(Record, pk=pk, is_deleted=False)
+    record = get_record_or_404(request, pk)
     
     # Permission check: must be admin or record creator
-    if not (request.user.profile.role == 'admin' or record.created_by == request.user):
+    if not get_principal(request).can_delete_record(record):
         messages.error(request, 'You do not have permission to delete this record.')
         return redirect('record_detail', pk=pk)
     
@@ -964,8 +609,8 @@ def record_delete(request, pk):
         # Get deletion reason from form
         deletion_reason = request.POST.get('deletion_reason', '').strip()
         
-        # Count related media
-        media_count = RecordMedia.objects.filter(record=record).count()
+        # Count related media (prefetched with the record)
+        media_count = len(record.media_files.all())
         
         # Collect metadata before deletion
         metadata = {
@@ -1005,9 +650,9 @@ def record_delete(request, pk):
 # =============================================
 
 @login_required
-def get_active_operation(request):
+async def get_active_operation(request):
     """API endpoint to get current active operation"""
-    active_op = Operation.objects.filter(is_active=True, is_deleted=False).first()
+    active_op = await Operation.objects.filter(is_active=True, is_deleted=False).afirst()
     
     if active_op:
         return JsonResponse({
@@ -1019,23 +664,108 @@ def get_active_operation(request):
         return JsonResponse({'error': 'No active operation'}, status=404)
 
 
-# =============================================
-# SEARCH FUNCTIONALITY
-# =============================================
+@admin_required
+def map_data(request):
+    """
+    API endpoint returning clustered record locations for a map viewport.
+
+    Query parameters:
+        bbox: west,south,east,north (required)
+        zoom: Map zoom level (default 0)
+        operation, status, anomaly: Optional filters
+        format: 'geojson' (default) or 'packed'
+    """
+    try:
+        bbox = maps.parse_bbox(request.GET.get('bbox', ''))
+        zoom = int(request.GET.get('zoom', 0))
+        operation_id = int(request.GET['operation']) if request.GET.get('operation') else None
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid parameters: {e}'}, status=400)
+
+    status = request.GET.get('status') or None
+    anomaly = request.GET.get('anomaly') or None
+
+    try:
+        features, truncated = maps.get_map_features(bbox, zoom, operation_id, status, anomaly)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if request.GET.get('format') == 'packed':
+        payload = maps.features_to_packed(features)
+    else:
+        payload = maps.features_to_geojson(features)
+    payload['truncated'] = truncated
+
+    return JsonResponse(payload)
+
 
 @admin_required
-def operation_search(request, pk):
-    """Search records within a specific operation (Admin only)"""
+def operation_analytics(request, pk):
+    """
+    API endpoint returning an operation's distributions and anomaly rates.
+
+    Cached until the operation's records change (see analytics.py).
+    """
     operation = get_object_or_404(Operation, pk=pk, is_deleted=False)
-    query = request.GET.get('q', '').strip()
+    return JsonResponse(analytics.get_operation_analytics(operation))
+
+
+async def prometheus_metrics(request):
+    """
+    Prometheus scrape endpoint (text exposition format).
+
+    Requires "Authorization: Bearer <METRICS_TOKEN>" when METRICS_TOKEN is
+    set, otherwise a request from INTERNAL_IPS.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = request.headers.get('Authorization') == f'Bearer {settings.METRICS_TOKEN}'
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(await aio.run_sync(metrics.exposition), content_type=metrics.CONTENT_TYPE_LATEST)
+
+
+@staff_required
+def registry_lookup(request):
+    """
+    Typeahead over the customer/meter registry (record form autofill).
+
+    Query parameters:
+        q: Meter number, account number or customer name prefix
+        limit: Maximum results (default 10, at most 20)
+    """
+    try:
+        limit = min(int(request.GET.get('limit', 10)), registry.LOOKUP_MAX_RESULTS)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+    
+    return JsonResponse({'results': registry.lookup(request.GET.get('q', ''), limit)})
+
+
+@admin_required
+def operation_density_tile(request, pk, zoom, x, y):
+    """Redirect to a pre-rendered density tile (see render_density_tiles command)"""
+    from django.core.files.storage import default_storage
+    from .tiles import tile_path
     
-    # Start with records in this operation
-    records = Record.objects.filter(operation=operation, is_deleted=False).select_related(
+    return redirect(default_storage.url(tile_path(pk, zoom, x, y, 'png')))
+
+
+# =============================================
+# SEARCH FUNCTIONALITY
+# =============================================
+
+def _search_operation_records(records, query):
+    """Filter aio.operation_records() by a search query (archives are searched in memory)"""
+    records = records.select_related(
         'created_by', 'operation'
     )
     
     # Apply search filter if query exists
-    if query:
+    if query and isinstance(records, ArchivedRecordSet):
+        records = records.search(query)
+    elif query:
         records = records.filter(
             Q(customer_name__icontains=query) |
             Q(customer_contact__icontains=query) |
@@ -1047,28 +777,37 @@ def operation_search(request, pk):
         )
     
     # Order by most recent first
-    records = records.order_by('-created_at')
+    return records.order_by('-created_at')
+
+
+@admin_required
+async def operation_search(request, pk):
+    """Search records within a specific operation (Admin only)"""
+    operation = await aget_object_or_404(Operation, pk=pk, is_deleted=False)
+    query = request.GET.get('q', '').strip()
+    
+    # Archived operations search their archive, which is scanned in the pool
+    records = await aio.operation_records(operation)
+    records = await aio.run_blocking(_search_operation_records, records, query)
     
     # Paginate results
-    paginator = Paginator(records, 50)  # 50 records per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = await aio.paginate(records, request.GET.get('page'))
     
     context = {
         'operation': operation,
         'records': page_obj,
         'query': query,
-        'total_results': records.count(),
+        'total_results': page_obj.paginator.count,
         'search_type': 'operation',
         'is_paginated': page_obj.has_other_pages(),
         'page_obj': page_obj,
     }
     
-    return render(request, 'dataform/search_results.html', context)
+    return await aio.render(request, 'dataform/search_results.html', context)
 
 
 @admin_required
-def system_search(request):
+async def system_search(request):
     """Search all records across all operations (Admin only)"""
     query = request.GET.get('q', '').strip()
     
@@ -1094,17 +833,16 @@ def system_search(request):
     records = records.order_by('-created_at')
     
     # Paginate results
-    paginator = Paginator(records, 50)  # 50 records per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = await aio.paginate(records, request.GET.get('page'))
     
     context = {
         'records': page_obj,
         'query': query,
-        'total_results': records.count(),
+        'total_results': page_obj.paginator.count,
         'search_type': 'system',
         'is_paginated': page_obj.has_other_pages(),
         'page_obj': page_obj,
     }
     
-    return render(request, 'dataform/search_results.html', context)
+    return await aio.render(request, 'dataform/search_results.html', context)
+
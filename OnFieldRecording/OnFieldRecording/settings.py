@@ -42,8 +42,8 @@ INSTALLED_APPS = [
     
     # Third-party apps
     'rest_framework',
+    'rest_framework.authtoken',
     'widget_tweaks',
-    'debug_toolbar',
     
     # Local apps
     'DataForm',
@@ -51,21 +51,29 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'DataForm.middleware.StaticFilesMiddleware',  # WhiteNoise, async-capable
+    'DataForm.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'DataForm.middleware.SlidingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'DataForm.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Django Debug Toolbar (development only)
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 ROOT_URLCONF = 'OnFieldRecording.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for RequestMetricsMiddleware
+        'BACKEND': 'DataForm.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -96,6 +104,25 @@ DATABASES = {
     }
 }
 
+# SQLite production mode for small depots with many concurrent agents:
+# WAL lets readers run alongside the writer, and write transactions take
+# the lock up front (BEGIN IMMEDIATE) so they wait for busy_timeout instead
+# of failing with "database is locked" when upgrading a read lock.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and config('SQLITE_TUNING', default=True, cast=bool):
+    SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=20, cast=int)  # seconds
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_BUSY_TIMEOUT,
+        'init_command': ';'.join([
+            'PRAGMA journal_mode=WAL',
+            'PRAGMA synchronous=NORMAL',
+            f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT * 1000}",
+            f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=268435456, cast=int)}",
+            f"PRAGMA cache_size=-{config('SQLITE_CACHE_SIZE_KB', default=65536, cast=int)}",
+            'PRAGMA temp_store=MEMORY',
+        ]),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -107,6 +134,13 @@ PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# Loads UserProfile together with the session user (see DataForm.auth).
+# ModelBackend stays listed so sessions that stored its path remain valid.
+AUTHENTICATION_BACKENDS = [
+    'DataForm.auth.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -156,12 +190,44 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# A shared cache (Redis) is required for cache-backed sessions with several workers;
+# per-process LocMem is only used when REDIS_URL is not set.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Map cluster cache (DataForm.maps): record writes invalidate tiles by
+# bumping counters in the cache, which only reach every worker when the
+# cache is shared. On by default with Redis; turn it on without Redis only
+# when a single process serves the site.
+MAP_CLUSTER_CACHE = config('MAP_CLUSTER_CACHE', default=bool(REDIS_URL), cast=bool)
+
 # Session Security
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if REDIS_URL else 'django.contrib.sessions.backends.db'
+)
 SESSION_COOKIE_AGE = config('SESSION_COOKIE_AGE', default=3600, cast=int)  # 1 hour
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=False, cast=bool)  # Set True in production with HTTPS
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_SAVE_EVERY_REQUEST = True
+# Sliding expiry is handled by DataForm.middleware.SlidingSessionMiddleware, which only
+# re-saves the session once less than SESSION_REFRESH_THRESHOLD seconds remain
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_THRESHOLD = config('SESSION_REFRESH_THRESHOLD', default=SESSION_COOKIE_AGE // 2, cast=int)
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
 # CSRF Security
@@ -184,14 +250,58 @@ INTERNAL_IPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        # Mobile client and billing integration (tokens are managed in the admin)
+        'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'DataForm.renderers.ORJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
 }
 
+# Delta sync (/api/v1/sync/): rows younger than this are held back for the
+# next call, so writes committing late are not skipped by the cursor
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=5, cast=int)
+
+# Long-polling sync (/api/v1/sync/poll/): a request waits at most
+# SYNC_POLL_MAX_WAIT seconds for changes, checking every SYNC_POLL_INTERVAL
+SYNC_POLL_MAX_WAIT = config('SYNC_POLL_MAX_WAIT', default=25, cast=int)
+SYNC_POLL_INTERVAL = config('SYNC_POLL_INTERVAL', default=2, cast=float)
+
+# Async views under ASGI (DataForm.aio): blocking work that does not query
+# (template rendering, archive parsing) runs in a pool of this many threads
+# shared by all requests
+ASYNC_SYNC_WORKERS = config('ASYNC_SYNC_WORKERS', default=8, cast=int)
+
+# Request metrics (DataForm.middleware.RequestMetricsMiddleware): per-view
+# histograms are logged every METRICS_FLUSH_SECONDS; a request over its
+# view's budget logs a warning. Keys are URL names ('default' for the rest).
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=60, cast=int)
+VIEW_BUDGETS = {
+    'default': {
+        'queries': config('METRICS_QUERY_BUDGET', default=30, cast=int),
+        'latency_ms': config('METRICS_LATENCY_BUDGET_MS', default=1000, cast=int),
+    },
+    'operation_export_pdf': {'latency_ms': 15000},
+    'operation_export_xlsx': {'latency_ms': 15000},
+    'operation_analytics': {'latency_ms': 5000},
+    'api_sync': {'latency_ms': 2000},
+    'api_sync_poll': {'latency_ms': (SYNC_POLL_MAX_WAIT + 2) * 1000},
+    'api_record_batch': {'queries': 60, 'latency_ms': 5000},
+}
+
+# Prometheus scrape endpoint (/metrics): bearer token, or INTERNAL_IPS only when unset
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# On-demand profiling (DataForm.middleware.ProfilingMiddleware): lifetime of
+# the signed admin tokens and profiled requests allowed per admin per hour
+PROFILING_TOKEN_MAX_AGE = config('PROFILING_TOKEN_MAX_AGE', default=3600, cast=int)
+PROFILING_RATE_LIMIT = config('PROFILING_RATE_LIMIT', default=10, cast=int)
+
 # Login/Logout URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -215,6 +325,14 @@ SUPABASE_URL = config('SUPABASE_URL', default='')
 SUPABASE_KEY = config('SUPABASE_KEY', default='')
 SUPABASE_STORAGE_BUCKET = config('SUPABASE_STORAGE_BUCKET', default='onfield-media')
 
+# Offline reverse geocoding (CSV: name,latitude,longitude[,region][,country] or a GeoNames .txt dump)
+GAZETTEER_PATH = config('GAZETTEER_PATH', default='')
+
+# PostgreSQL only: monthly AuditLog partitions (see DataForm.partitioning).
+# Run `manage.py manage_partitions` from cron to keep future months created.
+AUDITLOG_PARTITIONING = config('AUDITLOG_PARTITIONING', default=False, cast=bool)
+AUDITLOG_PARTITION_MONTHS_AHEAD = config('AUDITLOG_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -227,14 +345,24 @@ MAX_UPLOAD_SIZE = 5242880  # 5MB
 # =============================================
 # SENTRY ERROR MONITORING
 # =============================================
+# sentry_sdk is only imported when a DSN is configured. Its auto-enabled
+# integrations would import every supported library that is installed
+# (Celery alone adds ~0.1 s to every process start), so only the ones this
+# project uses are listed.
 SENTRY_DSN = config('SENTRY_DSN', default='')
 if SENTRY_DSN:
     import sentry_sdk
     from sentry_sdk.integrations.django import DjangoIntegration
     
+    sentry_integrations = [DjangoIntegration()]
+    if REDIS_URL:
+        from sentry_sdk.integrations.redis import RedisIntegration
+        sentry_integrations.append(RedisIntegration())
+    
     sentry_sdk.init(
         dsn=SENTRY_DSN,
-        integrations=[DjangoIntegration()],
+        integrations=sentry_integrations,
+        auto_enabling_integrations=False,
         traces_sample_rate=0.1,  # 10% of transactions for performance monitoring
         send_default_pii=False,  # Don't send personally identifiable information
         environment='production' if not DEBUG else 'development',
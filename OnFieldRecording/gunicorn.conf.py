@@ -0,0 +1,27 @@
+"""
+Gunicorn settings
+
+Usage:
+    PROMETHEUS_MULTIPROC_DIR=/tmp/onfield-metrics gunicorn OnFieldRecording.wsgi -c gunicorn.conf.py
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker writes its metrics to
+files in that directory and /metrics reports the sum over all workers.
+"""
+
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Drop the previous run's metric files (counters restart at zero)"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, '*.db')):
+            os.remove(name)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)